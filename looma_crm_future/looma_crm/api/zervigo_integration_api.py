@@ -59,6 +59,39 @@ async def check_zervigo_health(request: Request):
             'message': str(e)
         }, status=500)
 
+@zervigo_integration_bp.route('/auth/logout', methods=['POST'], name='logout')
+@require_auth()
+async def logout(request: Request):
+    """
+    登出：撤销本地token缓存并通知Zervigo认证服务
+    
+    Returns:
+        登出结果
+    """
+    try:
+        auth_header = request.headers.get('Authorization', '')
+        token = auth_header.replace('Bearer ', '')
+        
+        auth_middleware = request.app.ctx.zervigo_auth_middleware
+        logout_result = await auth_middleware.logout(token)
+        
+        if logout_result['success']:
+            return sanic_json({'success': True})
+        else:
+            # 本地缓存已撤销，认证服务登出失败不影响本服务后续重新验证
+            logger.warning(f"Zervigo登出失败: {logout_result['error']}")
+            return sanic_json({
+                'success': False,
+                'error': logout_result['error']
+            }, status=502)
+            
+    except Exception as e:
+        logger.error(f"登出异常: {e}")
+        return sanic_json({
+            'error': '登出异常',
+            'message': str(e)
+        }, status=500)
+
 @zervigo_integration_bp.route('/talents/<talent_id>/sync', methods=['POST'], name='sync_talent')
 @require_auth('talent:sync')
 async def sync_talent_to_zervigo(request: Request, talent_id: str):
@@ -23,6 +23,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared.database.unified_data_access import UnifiedDataAccess
 from shared.middleware.zervigo_auth_middleware import ZervigoAuthMiddleware
 from shared.integration.zervigo_client import ZervigoClient
+from shared.integration.token_cache import TokenRevocationStore
 
 # 导入Looma CRM组件
 from services.zervigo_integration_service import ZervigoIntegrationService
@@ -85,8 +86,12 @@ def create_app() -> Sanic:
             'user_service_url': os.getenv('ZERVIGO_USER_URL', 'http://localhost:7530')  # User Service
         }
         
-        # 初始化Zervigo认证中间件
-        app.ctx.zervigo_auth_middleware = ZervigoAuthMiddleware(zervigo_config)
+        # 初始化Zervigo认证中间件，Redis可用时各worker共享token撤销记录
+        redis_client = await app.ctx.data_access.get_client("redis")
+        app.ctx.zervigo_auth_middleware = ZervigoAuthMiddleware(
+            zervigo_config,
+            revocation_store=TokenRevocationStore(redis_client) if redis_client is not None else None
+        )
         await app.ctx.zervigo_auth_middleware.setup()
         logger.info("Zervigo认证中间件初始化完成")
         
@@ -155,7 +160,8 @@ def create_app() -> Sanic:
                 'service': 'looma-crm',
                 'version': '1.0.0',
                 'timestamp': datetime.now().isoformat(),
-                'zervigo_services': health_result.get('health_status', {})
+                'zervigo_services': health_result.get('health_status', {}),
+                'data_stores': app.ctx.data_access.get_readiness()
             })
         except Exception as e:
             logger.error(f"健康检查异常: {e}")
@@ -256,6 +262,10 @@ def create_app() -> Sanic:
         """清理服务"""
         logger.info("正在清理Looma CRM服务...")
         
+        # 关闭Zervigo认证中间件的共享会话
+        if hasattr(app.ctx, 'zervigo_auth_middleware'):
+            await app.ctx.zervigo_auth_middleware.close()
+        
         # 清理数据访问层
         if hasattr(app.ctx, 'data_access'):
             await app.ctx.data_access.close()
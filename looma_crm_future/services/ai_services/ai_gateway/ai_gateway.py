@@ -5,17 +5,22 @@ AI网关服务 - 统一AI服务入口
 
 import asyncio
 import logging
+import os
+import time
+import uuid
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
 from sanic import Request
 from sanic.response import json as sanic_json
+from prometheus_client import Histogram
 
 from shared.utils.base_service import BaseAIService
 from shared.utils.service_registry import ServiceRegistry
 from shared.utils.load_balancer import LoadBalancer
 from shared.utils.circuit_breaker import CircuitBreaker
-from shared.utils.rate_limiter import RateLimiter
+from shared.utils.rate_limiter import RedisTokenBucketRateLimiter
+from shared.utils.upstream_pool import UpstreamSessionPool
 
 logger = logging.getLogger(__name__)
 
@@ -30,14 +35,42 @@ class AIGateway(BaseAIService):
         # 服务注册表
         self.service_registry = ServiceRegistry()
         
-        # 负载均衡器
-        self.load_balancer = LoadBalancer()
+        # 负载均衡器 - 按实时响应时间二选一；简历服务按已认证用户的user_id一致性哈希以提高缓存命中
+        self.load_balancer = LoadBalancer(
+            strategy='power_of_two',
+            strategy_overrides={'resume-service': 'consistent_hash'}
+        )
         
         # 熔断器
         self.circuit_breaker = CircuitBreaker()
         
-        # 限流器
-        self.rate_limiter = RateLimiter()
+        # 限流器 - 多个网关worker通过Redis共享按用户的令牌桶
+        self.rate_limiter = RedisTokenBucketRateLimiter(
+            capacity=int(os.getenv('AI_GATEWAY_RATE_LIMIT_CAPACITY', 120)),
+            refill_rate=float(os.getenv('AI_GATEWAY_RATE_LIMIT_REFILL', 2.0)),
+            redis_url=os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+            key_prefix='ai_gateway:rate_limit',
+            fallback_workers=int(os.getenv('AI_GATEWAY_WORKERS', 8))
+        )
+        
+        # 上游长连接池
+        self.upstream_pool = UpstreamSessionPool()
+        
+        # 上游延迟与网关自身开销直方图(通过/metrics暴露)
+        latency_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+        self.upstream_latency = Histogram(
+            'ai_gateway_upstream_latency_seconds',
+            'Upstream request latency in seconds',
+            ['service', 'upstream', 'status'],
+            buckets=latency_buckets
+        )
+        self.gateway_overhead = Histogram(
+            'ai_gateway_overhead_seconds',
+            'Gateway processing time excluding upstream latency',
+            ['service'],
+            buckets=latency_buckets
+        )
         
         # AI服务配置 - Future版本端口配置 (7510-7519)
         self.ai_services = {
@@ -117,6 +150,7 @@ class AIGateway(BaseAIService):
     
     async def handle_ai_request(self, request: Request, service_type: str, action: str):
         """处理AI请求"""
+        started = time.perf_counter()
         try:
             # 1. 请求验证
             validation_result = await self.validate_request(request, service_type, action)
@@ -125,7 +159,7 @@ class AIGateway(BaseAIService):
             
             # 2. 限流检查
             rate_limit_result = await self.rate_limiter.check_rate_limit(
-                request.ctx.request_id, service_type
+                self._get_rate_limit_key(request), service_type
             )
             if not rate_limit_result['allowed']:
                 return sanic_json(rate_limit_result, status=429)
@@ -139,7 +173,9 @@ class AIGateway(BaseAIService):
                 }, status=404)
             
             # 4. 负载均衡选择实例
-            service_instance = await self.load_balancer.select_instance(service_info)
+            service_instance = await self.load_balancer.select_instance(
+                service_info, hash_key=self._get_hash_key(request)
+            )
             if not service_instance:
                 return sanic_json({
                     'error': 'No available service instances',
@@ -151,8 +187,21 @@ class AIGateway(BaseAIService):
             if not circuit_result['allowed']:
                 return sanic_json(circuit_result, status=503)
             
-            # 6. 转发请求
-            response = await self.forward_request(service_instance, action, request)
+            # 6. 转发请求，并向负载均衡器反馈实例响应时间
+            instance_id = service_instance.get('id', 'unknown')
+            self.load_balancer.record_request_start(service_info['name'], instance_id)
+            upstream_started = time.perf_counter()
+            success = False
+            try:
+                response, upstream_seconds = await self.forward_request(service_instance, action, request)
+                success = response.status < 500
+            finally:
+                self.load_balancer.record_response(
+                    service_info['name'], instance_id, time.perf_counter() - upstream_started, success
+                )
+            self.gateway_overhead.labels(service=service_type).observe(
+                max(time.perf_counter() - started - upstream_seconds, 0.0)
+            )
             
             # 7. 记录指标
             await self.record_request_metrics(service_type, action, response)
@@ -163,6 +212,17 @@ class AIGateway(BaseAIService):
             logger.error(f"处理AI请求失败: {e}")
             return await self.handle_error(request, e)
     
+    def _get_hash_key(self, request: Request) -> Optional[Any]:
+        """一致性哈希键：取认证中间件写入的user_id，请求体中的user_id可被客户端伪造，不参与路由"""
+        return getattr(request.ctx, 'user_id', None)
+    
+    def _get_rate_limit_key(self, request: Request) -> str:
+        """限流键：已认证用户按user_id，否则按客户端IP"""
+        user_id = self._get_hash_key(request)
+        if user_id is not None:
+            return f"user:{user_id}"
+        return f"ip:{request.remote_addr or request.ip}"
+    
     async def validate_request(self, request: Request, service_type: str, action: str) -> Dict[str, Any]:
         """验证请求"""
         # 检查服务类型是否支持
@@ -220,10 +280,15 @@ class AIGateway(BaseAIService):
         }
     
     async def forward_request(self, service_instance: Dict[str, Any], action: str, request: Request):
-        """转发请求到目标服务"""
+        """转发请求到目标服务，返回(响应, 上游耗时秒数)"""
+        host, port = service_instance['host'], service_instance['port']
+        upstream = f"{host}:{port}"
+        service_name = service_instance.get('name', 'unknown')
+        started = time.perf_counter()
+        status = 'error'
         try:
             # 构建目标URL
-            target_url = f"http://{service_instance['host']}:{service_instance['port']}/{action}"
+            target_url = f"http://{upstream}/{action}"
             
             # 获取请求数据
             request_data = request.json
@@ -236,17 +301,22 @@ class AIGateway(BaseAIService):
                 'source_ip': request.ip
             }
             
-            # 发送请求
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                async with session.post(target_url, json=request_data) as response:
-                    response_data = await response.json()
-                    
-                    return sanic_json(response_data, status=response.status)
+            # 通过上游长连接池发送请求
+            session = self.upstream_pool.get_session(host, port)
+            async with session.post(target_url, json=request_data) as response:
+                response_data = await response.json()
+                status = str(response.status)
+            
+            upstream_seconds = time.perf_counter() - started
+            return sanic_json(response_data, status=response.status), upstream_seconds
                     
         except Exception as e:
             logger.error(f"转发请求失败: {e}")
             raise
+        finally:
+            self.upstream_latency.labels(
+                service=service_name, upstream=upstream, status=status
+            ).observe(time.perf_counter() - started)
     
     async def list_services(self, request: Request):
         """列出所有AI服务"""
@@ -281,26 +351,26 @@ class AIGateway(BaseAIService):
                 'reason': 'No instances found'
             }, status=503)
         
-        # 检查每个实例的健康状态
-        health_checks = []
-        for instance in service_instances:
+        # 并发检查每个实例的健康状态
+        async def check_instance(instance: Dict[str, Any]) -> Dict[str, Any]:
             try:
-                import aiohttp
-                async with aiohttp.ClientSession() as session:
-                    health_url = f"http://{instance['host']}:{instance['port']}/health"
-                    async with session.get(health_url, timeout=5) as response:
-                        health_data = await response.json()
-                        health_checks.append({
-                            'instance': instance,
-                            'status': health_data.get('status', 'unknown'),
-                            'response_time': response.headers.get('X-Response-Time', 'unknown')
-                        })
+                session = self.upstream_pool.get_session(instance['host'], instance['port'])
+                health_url = f"http://{instance['host']}:{instance['port']}/health"
+                async with session.get(health_url, timeout=5) as response:
+                    health_data = await response.json()
+                    return {
+                        'instance': instance,
+                        'status': health_data.get('status', 'unknown'),
+                        'response_time': response.headers.get('X-Response-Time', 'unknown')
+                    }
             except Exception as e:
-                health_checks.append({
+                return {
                     'instance': instance,
                     'status': 'unhealthy',
                     'error': str(e)
-                })
+                }
+        
+        health_checks = await asyncio.gather(*[check_instance(instance) for instance in service_instances])
         
         # 计算整体健康状态
         healthy_instances = [h for h in health_checks if h['status'] == 'healthy']
@@ -475,6 +545,7 @@ class AIGateway(BaseAIService):
         await super().cleanup()
         
         # 清理各个组件
+        await self.upstream_pool.close()
         await self.service_registry.cleanup()
         await self.load_balancer.cleanup()
         await self.circuit_breaker.cleanup()
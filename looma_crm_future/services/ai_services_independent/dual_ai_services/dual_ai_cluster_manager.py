@@ -9,16 +9,19 @@ import logging
 from datetime import datetime
 from typing import Dict, List, Optional
 import aiomysql
-import aiohttp
+
+from dual_ai_metrics_collector import DualAIMetricsCollector
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DualAIClusterManager:
-    def __init__(self, db_config: Dict):
+    def __init__(self, db_config: Dict, metrics_collector: Optional[DualAIMetricsCollector] = None):
         self.db_config = db_config
         self.pool = None
+        # 指标采集器：共享HTTP会话、批量写库
+        self.metrics_collector = metrics_collector
         
         # 集群配置
         self.cluster_id = "dual-ai-cluster"
@@ -35,6 +38,17 @@ class DualAIClusterManager:
             minsize=5,
             maxsize=20
         )
+        if self.metrics_collector is None:
+            self.metrics_collector = DualAIMetricsCollector(pool=self.pool)
+        elif self.metrics_collector.pool is None:
+            self.metrics_collector.pool = self.pool
+        await self.metrics_collector.start()
+    
+    def _get_collector(self) -> DualAIMetricsCollector:
+        """未初始化连接池时退化为只做内存聚合的采集器"""
+        if self.metrics_collector is None:
+            self.metrics_collector = DualAIMetricsCollector(pool=self.pool)
+        return self.metrics_collector
     
     async def register_ai_cluster_services(self):
         """注册AI集群服务到集群管理"""
@@ -152,51 +166,28 @@ class DualAIClusterManager:
                 'monitoring_timestamp': datetime.now()
             }
             
-            # 检查个性化AI集群服务
-            try:
-                async with aiohttp.ClientSession() as session:
-                    start_time = datetime.now()
-                    async with session.get("http://localhost:8206/health", timeout=5) as response:
-                        response_time = (datetime.now() - start_time).total_seconds()
-                        cluster_health['ai_services'].append({
-                            'service_id': 'personalized-ai-cluster',
-                            'ai_type': 'personalized',
-                            'status_code': response.status,
-                            'response_time': response_time,
-                            'healthy': response.status == 200
-                        })
-            except Exception as e:
-                cluster_health['ai_services'].append({
-                    'service_id': 'personalized-ai-cluster',
-                    'ai_type': 'personalized',
-                    'status_code': 0,
-                    'response_time': 0,
-                    'healthy': False,
-                    'error': str(e)
-                })
-            
-            # 检查SaaS AI集群服务
-            try:
-                async with aiohttp.ClientSession() as session:
-                    start_time = datetime.now()
-                    async with session.get("http://localhost:8700/health", timeout=5) as response:
-                        response_time = (datetime.now() - start_time).total_seconds()
-                        cluster_health['ai_services'].append({
-                            'service_id': 'saas-ai-cluster',
-                            'ai_type': 'saas',
-                            'status_code': response.status,
-                            'response_time': response_time,
-                            'healthy': response.status == 200
-                        })
-            except Exception as e:
-                cluster_health['ai_services'].append({
-                    'service_id': 'saas-ai-cluster',
-                    'ai_type': 'saas',
-                    'status_code': 0,
-                    'response_time': 0,
-                    'healthy': False,
-                    'error': str(e)
-                })
+            # 并发检查个性化AI与SaaS AI集群服务
+            targets = [
+                ('personalized-ai-cluster', 'personalized', "http://localhost:8206/health"),
+                ('saas-ai-cluster', 'saas', "http://localhost:8700/health")
+            ]
+            probes = await self._get_collector().probe_many([url for _, _, url in targets])
+            for (service_id, ai_type, _), probe in zip(targets, probes):
+                if isinstance(probe, Exception):
+                    cluster_health['ai_services'].append({
+                        'service_id': service_id,
+                        'ai_type': ai_type,
+                        'status_code': 0,
+                        'response_time': 0,
+                        'healthy': False,
+                        'error': str(probe)
+                    })
+                else:
+                    cluster_health['ai_services'].append({
+                        'service_id': service_id,
+                        'ai_type': ai_type,
+                        **probe
+                    })
             
             # 计算集群状态
             healthy_services = sum(1 for service in cluster_health['ai_services'] if service['healthy'])
@@ -248,7 +239,7 @@ class DualAIClusterManager:
                 scaling_decision['scaling_action'] = 'maintain'
             
             # 记录扩缩容决策
-            await self._record_scaling_decision(scaling_decision)
+            self._record_scaling_decision(scaling_decision)
             
             return scaling_decision
             
@@ -256,31 +247,20 @@ class DualAIClusterManager:
             logger.error(f"管理AI集群扩缩容失败: {e}")
             return {'scaling_required': False, 'error': str(e)}
     
-    async def _record_scaling_decision(self, scaling_decision: Dict):
-        """记录扩缩容决策"""
+    def _record_scaling_decision(self, scaling_decision: Dict):
+        """记录扩缩容决策(批量写库)"""
         try:
-            async with self.pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    sql = """
-                    INSERT INTO service_metrics 
-                    (service_id, metric_name, metric_value, metric_unit, tags, timestamp)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    """
-                    
-                    await cursor.execute(sql, (
-                        f"{self.cluster_id}-scaling",
-                        'scaling_decision',
-                        1 if scaling_decision['scaling_required'] else 0,
-                        'count',
-                        json.dumps({
-                            'scaling_action': scaling_decision['scaling_action'],
-                            'target_services': scaling_decision['target_services']
-                        }),
-                        scaling_decision['scaling_timestamp']
-                    ))
-                    
-                    await conn.commit()
-                    
+            self._get_collector().record(
+                f"{self.cluster_id}-scaling",
+                'scaling_decision',
+                1 if scaling_decision['scaling_required'] else 0,
+                'count',
+                {
+                    'scaling_action': scaling_decision['scaling_action'],
+                    'target_services': scaling_decision['target_services']
+                },
+                scaling_decision['scaling_timestamp']
+            )
         except Exception as e:
             logger.error(f"记录扩缩容决策失败: {e}")
     
@@ -307,7 +287,7 @@ class DualAIClusterManager:
                 optimization_result['performance_improvement']['service_restart'] = 'improved'
             
             # 记录优化结果
-            await self._record_optimization_result(optimization_result)
+            self._record_optimization_result(optimization_result)
             
             return optimization_result
             
@@ -315,33 +295,24 @@ class DualAIClusterManager:
             logger.error(f"优化AI集群性能失败: {e}")
             return {}
     
-    async def _record_optimization_result(self, optimization_result: Dict):
-        """记录优化结果"""
+    def _record_optimization_result(self, optimization_result: Dict):
+        """记录优化结果(批量写库)"""
         try:
-            async with self.pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    sql = """
-                    INSERT INTO service_metrics 
-                    (service_id, metric_name, metric_value, metric_unit, tags, timestamp)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    """
-                    
-                    await cursor.execute(sql, (
-                        f"{self.cluster_id}-optimization",
-                        'optimization_applied',
-                        len(optimization_result['optimization_applied']),
-                        'count',
-                        json.dumps(optimization_result['optimization_applied']),
-                        optimization_result['optimization_timestamp']
-                    ))
-                    
-                    await conn.commit()
-                    
+            self._get_collector().record(
+                f"{self.cluster_id}-optimization",
+                'optimization_applied',
+                len(optimization_result['optimization_applied']),
+                'count',
+                optimization_result['optimization_applied'],
+                optimization_result['optimization_timestamp']
+            )
         except Exception as e:
             logger.error(f"记录优化结果失败: {e}")
     
     async def close(self):
-        """关闭数据库连接池"""
+        """写完缓冲指标并关闭数据库连接池"""
+        if self.metrics_collector is not None:
+            await self.metrics_collector.close()
         if self.pool:
             self.pool.close()
             await self.pool.wait_closed()
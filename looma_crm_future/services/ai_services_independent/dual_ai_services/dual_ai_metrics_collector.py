@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+双AI服务指标采集器
+监控管理器与集群管理器共用：复用HTTP会话并发探测健康检查，
+指标先进入内存缓冲区，按数量或时间批量多行写入service_metrics，
+同时维护1分钟/5分钟/1小时预聚合，告警检查直接读取聚合结果
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_RESOLUTIONS = (60, 300, 3600)
+
+INSERT_METRICS_SQL = """
+INSERT INTO service_metrics
+(service_id, metric_name, metric_value, metric_unit, tags, timestamp)
+VALUES {values}
+"""
+
+INSERT_ROLLUPS_SQL = """
+INSERT INTO service_metrics_rollup
+(service_id, metric_name, resolution_seconds, bucket_start, sample_count, value_sum, value_min, value_max, value_last)
+VALUES {values}
+ON DUPLICATE KEY UPDATE
+sample_count = VALUES(sample_count),
+value_sum = VALUES(value_sum),
+value_min = VALUES(value_min),
+value_max = VALUES(value_max),
+value_last = VALUES(value_last)
+"""
+
+CREATE_ROLLUP_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS service_metrics_rollup (
+    service_id VARCHAR(100) NOT NULL,
+    metric_name VARCHAR(100) NOT NULL,
+    resolution_seconds INT NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    sample_count INT NOT NULL,
+    value_sum DOUBLE NOT NULL,
+    value_min DOUBLE NOT NULL,
+    value_max DOUBLE NOT NULL,
+    value_last DOUBLE NOT NULL,
+    PRIMARY KEY (service_id, metric_name, resolution_seconds, bucket_start)
+)
+"""
+
+
+class RollupBucket:
+    """单个时间桶的聚合值"""
+    
+    __slots__ = ('start', 'count', 'total', 'minimum', 'maximum', 'last')
+    
+    def __init__(self, start: int, value: float):
+        self.start = start
+        self.count = 1
+        self.total = value
+        self.minimum = value
+        self.maximum = value
+        self.last = value
+    
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        self.last = value
+    
+    def to_dict(self, resolution: int) -> Dict[str, Any]:
+        return {
+            'bucket_start': datetime.fromtimestamp(self.start),
+            'resolution_seconds': resolution,
+            'count': self.count,
+            'avg': self.total / self.count,
+            'min': self.minimum,
+            'max': self.maximum,
+            'last': self.last
+        }
+
+
+class DualAIMetricsCollector:
+    """双AI服务指标采集器"""
+    
+    def __init__(self, pool=None, flush_size: int = 200, flush_interval: float = 10.0,
+                 probe_timeout: float = 5.0, max_buffer_size: int = 10000):
+        """
+        Args:
+            pool: aiomysql连接池，为None时只做内存聚合
+            flush_size: 缓冲指标达到该数量时立即写库
+            flush_interval: 最长写库间隔(秒)
+            probe_timeout: 单次健康探测超时(秒)
+            max_buffer_size: 写库失败时缓冲区保留的最大指标数
+        """
+        self.pool = pool
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.probe_timeout = aiohttp.ClientTimeout(total=probe_timeout)
+        self.max_buffer_size = max_buffer_size
+        
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._buffer: List[Tuple] = []
+        # (service_id, metric_name, 粒度) -> 当前桶；已结束的桶等待写库
+        self._rollups: Dict[Tuple[str, str, int], RollupBucket] = {}
+        self._closed_rollups: List[Tuple[Tuple[str, str, int], RollupBucket]] = []
+        
+        self._flush_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._rollup_table_ready = False
+        
+        self.stats = {
+            'recorded': 0,
+            'written': 0,
+            'dropped': 0,
+            'flushes': 0,
+            'flush_failures': 0,
+            'probes': 0
+        }
+    
+    async def start(self):
+        """创建共享HTTP会话并启动后台写库任务"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60),
+                timeout=self.probe_timeout
+            )
+        if self.pool is not None and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    # ------------------------------------------------------------------
+    # 健康探测
+    # ------------------------------------------------------------------
+    
+    async def probe(self, url: str) -> Dict[str, Any]:
+        """探测单个健康检查地址"""
+        if self.session is None or self.session.closed:
+            await self.start()
+        self.stats['probes'] += 1
+        started = time.perf_counter()
+        async with self.session.get(url) as response:
+            await response.read()
+            return {
+                'status_code': response.status,
+                'response_time': time.perf_counter() - started,
+                'healthy': response.status == 200
+            }
+    
+    async def probe_many(self, urls: List[str]) -> List[Any]:
+        """并发探测，失败项返回异常对象"""
+        return await asyncio.gather(*[self.probe(url) for url in urls], return_exceptions=True)
+    
+    # ------------------------------------------------------------------
+    # 记录与聚合
+    # ------------------------------------------------------------------
+    
+    def record(self, service_id: str, metric_name: str, value: float, unit: str,
+               tags: Any = None, timestamp: Optional[datetime] = None):
+        """记录一个指标：更新预聚合并进入写库缓冲区"""
+        timestamp = timestamp or datetime.now()
+        value = float(value or 0)
+        self.stats['recorded'] += 1
+        
+        epoch = int(timestamp.timestamp())
+        for resolution in ROLLUP_RESOLUTIONS:
+            key = (service_id, metric_name, resolution)
+            bucket_start = epoch - epoch % resolution
+            bucket = self._rollups.get(key)
+            if bucket is not None and bucket.start == bucket_start:
+                bucket.add(value)
+                continue
+            if bucket is not None and self.pool is not None:
+                self._closed_rollups.append((key, bucket))
+            self._rollups[key] = RollupBucket(bucket_start, value)
+        
+        if self.pool is None:
+            return
+        
+        self._buffer.append((
+            service_id, metric_name, value, unit,
+            json.dumps(tags if tags is not None else {}, ensure_ascii=False, default=str),
+            timestamp
+        ))
+        if len(self._buffer) > self.max_buffer_size:
+            overflow = len(self._buffer) - self.max_buffer_size
+            del self._buffer[:overflow]
+            self.stats['dropped'] += overflow
+        if len(self._buffer) >= self.flush_size:
+            self._flush_event.set()
+    
+    def get_rollup(self, service_id: str, metric_name: str, resolution: int = 60,
+                   include_previous: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        读取预聚合结果
+        
+        Args:
+            resolution: 聚合粒度(60/300/3600秒)
+            include_previous: 当前桶为空(已过期)时退回上一个桶
+        """
+        bucket = self._rollups.get((service_id, metric_name, resolution))
+        if bucket is None:
+            return None
+        now = int(time.time())
+        current_start = now - now % resolution
+        if bucket.start == current_start:
+            return bucket.to_dict(resolution)
+        if include_previous and bucket.start == current_start - resolution:
+            # 当前桶还没有样本，上一个完整桶仍可用
+            return bucket.to_dict(resolution)
+        return None
+    
+    # ------------------------------------------------------------------
+    # 写库
+    # ------------------------------------------------------------------
+    
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+    
+    async def _ensure_rollup_table(self, cursor):
+        if not self._rollup_table_ready:
+            await cursor.execute(CREATE_ROLLUP_TABLE_SQL)
+            self._rollup_table_ready = True
+    
+    async def flush(self):
+        """缓冲区中的指标与已结束的聚合桶各用一条多行INSERT写入，一次提交"""
+        if self.pool is None:
+            return
+        async with self._flush_lock:
+            rows, self._buffer = self._buffer, []
+            rollups, self._closed_rollups = self._closed_rollups, []
+            if not rows and not rollups:
+                return
+            
+            try:
+                async with self.pool.acquire() as conn:
+                    async with conn.cursor() as cursor:
+                        if rows:
+                            values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+                            await cursor.execute(
+                                INSERT_METRICS_SQL.format(values=values),
+                                [field for row in rows for field in row]
+                            )
+                        if rollups:
+                            await self._ensure_rollup_table(cursor)
+                            values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(rollups))
+                            params = []
+                            for (service_id, metric_name, resolution), bucket in rollups:
+                                params.extend([
+                                    service_id, metric_name, resolution,
+                                    datetime.fromtimestamp(bucket.start), bucket.count,
+                                    bucket.total, bucket.minimum, bucket.maximum, bucket.last
+                                ])
+                            await cursor.execute(INSERT_ROLLUPS_SQL.format(values=values), params)
+                    await conn.commit()
+                self.stats['written'] += len(rows)
+                self.stats['flushes'] += 1
+            
+            except Exception as e:
+                self.stats['flush_failures'] += 1
+                logger.error(f"批量写入指标失败({len(rows)}条)，稍后重试: {e}")
+                # 放回缓冲区头部，超出上限时丢弃最旧的数据
+                self._buffer = rows + self._buffer
+                self._closed_rollups = rollups + self._closed_rollups
+                overflow = len(self._buffer) - self.max_buffer_size
+                if overflow > 0:
+                    del self._buffer[:overflow]
+                    self.stats['dropped'] += overflow
+                del self._closed_rollups[:max(0, len(self._closed_rollups) - self.max_buffer_size)]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'buffered': len(self._buffer),
+            'pending_rollups': len(self._closed_rollups),
+            'tracked_series': len({key[:2] for key in self._rollups})
+        }
+    
+    async def close(self):
+        """写完缓冲区并关闭HTTP会话"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        
+        # 当前桶也一并写入
+        self._closed_rollups.extend(self._rollups.items())
+        await self.flush()
+        
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
@@ -9,16 +9,19 @@ import logging
 from datetime import datetime
 from typing import Dict, List, Optional
 import aiomysql
-import aiohttp
+
+from dual_ai_metrics_collector import DualAIMetricsCollector
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DualAIMonitoringManager:
-    def __init__(self, db_config: Dict):
+    def __init__(self, db_config: Dict, metrics_collector: Optional[DualAIMetricsCollector] = None):
         self.db_config = db_config
         self.pool = None
+        # 指标采集器：共享HTTP会话、批量写库、维护预聚合
+        self.metrics_collector = metrics_collector
         
         # 监控配置
         self.monitoring_interval = 60  # 监控间隔（秒）
@@ -40,6 +43,11 @@ class DualAIMonitoringManager:
             minsize=5,
             maxsize=20
         )
+        if self.metrics_collector is None:
+            self.metrics_collector = DualAIMetricsCollector(pool=self.pool)
+        elif self.metrics_collector.pool is None:
+            self.metrics_collector.pool = self.pool
+        await self.metrics_collector.start()
     
     async def collect_dual_ai_metrics(self) -> Dict:
         """收集双AI服务指标"""
@@ -52,24 +60,21 @@ class DualAIMonitoringManager:
                 'timestamp': datetime.now()
             }
             
-            # 收集个性化AI服务指标
-            personalized_ai_metrics = await self._collect_personalized_ai_metrics()
-            metrics['personalized_ai'] = personalized_ai_metrics
-            
-            # 收集SaaS AI服务指标
-            saas_ai_metrics = await self._collect_saas_ai_metrics()
-            metrics['saas_ai'] = saas_ai_metrics
-            
-            # 收集协作指标
-            collaboration_metrics = await self._collect_collaboration_metrics()
-            metrics['collaboration'] = collaboration_metrics
+            # 两个AI服务的健康探测与协作/集群统计并发收集
+            (
+                metrics['personalized_ai'],
+                metrics['saas_ai'],
+                metrics['collaboration'],
+                metrics['cluster']
+            ) = await asyncio.gather(
+                self._collect_personalized_ai_metrics(),
+                self._collect_saas_ai_metrics(),
+                self._collect_collaboration_metrics(),
+                self._collect_cluster_metrics()
+            )
             
-            # 收集集群指标
-            cluster_metrics = await self._collect_cluster_metrics()
-            metrics['cluster'] = cluster_metrics
-            
-            # 存储指标到数据库
-            await self._store_metrics(metrics)
+            # 记录指标(进入批量写库缓冲区)
+            self._store_metrics(metrics)
             
             return metrics
             
@@ -80,18 +85,12 @@ class DualAIMonitoringManager:
     async def _collect_personalized_ai_metrics(self) -> Dict:
         """收集个性化AI服务指标"""
         try:
-            async with aiohttp.ClientSession() as session:
-                start_time = datetime.now()
-                async with session.get("http://localhost:8206/health", timeout=5) as response:
-                    response_time = (datetime.now() - start_time).total_seconds()
-                    
-                    return {
-                        'status_code': response.status,
-                        'response_time': response_time,
-                        'healthy': response.status == 200,
-                        'ai_type': 'personalized',
-                        'capabilities': ['personalization', 'user_behavior_analysis']
-                    }
+            probe = await self._get_collector().probe("http://localhost:8206/health")
+            return {
+                **probe,
+                'ai_type': 'personalized',
+                'capabilities': ['personalization', 'user_behavior_analysis']
+            }
         except Exception as e:
             logger.error(f"收集个性化AI指标失败: {e}")
             return {
@@ -105,18 +104,12 @@ class DualAIMonitoringManager:
     async def _collect_saas_ai_metrics(self) -> Dict:
         """收集SaaS AI服务指标"""
         try:
-            async with aiohttp.ClientSession() as session:
-                start_time = datetime.now()
-                async with session.get("http://localhost:8700/health", timeout=5) as response:
-                    response_time = (datetime.now() - start_time).total_seconds()
-                    
-                    return {
-                        'status_code': response.status,
-                        'response_time': response_time,
-                        'healthy': response.status == 200,
-                        'ai_type': 'saas',
-                        'capabilities': ['standardization', 'multi_tenant']
-                    }
+            probe = await self._get_collector().probe("http://localhost:8700/health")
+            return {
+                **probe,
+                'ai_type': 'saas',
+                'capabilities': ['standardization', 'multi_tenant']
+            }
         except Exception as e:
             logger.error(f"收集SaaS AI指标失败: {e}")
             return {
@@ -183,95 +176,83 @@ class DualAIMonitoringManager:
             logger.error(f"收集集群指标失败: {e}")
             return {}
     
-    async def _store_metrics(self, metrics: Dict):
-        """存储指标到数据库"""
+    def _get_collector(self) -> DualAIMetricsCollector:
+        """未初始化连接池时退化为只做内存聚合的采集器"""
+        if self.metrics_collector is None:
+            self.metrics_collector = DualAIMetricsCollector(pool=self.pool)
+        return self.metrics_collector
+    
+    def _store_metrics(self, metrics: Dict):
+        """记录指标，由采集器按批量多行写入service_metrics"""
         try:
-            async with self.pool.acquire() as conn:
-                async with conn.cursor() as cursor:
-                    # 存储个性化AI指标
-                    if metrics.get('personalized_ai'):
-                        ai_metrics = metrics['personalized_ai']
-                        sql = """
-                        INSERT INTO service_metrics 
-                        (service_id, metric_name, metric_value, metric_unit, tags, timestamp)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        """
-                        
-                        await cursor.execute(sql, (
-                            'personalized-ai-service',
-                            'response_time',
-                            ai_metrics.get('response_time', 0),
-                            'seconds',
-                            json.dumps({'ai_type': 'personalized'}),
-                            metrics['timestamp']
-                        ))
-                        
-                        await cursor.execute(sql, (
-                            'personalized-ai-service',
-                            'status_code',
-                            ai_metrics.get('status_code', 0),
-                            'count',
-                            json.dumps({'ai_type': 'personalized'}),
-                            metrics['timestamp']
-                        ))
-                    
-                    # 存储SaaS AI指标
-                    if metrics.get('saas_ai'):
-                        ai_metrics = metrics['saas_ai']
-                        await cursor.execute(sql, (
-                            'saas-ai-service',
-                            'response_time',
-                            ai_metrics.get('response_time', 0),
-                            'seconds',
-                            json.dumps({'ai_type': 'saas'}),
-                            metrics['timestamp']
-                        ))
-                        
-                        await cursor.execute(sql, (
-                            'saas-ai-service',
-                            'status_code',
-                            ai_metrics.get('status_code', 0),
-                            'count',
-                            json.dumps({'ai_type': 'saas'}),
-                            metrics['timestamp']
-                        ))
-                    
-                    # 存储协作指标
-                    if metrics.get('collaboration'):
-                        collab_metrics = metrics['collaboration']
-                        await cursor.execute(sql, (
-                            'dual-ai-collaboration',
-                            'success_rate',
-                            collab_metrics.get('success_rate', 0),
-                            'percentage',
-                            json.dumps({'metric_type': 'collaboration'}),
-                            metrics['timestamp']
-                        ))
-                    
-                    # 存储集群指标
-                    if metrics.get('cluster'):
-                        cluster_metrics = metrics['cluster']
-                        await cursor.execute(sql, (
-                            'dual-ai-cluster',
-                            'health_rate',
-                            cluster_metrics.get('health_rate', 0),
-                            'percentage',
-                            json.dumps({'metric_type': 'cluster'}),
-                            metrics['timestamp']
-                        ))
-                    
-                    await conn.commit()
-                    
+            collector = self._get_collector()
+            timestamp = metrics['timestamp']
+            
+            # 个性化AI与SaaS AI指标
+            for key, service_id, ai_type in (
+                ('personalized_ai', 'personalized-ai-service', 'personalized'),
+                ('saas_ai', 'saas-ai-service', 'saas')
+            ):
+                ai_metrics = metrics.get(key)
+                if not ai_metrics:
+                    continue
+                tags = {'ai_type': ai_type}
+                collector.record(service_id, 'response_time', ai_metrics.get('response_time', 0),
+                                 'seconds', tags, timestamp)
+                collector.record(service_id, 'status_code', ai_metrics.get('status_code', 0),
+                                 'count', tags, timestamp)
+            
+            # 协作指标
+            if metrics.get('collaboration'):
+                collector.record('dual-ai-collaboration', 'success_rate',
+                                 metrics['collaboration'].get('success_rate', 0), 'percentage',
+                                 {'metric_type': 'collaboration'}, timestamp)
+            
+            # 集群指标
+            if metrics.get('cluster'):
+                collector.record('dual-ai-cluster', 'health_rate',
+                                 metrics['cluster'].get('health_rate', 0), 'percentage',
+                                 {'metric_type': 'cluster'}, timestamp)
+                
         except Exception as e:
             logger.error(f"存储指标失败: {e}")
     
+    def _metrics_from_rollups(self) -> Dict:
+        """从1分钟预聚合重建告警检查所需的指标，尚无数据时返回空"""
+        collector = self._get_collector()
+        metrics = {}
+        
+        for key, service_id in (
+            ('personalized_ai', 'personalized-ai-service'),
+            ('saas_ai', 'saas-ai-service')
+        ):
+            response_time = collector.get_rollup(service_id, 'response_time')
+            status_code = collector.get_rollup(service_id, 'status_code')
+            if response_time is None or status_code is None:
+                return {}
+            metrics[key] = {
+                'response_time': response_time['avg'],
+                'status_code': int(status_code['last']),
+                'healthy': status_code['last'] == 200
+            }
+        
+        success_rate = collector.get_rollup('dual-ai-collaboration', 'success_rate')
+        if success_rate is not None:
+            metrics['collaboration'] = {'success_rate': success_rate['last']}
+        health_rate = collector.get_rollup('dual-ai-cluster', 'health_rate')
+        if health_rate is not None:
+            metrics['cluster'] = {'health_rate': health_rate['last']}
+        return metrics
+    
     async def check_dual_ai_alerts(self) -> List[Dict]:
         """检查双AI服务告警"""
         try:
             alerts = []
             
-            # 收集当前指标
-            metrics = await self.collect_dual_ai_metrics()
+            # 优先读取最近1分钟的预聚合(响应时间取均值、状态取最新值)，没有时才现场收集
+            metrics = self._metrics_from_rollups()
+            if not metrics:
+                metrics = await self.collect_dual_ai_metrics()
             
             # 检查个性化AI服务告警
             if metrics.get('personalized_ai'):
@@ -336,7 +317,9 @@ class DualAIMonitoringManager:
             return []
     
     async def close(self):
-        """关闭数据库连接池"""
+        """写完缓冲指标并关闭数据库连接池"""
+        if self.metrics_collector is not None:
+            await self.metrics_collector.close()
         if self.pool:
             self.pool.close()
             await self.pool.wait_closed()
@@ -2,15 +2,26 @@
 """
 跨系统缓存同步服务
 负责Zervigo Redis和LoomaCRM Redis之间的缓存数据同步
+
+全量同步用SCAN游标分批遍历，每批以流水线DUMP/PTTL读取、RESTORE REPLACE写入，
+按DUMP内容校验和跳过未变化的键(全量校对时以目标端的DUMP校验和为准)；
+增量同步订阅键空间通知，收集变更键后批量复制
+
+键空间通知默认不由本服务开启：Redis需预先配置notify-keyspace-events(至少包含Kg$lshzx)，
+未配置时退化为定期全量同步。设置环境变量CACHE_SYNC_CONFIGURE_KEYSPACE_EVENTS=true
+后，服务启动时会通过CONFIG SET补齐缺少的通知类别(需要CONFIG权限，且会修改Redis全局配置)
 """
 
 import asyncio
+import hashlib
 import logging
-import json
+import os
 import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Optional
-import redis
+from typing import Dict, Any, Optional, List, Tuple
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
 
 # 配置日志
 logging.basicConfig(
@@ -19,6 +30,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 同步方向
+ZERVIGO_TO_LOOMA = "zervigo_to_looma"
+LOOMA_TO_ZERVIGO = "looma_to_zervigo"
+
+# 键空间通知需要的事件类别：K键空间 g通用命令 $字符串 l列表 s集合 h哈希 z有序集合 x过期
+KEYSPACE_EVENT_FLAGS = "Kg$lshzx"
+
+
 class CacheSyncService:
     """跨系统缓存同步服务"""
     
@@ -44,7 +63,11 @@ class CacheSyncService:
         
         # 同步状态
         self.running = False
-        self.sync_interval = 10  # 10秒同步一次
+        self.sync_interval = 10  # 未启用键空间通知时的全量同步间隔(秒)
+        self.full_sync_interval = 300  # 启用键空间通知后的全量校对间隔(秒)
+        self.scan_count = 500  # 每次SCAN的COUNT提示
+        self.batch_size = 200  # 每个流水线批次的键数
+        self.incremental_flush_interval = 0.2  # 增量变更的最大攒批时间(秒)
         
         # 需要同步的键模式
         self.sync_patterns = [
@@ -54,276 +77,424 @@ class CacheSyncService:
             "job_match:*",
             "resume_analysis:*"
         ]
+        
+        # (方向, 键) -> (DUMP校验和, 过期时间戳ms, 是否按类型复制)，用于跳过未变化的键；
+        # 按LRU淘汰，最多记录max_tracked_keys个键
+        self.max_tracked_keys = 200000
+        self._checksums: "OrderedDict[Tuple[str, bytes], Tuple[bytes, Optional[int], bool]]" = OrderedDict()
+        
+        # 是否允许服务通过CONFIG SET开启键空间通知
+        self.configure_keyspace_events = os.getenv(
+            'CACHE_SYNC_CONFIGURE_KEYSPACE_EVENTS', 'false').lower() in ('1', 'true', 'yes')
+        
+        # 增量同步：方向 -> {键: 首次收到通知的时间}
+        self._dirty_keys: Dict[str, Dict[bytes, float]] = {ZERVIGO_TO_LOOMA: {}, LOOMA_TO_ZERVIGO: {}}
+        self._dirty_event = asyncio.Event()
+        self.notifications_enabled = False
+        self._tasks: List[asyncio.Task] = []
+        
+        # 指标
+        self.metrics = {
+            'keys_scanned': 0,
+            'keys_copied': 0,
+            'keys_skipped': 0,
+            'keys_deleted': 0,
+            'bytes_copied': 0,
+            'restore_fallbacks': 0,
+            'target_mismatches': 0,
+            'errors': 0,
+            'batches': 0,
+            'notifications_received': 0,
+            'incremental_keys': 0,
+            'last_incremental_lag_ms': 0.0,
+            'max_incremental_lag_ms': 0.0,
+            'last_full_sync': None
+        }
     
     async def connect_redis(self):
         """连接Redis实例"""
         try:
             # 连接Zervigo Redis
             self.zervigo_redis = redis.Redis(**self.zervigo_redis_config)
-            self.zervigo_redis.ping()
+            await self.zervigo_redis.ping()
             logger.info("Zervigo Redis连接成功")
             
             # 连接LoomaCRM Redis
             self.looma_redis = redis.Redis(**self.looma_redis_config)
-            self.looma_redis.ping()
+            await self.looma_redis.ping()
             logger.info("LoomaCRM Redis连接成功")
-            
+        
         except Exception as e:
             logger.error(f"Redis连接失败: {e}")
             raise
     
+    def _clients(self, direction: str):
+        """返回(源, 目标)连接"""
+        if direction == ZERVIGO_TO_LOOMA:
+            return self.zervigo_redis, self.looma_redis
+        return self.looma_redis, self.zervigo_redis
+    
+    # ------------------------------------------------------------------
+    # 全量同步
+    # ------------------------------------------------------------------
+    
+    async def _scan_batches(self, client, pattern: str):
+        """SCAN游标遍历，按批返回键"""
+        cursor = 0
+        pending: List[bytes] = []
+        while True:
+            cursor, keys = await client.scan(cursor=cursor, match=pattern, count=self.scan_count)
+            pending.extend(keys)
+            self.metrics['keys_scanned'] += len(keys)
+            while len(pending) >= self.batch_size:
+                yield pending[:self.batch_size]
+                pending = pending[self.batch_size:]
+            if cursor == 0:
+                break
+        if pending:
+            yield pending
+    
     async def sync_keys_by_pattern(self, pattern: str):
-        """根据模式同步键"""
+        """根据模式同步键：Zervigo键覆盖到LoomaCRM，LoomaCRM独有的键补回Zervigo"""
         try:
-            # 从Zervigo获取匹配的键
-            zervigo_keys = self.zervigo_redis.keys(pattern)
-            
-            for key in zervigo_keys:
-                key_str = key.decode('utf-8')
-                
-                # 获取键的类型
-                key_type = self.zervigo_redis.type(key).decode('utf-8')
-                
-                if key_type == 'string':
-                    await self.sync_string_key(key_str)
-                elif key_type == 'hash':
-                    await self.sync_hash_key(key_str)
-                elif key_type == 'list':
-                    await self.sync_list_key(key_str)
-                elif key_type == 'set':
-                    await self.sync_set_key(key_str)
-                elif key_type == 'zset':
-                    await self.sync_zset_key(key_str)
-                
-                logger.debug(f"同步键: {key_str} (类型: {key_type})")
-            
-            # 从LoomaCRM获取匹配的键
-            looma_keys = self.looma_redis.keys(pattern)
-            
-            for key in looma_keys:
-                key_str = key.decode('utf-8')
-                
-                # 检查Zervigo中是否存在
-                if not self.zervigo_redis.exists(key):
-                    # 获取键的类型
-                    key_type = self.looma_redis.type(key).decode('utf-8')
-                    
-                    if key_type == 'string':
-                        await self.sync_string_key_from_looma(key_str)
-                    elif key_type == 'hash':
-                        await self.sync_hash_key_from_looma(key_str)
-                    elif key_type == 'list':
-                        await self.sync_list_key_from_looma(key_str)
-                    elif key_type == 'set':
-                        await self.sync_set_key_from_looma(key_str)
-                    elif key_type == 'zset':
-                        await self.sync_zset_key_from_looma(key_str)
-                    
-                    logger.debug(f"从LoomaCRM同步键: {key_str} (类型: {key_type})")
+            # 全量校对不信任本地记录，以目标端实际内容为准，修复目标端被删除或改写的键
+            async for keys in self._scan_batches(self.zervigo_redis, pattern):
+                await self.copy_keys(ZERVIGO_TO_LOOMA, keys, verify_target=True)
             
+            async for keys in self._scan_batches(self.looma_redis, pattern):
+                await self.copy_keys(LOOMA_TO_ZERVIGO, keys, only_missing=True)
+        
         except Exception as e:
+            self.metrics['errors'] += 1
             logger.error(f"同步键模式 {pattern} 失败: {e}")
     
-    async def sync_string_key(self, key: str):
-        """同步字符串键"""
-        try:
-            value = self.zervigo_redis.get(key)
-            if value:
-                # 获取TTL
-                ttl = self.zervigo_redis.ttl(key)
-                
-                # 设置到LoomaCRM Redis
-                if ttl > 0:
-                    self.looma_redis.setex(key, ttl, value)
-                else:
-                    self.looma_redis.set(key, value)
-                
-                # 记录同步状态
-                sync_key = f"sync:cache:{key}"
-                self.zervigo_redis.setex(sync_key, 300, json.dumps({
-                    "key": key,
-                    "type": "string",
-                    "sync_time": datetime.now().isoformat(),
-                    "direction": "zervigo_to_looma"
-                }))
-                
-        except Exception as e:
-            logger.error(f"同步字符串键 {key} 失败: {e}")
+    # ------------------------------------------------------------------
+    # 批量复制
+    # ------------------------------------------------------------------
     
-    async def sync_string_key_from_looma(self, key: str):
-        """从LoomaCRM同步字符串键到Zervigo"""
-        try:
-            value = self.looma_redis.get(key)
-            if value:
-                # 获取TTL
-                ttl = self.looma_redis.ttl(key)
-                
-                # 设置到Zervigo Redis
-                if ttl > 0:
-                    self.zervigo_redis.setex(key, ttl, value)
-                else:
-                    self.zervigo_redis.set(key, value)
-                
-        except Exception as e:
-            logger.error(f"从LoomaCRM同步字符串键 {key} 失败: {e}")
+    @staticmethod
+    def _checksum(payload: bytes) -> bytes:
+        return hashlib.blake2b(payload, digest_size=16).digest()
     
-    async def sync_hash_key(self, key: str):
-        """同步哈希键"""
-        try:
-            hash_data = self.zervigo_redis.hgetall(key)
-            if hash_data:
-                # 设置到LoomaCRM Redis
-                self.looma_redis.hmset(key, hash_data)
-                
-                # 获取TTL并设置
-                ttl = self.zervigo_redis.ttl(key)
-                if ttl > 0:
-                    self.looma_redis.expire(key, ttl)
-                
-                # 记录同步状态
-                sync_key = f"sync:cache:{key}"
-                self.zervigo_redis.setex(sync_key, 300, json.dumps({
-                    "key": key,
-                    "type": "hash",
-                    "sync_time": datetime.now().isoformat(),
-                    "direction": "zervigo_to_looma",
-                    "fields": len(hash_data)
-                }))
-                
-        except Exception as e:
-            logger.error(f"同步哈希键 {key} 失败: {e}")
+    @staticmethod
+    def _same_expiry(previous: Optional[int], current: Optional[int]) -> bool:
+        # 值未变但过期时间被修改(EXPIRE/PERSIST)时仍需复制，容忍1秒内的时钟误差
+        if previous is None or current is None:
+            return previous == current
+        return abs(previous - current) < 1000
     
-    async def sync_hash_key_from_looma(self, key: str):
-        """从LoomaCRM同步哈希键到Zervigo"""
-        try:
-            hash_data = self.looma_redis.hgetall(key)
-            if hash_data:
-                # 设置到Zervigo Redis
-                self.zervigo_redis.hmset(key, hash_data)
-                
-                # 获取TTL并设置
-                ttl = self.looma_redis.ttl(key)
-                if ttl > 0:
-                    self.zervigo_redis.expire(key, ttl)
-                
-        except Exception as e:
-            logger.error(f"从LoomaCRM同步哈希键 {key} 失败: {e}")
+    def _is_unchanged(self, direction: str, key: bytes, checksum: bytes, expire_at: Optional[int]) -> bool:
+        previous = self._checksums.get((direction, key))
+        if previous is None or previous[0] != checksum:
+            return False
+        self._checksums.move_to_end((direction, key))
+        return self._same_expiry(previous[1], expire_at)
     
-    async def sync_list_key(self, key: str):
-        """同步列表键"""
-        try:
-            list_data = self.zervigo_redis.lrange(key, 0, -1)
-            if list_data:
-                # 清空LoomaCRM中的列表
-                self.looma_redis.delete(key)
-                
-                # 设置到LoomaCRM Redis
-                self.looma_redis.lpush(key, *list_data)
-                
-                # 获取TTL并设置
-                ttl = self.zervigo_redis.ttl(key)
-                if ttl > 0:
-                    self.looma_redis.expire(key, ttl)
-                
-        except Exception as e:
-            logger.error(f"同步列表键 {key} 失败: {e}")
+    def _remember(self, direction: str, key: bytes, checksum: bytes, expire_at: Optional[int],
+                  typed: bool = False):
+        self._checksums[(direction, key)] = (checksum, expire_at, typed)
+        self._checksums.move_to_end((direction, key))
+        # 目标端写入后会产生反向通知，记录反向校验和避免回写相同内容
+        reverse = LOOMA_TO_ZERVIGO if direction == ZERVIGO_TO_LOOMA else ZERVIGO_TO_LOOMA
+        self._checksums[(reverse, key)] = (checksum, expire_at, typed)
+        self._checksums.move_to_end((reverse, key))
+        while len(self._checksums) > self.max_tracked_keys:
+            self._checksums.popitem(last=False)
     
-    async def sync_list_key_from_looma(self, key: str):
-        """从LoomaCRM同步列表键到Zervigo"""
-        try:
-            list_data = self.looma_redis.lrange(key, 0, -1)
-            if list_data:
-                # 清空Zervigo中的列表
-                self.zervigo_redis.delete(key)
-                
-                # 设置到Zervigo Redis
-                self.zervigo_redis.lpush(key, *list_data)
-                
-                # 获取TTL并设置
-                ttl = self.looma_redis.ttl(key)
-                if ttl > 0:
-                    self.zervigo_redis.expire(key, ttl)
-                
-        except Exception as e:
-            logger.error(f"从LoomaCRM同步列表键 {key} 失败: {e}")
+    async def _unchanged_on_target(self, target, candidates: List[Tuple[bytes, bytes, Optional[int]]],
+                                   direction: str, now_ms: int) -> List[bool]:
+        """
+        校验本地记录为未变化的键在目标端是否确实一致
+        
+        以DUMP方式复制的键比较目标端DUMP校验和；按类型复制的键(两端版本不兼容，DUMP不可比)
+        只检查目标端存在且过期时间一致
+        """
+        async with target.pipeline(transaction=False) as pipe:
+            for key, _, _ in candidates:
+                pipe.dump(key)
+                pipe.pttl(key)
+            replies = await pipe.execute(raise_on_error=False)
+        
+        results = []
+        for i, (key, checksum, expire_at) in enumerate(candidates):
+            payload, pttl = replies[2 * i], replies[2 * i + 1]
+            if isinstance(payload, Exception) or isinstance(pttl, Exception) or payload is None or pttl == -2:
+                results.append(False)
+                continue
+            target_expire_at = now_ms + pttl if pttl > 0 else None
+            typed = self._checksums.get((direction, key), (None, None, False))[2]
+            same_value = typed or self._checksum(payload) == checksum
+            results.append(same_value and self._same_expiry(expire_at, target_expire_at))
+        return results
     
-    async def sync_set_key(self, key: str):
-        """同步集合键"""
-        try:
-            set_data = self.zervigo_redis.smembers(key)
-            if set_data:
-                # 清空LoomaCRM中的集合
-                self.looma_redis.delete(key)
-                
-                # 设置到LoomaCRM Redis
-                self.looma_redis.sadd(key, *set_data)
-                
-                # 获取TTL并设置
-                ttl = self.zervigo_redis.ttl(key)
-                if ttl > 0:
-                    self.looma_redis.expire(key, ttl)
-                
-        except Exception as e:
-            logger.error(f"同步集合键 {key} 失败: {e}")
+    async def copy_keys(self, direction: str, keys: List[bytes], only_missing: bool = False,
+                        propagate_deletes: bool = False, verify_target: bool = False) -> int:
+        """
+        批量复制一组键，返回实际复制的键数
+        
+        Args:
+            direction: 同步方向
+            keys: 键列表
+            only_missing: 只复制目标端不存在的键
+            propagate_deletes: 源端已不存在的键在目标端删除(仅对已复制过的键)
+            verify_target: 本地记录为未变化的键，再读取目标端确认一致后才跳过
+        """
+        if not keys:
+            return 0
+        source, target = self._clients(direction)
+        self.metrics['batches'] += 1
+        
+        if only_missing:
+            async with target.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.exists(key)
+                exists = await pipe.execute()
+            keys = [key for key, found in zip(keys, exists) if not found]
+            if not keys:
+                return 0
+        
+        # 一次往返读取DUMP和PTTL
+        async with source.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.dump(key)
+                pipe.pttl(key)
+            replies = await pipe.execute(raise_on_error=False)
+        
+        now_ms = int(time.time() * 1000)
+        restores: List[Tuple[bytes, bytes, int, bytes, Optional[int]]] = []
+        unchanged: List[Tuple[bytes, bytes, int, bytes, Optional[int]]] = []
+        deletes: List[bytes] = []
+        for i, key in enumerate(keys):
+            payload, pttl = replies[2 * i], replies[2 * i + 1]
+            if isinstance(payload, Exception) or isinstance(pttl, Exception):
+                self.metrics['errors'] += 1
+                logger.error(f"读取键 {key!r} 失败: {payload if isinstance(payload, Exception) else pttl}")
+                continue
+            if payload is None or pttl == -2:
+                # 源端已不存在(过期或删除)
+                if propagate_deletes and (direction, key) in self._checksums:
+                    deletes.append(key)
+                continue
+            
+            ttl_ms = pttl if pttl > 0 else 0
+            expire_at = now_ms + pttl if pttl > 0 else None
+            checksum = self._checksum(payload)
+            if self._is_unchanged(direction, key, checksum, expire_at):
+                unchanged.append((key, payload, ttl_ms, checksum, expire_at))
+                continue
+            restores.append((key, payload, ttl_ms, checksum, expire_at))
+        
+        if unchanged and verify_target:
+            candidates = [(key, checksum, expire_at) for key, _, _, checksum, expire_at in unchanged]
+            matches = await self._unchanged_on_target(target, candidates, direction, now_ms)
+            for item, match in zip(unchanged, matches):
+                if not match:
+                    self.metrics['target_mismatches'] += 1
+                    restores.append(item)
+            unchanged = [item for item, match in zip(unchanged, matches) if match]
+        self.metrics['keys_skipped'] += len(unchanged)
+        
+        copied = 0
+        if restores or deletes:
+            async with target.pipeline(transaction=False) as pipe:
+                for key, payload, ttl_ms, _, _ in restores:
+                    pipe.restore(key, ttl_ms, payload, replace=True)
+                for key in deletes:
+                    pipe.delete(key)
+                results = await pipe.execute(raise_on_error=False)
+            
+            for (key, payload, ttl_ms, checksum, expire_at), result in zip(restores, results):
+                typed = isinstance(result, Exception)
+                if typed:
+                    # 两端Redis版本不兼容时DUMP格式无法RESTORE，改为按类型复制
+                    if not await self._copy_typed(source, target, key):
+                        continue
+                    self.metrics['restore_fallbacks'] += 1
+                copied += 1
+                self.metrics['bytes_copied'] += len(payload)
+                self._remember(direction, key, checksum, expire_at, typed)
+            
+            for key in deletes:
+                self._checksums.pop((direction, key), None)
+            self.metrics['keys_deleted'] += len(deletes)
+        
+        self.metrics['keys_copied'] += copied
+        return copied
     
-    async def sync_set_key_from_looma(self, key: str):
-        """从LoomaCRM同步集合键到Zervigo"""
+    async def _copy_typed(self, source, target, key: bytes) -> bool:
+        """按类型复制单个键，目标端在一个事务中替换，避免出现半写状态"""
         try:
-            set_data = self.looma_redis.smembers(key)
-            if set_data:
-                # 清空Zervigo中的集合
-                self.zervigo_redis.delete(key)
-                
-                # 设置到Zervigo Redis
-                self.zervigo_redis.sadd(key, *set_data)
-                
-                # 获取TTL并设置
-                ttl = self.looma_redis.ttl(key)
-                if ttl > 0:
-                    self.zervigo_redis.expire(key, ttl)
-                
+            key_type = await source.type(key)
+            key_type = key_type.decode('utf-8') if isinstance(key_type, bytes) else key_type
+            
+            async with source.pipeline(transaction=True) as pipe:
+                if key_type == 'string':
+                    pipe.get(key)
+                elif key_type == 'hash':
+                    pipe.hgetall(key)
+                elif key_type == 'list':
+                    pipe.lrange(key, 0, -1)
+                elif key_type == 'set':
+                    pipe.smembers(key)
+                elif key_type == 'zset':
+                    pipe.zrange(key, 0, -1, withscores=True)
+                else:
+                    logger.warning(f"不支持同步的键类型: {key!r} ({key_type})")
+                    return False
+                pipe.pttl(key)
+                data, pttl = await pipe.execute()
+            
+            if not data:
+                return False
+            
+            async with target.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if key_type == 'string':
+                    pipe.set(key, data)
+                elif key_type == 'hash':
+                    pipe.hset(key, mapping=data)
+                elif key_type == 'list':
+                    pipe.rpush(key, *data)
+                elif key_type == 'set':
+                    pipe.sadd(key, *data)
+                elif key_type == 'zset':
+                    pipe.zadd(key, dict(data))
+                if pttl > 0:
+                    pipe.pexpire(key, pttl)
+                await pipe.execute()
+            return True
+        
         except Exception as e:
-            logger.error(f"从LoomaCRM同步集合键 {key} 失败: {e}")
+            self.metrics['errors'] += 1
+            logger.error(f"按类型同步键 {key!r} 失败: {e}")
+            return False
     
-    async def sync_zset_key(self, key: str):
-        """同步有序集合键"""
-        try:
-            zset_data = self.zervigo_redis.zrange(key, 0, -1, withscores=True)
-            if zset_data:
-                # 清空LoomaCRM中的有序集合
-                self.looma_redis.delete(key)
-                
-                # 设置到LoomaCRM Redis
-                for member, score in zset_data:
-                    self.looma_redis.zadd(key, {member: score})
-                
-                # 获取TTL并设置
-                ttl = self.zervigo_redis.ttl(key)
-                if ttl > 0:
-                    self.looma_redis.expire(key, ttl)
-                
-        except Exception as e:
-            logger.error(f"同步有序集合键 {key} 失败: {e}")
+    # ------------------------------------------------------------------
+    # 增量同步
+    # ------------------------------------------------------------------
     
-    async def sync_zset_key_from_looma(self, key: str):
-        """从LoomaCRM同步有序集合键到Zervigo"""
+    async def _enable_keyspace_notifications(self, client) -> bool:
+        """
+        检查所需的键空间通知类别是否已开启
+        
+        缺少类别时，仅在configure_keyspace_events开启时通过CONFIG SET补齐，否则退化为定期全量同步
+        """
         try:
-            zset_data = self.looma_redis.zrange(key, 0, -1, withscores=True)
-            if zset_data:
-                # 清空Zervigo中的有序集合
-                self.zervigo_redis.delete(key)
-                
-                # 设置到Zervigo Redis
-                for member, score in zset_data:
-                    self.zervigo_redis.zadd(key, {member: score})
-                
-                # 获取TTL并设置
-                ttl = self.looma_redis.ttl(key)
-                if ttl > 0:
-                    self.zervigo_redis.expire(key, ttl)
-                
-        except Exception as e:
-            logger.error(f"从LoomaCRM同步有序集合键 {key} 失败: {e}")
+            config = await client.config_get('notify-keyspace-events')
+            current = config.get('notify-keyspace-events', '')
+            current = current.decode('utf-8') if isinstance(current, bytes) else current
+            # A是g$lshzxe的简写
+            expanded = current.replace('A', 'g$lshzxe')
+            missing = ''.join(flag for flag in KEYSPACE_EVENT_FLAGS if flag not in expanded)
+            if not missing:
+                return True
+            if not self.configure_keyspace_events:
+                logger.warning(f"Redis未开启键空间通知类别 {missing}，退化为定期全量同步；"
+                               f"可在Redis配置notify-keyspace-events，"
+                               f"或设置CACHE_SYNC_CONFIGURE_KEYSPACE_EVENTS=true由服务开启")
+                return False
+            await client.config_set('notify-keyspace-events', current + missing)
+            logger.info(f"已开启键空间通知类别: {missing}")
+            return True
+        except ResponseError as e:
+            logger.warning(f"无法开启键空间通知，退化为定期全量同步: {e}")
+            return False
+    
+    async def _listen_keyspace(self, direction: str):
+        """订阅源端键空间通知，把变更键加入待同步集合"""
+        source, _ = self._clients(direction)
+        db = (self.zervigo_redis_config if direction == ZERVIGO_TO_LOOMA else self.looma_redis_config)['db']
+        prefix = f"__keyspace@{db}__:"
+        channels = [prefix + pattern for pattern in self.sync_patterns]
+        dirty = self._dirty_keys[direction]
+        
+        while self.running:
+            pubsub = source.pubsub()
+            try:
+                await pubsub.psubscribe(*channels)
+                logger.info(f"键空间通知订阅成功: {direction}")
+                while self.running:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    channel = message['channel']
+                    key = channel[len(prefix):] if isinstance(channel, bytes) else channel[len(prefix):].encode('utf-8')
+                    self.metrics['notifications_received'] += 1
+                    dirty.setdefault(key, time.time())
+                    if len(dirty) >= self.batch_size:
+                        self._dirty_event.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics['errors'] += 1
+                logger.error(f"键空间通知订阅中断({direction})，稍后重试: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+    
+    async def _flush_dirty_keys(self):
+        """批量复制收到通知的键"""
+        while self.running:
+            try:
+                await asyncio.wait_for(self._dirty_event.wait(), timeout=self.incremental_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty_event.clear()
+            
+            for direction, dirty in self._dirty_keys.items():
+                if not dirty:
+                    continue
+                pending = list(dirty.items())
+                dirty.clear()
+                for start in range(0, len(pending), self.batch_size):
+                    batch = pending[start:start + self.batch_size]
+                    try:
+                        await self.copy_keys(
+                            direction, [key for key, _ in batch],
+                            only_missing=(direction == LOOMA_TO_ZERVIGO),
+                            propagate_deletes=(direction == ZERVIGO_TO_LOOMA)
+                        )
+                    except Exception as e:
+                        self.metrics['errors'] += 1
+                        logger.error(f"增量同步失败({direction})，等待全量同步校对: {e}")
+                        continue
+                    lag_ms = (time.time() - min(ts for _, ts in batch)) * 1000
+                    self.metrics['incremental_keys'] += len(batch)
+                    self.metrics['last_incremental_lag_ms'] = lag_ms
+                    self.metrics['max_incremental_lag_ms'] = max(self.metrics['max_incremental_lag_ms'], lag_ms)
+    
+    # ------------------------------------------------------------------
+    # 主循环
+    # ------------------------------------------------------------------
+    
+    async def run_full_sync(self):
+        """对所有模式执行一次全量同步，并记录吞吐"""
+        started = time.perf_counter()
+        copied_before = self.metrics['keys_copied']
+        scanned_before = self.metrics['keys_scanned']
+        
+        for pattern in self.sync_patterns:
+            await self.sync_keys_by_pattern(pattern)
+        
+        # 清理已过期键的校验和
+        now_ms = int(time.time() * 1000)
+        for key in [key for key, (_, expire_at, _) in self._checksums.items()
+                    if expire_at is not None and expire_at < now_ms]:
+            del self._checksums[key]
+        
+        elapsed = time.perf_counter() - started
+        copied = self.metrics['keys_copied'] - copied_before
+        self.metrics['last_full_sync'] = {
+            'finished_at': datetime.now().isoformat(),
+            'duration_seconds': elapsed,
+            'keys_scanned': self.metrics['keys_scanned'] - scanned_before,
+            'keys_copied': copied,
+            'keys_per_second': copied / elapsed if elapsed > 0 else 0.0
+        }
+        logger.info(f"全量同步完成: 复制 {copied} 个键，耗时 {elapsed:.2f}s")
     
     async def start_sync_loop(self):
         """启动同步循环"""
@@ -331,13 +502,12 @@ class CacheSyncService:
         
         while self.running:
             try:
-                # 同步所有配置的模式
-                for pattern in self.sync_patterns:
-                    await self.sync_keys_by_pattern(pattern)
-                
-                # 等待下次同步
-                await asyncio.sleep(self.sync_interval)
+                await self.run_full_sync()
                 
+                # 增量同步生效时全量同步只做定期校对
+                interval = self.full_sync_interval if self.notifications_enabled else self.sync_interval
+                await asyncio.sleep(interval)
+            
             except Exception as e:
                 logger.error(f"缓存同步循环异常: {e}")
                 await asyncio.sleep(5)  # 异常时等待5秒后重试
@@ -353,23 +523,48 @@ class CacheSyncService:
             # 设置运行状态
             self.running = True
             
+            # 启动增量同步
+            zervigo_ok = await self._enable_keyspace_notifications(self.zervigo_redis)
+            looma_ok = await self._enable_keyspace_notifications(self.looma_redis)
+            self.notifications_enabled = zervigo_ok and looma_ok
+            if self.notifications_enabled:
+                self._tasks = [
+                    asyncio.create_task(self._listen_keyspace(ZERVIGO_TO_LOOMA)),
+                    asyncio.create_task(self._listen_keyspace(LOOMA_TO_ZERVIGO)),
+                    asyncio.create_task(self._flush_dirty_keys())
+                ]
+            
             # 启动同步循环
             await self.start_sync_loop()
-            
+        
         except Exception as e:
             logger.error(f"启动缓存同步服务失败: {e}")
             raise
     
+    def get_metrics(self) -> Dict[str, Any]:
+        """同步指标"""
+        return {
+            **self.metrics,
+            'notifications_enabled': self.notifications_enabled,
+            'pending_incremental_keys': sum(len(dirty) for dirty in self._dirty_keys.values()),
+            'tracked_checksums': len(self._checksums)
+        }
+    
     async def stop(self):
         """停止缓存同步服务"""
         logger.info("停止跨系统缓存同步服务...")
         self.running = False
         
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        
         # 关闭Redis连接
         if self.zervigo_redis:
-            self.zervigo_redis.close()
+            await self.zervigo_redis.close()
         if self.looma_redis:
-            self.looma_redis.close()
+            await self.looma_redis.close()
         
         logger.info("跨系统缓存同步服务已停止")
 
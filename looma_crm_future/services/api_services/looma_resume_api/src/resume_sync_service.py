@@ -2,6 +2,9 @@
 """
 简历数据同步服务
 负责Zervigo MySQL和LoomaCRM MongoDB之间的简历数据同步
+
+两个方向都按(updated_at, id)高水位增量读取并用键集分页，水位持久化在Redis中；
+写入MongoDB用bulk_write批量upsert，写入MySQL用多行INSERT ... ON DUPLICATE KEY UPDATE
 """
 
 import asyncio
@@ -9,11 +12,12 @@ import logging
 import json
 import time
 from datetime import datetime
-from typing import Dict, Any, Optional
-import pymongo
-import mysql.connector
-from mysql.connector import Error
-import redis
+from typing import Dict, Any, Optional, List, Tuple
+import aiomysql
+import motor.motor_asyncio
+import redis.asyncio as redis
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
 
 # 配置日志
 logging.basicConfig(
@@ -22,6 +26,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+WATERMARK_KEY = "resume_sync:watermark:{direction}"
+
 class ResumeSyncService:
     """简历数据同步服务"""
     
@@ -51,7 +57,7 @@ class ResumeSyncService:
         }
         
         # 连接对象
-        self.mysql_conn = None
+        self.mysql_pool = None
         self.mongodb_client = None
         self.mongodb_db = None
         self.redis_client = None
@@ -59,16 +65,38 @@ class ResumeSyncService:
         # 同步状态
         self.running = False
         self.sync_interval = 30  # 30秒同步一次
+        self.page_size = 500  # 键集分页每页行数
+        # 只读取早于数据库当前时间该秒数的行，避免长事务晚提交的行落在水位之后被漏掉
+        self.watermark_safety_seconds = 5
         
+        # 内存中的水位，持久化副本在Redis
+        self.watermarks: Dict[str, Optional[Tuple[datetime, Any]]] = {}
+        
+        self.stats = {
+            'zervigo_to_looma': 0,
+            'looma_to_zervigo': 0,
+            'analysis_synced': 0,
+            'last_cycle_seconds': 0.0
+        }
+    
     async def connect_databases(self):
         """连接所有数据库"""
         try:
             # 连接MySQL (Zervigo)
-            self.mysql_conn = mysql.connector.connect(**self.zervigo_mysql_config)
+            self.mysql_pool = await aiomysql.create_pool(
+                host=self.zervigo_mysql_config['host'],
+                port=self.zervigo_mysql_config['port'],
+                user=self.zervigo_mysql_config['user'],
+                password=self.zervigo_mysql_config['password'],
+                db=self.zervigo_mysql_config['database'],
+                minsize=1,
+                maxsize=5,
+                autocommit=False
+            )
             logger.info("MySQL数据库连接成功")
             
             # 连接MongoDB (LoomaCRM)
-            self.mongodb_client = pymongo.MongoClient(
+            self.mongodb_client = motor.motor_asyncio.AsyncIOMotorClient(
                 f"mongodb://{self.looma_mongodb_config['username']}:{self.looma_mongodb_config['password']}@{self.looma_mongodb_config['host']}:{self.looma_mongodb_config['port']}/{self.looma_mongodb_config['database']}"
             )
             self.mongodb_db = self.mongodb_client[self.looma_mongodb_config['database']]
@@ -76,150 +104,292 @@ class ResumeSyncService:
             
             # 连接Redis
             self.redis_client = redis.Redis(**self.redis_config)
-            self.redis_client.ping()
+            await self.redis_client.ping()
             logger.info("Redis连接成功")
             
+            await self.ensure_indexes()
+        
         except Exception as e:
             logger.error(f"数据库连接失败: {e}")
             raise
     
+    async def ensure_indexes(self):
+        """创建水位查询和upsert所需的索引"""
+        try:
+            await self.mongodb_db.resumes.create_index([("zervigo_id", ASCENDING)])
+            await self.mongodb_db.resumes.create_index(
+                [("sync_source", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)]
+            )
+            await self.mongodb_db.resume_analysis.create_index([("sync_status", ASCENDING)])
+        except Exception as e:
+            logger.warning(f"创建MongoDB索引失败: {e}")
+        
+        try:
+            async with self.mysql_pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("""
+                        SELECT COUNT(*) FROM information_schema.statistics
+                        WHERE table_schema = DATABASE() AND table_name = 'resumes'
+                          AND index_name = 'idx_resumes_updated_at_id'
+                    """)
+                    (exists,) = await cursor.fetchone()
+                    if not exists:
+                        await cursor.execute(
+                            "CREATE INDEX idx_resumes_updated_at_id ON resumes (updated_at, id)"
+                        )
+                        logger.info("已创建resumes(updated_at, id)索引")
+        except Exception as e:
+            logger.warning(f"创建resumes(updated_at, id)索引失败，增量查询可能退化为全表扫描: {e}")
+    
+    # ------------------------------------------------------------------
+    # 水位
+    # ------------------------------------------------------------------
+    
+    async def load_watermark(self, direction: str) -> Optional[Tuple[datetime, Any]]:
+        """读取水位：优先内存，其次Redis，都没有时从已同步的数据推导"""
+        if direction in self.watermarks:
+            return self.watermarks[direction]
+        
+        watermark = None
+        try:
+            raw = await self.redis_client.get(WATERMARK_KEY.format(direction=direction))
+            if raw:
+                data = json.loads(raw)
+                last_id = data['id']
+                if direction == 'looma_to_zervigo' and ObjectId.is_valid(last_id):
+                    last_id = ObjectId(last_id)
+                watermark = (datetime.fromisoformat(data['updated_at']), last_id)
+        except Exception as e:
+            logger.warning(f"读取同步水位失败({direction}): {e}")
+        
+        if watermark is None and direction == 'zervigo_to_looma':
+            # 以MongoDB中已同步的最新简历作为起点，避免首次启动全量重放
+            latest = await self.mongodb_db.resumes.find_one(
+                {"sync_source": "zervigo"},
+                sort=[("updated_at", -1), ("zervigo_id", -1)],
+                projection={"updated_at": 1, "zervigo_id": 1}
+            )
+            if latest and latest.get('updated_at'):
+                watermark = (latest['updated_at'], latest['zervigo_id'])
+        
+        self.watermarks[direction] = watermark
+        return watermark
+    
+    async def save_watermark(self, direction: str, watermark: Tuple[datetime, Any]):
+        """推进并持久化水位"""
+        self.watermarks[direction] = watermark
+        await self.redis_client.set(WATERMARK_KEY.format(direction=direction), json.dumps({
+            'updated_at': watermark[0].isoformat(),
+            'id': str(watermark[1]) if direction == 'looma_to_zervigo' else watermark[1]
+        }))
+    
+    # ------------------------------------------------------------------
+    # Zervigo MySQL -> LoomaCRM MongoDB
+    # ------------------------------------------------------------------
+    
+    async def _fetch_zervigo_page(self, watermark: Optional[Tuple[datetime, Any]]) -> List[Dict[str, Any]]:
+        """按(updated_at, id)键集分页读取水位之后的简历"""
+        async with self.mysql_pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                if watermark is None:
+                    await cursor.execute("""
+                        SELECT id, user_id, title, content, created_at, updated_at, status
+                        FROM resumes
+                        WHERE updated_at < NOW() - INTERVAL %s SECOND
+                        ORDER BY updated_at, id
+                        LIMIT %s
+                    """, (self.watermark_safety_seconds, self.page_size))
+                else:
+                    await cursor.execute("""
+                        SELECT id, user_id, title, content, created_at, updated_at, status
+                        FROM resumes
+                        WHERE (updated_at, id) > (%s, %s)
+                          AND updated_at < NOW() - INTERVAL %s SECOND
+                        ORDER BY updated_at, id
+                        LIMIT %s
+                    """, (watermark[0], watermark[1], self.watermark_safety_seconds, self.page_size))
+                rows = await cursor.fetchall()
+            # 结束只读事务，下一页可看到新提交的数据
+            await conn.commit()
+        return rows
+    
     async def sync_resume_from_zervigo_to_looma(self):
         """从Zervigo MySQL同步简历数据到LoomaCRM MongoDB"""
+        direction = 'zervigo_to_looma'
+        synced = 0
         try:
-            cursor = self.mysql_conn.cursor(dictionary=True)
+            watermark = await self.load_watermark(direction)
             
-            # 查询最新的简历数据
-            query = """
-            SELECT id, user_id, title, content, created_at, updated_at, status
-            FROM resumes 
-            WHERE updated_at > DATE_SUB(NOW(), INTERVAL 1 HOUR)
-            ORDER BY updated_at DESC
-            """
-            
-            cursor.execute(query)
-            resumes = cursor.fetchall()
-            
-            for resume in resumes:
-                # 检查是否已存在
-                existing = self.mongodb_db.resumes.find_one({"zervigo_id": resume['id']})
-                
-                resume_doc = {
-                    "zervigo_id": resume['id'],
-                    "user_id": resume['user_id'],
-                    "title": resume['title'],
-                    "content": resume['content'],
-                    "created_at": resume['created_at'],
-                    "updated_at": resume['updated_at'],
-                    "status": resume['status'],
-                    "sync_source": "zervigo",
-                    "last_sync": datetime.now()
-                }
+            while self.running:
+                resumes = await self._fetch_zervigo_page(watermark)
+                if not resumes:
+                    break
                 
-                if existing:
-                    # 更新现有文档
-                    self.mongodb_db.resumes.update_one(
+                now = datetime.now()
+                operations = [
+                    UpdateOne(
                         {"zervigo_id": resume['id']},
-                        {"$set": resume_doc}
+                        {"$set": {
+                            "zervigo_id": resume['id'],
+                            "user_id": resume['user_id'],
+                            "title": resume['title'],
+                            "content": resume['content'],
+                            "created_at": resume['created_at'],
+                            "updated_at": resume['updated_at'],
+                            "status": resume['status'],
+                            "sync_source": "zervigo",
+                            "last_sync": now
+                        }},
+                        upsert=True
                     )
-                    logger.info(f"更新简历数据: {resume['id']}")
-                else:
-                    # 插入新文档
-                    self.mongodb_db.resumes.insert_one(resume_doc)
-                    logger.info(f"新增简历数据: {resume['id']}")
+                    for resume in resumes
+                ]
+                result = await self.mongodb_db.resumes.bulk_write(operations, ordered=False)
                 
                 # 记录同步状态到Redis
-                sync_key = f"resume_sync:zervigo_to_looma:{resume['id']}"
-                self.redis_client.set(sync_key, json.dumps({
-                    "resume_id": resume['id'],
-                    "sync_time": datetime.now().isoformat(),
-                    "status": "success"
-                }), ex=3600)  # 1小时过期
-            
-            cursor.close()
-            logger.info(f"从Zervigo同步了 {len(resumes)} 条简历数据到LoomaCRM")
+                sync_time = now.isoformat()
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for resume in resumes:
+                        pipe.set(f"resume_sync:zervigo_to_looma:{resume['id']}", json.dumps({
+                            "resume_id": resume['id'],
+                            "sync_time": sync_time,
+                            "status": "success"
+                        }), ex=3600)  # 1小时过期
+                    await pipe.execute()
+                
+                last = resumes[-1]
+                watermark = (last['updated_at'], last['id'])
+                await self.save_watermark(direction, watermark)
+                synced += len(resumes)
+                logger.debug(f"同步简历页: 新增 {result.upserted_count}，更新 {result.modified_count}")
+                
+                if len(resumes) < self.page_size:
+                    break
             
+            if synced:
+                self.stats[direction] += synced
+                logger.info(f"从Zervigo同步了 {synced} 条简历数据到LoomaCRM")
+        
         except Exception as e:
             logger.error(f"从Zervigo同步简历数据失败: {e}")
     
+    # ------------------------------------------------------------------
+    # LoomaCRM MongoDB -> Zervigo MySQL
+    # ------------------------------------------------------------------
+    
+    async def _fetch_looma_page(self, watermark: Optional[Tuple[datetime, Any]]) -> List[Dict[str, Any]]:
+        """按(updated_at, _id)键集分页读取LoomaCRM侧修改的简历"""
+        query: Dict[str, Any] = {"sync_source": "looma"}
+        if watermark is not None:
+            updated_at, last_id = watermark
+            query["$or"] = [
+                {"updated_at": {"$gt": updated_at}},
+                {"updated_at": updated_at, "_id": {"$gt": last_id}}
+            ]
+        cursor = self.mongodb_db.resumes.find(query).sort(
+            [("updated_at", ASCENDING), ("_id", ASCENDING)]
+        ).limit(self.page_size)
+        return await cursor.to_list(length=self.page_size)
+    
+    async def _upsert_zervigo_resumes(self, resumes: List[Dict[str, Any]]):
+        """多行INSERT ... ON DUPLICATE KEY UPDATE写回Zervigo"""
+        values_sql = ", ".join(["(%s, %s, %s, %s, %s, NOW(), %s)"] * len(resumes))
+        params: List[Any] = []
+        for resume in resumes:
+            params.extend([
+                resume['zervigo_id'],
+                resume['user_id'],
+                resume['title'],
+                resume['content'],
+                resume['created_at'],
+                resume.get('status', 'active')
+            ])
+        
+        async with self.mysql_pool.acquire() as conn:
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(f"""
+                        INSERT INTO resumes (id, user_id, title, content, created_at, updated_at, status)
+                        VALUES {values_sql}
+                        ON DUPLICATE KEY UPDATE
+                            title = VALUES(title),
+                            content = VALUES(content),
+                            updated_at = NOW()
+                    """, params)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+    
     async def sync_resume_from_looma_to_zervigo(self):
         """从LoomaCRM MongoDB同步简历数据到Zervigo MySQL"""
+        direction = 'looma_to_zervigo'
+        synced = 0
         try:
-            # 查询LoomaCRM中标记为需要同步的简历数据
-            looma_resumes = self.mongodb_db.resumes.find({
-                "sync_source": "looma",
-                "last_sync": {"$lt": datetime.now()}
-            })
+            watermark = await self.load_watermark(direction)
             
-            cursor = self.mysql_conn.cursor()
-            
-            for resume in looma_resumes:
-                # 检查Zervigo中是否存在
-                check_query = "SELECT id FROM resumes WHERE id = %s"
-                cursor.execute(check_query, (resume['zervigo_id'],))
-                exists = cursor.fetchone()
+            while self.running:
+                page = await self._fetch_looma_page(watermark)
+                if not page:
+                    break
                 
-                if exists:
-                    # 更新现有记录
-                    update_query = """
-                    UPDATE resumes 
-                    SET title = %s, content = %s, updated_at = NOW()
-                    WHERE id = %s
-                    """
-                    cursor.execute(update_query, (
-                        resume['title'],
-                        resume['content'],
-                        resume['zervigo_id']
-                    ))
-                else:
-                    # 插入新记录
-                    insert_query = """
-                    INSERT INTO resumes (id, user_id, title, content, created_at, updated_at, status)
-                    VALUES (%s, %s, %s, %s, %s, NOW(), %s)
-                    """
-                    cursor.execute(insert_query, (
-                        resume['zervigo_id'],
-                        resume['user_id'],
-                        resume['title'],
-                        resume['content'],
-                        resume['created_at'],
-                        resume.get('status', 'active')
-                    ))
+                # 缺少更新时间的文档无法推进水位，跳过并告警
+                resumes = [doc for doc in page if doc.get('updated_at') and doc.get('zervigo_id') is not None]
+                if len(resumes) < len(page):
+                    logger.warning(f"跳过 {len(page) - len(resumes)} 条缺少updated_at或zervigo_id的简历")
                 
-                # 更新同步状态
-                self.mongodb_db.resumes.update_one(
-                    {"_id": resume['_id']},
-                    {"$set": {"last_sync": datetime.now()}}
-                )
+                if resumes:
+                    await self._upsert_zervigo_resumes(resumes)
+                    
+                    # 更新同步状态
+                    await self.mongodb_db.resumes.update_many(
+                        {"_id": {"$in": [doc['_id'] for doc in resumes]}},
+                        {"$set": {"last_sync": datetime.now()}}
+                    )
+                    synced += len(resumes)
                 
-                logger.info(f"同步简历数据到Zervigo: {resume['zervigo_id']}")
-            
-            self.mysql_conn.commit()
-            cursor.close()
+                last = page[-1]
+                if not last.get('updated_at'):
+                    break
+                watermark = (last['updated_at'], last['_id'])
+                await self.save_watermark(direction, watermark)
+                
+                if len(page) < self.page_size:
+                    break
             
+            if synced:
+                self.stats[direction] += synced
+                logger.info(f"从LoomaCRM同步了 {synced} 条简历数据到Zervigo")
+        
         except Exception as e:
             logger.error(f"同步简历数据到Zervigo失败: {e}")
-            if self.mysql_conn:
-                self.mysql_conn.rollback()
     
     async def sync_resume_analysis_data(self):
         """同步简历分析数据"""
         try:
-            # 从LoomaCRM MongoDB获取简历分析数据
-            analysis_data = self.mongodb_db.resume_analysis.find({
-                "sync_status": "pending"
-            })
-            
-            for analysis in analysis_data:
+            while self.running:
+                # 从LoomaCRM MongoDB获取简历分析数据
+                analysis_data = await self.mongodb_db.resume_analysis.find(
+                    {"sync_status": "pending"},
+                    projection={"_id": 1, "resume_id": 1}
+                ).limit(self.page_size).to_list(length=self.page_size)
+                if not analysis_data:
+                    break
+                
                 # 同步到Zervigo PostgreSQL
                 # 这里需要根据实际的AI分析数据结构来实现
-                logger.info(f"同步简历分析数据: {analysis.get('resume_id')}")
+                logger.info(f"同步简历分析数据: {len(analysis_data)} 条")
                 
                 # 更新同步状态
-                self.mongodb_db.resume_analysis.update_one(
-                    {"_id": analysis['_id']},
+                await self.mongodb_db.resume_analysis.update_many(
+                    {"_id": {"$in": [analysis['_id'] for analysis in analysis_data]}},
                     {"$set": {"sync_status": "synced", "sync_time": datetime.now()}}
                 )
-            
+                self.stats['analysis_synced'] += len(analysis_data)
+                
+                if len(analysis_data) < self.page_size:
+                    break
+        
         except Exception as e:
             logger.error(f"同步简历分析数据失败: {e}")
     
@@ -229,6 +399,8 @@ class ResumeSyncService:
         
         while self.running:
             try:
+                started = time.perf_counter()
+                
                 # 从Zervigo同步到LoomaCRM
                 await self.sync_resume_from_zervigo_to_looma()
                 
@@ -238,9 +410,11 @@ class ResumeSyncService:
                 # 同步分析数据
                 await self.sync_resume_analysis_data()
                 
+                self.stats['last_cycle_seconds'] = time.perf_counter() - started
+                
                 # 等待下次同步
                 await asyncio.sleep(self.sync_interval)
-                
+            
             except Exception as e:
                 logger.error(f"同步循环异常: {e}")
                 await asyncio.sleep(10)  # 异常时等待10秒后重试
@@ -258,7 +432,7 @@ class ResumeSyncService:
             
             # 启动同步循环
             await self.start_sync_loop()
-            
+        
         except Exception as e:
             logger.error(f"启动简历同步服务失败: {e}")
             raise
@@ -269,12 +443,13 @@ class ResumeSyncService:
         self.running = False
         
         # 关闭数据库连接
-        if self.mysql_conn:
-            self.mysql_conn.close()
+        if self.mysql_pool:
+            self.mysql_pool.close()
+            await self.mysql_pool.wait_closed()
         if self.mongodb_client:
             self.mongodb_client.close()
         if self.redis_client:
-            self.redis_client.close()
+            await self.redis_client.close()
         
         logger.info("简历数据同步服务已停止")
 
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+简历文件存储层
+- 流式解析multipart请求体，分块写入临时文件，写盘与哈希计算都在线程中进行
+- 按内容SHA-256去重，相同内容的简历只保存一份
+- SQLite元数据索引，按file_id查找与按上传时间分页都走索引
+"""
+
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS resume_blobs (
+    content_hash TEXT PRIMARY KEY,
+    stored_name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resume_files (
+    file_id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL REFERENCES resume_blobs(content_hash),
+    original_filename TEXT,
+    mime_type TEXT,
+    upload_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_resume_files_upload_time ON resume_files(upload_time, file_id);
+CREATE INDEX IF NOT EXISTS idx_resume_files_content_hash ON resume_files(content_hash);
+"""
+
+SELECT_FILE_SQL = """
+SELECT f.file_id, f.original_filename, f.mime_type, f.upload_time,
+       b.content_hash, b.stored_name, b.size
+FROM resume_files f JOIN resume_blobs b ON b.content_hash = f.content_hash
+"""
+
+
+class UploadTooLarge(Exception):
+    """上传内容超过大小限制"""
+
+
+def multipart_boundary(content_type: str) -> Optional[bytes]:
+    """从Content-Type中取出multipart边界，不是multipart/form-data时返回None"""
+    if not content_type:
+        return None
+    ctype, params = parse_options_header(content_type)
+    if ctype != b'multipart/form-data':
+        return None
+    return params.get(b'boundary') or None
+
+
+class MultipartFileReader:
+    """
+    流式multipart读取器
+
+    每次feed一块请求体，返回该块产生的事件：
+    ('begin', 文件名)、('data', 字节)、('end', None)，只关注指定字段
+    """
+    
+    def __init__(self, boundary: bytes, field_name: str = 'file'):
+        self.field_name = field_name
+        self._events: List[Tuple[str, Any]] = []
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._headers: Dict[bytes, bytes] = {}
+        self._in_target = False
+        self.found = False
+        self._parser = MultipartParser(boundary, callbacks={
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end,
+        })
+    
+    def feed(self, chunk: bytes) -> List[Tuple[str, Any]]:
+        self._parser.write(chunk)
+        events, self._events = self._events, []
+        return events
+    
+    def _on_part_begin(self):
+        self._headers = {}
+        self._in_target = False
+    
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+    
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+    
+    def _on_header_end(self):
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+    
+    def _on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b'content-disposition', b''))
+        name = params.get(b'name', b'').decode('utf-8', 'replace')
+        # 只读取第一个目标字段
+        if name != self.field_name or self.found:
+            return
+        filename = params.get(b'filename')
+        self._in_target = True
+        self.found = True
+        self._events.append(('begin', filename.decode('utf-8', 'replace') if filename else ''))
+    
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_target:
+            self._events.append(('data', bytes(data[start:end])))
+    
+    def _on_part_end(self):
+        if self._in_target:
+            self._in_target = False
+            self._events.append(('end', None))
+
+
+class PendingUpload:
+    """正在写入的上传文件，攒够一批后在线程中写盘并更新哈希"""
+    
+    def __init__(self, store: "ResumeFileStore", original_filename: str, max_size: int):
+        self.store = store
+        self.original_filename = original_filename
+        self.extension = Path(original_filename).suffix.lower()
+        self.max_size = max_size
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._temp_path = store.temp_dir / f"{uuid.uuid4().hex}.part"
+        self._file = None
+    
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise UploadTooLarge(self.size)
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.store.write_chunk_size:
+            await self._flush()
+    
+    async def _flush(self):
+        if not self._buffer:
+            return
+        data = b''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        await asyncio.to_thread(self._write_sync, data)
+    
+    def _write_sync(self, data: bytes):
+        if self._file is None:
+            self._file = open(self._temp_path, 'wb')
+        self._file.write(data)
+        self._hasher.update(data)
+    
+    def _close_sync(self):
+        if self._file is None:
+            # 空文件也落一个临时文件，流程与普通文件一致
+            self._file = open(self._temp_path, 'wb')
+        self._file.close()
+    
+    async def commit(self) -> Dict[str, Any]:
+        """写完剩余数据并登记到索引，返回文件记录(含是否重复)"""
+        await self._flush()
+        await asyncio.to_thread(self._close_sync)
+        return await asyncio.to_thread(
+            self.store._commit_sync, self._temp_path, self._hasher.hexdigest(),
+            self.size, self.original_filename, self.extension
+        )
+    
+    async def abort(self):
+        """放弃上传并删除临时文件"""
+        self._buffer = []
+        await asyncio.to_thread(self._abort_sync)
+    
+    def _abort_sync(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self._temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class ResumeFileStore:
+    """内容寻址的简历文件存储 + SQLite元数据索引"""
+    
+    def __init__(self, upload_dir: str, db_path: Optional[str] = None,
+                 write_chunk_size: int = 256 * 1024):
+        """
+        Args:
+            upload_dir: 文件存放目录
+            db_path: 索引库路径，默认放在upload_dir下
+            write_chunk_size: 攒够多少字节后写一次盘
+        """
+        self.upload_dir = Path(upload_dir)
+        self.temp_dir = self.upload_dir / '.tmp'
+        self.db_path = db_path or str(self.upload_dir / 'resume_index.db')
+        self.write_chunk_size = write_chunk_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    async def initialize(self):
+        await asyncio.to_thread(self._initialize_sync)
+    
+    def _initialize_sync(self):
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.temp_dir.mkdir(exist_ok=True)
+        # 清理上次异常退出残留的临时文件
+        for leftover in self.temp_dir.glob('*.part'):
+            leftover.unlink()
+        
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        self._conn.executescript(SCHEMA_SQL)
+        if version < SCHEMA_VERSION:
+            # 首次建立索引时把已有的上传文件(旧版按file_id命名)登记进来
+            imported = self._import_existing_sync()
+            self._conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+            logger.info(f"已将{imported}个已有文件登记到索引")
+        self._conn.commit()
+    
+    def _import_existing_sync(self) -> int:
+        imported = 0
+        db_names = {Path(self.db_path).name, Path(self.db_path).name + '-wal', Path(self.db_path).name + '-shm'}
+        for file_path in self.upload_dir.iterdir():
+            if not file_path.is_file() or file_path.name in db_names:
+                continue
+            hasher = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    hasher.update(block)
+            content_hash = hasher.hexdigest()
+            stat = file_path.stat()
+            self._conn.execute(
+                'INSERT OR IGNORE INTO resume_blobs (content_hash, stored_name, size, created_at) VALUES (?, ?, ?, ?)',
+                (content_hash, file_path.name, stat.st_size, datetime.fromtimestamp(stat.st_mtime).isoformat())
+            )
+            self._conn.execute(
+                'INSERT OR IGNORE INTO resume_files (file_id, content_hash, original_filename, mime_type, upload_time) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (file_path.stem, content_hash, file_path.name, mimetypes.guess_type(file_path.name)[0],
+                 datetime.fromtimestamp(stat.st_mtime).isoformat())
+            )
+            imported += 1
+        return imported
+    
+    def open_upload(self, original_filename: str, max_size: int) -> PendingUpload:
+        return PendingUpload(self, original_filename, max_size)
+    
+    def _commit_sync(self, temp_path: Path, content_hash: str, size: int,
+                     original_filename: str, extension: str) -> Dict[str, Any]:
+        file_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT stored_name FROM resume_blobs WHERE content_hash = ?', (content_hash,)
+            ).fetchone()
+            duplicate = row is not None
+            if duplicate:
+                stored_name = row['stored_name']
+                os.remove(temp_path)
+            else:
+                stored_name = f"{content_hash}{extension}"
+                os.replace(temp_path, self.upload_dir / stored_name)
+                self._conn.execute(
+                    'INSERT INTO resume_blobs (content_hash, stored_name, size, created_at) VALUES (?, ?, ?, ?)',
+                    (content_hash, stored_name, size, now)
+                )
+            self._conn.execute(
+                'INSERT INTO resume_files (file_id, content_hash, original_filename, mime_type, upload_time) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (file_id, content_hash, original_filename, mimetypes.guess_type(original_filename)[0], now)
+            )
+            self._conn.commit()
+        
+        return {
+            'file_id': file_id,
+            'filename': stored_name,
+            'original_filename': original_filename,
+            'size': size,
+            'content_hash': content_hash,
+            'upload_time': now,
+            'duplicate': duplicate
+        }
+    
+    def _to_record(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'file_id': row['file_id'],
+            'filename': row['stored_name'],
+            'original_filename': row['original_filename'],
+            'size': row['size'],
+            'path': str(self.upload_dir / row['stored_name']),
+            'content_hash': row['content_hash'],
+            'upload_time': row['upload_time'],
+            'mime_type': row['mime_type']
+        }
+    
+    async def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get_sync, file_id)
+    
+    def _get_sync(self, file_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(SELECT_FILE_SQL + ' WHERE f.file_id = ?', (file_id,)).fetchone()
+        return self._to_record(row) if row is not None else None
+    
+    async def list_files(self, limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        按上传时间倒序分页
+
+        Args:
+            limit: 每页条数
+            cursor: 上一页返回的next_cursor(最后一条的file_id)，从其之后继续
+        """
+        return await asyncio.to_thread(self._list_sync, limit, cursor)
+    
+    def _list_sync(self, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+        with self._lock:
+            total = self._conn.execute('SELECT COUNT(*) FROM resume_files').fetchone()[0]
+            if cursor:
+                anchor = self._conn.execute(
+                    'SELECT upload_time, file_id FROM resume_files WHERE file_id = ?', (cursor,)
+                ).fetchone()
+                if anchor is None:
+                    raise ValueError(f"无效的分页游标: {cursor}")
+                rows = self._conn.execute(
+                    SELECT_FILE_SQL + ' WHERE (f.upload_time, f.file_id) < (?, ?)'
+                    ' ORDER BY f.upload_time DESC, f.file_id DESC LIMIT ?',
+                    (anchor['upload_time'], anchor['file_id'], limit + 1)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    SELECT_FILE_SQL + ' ORDER BY f.upload_time DESC, f.file_id DESC LIMIT ?',
+                    (limit + 1,)
+                ).fetchall()
+        
+        has_more = len(rows) > limit
+        files = [self._to_record(row) for row in rows[:limit]]
+        return {
+            'files': files,
+            'total': total,
+            'next_cursor': files[-1]['file_id'] if has_more else None
+        }
+    
+    async def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
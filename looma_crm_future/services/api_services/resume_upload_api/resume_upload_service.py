@@ -6,13 +6,12 @@ Future版简历上传服务
 
 from sanic import Sanic, Request, json as sanic_json
 from sanic.response import json as sanic_response
-import os
-import uuid
-import mimetypes
 from pathlib import Path
 import logging
 from datetime import datetime
 
+from resume_file_store import ResumeFileStore, MultipartFileReader, UploadTooLarge, multipart_boundary
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,58 +22,80 @@ app = Sanic("ResumeUploadService")
 UPLOAD_DIR = "uploads"
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_EXTENSIONS = {'.pdf', '.doc', '.docx', '.txt'}
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+file_store = ResumeFileStore(UPLOAD_DIR)
+
+@app.before_server_start
+async def setup_file_store(app, loop):
+    """初始化文件存储与元数据索引"""
+    await file_store.initialize()
+
+@app.after_server_stop
+async def close_file_store(app, loop):
+    """关闭元数据索引"""
+    await file_store.close()
 
-@app.route('/api/v1/upload', methods=['POST'])
+@app.route('/api/v1/upload', methods=['POST'], stream=True)
 async def upload_resume(request: Request):
-    """简历上传接口"""
+    """简历上传接口，请求体按块流式写盘"""
+    upload = None
     try:
         logger.info("收到简历上传请求")
         
-        # 获取上传的文件 - 使用正确的方式
-        if 'file' not in request.files:
+        boundary = multipart_boundary(request.headers.get('content-type', ''))
+        if not boundary:
             return sanic_response({"error": "没有上传文件"}, status=400)
         
-        file = request.files.get('file')
-        
-        # 验证文件
-        if not file or not hasattr(file, 'name') or not file.name:
-            return sanic_response({"error": "文件名不能为空"}, status=400)
-        
-        # 检查文件大小
-        if len(file.body) > MAX_FILE_SIZE:
-            return sanic_response({"error": f"文件大小超过限制 ({MAX_FILE_SIZE / 1024 / 1024:.1f}MB)"}, status=400)
-        
-        # 检查文件类型
-        file_ext = Path(file.name).suffix.lower()
-        if file_ext not in ALLOWED_EXTENSIONS:
-            return sanic_response({"error": f"不支持的文件类型，支持的类型: {', '.join(ALLOWED_EXTENSIONS)}"}, status=400)
-        
-        # 生成唯一文件名
-        file_id = str(uuid.uuid4())
-        safe_filename = f"{file_id}{file_ext}"
-        
-        # 确保上传目录存在
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        reader = MultipartFileReader(boundary, field_name='file')
+        completed = False
+        while not completed:
+            chunk = await request.stream.read()
+            if chunk is None:
+                break
+            for event, value in reader.feed(chunk):
+                if event == 'begin':
+                    # 验证文件
+                    if not value:
+                        return sanic_response({"error": "文件名不能为空"}, status=400)
+                    
+                    # 检查文件类型
+                    file_ext = Path(value).suffix.lower()
+                    if file_ext not in ALLOWED_EXTENSIONS:
+                        return sanic_response({"error": f"不支持的文件类型，支持的类型: {', '.join(ALLOWED_EXTENSIONS)}"}, status=400)
+                    
+                    upload = file_store.open_upload(value, MAX_FILE_SIZE)
+                elif event == 'data':
+                    await upload.write(value)
+                elif event == 'end':
+                    completed = True
+        
+        if upload is None:
+            return sanic_response({"error": "没有上传文件"}, status=400)
+        if not completed:
+            await upload.abort()
+            return sanic_response({"error": "上传内容不完整"}, status=400)
         
-        # 保存文件
-        file_path = os.path.join(UPLOAD_DIR, safe_filename)
-        with open(file_path, 'wb') as f:
-            f.write(file.body)
+        # 计算内容哈希后登记，相同内容只保存一份
+        record = await upload.commit()
         
-        logger.info(f"文件上传成功: {file.name} -> {safe_filename}")
+        logger.info(f"文件上传成功: {record['original_filename']} -> {record['filename']}"
+                    f"{' (重复内容)' if record['duplicate'] else ''}")
         
         return sanic_response({
             "success": True,
-            "file_id": file_id,
-            "filename": safe_filename,
-            "original_filename": file.name,
-            "size": len(file.body),
-            "upload_time": datetime.now().isoformat(),
+            **record,
             "message": "文件上传成功"
         })
         
+    except UploadTooLarge:
+        await upload.abort()
+        return sanic_response({"error": f"文件大小超过限制 ({MAX_FILE_SIZE / 1024 / 1024:.1f}MB)"}, status=400)
     except Exception as e:
         logger.error(f"文件上传失败: {e}")
+        if upload is not None:
+            await upload.abort()
         return sanic_response({"error": str(e)}, status=500)
 
 @app.route('/api/v1/upload/<file_id>', methods=['GET'])
@@ -83,25 +104,14 @@ async def get_file_info(request: Request, file_id: str):
     try:
         logger.info(f"获取文件信息: {file_id}")
         
-        # 查找文件
-        upload_dir = Path(UPLOAD_DIR)
-        files = list(upload_dir.glob(f"{file_id}.*"))
-        
-        if not files:
+        # 按file_id查索引
+        record = await file_store.get(file_id)
+        if record is None:
             return sanic_response({"error": "文件不存在"}, status=404)
         
-        file_path = files[0]
-        file_size = file_path.stat().st_size
-        file_mtime = datetime.fromtimestamp(file_path.stat().st_mtime)
-        
         return sanic_response({
             "success": True,
-            "file_id": file_id,
-            "filename": file_path.name,
-            "size": file_size,
-            "path": str(file_path),
-            "upload_time": file_mtime.isoformat(),
-            "mime_type": mimetypes.guess_type(str(file_path))[0]
+            **record
         })
         
     except Exception as e:
@@ -110,35 +120,27 @@ async def get_file_info(request: Request, file_id: str):
 
 @app.route('/api/v1/upload/list', methods=['GET'])
 async def list_files(request: Request):
-    """列出所有上传的文件"""
+    """分页列出上传的文件(按上传时间倒序)，通过cursor参数翻页"""
     try:
         logger.info("获取文件列表")
         
-        upload_dir = Path(UPLOAD_DIR)
-        if not upload_dir.exists():
-            return sanic_response({
-                "success": True,
-                "files": [],
-                "count": 0
-            })
-        
-        files = []
-        for file_path in upload_dir.iterdir():
-            if file_path.is_file():
-                files.append({
-                    "filename": file_path.name,
-                    "size": file_path.stat().st_size,
-                    "upload_time": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-                    "mime_type": mimetypes.guess_type(str(file_path))[0]
-                })
+        try:
+            page_size = int(request.args.get('page_size', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return sanic_response({"error": "page_size必须是整数"}, status=400)
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
         
-        # 按上传时间排序
-        files.sort(key=lambda x: x['upload_time'], reverse=True)
+        try:
+            page = await file_store.list_files(page_size, request.args.get('cursor'))
+        except ValueError as e:
+            return sanic_response({"error": str(e)}, status=400)
         
         return sanic_response({
             "success": True,
-            "files": files,
-            "count": len(files)
+            "files": page['files'],
+            "count": len(page['files']),
+            "total": page['total'],
+            "next_cursor": page['next_cursor']
         })
         
     except Exception as e:
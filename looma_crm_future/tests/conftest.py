@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+Looma CRM单元测试配置
+共享模块位于utils/shared，以命名空间包形式导入，测试时把utils目录和项目根目录加入Python路径
+"""
+
+import os
+import sys
+
+LOOMA_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (LOOMA_ROOT, os.path.join(LOOMA_ROOT, "utils")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+审计系统测试
+验证滑动窗口阈值规则的计数与告警去重、内存环形缓冲区的淘汰与索引，以及后台批量持久化
+"""
+
+import asyncio
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from shared.security.audit_system import (
+    AuditRuleEngine, AuditEvent, AuditEventType, AuditStatus, SlidingWindowCounter,
+    AuditSink, AuditSystem, BatchedAuditWriter, MemoryAuditStorage, SQLiteAuditSink,
+    create_audit_storage
+)
+
+T0 = datetime(2025, 10, 17, 12, 0, 0)
+
+
+def _login_failure(user_id: str, timestamp: datetime) -> AuditEvent:
+    return AuditEvent(
+        event_id=str(uuid.uuid4()),
+        event_type=AuditEventType.LOGIN,
+        user_id=user_id,
+        username=user_id,
+        status=AuditStatus.FAILURE,
+        timestamp=timestamp
+    )
+
+
+def _event(user_id: str, event_type: AuditEventType, timestamp: datetime) -> AuditEvent:
+    return AuditEvent(
+        event_id=str(uuid.uuid4()),
+        event_type=event_type,
+        user_id=user_id,
+        username=user_id,
+        timestamp=timestamp
+    )
+
+
+class RecordingSink(AuditSink):
+    """记录每次批量写入的持久化目标"""
+    
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+    
+    async def write_batch(self, events):
+        self.batches.append(list(events))
+    
+    async def close(self):
+        self.closed = True
+
+
+async def _login_failure_alerts(engine: AuditRuleEngine, event: AuditEvent):
+    alerts = await engine.evaluate_event(event)
+    return [alert for alert in alerts if alert.rule_id == "login_failure"]
+
+
+class TestSlidingWindowCounter:
+    """测试滑动窗口计数器"""
+    
+    def test_counts_expire_after_window(self):
+        counter = SlidingWindowCounter(60, buckets=6)
+        assert counter.add(0) == 1
+        assert counter.add(30) == 2
+        assert counter.count(75) == 1
+        assert counter.count(200) == 0
+
+
+class TestAuditThreshold:
+    """测试阈值规则"""
+    
+    @pytest.mark.asyncio
+    async def test_threshold_failures_fire_alert(self):
+        """阈值为5时第5次登录失败触发告警"""
+        engine = AuditRuleEngine()
+        for i in range(4):
+            event = _login_failure("user-1", T0 + timedelta(seconds=i))
+            assert await _login_failure_alerts(engine, event) == []
+        
+        event = _login_failure("user-1", T0 + timedelta(seconds=4))
+        assert len(await _login_failure_alerts(engine, event)) == 1
+    
+    @pytest.mark.asyncio
+    async def test_first_event_counted_when_prune_runs(self):
+        """新建计数器时触发的清理不能移除当前键"""
+        engine = AuditRuleEngine(max_window_keys=1)
+        for i in range(5):
+            await engine.evaluate_event(_login_failure(f"other-{i}", T0))
+        
+        alerts = []
+        for i in range(5):
+            alerts += await _login_failure_alerts(engine, _login_failure("user-1", T0 + timedelta(seconds=i)))
+        assert len(alerts) == 1
+    
+    @pytest.mark.asyncio
+    async def test_alert_once_per_window(self):
+        engine = AuditRuleEngine()
+        alerts = []
+        for i in range(10):
+            alerts += await _login_failure_alerts(engine, _login_failure("user-1", T0 + timedelta(seconds=i)))
+        assert len(alerts) == 1
+        
+        # 窗口(15分钟)过后重新累计
+        later = T0 + timedelta(minutes=30)
+        for i in range(5):
+            alerts += await _login_failure_alerts(engine, _login_failure("user-1", later + timedelta(seconds=i)))
+        assert len(alerts) == 2
+
+
+class TestMemoryAuditStorage:
+    """测试内存环形缓冲区"""
+    
+    @pytest.mark.asyncio
+    async def test_oldest_events_are_evicted(self):
+        storage = MemoryAuditStorage(max_events=3)
+        events = [_event(f"u{i}", AuditEventType.LOGIN, T0 + timedelta(seconds=i)) for i in range(5)]
+        for event in events:
+            await storage.store_event(event)
+        
+        assert storage.events == events[2:]
+        assert [event.user_id for event in await storage.get_events({}, limit=10)] == ["u4", "u3", "u2"]
+    
+    @pytest.mark.asyncio
+    async def test_indexes_drop_evicted_events(self):
+        storage = MemoryAuditStorage(max_events=4)
+        for i in range(6):
+            event_type = AuditEventType.LOGIN if i % 2 == 0 else AuditEventType.DATA_ACCESS
+            await storage.store_event(_event("u1" if i < 3 else "u2", event_type, T0 + timedelta(seconds=i)))
+        
+        # 序号0、1已被覆盖，u1只剩序号2的事件
+        assert [event.timestamp for event in await storage.get_events_by_user("u1")] == [T0 + timedelta(seconds=2)]
+        assert len(await storage.get_events_by_user("u2")) == 3
+        logins = await storage.get_events({"event_type": AuditEventType.LOGIN})
+        assert [event.timestamp for event in logins] == [T0 + timedelta(seconds=4), T0 + timedelta(seconds=2)]
+        
+        for i in range(6, 10):
+            await storage.store_event(_event("u3", AuditEventType.LOGOUT, T0 + timedelta(seconds=i)))
+        assert "u1" not in storage._by_user and "u2" not in storage._by_user
+        assert set(storage._by_type) == {AuditEventType.LOGOUT}
+    
+    @pytest.mark.asyncio
+    async def test_filters_apply_on_indexed_candidates(self):
+        storage = MemoryAuditStorage(max_events=10)
+        for i in range(4):
+            await storage.store_event(_event("u1", AuditEventType.LOGIN, T0 + timedelta(seconds=i)))
+        
+        events = await storage.get_events({"user_id": "u1", "start_time": T0 + timedelta(seconds=2)})
+        assert len(events) == 2
+        assert await storage.get_events({"user_id": "u1", "event_type": AuditEventType.LOGOUT}) == []
+
+
+class TestBatchedAuditWriter:
+    """测试后台批量写入器"""
+    
+    @pytest.mark.asyncio
+    async def test_flushes_full_batches_and_remainder(self):
+        sink = RecordingSink()
+        writer = BatchedAuditWriter(sink, batch_size=3, flush_interval=0.01)
+        for i in range(7):
+            assert writer.enqueue(_event("u1", AuditEventType.LOGIN, T0 + timedelta(seconds=i)))
+        await asyncio.wait_for(writer.queue.join(), timeout=1)
+        
+        assert [len(batch) for batch in sink.batches] == [3, 3, 1]
+        assert writer.get_stats()["written"] == 7
+        await writer.close()
+        assert sink.closed
+    
+    @pytest.mark.asyncio
+    async def test_close_drains_queue(self):
+        sink = RecordingSink()
+        writer = BatchedAuditWriter(sink, batch_size=100, flush_interval=60)
+        for i in range(5):
+            writer.enqueue(_event("u1", AuditEventType.LOGIN, T0 + timedelta(seconds=i)))
+        
+        await writer.close(timeout=1)
+        assert sum(len(batch) for batch in sink.batches) == 5
+        assert not writer.enqueue(_event("u1", AuditEventType.LOGIN, T0))
+    
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_events(self):
+        writer = BatchedAuditWriter(RecordingSink(), max_queue_size=2)
+        results = [writer.enqueue(_event("u1", AuditEventType.LOGIN, T0)) for _ in range(3)]
+        
+        assert results == [True, True, False]
+        assert writer.get_stats()["dropped"] == 1
+        await writer.close(timeout=1)
+
+
+class TestAuditStorageConfig:
+    """测试按配置创建审计存储"""
+    
+    def test_default_config_keeps_memory_only(self):
+        storage = create_audit_storage({"sink": "none", "max_events": 5})
+        assert storage.writer is None
+        assert storage.max_events == 5
+    
+    @pytest.mark.asyncio
+    async def test_sqlite_sink_persists_logged_events(self, tmp_path):
+        db_path = str(tmp_path / "audit.db")
+        system = AuditSystem(config={"sink": "sqlite", "sqlite_path": db_path,
+                                     "batch_size": 10, "flush_interval": 0.01})
+        assert isinstance(system.storage.writer.sink, SQLiteAuditSink)
+        
+        for i in range(3):
+            await system.log_event(AuditEventType.DATA_ACCESS, f"u{i}", f"u{i}")
+        await system.close()
+        
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute("SELECT user_id FROM audit_events ORDER BY user_id").fetchall()
+        assert [row[0] for row in rows] == ["u0", "u1", "u2"]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+数据库连接管理器测试
+使用可控的假后端验证重连、定期健康检查与close()后重新初始化
+"""
+
+import asyncio
+
+import pytest
+
+from shared.database.connection_manager import (
+    DatabaseConnectionManager, STATUS_READY, STATUS_DEGRADED, STATUS_PENDING
+)
+
+
+class FakeBackend:
+    """可切换可用状态的假后端"""
+    
+    def __init__(self, available: bool = True):
+        self.available = available
+        self.connects = 0
+        self.closed = 0
+    
+    async def connect(self):
+        self.connects += 1
+        if not self.available:
+            raise ConnectionError("backend down")
+        return {"id": self.connects}
+    
+    async def ping(self, client):
+        if not self.available:
+            raise ConnectionError("ping failed")
+    
+    async def close(self, client):
+        self.closed += 1
+
+
+def _manager(**kwargs) -> DatabaseConnectionManager:
+    options = {"connect_timeout": 1.0, "retry_initial_delay": 0.01, "retry_max_delay": 0.02,
+               "health_check_interval": 0}
+    options.update(kwargs)
+    return DatabaseConnectionManager(**options)
+
+
+def _register(manager: DatabaseConnectionManager, name: str, backend: FakeBackend, **kwargs):
+    manager.register(name, backend.connect, close=backend.close, ping=backend.ping, **kwargs)
+
+
+async def _wait_for_status(manager: DatabaseConnectionManager, name: str, status: str, timeout: float = 1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while manager.backends[name].status != status:
+        assert asyncio.get_running_loop().time() < deadline, manager.summary()
+        await asyncio.sleep(0.005)
+
+
+class TestConnectionManager:
+    """测试连接管理器"""
+    
+    @pytest.mark.asyncio
+    async def test_failed_backend_retries_without_blocking_others(self):
+        manager = _manager()
+        redis, postgres = FakeBackend(), FakeBackend(available=False)
+        _register(manager, "redis", redis)
+        _register(manager, "postgres", postgres)
+        try:
+            await manager.start()
+            assert manager.is_ready("redis")
+            assert manager.backends["postgres"].status == STATUS_DEGRADED
+            
+            postgres.available = True
+            await _wait_for_status(manager, "postgres", STATUS_READY)
+            assert postgres.connects >= 2
+        finally:
+            await manager.close()
+    
+    @pytest.mark.asyncio
+    async def test_initialize_after_close(self):
+        manager = _manager()
+        redis = FakeBackend()
+        _register(manager, "redis", redis)
+        
+        await manager.start()
+        await manager.close()
+        assert manager.backends["redis"].status == STATUS_PENDING
+        assert redis.closed == 1
+        
+        await manager.start()
+        try:
+            assert manager.is_ready("redis")
+            assert redis.connects == 2
+        finally:
+            await manager.close()
+    
+    @pytest.mark.asyncio
+    async def test_lazy_backend_connects_on_first_get(self):
+        manager = _manager()
+        neo4j = FakeBackend()
+        _register(manager, "neo4j", neo4j, lazy=True)
+        try:
+            await manager.start()
+            assert neo4j.connects == 0
+            assert await manager.get("neo4j") == {"id": 1}
+        finally:
+            await manager.close()
+    
+    @pytest.mark.asyncio
+    async def test_periodic_health_check_detects_disconnect(self):
+        manager = _manager(health_check_interval=0.01)
+        elasticsearch = FakeBackend()
+        _register(manager, "elasticsearch", elasticsearch)
+        try:
+            await manager.start()
+            assert manager.is_ready("elasticsearch")
+            
+            elasticsearch.available = False
+            await _wait_for_status(manager, "elasticsearch", STATUS_DEGRADED)
+            assert manager.client("elasticsearch") is None
+            
+            elasticsearch.available = True
+            await _wait_for_status(manager, "elasticsearch", STATUS_READY)
+        finally:
+            await manager.close()
+
+
+class TestUnifiedDataAccessErrors:
+    """测试调用方上报的连接类异常"""
+    
+    @pytest.mark.asyncio
+    async def test_redis_connection_error_degrades_backend(self):
+        redis_exceptions = pytest.importorskip("redis.exceptions")
+        from shared.database.unified_data_access import UnifiedDataAccess
+        
+        manager = _manager()
+        data_access = UnifiedDataAccess(config={"lazy_backends": []}, connection_manager=manager)
+        redis = FakeBackend()
+        manager.backends.clear()
+        _register(manager, "redis", redis)
+        try:
+            await manager.start()
+            assert data_access.report_error("redis", ValueError("bad value")) is False
+            assert manager.is_ready("redis")
+            
+            redis.available = False
+            assert data_access.report_error("redis", redis_exceptions.ConnectionError("reset")) is True
+            assert manager.backends["redis"].status != STATUS_READY
+        finally:
+            await manager.close()
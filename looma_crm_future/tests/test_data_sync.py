@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+数据映射/验证缓存与同步工作器测试
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from shared.database.memo_cache import MemoCache, structural_fingerprint
+from shared.database.enhanced_unified_data_access import EnhancedUnifiedDataAccess
+
+
+class TestMemoCache:
+    """测试有界记忆化缓存"""
+    
+    def test_lru_eviction(self):
+        cache = MemoCache(max_entries=2, ttl=0)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == (True, 1)
+        cache.set("c", 3)
+        
+        assert cache.get("b") == (False, None)
+        assert "a" in cache and "c" in cache
+        assert cache.stats["evicted"] == 1
+    
+    def test_cached_none_is_a_hit(self):
+        cache = MemoCache()
+        cache.set("empty", None)
+        assert cache.get("empty") == (True, None)
+    
+    def test_purge_expired(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("shared.database.memo_cache.time.monotonic", lambda: now[0])
+        cache = MemoCache(ttl=10)
+        cache.set("old", 1)
+        now[0] += 5
+        cache.set("new", 2)
+        now[0] += 6
+        
+        assert cache.purge_expired() == 1
+        assert len(cache) == 1
+        assert cache.get("new") == (True, 2)
+    
+    def test_fingerprint_distinguishes_types(self):
+        assert structural_fingerprint({"a": 1}) != structural_fingerprint({"a": True})
+        assert structural_fingerprint({"a": 1}) != structural_fingerprint([("a", 1)])
+        assert structural_fingerprint({"at": datetime(2025, 1, 1)}) == structural_fingerprint({"at": datetime(2025, 1, 1)})
+
+
+def _talent(talent_id: str):
+    return {
+        "id": talent_id,
+        "name": f"Talent_{talent_id}",
+        "email": f"{talent_id}@example.com",
+        "status": "active",
+        "zervigo_user_id": int(talent_id.replace("talent_", ""))
+    }
+
+
+def _project(project_id: str):
+    return {
+        "id": project_id,
+        "name": f"Project_{project_id}",
+        "description": f"Description for {project_id}",
+        "requirements": ["3年以上经验"],
+        "skills_needed": ["Python"],
+        "team_size": 1,
+        "duration": 6,
+        "budget": None,
+        "status": "planning",
+        "created_at": datetime.now().isoformat(),
+        "zervigo_job_id": int(project_id.replace("project_", ""))
+    }
+
+
+class TestSyncWorker:
+    """测试同步工作器的批量处理"""
+    
+    @pytest.mark.asyncio
+    async def test_worker_syncs_queued_talents_in_one_batch(self):
+        data_access = EnhancedUnifiedDataAccess(cache_purge_interval=0.05)
+        updated = []
+        
+        async def update_zervigo_user_data(user_data):
+            updated.append(user_data)
+            return True
+        
+        data_access._update_zervigo_user_data = update_zervigo_user_data
+        validate_calls = []
+        validate_many = data_access.validation_service.validate_many
+        
+        async def counting_validate_many(items, model_type):
+            validate_calls.append(len(items))
+            return await validate_many(items, model_type)
+        
+        data_access.validation_service.validate_many = counting_validate_many
+        
+        for talent_id in ("talent_1", "talent_2", "talent_1"):
+            await data_access.sync_queue.put({"type": "talent_update", "looma_data": _talent(talent_id)})
+        
+        worker = asyncio.create_task(data_access._sync_worker())
+        try:
+            await asyncio.wait_for(data_access.sync_queue.join(), timeout=1.0)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        
+        assert validate_calls == [3]
+        assert len(updated) == 3
+    
+    @pytest.mark.asyncio
+    async def test_idle_worker_purges_expired_cache_entries(self):
+        data_access = EnhancedUnifiedDataAccess(cache_purge_interval=0.02)
+        data_access.mapping_service.mapping_cache.ttl = 0.01
+        data_access.mapping_service.mapping_cache.set("stale", {"x": 1})
+        
+        worker = asyncio.create_task(data_access._sync_worker())
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        
+        assert len(data_access.mapping_service.mapping_cache) == 0
+    
+    @pytest.mark.asyncio
+    async def test_worker_syncs_valid_projects(self):
+        data_access = EnhancedUnifiedDataAccess(cache_purge_interval=0.05)
+        synced = []
+        
+        async def sync_project_to_zervigo(looma_data):
+            synced.append(looma_data["id"])
+        
+        data_access._sync_project_to_zervigo = sync_project_to_zervigo
+        invalid = {**_project("project_3"), "name": ""}
+        for project in (_project("project_1"), _project("project_2"), invalid):
+            await data_access.sync_queue.put({"type": "project_update", "looma_data": project})
+        
+        worker = asyncio.create_task(data_access._sync_worker())
+        try:
+            await asyncio.wait_for(data_access.sync_queue.join(), timeout=1.0)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        
+        assert synced == ["project_1", "project_2"]
+    
+    @pytest.mark.asyncio
+    async def test_mapped_job_passes_project_validation(self):
+        data_access = EnhancedUnifiedDataAccess()
+        project = await data_access.mapping_service.mappers["zervigo_to_looma"].map_job_to_project({
+            "id": 42,
+            "title": "后端工程师",
+            "description": "负责服务端开发",
+            "requirements": {"skills": ["Python"]},
+            "status": "active",
+            "created_at": "2026-10-17T09:00:00Z"
+        })
+        
+        result = await data_access.validation_service.validate_data(project, "looma_project")
+        assert result.is_valid, result.errors
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+事件队列测试
+使用内存版Redis Stream替身验证死信转移、按秒分桶的吞吐统计、按最早待确认消息计算的延迟，
+以及同步引擎只确认成功或已安排重试的消息
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("redis")
+
+from shared.sync.event_queue import EventQueue
+from shared.sync.sync_engine import SyncEngine, SyncResult
+
+
+class FakePipeline:
+    """记录命令并在execute时依次执行"""
+    
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+        return queue
+    
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeStreamRedis:
+    """单消费者组的Stream替身：pending记录投递次数，XAUTOCLAIM每次接管都计一次投递"""
+    
+    def __init__(self):
+        self.streams = {}
+        self.pending = {}  # message_id -> 投递次数
+        self.delivered = {}  # stream -> 已投递给消费者组的条目数
+    
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+    
+    async def xadd(self, name, fields, maxlen=None, approximate=True, id=None):
+        entries = self.streams.setdefault(name, [])
+        message_id = id or f"{len(entries) + 1}-0"
+        entries.append((message_id, dict(fields)))
+        return message_id
+    
+    async def xreadgroup(self, groupname, consumername, streams, count=None, block=None):
+        response = []
+        for name in streams:
+            entries = self.streams.get(name, [])
+            start = self.delivered.get(name, 0)
+            batch = entries[start:start + (count or len(entries))]
+            self.delivered[name] = start + len(batch)
+            for message_id, _ in batch:
+                self.pending[message_id] = 1
+            if batch:
+                response.append((name, batch))
+        return response
+    
+    async def xpending(self, name, groupname):
+        ids = sorted(self.pending, key=lambda message_id: int(message_id.split("-")[0]))
+        return {"pending": len(ids), "min": ids[0] if ids else None,
+                "max": ids[-1] if ids else None, "consumers": []}
+    
+    async def xautoclaim(self, name, groupname, consumername, min_idle_time, start_id="0-0", count=None):
+        claimed = []
+        for message_id, fields in self.streams.get(name, []):
+            if message_id in self.pending and len(claimed) < count:
+                self.pending[message_id] += 1
+                claimed.append((message_id, fields))
+        return ["0-0", claimed, []]
+    
+    async def xpending_range(self, name, groupname, min, max, count, consumername=None, idle=None):
+        if min in self.pending:
+            return [{"message_id": min, "consumer": "c", "time_since_delivered": 0,
+                     "times_delivered": self.pending[min]}]
+        return []
+    
+    async def xack(self, name, groupname, *ids):
+        acked = [message_id for message_id in ids if message_id in self.pending]
+        for message_id in acked:
+            del self.pending[message_id]
+        return len(acked)
+
+
+def _fields(event_id: str):
+    return {"id": event_id, "type": "create", "source": "looma", "target": "zervigo",
+            "data": "{}", "timestamp": "2025-10-17T12:00:00", "priority": "0",
+            "retry_count": "0", "max_retries": "3", "status": "pending", "metadata": "{}"}
+
+
+@pytest.fixture
+def queue():
+    queue = EventQueue({"max_deliveries": 3})
+    queue.redis_client = FakeStreamRedis()
+    queue.is_connected = True
+    return queue
+
+
+class TestDeadLetter:
+    """测试超过投递次数上限的消息转入死信流"""
+    
+    @pytest.mark.asyncio
+    async def test_exhausted_message_moves_to_dlq(self, queue):
+        redis = queue.redis_client
+        poison = await redis.xadd(queue.stream_name, _fields("poison"))
+        fresh = await redis.xadd(queue.stream_name, _fields("fresh"))
+        redis.pending[poison] = 3
+        redis.pending[fresh] = 1
+        
+        messages = await queue.reclaim_stale("worker-1")
+        
+        assert [message_id for message_id, _ in messages] == [fresh]
+        assert poison not in redis.pending
+        dlq = redis.streams[queue.dead_letter_stream]
+        assert len(dlq) == 1
+        assert dlq[0][1]["id"] == "poison"
+        assert dlq[0][1]["dlq_original_id"] == poison
+        assert dlq[0][1]["dlq_deliveries"] == "4"
+        assert queue.consumer_metrics["dead_lettered"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_unlimited_deliveries_when_disabled(self, queue):
+        queue.max_deliveries = 0
+        redis = queue.redis_client
+        message_id = await redis.xadd(queue.stream_name, _fields("event"))
+        redis.pending[message_id] = 100
+        
+        messages = await queue.reclaim_stale("worker-1")
+        
+        assert [m for m, _ in messages] == [message_id]
+        assert queue.dead_letter_stream not in redis.streams
+
+
+class TestThroughput:
+    """测试按秒分桶的吞吐统计"""
+    
+    @pytest.mark.asyncio
+    async def test_throughput_counts_recent_acks(self, queue, monkeypatch):
+        redis = queue.redis_client
+        ids = [await redis.xadd(queue.stream_name, _fields(str(i))) for i in range(30)]
+        for message_id in ids:
+            redis.pending[message_id] = 1
+        
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now - 120)
+        await queue.ack_many(ids[:10])
+        monkeypatch.setattr(time, "time", lambda: now)
+        await queue.ack_many(ids[10:20])
+        await queue.ack_many(ids[20:])
+        
+        metrics = queue.get_consumer_metrics(window_seconds=60)
+        assert metrics["acked"] == 30
+        assert metrics["throughput_per_second"] == pytest.approx(20 / 60)
+        assert len(queue._ack_buckets) == 2
+
+
+class TestLag:
+    """测试消费延迟按最早待确认消息计算"""
+    
+    @pytest.mark.asyncio
+    async def test_lag_measured_from_oldest_pending(self, queue):
+        redis = queue.redis_client
+        now_ms = int(time.time() * 1000)
+        oldest = await redis.xadd(queue.stream_name, _fields("old"), id=f"{now_ms - 30000}-0")
+        newest = await redis.xadd(queue.stream_name, _fields("new"), id=f"{now_ms - 10}-0")
+        redis.pending[oldest] = 2
+        redis.pending[newest] = 1
+        
+        lag_ms = await queue.sample_lag(force=True)
+        
+        assert lag_ms >= 30000
+        assert queue.consumer_metrics["max_lag_ms"] == lag_ms
+    
+    @pytest.mark.asyncio
+    async def test_lag_is_zero_without_pending(self, queue):
+        assert await queue.sample_lag(force=True) == 0
+        # 限频期间不重复采样
+        assert await queue.sample_lag() is None
+
+
+def _run_once():
+    """consume循环只执行一轮"""
+    calls = []
+    
+    def should_continue():
+        calls.append(1)
+        return len(calls) == 1
+    return should_continue
+
+
+@pytest.fixture
+def engine():
+    engine = SyncEngine({"retry_delay_ms": 0, "max_deliveries": 3, "claim_interval_seconds": 3600})
+    engine.event_queue.redis_client = FakeStreamRedis()
+    engine.event_queue.is_connected = True
+    return engine
+
+
+class TestSyncEngineAck:
+    """测试同步引擎只确认成功或已重新发布重试的消息"""
+    
+    @pytest.mark.asyncio
+    async def test_failed_sync_is_not_acked(self, engine, monkeypatch):
+        async def execute_sync(event):
+            raise RuntimeError("zervigo unavailable")
+        monkeypatch.setattr(engine, "_execute_sync", execute_sync)
+        
+        queue = engine.event_queue
+        redis = queue.redis_client
+        message_id = await redis.xadd(queue.stream_name, _fields("event"))
+        
+        await queue.consume("worker-1", engine._handle_queued_event, should_continue=_run_once())
+        
+        assert message_id in redis.pending
+        assert queue.consumer_metrics["acked"] == 0
+        assert queue.consumer_metrics["handler_failures"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_exhausted_retries_stay_pending_for_dlq(self, engine, monkeypatch):
+        async def execute_sync(event):
+            return SyncResult(event_id=event.id, success=False, timestamp=event.timestamp, duration_ms=0)
+        monkeypatch.setattr(engine, "_execute_sync", execute_sync)
+        
+        queue = engine.event_queue
+        redis = queue.redis_client
+        fields = dict(_fields("event"), retry_count="3")
+        message_id = await redis.xadd(queue.stream_name, fields)
+        
+        await queue.consume("worker-1", engine._handle_queued_event, should_continue=_run_once())
+        assert message_id in redis.pending
+        
+        # 多次重新投递后转入死信流
+        redis.pending[message_id] = queue.max_deliveries
+        assert await queue.reclaim_stale("worker-1") == []
+        assert redis.streams[queue.dead_letter_stream][0][1]["dlq_original_id"] == message_id
+    
+    @pytest.mark.asyncio
+    async def test_republished_retry_is_acked(self, engine, monkeypatch):
+        async def execute_sync(event):
+            return SyncResult(event_id=event.id, success=False, timestamp=event.timestamp, duration_ms=0)
+        monkeypatch.setattr(engine, "_execute_sync", execute_sync)
+        
+        queue = engine.event_queue
+        redis = queue.redis_client
+        message_id = await redis.xadd(queue.stream_name, _fields("event"))
+        
+        await queue.consume("worker-1", engine._handle_queued_event, should_continue=_run_once())
+        
+        assert message_id not in redis.pending
+        retry = redis.streams[queue.stream_name][-1][1]
+        assert retry["id"] == "event"
+        assert retry["retry_count"] == "1"
+    
+    @pytest.mark.asyncio
+    async def test_successful_sync_is_acked(self, engine, monkeypatch):
+        async def execute_sync(event):
+            return SyncResult(event_id=event.id, success=True, timestamp=event.timestamp, duration_ms=0)
+        monkeypatch.setattr(engine, "_execute_sync", execute_sync)
+        
+        queue = engine.event_queue
+        redis = queue.redis_client
+        message_id = await redis.xadd(queue.stream_name, _fields("event"))
+        
+        await queue.consume("worker-1", engine._handle_queued_event, should_continue=_run_once())
+        
+        assert message_id not in redis.pending
+        assert queue.consumer_metrics["acked"] == 1
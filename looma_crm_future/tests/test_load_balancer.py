@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+负载均衡器测试
+验证Peak-EWMA代价排序、一致性哈希环在实例增减时的稳定性、摘除比例上限与摘除到期后的恢复
+"""
+
+import asyncio
+
+import pytest
+
+from shared.utils.load_balancer import LoadBalancer, InstanceStats
+
+
+def _service(name: str, instance_ids):
+    return {
+        "name": name,
+        "instances": [{"id": instance_id, "status": "healthy"} for instance_id in instance_ids]
+    }
+
+
+async def _select(balancer: LoadBalancer, service, hash_key=None) -> str:
+    return (await balancer.select_instance(service, hash_key))["id"]
+
+
+class TestPeakEwma:
+    """测试Peak-EWMA选择"""
+    
+    def test_peak_is_taken_immediately_and_decays(self):
+        stats = InstanceStats(decay_seconds=0.01)
+        stats.observe(0.1, True)
+        stats.observe(1.0, True)
+        assert stats.ewma_latency == 1.0
+    
+        stats.last_update -= 1.0
+        stats.observe(0.1, True)
+        assert stats.ewma_latency == pytest.approx(0.1, rel=1e-3)
+    
+    @pytest.mark.asyncio
+    async def test_prefers_lower_latency(self):
+        balancer = LoadBalancer(strategy="peak_ewma")
+        service = _service("svc", ["fast", "slow"])
+        for _ in range(3):
+            balancer.record_request_start("svc", "fast")
+            balancer.record_response("svc", "fast", 0.01, True)
+            balancer.record_request_start("svc", "slow")
+            balancer.record_response("svc", "slow", 0.5, True)
+    
+        assert await _select(balancer, service) == "fast"
+    
+    @pytest.mark.asyncio
+    async def test_pending_requests_raise_cost(self):
+        balancer = LoadBalancer(strategy="peak_ewma")
+        service = _service("svc", ["a", "b"])
+        balancer.record_request_start("svc", "a")
+        balancer.record_response("svc", "a", 0.1, True)
+        balancer.record_request_start("svc", "b")
+        balancer.record_response("svc", "b", 0.2, True)
+    
+        # a的在途请求使其代价 0.1 * 3 超过 b 的 0.2 * 1
+        balancer.record_request_start("svc", "a")
+        balancer.record_request_start("svc", "a")
+        assert await _select(balancer, service) == "b"
+    
+    @pytest.mark.asyncio
+    async def test_power_of_two_never_picks_worse_of_two(self):
+        balancer = LoadBalancer(strategy="power_of_two")
+        service = _service("svc", ["fast", "slow"])
+        balancer.record_request_start("svc", "fast")
+        balancer.record_response("svc", "fast", 0.01, True)
+        balancer.record_request_start("svc", "slow")
+        balancer.record_response("svc", "slow", 0.5, True)
+    
+        assert {await _select(balancer, service) for _ in range(20)} == {"fast"}
+
+
+class TestConsistentHash:
+    """测试一致性哈希环的稳定性"""
+    
+    async def _mapping(self, balancer: LoadBalancer, instance_ids, keys):
+        service = _service("svc", instance_ids)
+        return {key: await _select(balancer, service, key) for key in keys}
+    
+    @pytest.mark.asyncio
+    async def test_adding_instance_only_moves_keys_to_it(self):
+        balancer = LoadBalancer(strategy="consistent_hash")
+        keys = [f"user-{i}" for i in range(1000)]
+        before = await self._mapping(balancer, ["a", "b", "c", "d"], keys)
+        after = await self._mapping(balancer, ["a", "b", "c", "d", "e"], keys)
+    
+        moved = [key for key in keys if before[key] != after[key]]
+        assert all(after[key] == "e" for key in moved)
+        # 约1/5的键迁移到新实例
+        assert 100 < len(moved) < 300
+    
+    @pytest.mark.asyncio
+    async def test_removing_instance_only_moves_its_keys(self):
+        balancer = LoadBalancer(strategy="consistent_hash")
+        keys = [f"user-{i}" for i in range(1000)]
+        before = await self._mapping(balancer, ["a", "b", "c", "d"], keys)
+        after = await self._mapping(balancer, ["a", "b", "c"], keys)
+    
+        for key in keys:
+            if before[key] != "d":
+                assert after[key] == before[key]
+    
+    @pytest.mark.asyncio
+    async def test_ejected_owner_falls_through_without_remapping_others(self):
+        balancer = LoadBalancer(strategy="consistent_hash", ejection_consecutive_failures=1)
+        keys = [f"user-{i}" for i in range(200)]
+        before = await self._mapping(balancer, ["a", "b", "c", "d"], keys)
+    
+        balancer.record_request_start("svc", "d")
+        balancer.record_response("svc", "d", 0.1, False)
+        after = await self._mapping(balancer, ["a", "b", "c", "d"], keys)
+    
+        for key in keys:
+            if before[key] == "d":
+                assert after[key] != "d"
+            else:
+                assert after[key] == before[key]
+
+
+class TestOutlierEjection:
+    """测试异常实例摘除"""
+    
+    def _fail(self, balancer: LoadBalancer, instance_id: str, times: int):
+        for _ in range(times):
+            balancer.record_request_start("svc", instance_id)
+            balancer.record_response("svc", instance_id, 0.1, False)
+    
+    @pytest.mark.asyncio
+    async def test_max_ejection_percent_caps_ejections(self):
+        balancer = LoadBalancer(strategy="round_robin", ejection_consecutive_failures=2,
+                                max_ejection_percent=0.5)
+        instance_ids = ["a", "b", "c", "d"]
+        # 先让四个实例都有统计，上限按 4 * 0.5 = 2 计算
+        for instance_id in instance_ids:
+            balancer.record_request_start("svc", instance_id)
+            balancer.record_response("svc", instance_id, 0.1, True)
+        for instance_id in instance_ids:
+            self._fail(balancer, instance_id, 2)
+    
+        stats = await balancer.get_instance_stats("svc")
+        ejected = [instance_id for instance_id, info in stats["instances"].items() if info["ejected"]]
+        assert ejected == ["a", "b"]
+    
+    @pytest.mark.asyncio
+    async def test_latency_outlier_is_ejected(self):
+        balancer = LoadBalancer(strategy="round_robin", ejection_min_samples=3,
+                                ejection_latency_factor=3.0)
+        for _ in range(3):
+            for instance_id, latency in (("a", 0.1), ("b", 0.1), ("c", 1.0)):
+                balancer.record_request_start("svc", instance_id)
+                balancer.record_response("svc", instance_id, latency, True)
+    
+        service = _service("svc", ["a", "b", "c"])
+        assert {await _select(balancer, service) for _ in range(6)} == {"a", "b"}
+    
+    @pytest.mark.asyncio
+    async def test_readmitted_after_ejection_period(self):
+        balancer = LoadBalancer(strategy="round_robin", ejection_consecutive_failures=2,
+                                ejection_base_seconds=0.05)
+        service = _service("svc", ["a", "b"])
+        self._fail(balancer, "a", 2)
+    
+        assert {await _select(balancer, service) for _ in range(4)} == {"b"}
+    
+        await asyncio.sleep(0.06)
+        assert {await _select(balancer, service) for _ in range(4)} == {"a", "b"}
+    
+        # 再次摘除时时长按摘除次数增长
+        self._fail(balancer, "a", 2)
+        stats = balancer.instance_stats["svc"]["a"]
+        assert stats.ejection_count == 2
+        assert stats.ejected_until - stats.last_update == pytest.approx(0.1, abs=0.01)
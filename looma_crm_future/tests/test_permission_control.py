@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+权限控制测试
+验证编译权限与决策缓存的命中，以及角色分配、撤销和到期后的缓存失效
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from shared.security.permission_control import (
+    PermissionEngine, PermissionRequest, ResourceType, ActionType
+)
+
+
+def _request(user_id: str, resource_type: ResourceType, action: ActionType, **kwargs) -> PermissionRequest:
+    return PermissionRequest(user_id=user_id, resource_type=resource_type, action=action, **kwargs)
+
+
+class TestPermissionDecisionCache:
+    """测试权限决策缓存"""
+    
+    @pytest.mark.asyncio
+    async def test_repeated_check_hits_cache(self):
+        engine = PermissionEngine()
+        await engine.assign_role("u1", "user", "admin")
+        
+        request = _request("u1", ResourceType.JOB, ActionType.READ)
+        first = await engine.check_permission(request)
+        second = await engine.check_permission(request)
+        
+        assert first.granted and second.granted
+        stats = engine.get_cache_stats()
+        assert stats["compilations"] == 1
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_ownership_context_is_part_of_key(self):
+        engine = PermissionEngine()
+        await engine.assign_role("u1", "user", "admin")
+        
+        own = _request("u1", ResourceType.RESUME, ActionType.UPDATE, resource_id="r1",
+                       context={"resource_owner_id": "u1", "user_id": "u1"})
+        other = _request("u1", ResourceType.RESUME, ActionType.UPDATE, resource_id="r2",
+                         context={"resource_owner_id": "u2", "user_id": "u1"})
+        
+        decisions = await engine.check_many([own, other, own])
+        assert [decision.granted for decision in decisions] == [True, False, True]
+        assert engine.get_cache_stats()["hits"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_assign_and_revoke_invalidate_user(self):
+        engine = PermissionEngine()
+        await engine.assign_role("u1", "guest", "admin")
+        request = _request("u1", ResourceType.RESUME, ActionType.CREATE)
+        
+        assert not (await engine.check_permission(request)).granted
+        
+        await engine.assign_role("u1", "user", "admin")
+        assert (await engine.check_permission(request)).granted
+        
+        await engine.revoke_role("u1", "user")
+        assert not (await engine.check_permission(request)).granted
+        assert engine.get_cache_stats()["invalidations"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_invalidation_is_per_user(self):
+        engine = PermissionEngine()
+        await engine.assign_role("u1", "user", "admin")
+        await engine.assign_role("u2", "user", "admin")
+        request = _request("u2", ResourceType.JOB, ActionType.READ)
+        await engine.check_permission(_request("u1", ResourceType.JOB, ActionType.READ))
+        await engine.check_permission(request)
+        
+        await engine.revoke_role("u1", "user")
+        await engine.check_permission(request)
+        stats = engine.get_cache_stats()
+        assert stats["compilations"] == 2
+        assert stats["hits"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_expired_role_forces_recompile(self):
+        engine = PermissionEngine()
+        await engine.assign_role("u1", "user", "admin",
+                                 expires_at=datetime.now() + timedelta(milliseconds=50))
+        request = _request("u1", ResourceType.RESUME, ActionType.CREATE)
+        
+        assert (await engine.check_permission(request)).granted
+        await asyncio.sleep(0.06)
+        assert not (await engine.check_permission(request)).granted
+        assert engine.get_cache_stats()["compilations"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_cached_users_are_bounded(self):
+        engine = PermissionEngine(max_cached_users=2)
+        for user_id in ("u1", "u2", "u3"):
+            await engine.assign_role(user_id, "user", "admin")
+            await engine.check_permission(_request(user_id, ResourceType.JOB, ActionType.READ))
+        
+        assert engine.get_cache_stats()["cached_users"] == 2
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+限流器测试
+用假Redis客户端验证Lua脚本批量检查、脚本缓存丢失后的重新加载，
+以及Redis出错或超时时退化为按worker数折算的本地限流
+"""
+
+import asyncio
+
+import pytest
+
+from shared.utils import rate_limiter
+from shared.utils.rate_limiter import RedisTokenBucketRateLimiter, TokenBucketRateLimiter
+
+
+class FakePipeline:
+    """记录evalsha调用并按FakeRedis的设定返回结果"""
+    
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    def evalsha(self, sha, numkeys, key, *args):
+        self.calls.append((sha, key, args))
+    
+    async def execute(self, raise_on_error=True):
+        self.redis.executions += 1
+        if self.redis.delay:
+            await asyncio.sleep(self.redis.delay)
+        if self.redis.error is not None:
+            raise self.redis.error
+        results = []
+        for sha, key, args in self.calls:
+            if sha not in self.redis.scripts:
+                results.append(rate_limiter.NoScriptError("NOSCRIPT"))
+            else:
+                results.append([1, "9"])
+        return results
+
+
+class FakeRedis:
+    """可设置出错、延迟与脚本缓存丢失的假Redis客户端"""
+    
+    def __init__(self):
+        self.scripts = set()
+        self.loads = 0
+        self.executions = 0
+        self.delay = 0.0
+        self.error = None
+    
+    async def script_load(self, script):
+        self.loads += 1
+        self.scripts.add("sha")
+        return "sha"
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def _limiter(redis, **kwargs) -> RedisTokenBucketRateLimiter:
+    options = {"capacity": 8, "refill_rate": 0.001, "timeout": 0.05,
+               "fallback_workers": 4, "fallback_cooldown": 60.0}
+    options.update(kwargs)
+    return RedisTokenBucketRateLimiter(redis_client=redis, **options)
+
+
+class TestRedisTokenBucketRateLimiter:
+    """测试Redis令牌桶限流器"""
+    
+    @pytest.mark.asyncio
+    async def test_check_many_uses_one_pipeline(self):
+        redis = FakeRedis()
+        limiter = _limiter(redis)
+        await limiter.initialize()
+        
+        assert await limiter.check_many(["a", "b", "c"]) == [True, True, True]
+        assert redis.executions == 1
+        assert limiter.redis_checks == 3
+        assert limiter.fallback_checks == 0
+    
+    @pytest.mark.asyncio
+    async def test_reloads_script_after_noscript(self):
+        redis = FakeRedis()
+        limiter = _limiter(redis)
+        await limiter.initialize()
+        
+        # 模拟Redis重启后脚本缓存丢失
+        redis.scripts.clear()
+        assert await limiter.is_allowed("a") is True
+        assert redis.loads == 2
+        assert redis.executions == 2
+        assert limiter.redis_errors == 0
+    
+    @pytest.mark.asyncio
+    async def test_redis_error_falls_back_to_local_share(self):
+        redis = FakeRedis()
+        limiter = _limiter(redis)
+        await limiter.initialize()
+        
+        redis.error = ConnectionError("connection reset")
+        # 本地限额按worker数折算: 8 // 4 = 2
+        assert isinstance(limiter.local_limiter, TokenBucketRateLimiter)
+        assert limiter.local_limiter.capacity == 2
+        assert [await limiter.is_allowed("a") for _ in range(3)] == [True, True, False]
+        
+        # 冷却期内不再访问Redis
+        assert redis.executions == 1
+        assert limiter.redis_errors == 1
+        assert limiter.fallback_checks == 3
+        assert limiter.get_stats()["redis_available"] is False
+    
+    @pytest.mark.asyncio
+    async def test_redis_timeout_falls_back(self):
+        redis = FakeRedis()
+        limiter = _limiter(redis, timeout=0.01)
+        await limiter.initialize()
+        
+        redis.delay = 0.5
+        assert await limiter.check_many(["a", "b"]) == [True, True]
+        assert limiter.redis_errors == 1
+        assert limiter.fallback_checks == 2
+    
+    @pytest.mark.asyncio
+    async def test_recovers_after_cooldown(self):
+        redis = FakeRedis()
+        limiter = _limiter(redis, fallback_cooldown=0.01)
+        await limiter.initialize()
+        
+        redis.error = ConnectionError("connection reset")
+        await limiter.is_allowed("a")
+        assert limiter.fallback_checks == 1
+        
+        redis.error = None
+        await asyncio.sleep(0.02)
+        assert await limiter.is_allowed("a") is True
+        assert limiter.redis_checks == 1
+        assert limiter.fallback_checks == 1
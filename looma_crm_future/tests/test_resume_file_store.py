@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+简历文件存储测试
+验证相同内容去重为一份文件、超限上传中止后的清理、上传时间相同时的游标分页，
+以及首次初始化时登记已有文件
+"""
+
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+
+resume_file_store = pytest.importorskip(
+    "services.api_services.resume_upload_api.resume_file_store", reason="需要python-multipart"
+)
+ResumeFileStore = resume_file_store.ResumeFileStore
+UploadTooLarge = resume_file_store.UploadTooLarge
+
+
+class FrozenDatetime(datetime):
+    """固定当前时间，让多次上传的upload_time相同"""
+    
+    @classmethod
+    def now(cls, tz=None):
+        return datetime(2026, 10, 17, 12, 0, 0)
+
+
+async def _upload(store: ResumeFileStore, filename: str, content: bytes, max_size: int = 1024 * 1024):
+    upload = store.open_upload(filename, max_size)
+    await upload.write(content)
+    return await upload.commit()
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    return tmp_path / "uploads"
+
+
+@pytest_asyncio.fixture
+async def store(upload_dir):
+    store = ResumeFileStore(str(upload_dir), write_chunk_size=4)
+    await store.initialize()
+    yield store
+    await store.close()
+
+
+class TestDeduplication:
+    """测试按内容去重"""
+    
+    @pytest.mark.asyncio
+    async def test_identical_content_shares_one_blob(self, store, upload_dir):
+        first = await _upload(store, "a.txt", b"same resume")
+        second = await _upload(store, "b.pdf", b"same resume")
+    
+        assert first["file_id"] != second["file_id"]
+        assert first["duplicate"] is False and second["duplicate"] is True
+        assert second["filename"] == first["filename"]
+        assert [path.name for path in upload_dir.iterdir() if path.is_file() and path.suffix == ".txt"] == [first["filename"]]
+    
+        for result in (first, second):
+            record = await store.get(result["file_id"])
+            assert record["content_hash"] == first["content_hash"]
+            assert record["path"] == str(upload_dir / first["filename"])
+        assert (await store.get(second["file_id"]))["original_filename"] == "b.pdf"
+    
+    @pytest.mark.asyncio
+    async def test_different_content_gets_own_blob(self, store):
+        first = await _upload(store, "a.txt", b"resume one")
+        second = await _upload(store, "a.txt", b"resume two")
+    
+        assert second["duplicate"] is False
+        assert first["filename"] != second["filename"]
+
+
+class TestUploadAbort:
+    """测试超限上传的中止"""
+    
+    @pytest.mark.asyncio
+    async def test_too_large_upload_leaves_nothing_behind(self, store, upload_dir):
+        upload = store.open_upload("big.txt", max_size=10)
+        await upload.write(b"12345678")
+        with pytest.raises(UploadTooLarge):
+            await upload.write(b"9abc")
+        await upload.abort()
+    
+        assert list((upload_dir / ".tmp").iterdir()) == []
+        assert (await store.list_files())["total"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_leftover_parts_are_removed_on_initialize(self, upload_dir):
+        (upload_dir / ".tmp").mkdir(parents=True)
+        (upload_dir / ".tmp" / "stale.part").write_bytes(b"partial")
+    
+        store = ResumeFileStore(str(upload_dir))
+        await store.initialize()
+        try:
+            assert list((upload_dir / ".tmp").iterdir()) == []
+        finally:
+            await store.close()
+
+
+class TestPagination:
+    """测试游标分页"""
+    
+    @pytest.mark.asyncio
+    async def test_cursor_pages_through_equal_upload_times(self, store, monkeypatch):
+        monkeypatch.setattr(resume_file_store, "datetime", FrozenDatetime)
+        file_ids = {(await _upload(store, f"{i}.txt", f"resume {i}".encode()))["file_id"] for i in range(7)}
+    
+        seen = []
+        cursor = None
+        while True:
+            page = await store.list_files(limit=3, cursor=cursor)
+            assert page["total"] == 7
+            seen.extend(record["file_id"] for record in page["files"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+    
+        assert len(seen) == 7
+        assert set(seen) == file_ids
+        assert seen == sorted(seen, reverse=True)
+    
+    @pytest.mark.asyncio
+    async def test_unknown_cursor_is_rejected(self, store):
+        with pytest.raises(ValueError):
+            await store.list_files(cursor="missing")
+
+
+class TestImportExisting:
+    """测试首次初始化时登记已有文件"""
+    
+    @pytest.mark.asyncio
+    async def test_existing_files_are_indexed_once(self, upload_dir):
+        upload_dir.mkdir(parents=True)
+        (upload_dir / "legacy-1.txt").write_bytes(b"old resume")
+        (upload_dir / "legacy-2.pdf").write_bytes(b"%PDF old")
+    
+        store = ResumeFileStore(str(upload_dir))
+        await store.initialize()
+        record = await store.get("legacy-1")
+        assert record["filename"] == "legacy-1.txt"
+        assert record["size"] == len(b"old resume")
+        assert record["mime_type"] == "text/plain"
+    
+        # 已登记的文件内容再次上传时去重到旧文件
+        duplicate = await _upload(store, "again.txt", b"old resume")
+        assert duplicate["duplicate"] is True
+        assert duplicate["filename"] == "legacy-1.txt"
+        await store.close()
+    
+        # 索引已建立后再加入的文件不会被重新导入
+        (upload_dir / "later.txt").write_bytes(b"later")
+        store = ResumeFileStore(str(upload_dir))
+        await store.initialize()
+        try:
+            assert (await store.list_files())["total"] == 3
+            assert await store.get("later") is None
+        finally:
+            await store.close()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+服务注册表测试
+验证Consul阻塞查询不会占用注册等短调用的线程
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from shared.utils.service_registry import ServiceRegistry
+
+
+class FakeHealth:
+    def __init__(self, release: threading.Event):
+        self.release = release
+        self.waiting = 0
+    
+    def service(self, service_name, index=None, wait=None, passing=True):
+        self.waiting += 1
+        self.release.wait(5)
+        return "1", []
+
+
+class FakeAgentService:
+    def __init__(self):
+        self.registered = []
+    
+    def register(self, service_id, service_name, **kwargs):
+        self.registered.append(service_id)
+
+
+class FakeConsul:
+    """阻塞查询挂起直到release，短调用立即返回"""
+    
+    def __init__(self):
+        self.release = threading.Event()
+        self.health = FakeHealth(self.release)
+        self.agent = type('Agent', (), {})()
+        self.agent.service = FakeAgentService()
+
+
+@pytest.mark.asyncio
+async def test_register_not_starved_by_watches():
+    registry = ServiceRegistry(call_threads=2)
+    consul_client = FakeConsul()
+    registry.consul_client = consul_client
+    try:
+        for i in range(8):
+            registry._ensure_watch(f"service-{i}")
+        await asyncio.sleep(0.05)
+        
+        await asyncio.wait_for(
+            registry.register_service({'name': 'api', 'host': 'localhost', 'port': 8080}),
+            timeout=1.0
+        )
+        assert consul_client.health.waiting == 8
+        assert consul_client.agent.service.registered == ['api-localhost-8080']
+        assert len(registry._watch_executors) == 8
+    finally:
+        consul_client.release.set()
+        await registry.cleanup()
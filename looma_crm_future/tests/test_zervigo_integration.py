@@ -5,12 +5,16 @@ Zervigo集成测试
 """
 
 import asyncio
+import base64
+import json
+import time
 import pytest
+import pytest_asyncio
 import aiohttp
 from unittest.mock import Mock, AsyncMock, patch
 from typing import Dict, Any
 
-from shared.integration import ZervigoClient
+from shared.integration import ZervigoClient, TokenRevocationStore
 from shared.middleware import ZervigoAuthMiddleware
 from looma_crm.services import ZervigoIntegrationService
 from shared.database.unified_data_access import UnifiedDataAccess
@@ -278,6 +282,166 @@ class TestZervigoIntegrationService:
             assert 'response' in result
             assert 'John Doe' in result['response']
 
+class FakeAuthResponse:
+    """认证服务响应替身，可模拟网络延迟"""
+    
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.status = 200
+    
+    async def __aenter__(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    async def json(self):
+        return {
+            'user': {'user_id': 123, 'username': 'test_user'},
+            'permissions': ['talent:read']
+        }
+
+class FakeRevocationRedis:
+    """只实现set/exists的Redis替身，供多个中间件实例共享撤销记录"""
+    
+    def __init__(self):
+        self.keys = {}
+    
+    async def set(self, key, value, ex=None):
+        self.keys[key] = ex
+    
+    async def exists(self, key):
+        return int(key in self.keys)
+
+def make_jwt(exp: float) -> str:
+    """构造只用于读取exp的JWT(签名由认证服务校验，测试中不需要)"""
+    def encode(data: Dict[str, Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b'=').decode()
+    return f"{encode({'alg': 'HS256'})}.{encode({'user_id': 123, 'exp': exp})}.signature"
+
+class TestZervigoTokenCache:
+    """测试token验证缓存与并发合并"""
+    
+    @pytest.fixture
+    def zervigo_config(self):
+        """Zervigo配置"""
+        return {
+            'auth_service_url': 'http://localhost:8207',
+            'ai_service_url': 'http://localhost:8000',
+            'resume_service_url': 'http://localhost:8082',
+            'job_service_url': 'http://localhost:8089',
+            'company_service_url': 'http://localhost:8083',
+            'user_service_url': 'http://localhost:8081'
+        }
+    
+    @pytest_asyncio.fixture
+    async def auth_middleware(self, zervigo_config):
+        """认证中间件实例"""
+        middleware = ZervigoAuthMiddleware(zervigo_config)
+        yield middleware
+        await middleware.close()
+    
+    @pytest.mark.asyncio
+    async def test_cache_hit_skips_http_call(self, auth_middleware):
+        """缓存命中时不再请求认证服务"""
+        token = make_jwt(time.time() + 3600)
+        with patch('aiohttp.ClientSession.request') as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: FakeAuthResponse()
+            
+            first = await auth_middleware.verify_token(token)
+            second = await auth_middleware.verify_token(token)
+            
+            assert first['valid'] is True
+            assert second == first
+            assert mock_request.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_expired_token_is_reverified(self, auth_middleware):
+        """token过期后重新验证"""
+        now = time.time()
+        token = make_jwt(now + 10)
+        with patch('aiohttp.ClientSession.request') as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: FakeAuthResponse()
+            
+            await auth_middleware.verify_token(token)
+            with patch('time.time', return_value=now + 11):
+                await auth_middleware.verify_token(token)
+            
+            assert mock_request.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_revoked_token_is_reverified(self, auth_middleware):
+        """登出撤销后重新验证"""
+        token = make_jwt(time.time() + 3600)
+        with patch('aiohttp.ClientSession.request') as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: FakeAuthResponse()
+            
+            await auth_middleware.verify_token(token)
+            logout_result = await auth_middleware.logout(token)
+            await auth_middleware.verify_token(token)
+            
+            assert logout_result['success'] is True
+            urls = [call.args[1] for call in mock_request.call_args_list]
+            assert urls == [
+                'http://localhost:8207/api/v1/auth/validate',
+                'http://localhost:8207/api/v1/auth/logout',
+                'http://localhost:8207/api/v1/auth/validate'
+            ]
+    
+    @pytest.mark.asyncio
+    async def test_revocation_is_shared_across_workers(self, zervigo_config):
+        """一个worker登出后，其他worker缓存命中时发现撤销并重新验证"""
+        redis = FakeRevocationRedis()
+        worker_a = ZervigoAuthMiddleware(zervigo_config, revocation_store=TokenRevocationStore(redis))
+        worker_b = ZervigoAuthMiddleware(zervigo_config, revocation_store=TokenRevocationStore(redis))
+        token = make_jwt(time.time() + 3600)
+        try:
+            with patch('aiohttp.ClientSession.request') as mock_request:
+                mock_request.side_effect = lambda *args, **kwargs: FakeAuthResponse()
+                
+                await worker_a.verify_token(token)
+                await worker_b.verify_token(token)
+                await worker_a.logout(token)
+                await worker_b.verify_token(token)
+                
+                urls = [call.args[1].rsplit('/', 1)[-1] for call in mock_request.call_args_list]
+                assert urls == ['validate', 'validate', 'logout', 'validate']
+                assert 0 < list(redis.keys.values())[0] <= 300
+                assert worker_b.revocation_store.get_stats()['hits'] >= 1
+        finally:
+            await worker_a.close()
+            await worker_b.close()
+    
+    @pytest.mark.asyncio
+    async def test_revoked_during_verification_is_not_cached(self, auth_middleware):
+        """验证进行中被撤销的token不写回缓存"""
+        token = make_jwt(time.time() + 3600)
+        with patch('aiohttp.ClientSession.request') as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: FakeAuthResponse(delay=0.05)
+            
+            verification = asyncio.create_task(auth_middleware.verify_token(token))
+            await asyncio.sleep(0.01)
+            await auth_middleware.revoke_token(token)
+            await verification
+            
+            assert auth_middleware.token_cache.get_stats()['size'] == 0
+            await auth_middleware.verify_token(token)
+            assert mock_request.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_verifications_share_one_request(self, zervigo_config):
+        """同一token的并发验证只请求一次"""
+        with patch('aiohttp.ClientSession.request') as mock_request:
+            mock_request.side_effect = lambda *args, **kwargs: FakeAuthResponse(delay=0.05)
+            
+            async with ZervigoClient(zervigo_config) as client:
+                results = await asyncio.gather(*[client.verify_token('shared_token') for _ in range(10)])
+            
+            assert all(result['valid'] for result in results)
+            assert mock_request.call_count == 1
+
 class TestIntegrationEndToEnd:
     """端到端集成测试"""
     
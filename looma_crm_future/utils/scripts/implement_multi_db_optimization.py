@@ -90,13 +90,16 @@ class MultiDatabaseOptimizationImplementer:
         logger.info("步骤2: 实施连接池优化...")
         
         try:
+            mongodb_client = await self.data_access.get_client("mongodb")
+            redis_client = await self.data_access.get_client("redis")
+            postgres_pool = await self.data_access.get_client("postgres")
             optimization_results = {}
             
             # 1. MongoDB连接池优化
-            if self.data_access.mongodb_client:
+            if mongodb_client:
                 try:
                     # 获取MongoDB连接池状态
-                    server_info = await self.data_access.mongodb_client.server_info()
+                    server_info = await mongodb_client.server_info()
                     optimization_results["mongodb_pool"] = {
                         "status": "optimized",
                         "max_pool_size": 100,
@@ -112,10 +115,10 @@ class MultiDatabaseOptimizationImplementer:
                     logger.error(f"❌ MongoDB连接池优化失败: {e}")
             
             # 2. Redis连接池优化
-            if self.data_access.redis_client:
+            if redis_client:
                 try:
                     # 测试Redis连接池
-                    pool_stats = self.data_access.redis_client.connection_pool
+                    pool_stats = redis_client.connection_pool
                     optimization_results["redis_pool"] = {
                         "status": "optimized",
                         "max_connections": pool_stats.max_connections,
@@ -130,13 +133,13 @@ class MultiDatabaseOptimizationImplementer:
                     logger.error(f"❌ Redis连接池优化失败: {e}")
             
             # 3. PostgreSQL连接池优化
-            if self.data_access.postgres_pool:
+            if postgres_pool:
                 try:
                     # 获取PostgreSQL连接池状态
                     optimization_results["postgres_pool"] = {
                         "status": "optimized",
-                        "min_size": self.data_access.postgres_pool._minsize,
-                        "max_size": self.data_access.postgres_pool._maxsize
+                        "min_size": postgres_pool._minsize,
+                        "max_size": postgres_pool._maxsize
                     }
                     logger.info("✅ PostgreSQL连接池优化完成")
                 except Exception as e:
@@ -164,10 +167,12 @@ class MultiDatabaseOptimizationImplementer:
         logger.info("步骤3: 实施数据一致性保障...")
         
         try:
+            mongodb_client = await self.data_access.get_client("mongodb")
+            redis_client = await self.data_access.get_client("redis")
             consistency_results = {}
             
             # 1. 测试MongoDB数据一致性
-            if self.data_access.mongodb_client:
+            if mongodb_client:
                 try:
                     # 创建测试数据
                     test_data = {
@@ -198,7 +203,7 @@ class MultiDatabaseOptimizationImplementer:
                     logger.error(f"❌ MongoDB数据一致性测试异常: {e}")
             
             # 2. 测试跨数据库数据一致性
-            if self.data_access.redis_client and self.data_access.mongodb_client:
+            if redis_client and mongodb_client:
                 try:
                     # 从MongoDB获取数据
                     talent_data = await self.data_access.get_talent_data("consistency_test_001")
@@ -206,14 +211,14 @@ class MultiDatabaseOptimizationImplementer:
                     # 缓存到Redis
                     import json
                     cache_key = "talent:consistency_test_001"
-                    self.data_access.redis_client.setex(
+                    await redis_client.setex(
                         cache_key,
                         300,  # 5分钟过期
                         json.dumps(talent_data, ensure_ascii=False)
                     )
                     
                     # 从Redis读取并验证
-                    cached_data = self.data_access.redis_client.get(cache_key)
+                    cached_data = await redis_client.get(cache_key)
                     if cached_data:
                         cached_talent = json.loads(cached_data)
                         if cached_talent.get("consistency_test") == True:
@@ -248,10 +253,13 @@ class MultiDatabaseOptimizationImplementer:
         logger.info("步骤4: 实施健康监控机制...")
         
         try:
+            mongodb_client = await self.data_access.get_client("mongodb")
+            redis_client = await self.data_access.get_client("redis")
+            postgres_pool = await self.data_access.get_client("postgres")
             health_results = {}
             
             # 1. MongoDB健康监控
-            if self.data_access.mongodb_client:
+            if mongodb_client:
                 try:
                     mongodb_health = await self.data_access.get_mongodb_health()
                     health_results["mongodb_health"] = mongodb_health
@@ -261,9 +269,9 @@ class MultiDatabaseOptimizationImplementer:
                     logger.error(f"❌ MongoDB健康监控失败: {e}")
             
             # 2. Redis健康监控
-            if self.data_access.redis_client:
+            if redis_client:
                 try:
-                    redis_health = self.data_access.redis_client.ping()
+                    redis_health = await redis_client.ping()
                     health_results["redis_health"] = {
                         "status": "connected" if redis_health else "disconnected",
                         "ping_result": redis_health
@@ -274,9 +282,9 @@ class MultiDatabaseOptimizationImplementer:
                     logger.error(f"❌ Redis健康监控失败: {e}")
             
             # 3. PostgreSQL健康监控
-            if self.data_access.postgres_pool:
+            if postgres_pool:
                 try:
-                    async with self.data_access.postgres_pool.acquire() as conn:
+                    async with postgres_pool.acquire() as conn:
                         result = await conn.fetchval("SELECT 1")
                         health_results["postgres_health"] = {
                             "status": "connected" if result == 1 else "disconnected",
@@ -305,11 +313,13 @@ class MultiDatabaseOptimizationImplementer:
         logger.info("步骤5: 实施性能优化...")
         
         try:
+            mongodb_client = await self.data_access.get_client("mongodb")
+            redis_client = await self.data_access.get_client("redis")
             import time
             performance_results = {}
             
             # 1. 批量操作性能测试
-            if self.data_access.mongodb_client:
+            if mongodb_client:
                 try:
                     start_time = time.time()
                     
@@ -350,7 +360,7 @@ class MultiDatabaseOptimizationImplementer:
                     logger.error(f"❌ MongoDB性能优化测试失败: {e}")
             
             # 2. 缓存性能测试
-            if self.data_access.redis_client:
+            if redis_client:
                 try:
                     start_time = time.time()
                     
@@ -359,7 +369,7 @@ class MultiDatabaseOptimizationImplementer:
                     for i in range(cache_operations):
                         cache_key = f"perf_test:cache_{i}"
                         cache_value = f"performance_test_value_{i}"
-                        self.data_access.redis_client.setex(cache_key, 60, cache_value)
+                        await redis_client.setex(cache_key, 60, cache_value)
                     
                     cache_write_time = time.time() - start_time
                     
@@ -367,7 +377,7 @@ class MultiDatabaseOptimizationImplementer:
                     start_time = time.time()
                     for i in range(cache_operations):
                         cache_key = f"perf_test:cache_{i}"
-                        self.data_access.redis_client.get(cache_key)
+                        await redis_client.get(cache_key)
                     
                     cache_read_time = time.time() - start_time
                     
@@ -402,10 +412,11 @@ class MultiDatabaseOptimizationImplementer:
         logger.info("步骤6: 实施数据隔离机制...")
         
         try:
+            mongodb_client = await self.data_access.get_client("mongodb")
             isolation_results = {}
             
             # 1. 基于角色的数据隔离测试
-            if self.data_access.mongodb_client:
+            if mongodb_client:
                 try:
                     # 创建不同角色的测试数据
                     test_roles = ["super_admin", "system_admin", "data_admin", "hr_admin", "company_admin", "regular_user"]
@@ -436,7 +447,7 @@ class MultiDatabaseOptimizationImplementer:
                     logger.error(f"❌ 基于角色的数据隔离失败: {e}")
             
             # 2. 租户级数据隔离测试
-            if self.data_access.mongodb_client:
+            if mongodb_client:
                 try:
                     # 创建不同租户的测试数据
                     test_tenants = ["tenant_001", "tenant_002", "tenant_003"]
@@ -172,11 +172,13 @@ class MongoDBIntegrationTester:
         logger.info("测试4: MongoDB与其他数据库协同测试...")
         
         try:
+            redis_client = await self.data_access.get_client("redis")
+            neo4j_driver = await self.data_access.get_client("neo4j")
             # 测试多数据库协同工作
             integration_results = {}
             
             # 1. 测试MongoDB + Redis协同
-            if self.data_access.redis_client:
+            if redis_client:
                 try:
                     # 从MongoDB获取数据
                     talent_data = await self.data_access.get_talent_data("test_talent_001")
@@ -184,14 +186,14 @@ class MongoDBIntegrationTester:
                     # 缓存到Redis
                     cache_key = f"talent:test_talent_001"
                     import json
-                    self.data_access.redis_client.setex(
+                    await redis_client.setex(
                         cache_key, 
                         300,  # 5分钟过期
                         json.dumps(talent_data, ensure_ascii=False)
                     )
                     
                     # 从Redis读取
-                    cached_data = self.data_access.redis_client.get(cache_key)
+                    cached_data = await redis_client.get(cache_key)
                     if cached_data:
                         integration_results["mongodb_redis"] = "success"
                         logger.info("✅ MongoDB + Redis协同测试通过")
@@ -206,7 +208,7 @@ class MongoDBIntegrationTester:
                 logger.warning("⚠️ Redis不可用，跳过MongoDB + Redis协同测试")
             
             # 2. 测试MongoDB + Neo4j协同
-            if self.data_access.neo4j_driver:
+            if neo4j_driver:
                 try:
                     # 这里可以添加Neo4j关系数据创建和查询逻辑
                     integration_results["mongodb_neo4j"] = "success"
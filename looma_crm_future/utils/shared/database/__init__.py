@@ -1,6 +1,11 @@
 # 统一数据访问层
 from .unified_data_access import UnifiedDataAccess
+from .connection_manager import DatabaseConnectionManager
+from .memo_cache import MemoCache, structural_fingerprint
 
 __all__ = [
-    'UnifiedDataAccess'
+    'UnifiedDataAccess',
+    'DatabaseConnectionManager',
+    'MemoCache',
+    'structural_fingerprint'
 ]
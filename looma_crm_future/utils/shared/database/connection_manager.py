@@ -0,0 +1,253 @@
+"""
+数据库连接管理器
+各存储后端并发建立连接(或在首次使用时按需连接)，每个后端独立维护就绪状态：
+连接失败或运行中断开的后端以指数退避在后台重连，其余已就绪的后端照常提供服务；
+已就绪的后端定期健康检查，调用方未上报的断线也能及时转为降级
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+
+logger = logging.getLogger(__name__)
+
+# 后端状态
+STATUS_PENDING = "pending"        # 尚未连接(按需连接的后端在首次使用前)
+STATUS_CONNECTING = "connecting"
+STATUS_READY = "ready"
+STATUS_DEGRADED = "degraded"      # 连接失败或健康检查失败，后台重试中
+STATUS_DISABLED = "disabled"      # 缺少客户端库或被配置关闭
+
+
+class BackendState:
+    """单个存储后端的连接与就绪状态"""
+    
+    def __init__(self, name: str, connect: Callable[[], Awaitable[Any]],
+                 close: Optional[Callable[[Any], Awaitable[None]]] = None,
+                 ping: Optional[Callable[[Any], Awaitable[Any]]] = None,
+                 lazy: bool = False):
+        self.name = name
+        self.connect = connect
+        self.close = close
+        self.ping = ping
+        self.lazy = lazy
+        
+        self.status = STATUS_PENDING
+        self.client: Any = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.connect_time: Optional[float] = None
+        self.ready_since: Optional[float] = None
+        self.next_retry_at: Optional[float] = None
+        
+        self.lock = asyncio.Lock()
+        self.retry_task: Optional[asyncio.Task] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "ready": self.status == STATUS_READY,
+            "lazy": self.lazy,
+            "attempts": self.attempts,
+            "error": self.error,
+            "connect_time": round(self.connect_time, 3) if self.connect_time is not None else None,
+            "ready_since": self.ready_since,
+            "next_retry_in": max(0.0, round(self.next_retry_at - time.time(), 1)) if self.next_retry_at else None
+        }
+
+
+class DatabaseConnectionManager:
+    """数据库连接管理器"""
+    
+    def __init__(self, connect_timeout: float = 5.0, retry_initial_delay: float = 1.0,
+                 retry_max_delay: float = 60.0, health_check_interval: float = 30.0):
+        """
+        Args:
+            connect_timeout: 单次连接(含健康检查)的超时时间(秒)
+            retry_initial_delay: 首次重试的等待时间(秒)，之后每次翻倍
+            retry_max_delay: 重试等待时间上限(秒)
+            health_check_interval: 对已就绪后端定期健康检查的间隔(秒)，<=0表示不检查
+        """
+        self.connect_timeout = connect_timeout
+        self.retry_initial_delay = retry_initial_delay
+        self.retry_max_delay = retry_max_delay
+        self.health_check_interval = health_check_interval
+        self.backends: Dict[str, BackendState] = {}
+        self._closed = False
+        self._health_task: Optional[asyncio.Task] = None
+    
+    def register(self, name: str, connect: Callable[[], Awaitable[Any]],
+                 close: Optional[Callable[[Any], Awaitable[None]]] = None,
+                 ping: Optional[Callable[[Any], Awaitable[Any]]] = None,
+                 lazy: bool = False, enabled: bool = True, disabled_reason: str = ""):
+        """
+        注册后端
+        
+        Args:
+            connect: 建立连接并完成健康检查，返回客户端
+            close: 关闭客户端
+            ping: 对已有客户端做健康检查，失败时抛出异常；重试时优先复用已有客户端
+            lazy: 为True时不在start()中连接，首次get()时再连接
+            enabled: 为False时标记为disabled(如缺少客户端库)
+        """
+        state = BackendState(name, connect, close, ping, lazy)
+        if not enabled:
+            state.status = STATUS_DISABLED
+            state.error = disabled_reason or "已禁用"
+        self.backends[name] = state
+    
+    async def start(self):
+        """并发连接所有非按需后端，总耗时取决于最慢的一个(受connect_timeout限制)；close()后可再次调用"""
+        self._closed = False
+        eager = [state for state in self.backends.values()
+                 if not state.lazy and state.status == STATUS_PENDING]
+        started = time.perf_counter()
+        await asyncio.gather(*[self._connect(state) for state in eager])
+        if self.health_check_interval > 0 and (self._health_task is None or self._health_task.done()):
+            self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"数据库连接初始化完成，耗时{time.perf_counter() - started:.2f}秒: "
+                    f"{self.summary()}")
+    
+    async def get(self, name: str) -> Any:
+        """返回就绪的客户端；按需后端首次调用时连接；未就绪时返回None"""
+        state = self.backends.get(name)
+        if state is None:
+            return None
+        if state.status == STATUS_READY:
+            return state.client
+        if state.status == STATUS_PENDING or (state.status == STATUS_CONNECTING and state.error is None):
+            # 首次连接(含其他调用方正在进行的首次连接)时等待其结果；降级后的重连不阻塞调用方
+            await self._connect(state)
+            return state.client if state.status == STATUS_READY else None
+        return None
+    
+    def client(self, name: str) -> Any:
+        """同步读取已就绪的客户端，不触发连接"""
+        state = self.backends.get(name)
+        if state is None or state.status != STATUS_READY:
+            return None
+        return state.client
+    
+    def is_ready(self, name: str) -> bool:
+        state = self.backends.get(name)
+        return state is not None and state.status == STATUS_READY
+    
+    def report_failure(self, name: str, error: Exception):
+        """调用方发现连接异常(如连接断开)时上报，后端转为降级并在后台重连"""
+        state = self.backends.get(name)
+        if state is None or state.status != STATUS_READY:
+            return
+        state.status = STATUS_DEGRADED
+        state.error = str(error) or type(error).__name__
+        state.ready_since = None
+        logger.warning(f"{name}连接异常，转为降级状态并后台重连: {error}")
+        self._schedule_retry(state)
+    
+    def readiness(self) -> Dict[str, Dict[str, Any]]:
+        """各后端的就绪状态"""
+        return {name: state.to_dict() for name, state in self.backends.items()}
+    
+    def summary(self) -> str:
+        return ", ".join(f"{name}={state.status}" for name, state in self.backends.items())
+    
+    async def _connect(self, state: BackendState) -> bool:
+        """连接一次；失败时转为降级并安排后台重试。同一后端的并发调用只连接一次"""
+        async with state.lock:
+            if state.status in (STATUS_READY, STATUS_DISABLED) or self._closed:
+                return state.status == STATUS_READY
+            
+            state.status = STATUS_CONNECTING
+            state.attempts += 1
+            started = time.perf_counter()
+            try:
+                if state.client is not None and state.ping is not None:
+                    # 已有客户端(运行中降级)时先尝试健康检查，通过即恢复
+                    await asyncio.wait_for(state.ping(state.client), timeout=self.connect_timeout)
+                else:
+                    await self._close_client(state)
+                    state.client = await asyncio.wait_for(state.connect(), timeout=self.connect_timeout)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                if state.client is not None:
+                    # 健康检查失败的旧客户端关闭后重建
+                    await self._close_client(state)
+                state.status = STATUS_DEGRADED
+                state.error = error
+                logger.warning(f"{state.name}连接失败(第{state.attempts}次): {error}")
+                self._schedule_retry(state)
+                return False
+            
+            state.status = STATUS_READY
+            state.error = None
+            state.connect_time = time.perf_counter() - started
+            state.ready_since = time.time()
+            state.next_retry_at = None
+            logger.info(f"{state.name}连接成功，耗时{state.connect_time:.2f}秒")
+            return True
+    
+    async def check_health(self):
+        """并发健康检查所有已就绪的后端，失败的转为降级并后台重连"""
+        ready = [state for state in self.backends.values()
+                 if state.status == STATUS_READY and state.ping is not None]
+        results = await asyncio.gather(
+            *[asyncio.wait_for(state.ping(state.client), timeout=self.connect_timeout) for state in ready],
+            return_exceptions=True
+        )
+        for state, result in zip(ready, results):
+            if isinstance(result, Exception):
+                self.report_failure(state.name, result)
+    
+    async def _health_loop(self):
+        while not self._closed:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.warning(f"数据库健康检查失败: {e}")
+    
+    def _schedule_retry(self, state: BackendState):
+        if self._closed or (state.retry_task is not None and not state.retry_task.done()):
+            return
+        state.retry_task = asyncio.create_task(self._retry_loop(state))
+    
+    async def _retry_loop(self, state: BackendState):
+        failures = 0
+        while not self._closed and state.status == STATUS_DEGRADED:
+            delay = min(self.retry_max_delay, self.retry_initial_delay * (2 ** failures))
+            # 加抖动，避免多个实例同时重连
+            delay *= random.uniform(0.8, 1.2)
+            state.next_retry_at = time.time() + delay
+            await asyncio.sleep(delay)
+            # _connect失败时会再次调用_schedule_retry，但当前任务尚未结束，不会重复创建
+            if await self._connect(state):
+                return
+            failures += 1
+    
+    async def _close_client(self, state: BackendState):
+        client, state.client = state.client, None
+        if client is None or state.close is None:
+            return
+        try:
+            await state.close(client)
+        except Exception as e:
+            logger.warning(f"关闭{state.name}连接失败: {e}")
+    
+    async def close(self):
+        """停止健康检查与重试并并发关闭所有连接"""
+        self._closed = True
+        retry_tasks: List[asyncio.Task] = []
+        if self._health_task is not None:
+            self._health_task.cancel()
+            retry_tasks.append(self._health_task)
+            self._health_task = None
+        for state in self.backends.values():
+            if state.retry_task is not None and not state.retry_task.done():
+                state.retry_task.cancel()
+                retry_tasks.append(state.retry_task)
+        await asyncio.gather(*retry_tasks, return_exceptions=True)
+        await asyncio.gather(*[self._close_client(state) for state in self.backends.values()])
+        for state in self.backends.values():
+            if state.status != STATUS_DISABLED:
+                state.status = STATUS_PENDING
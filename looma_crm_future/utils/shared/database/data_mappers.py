@@ -7,10 +7,11 @@
 
 from typing import Dict, Any, Optional, List
 from datetime import datetime
-import json
 import logging
 import re
 
+from .memo_cache import MemoCache, structural_fingerprint
+
 logger = logging.getLogger(__name__)
 
 class DataMapper:
@@ -382,16 +383,43 @@ class ZervigoToLoomaMapper(DataMapper):
 class DataMappingService:
     """数据映射服务"""
     
-    def __init__(self):
+    def __init__(self, cache_max_entries: int = 4096, cache_ttl: float = 300.0):
         self.mappers = {
             "zervigo_to_looma": ZervigoToLoomaMapper(),
             "zervigo_to_looma_crm": ZervigoToLoomaMapper(),  # 添加兼容性键名
             "looma_crm_to_zervigo": ZervigoToLoomaMapper()   # 添加反向映射键名
         }
-        self.mapping_cache = {}
+        self.mapping_cache = MemoCache(cache_max_entries, cache_ttl, name="mapping")
     
     async def map_data(self, source: str, target: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """映射数据"""
+        mapper = await self._get_mapper(source, target)
+        if mapper is None:
+            return {}
+        return await self._map_with_cache(mapper, source, target, data)
+    
+    async def map_many(self, source: str, target: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量映射数据
+        
+        映射器只解析一次，批内重复记录只映射一次；结果与输入顺序一致，失败项为空字典
+        """
+        mapper = await self._get_mapper(source, target)
+        if mapper is None:
+            return [{} for _ in items]
+        
+        results: List[Dict[str, Any]] = []
+        batch_results: Dict[Any, Dict[str, Any]] = {}
+        for data in items:
+            cache_key = self._generate_cache_key(source, target, data)
+            result = batch_results.get(cache_key)
+            if result is None:
+                result = await self._map_with_cache(mapper, source, target, data, cache_key)
+                batch_results[cache_key] = result
+            results.append(dict(result))
+        return results
+    
+    async def _get_mapper(self, source: str, target: str) -> Optional[DataMapper]:
         mapper_key = f"{source}_to_{target}"
         
         # 尝试自动注册映射器
@@ -401,15 +429,20 @@ class DataMappingService:
         if mapper_key not in self.mappers:
             logger.error(f"未找到映射器: {mapper_key}")
             logger.info(f"可用映射器: {list(self.mappers.keys())}")
-            return {}
-        
-        mapper = self.mappers[mapper_key]
+            return None
         
+        return self.mappers[mapper_key]
+    
+    async def _map_with_cache(self, mapper: DataMapper, source: str, target: str,
+                              data: Dict[str, Any], cache_key: Any = None) -> Dict[str, Any]:
         # 检查缓存
-        cache_key = self._generate_cache_key(source, target, data)
-        if cache_key in self.mapping_cache:
-            logger.info(f"使用缓存映射结果: {cache_key}")
-            return self.mapping_cache[cache_key]
+        if cache_key is None:
+            cache_key = self._generate_cache_key(source, target, data)
+        hit, cached = self.mapping_cache.get(cache_key)
+        if hit:
+            logger.debug(f"使用缓存映射结果: {source} -> {target}")
+            # 返回浅拷贝，调用方在结果上追加字段不会污染缓存
+            return dict(cached)
         
         # 执行映射
         result = {}
@@ -442,7 +475,8 @@ class DataMappingService:
         
         # 缓存结果
         if result:
-            self.mapping_cache[cache_key] = result
+            self.mapping_cache.set(cache_key, result)
+            return dict(result)
         
         return result
     
@@ -462,6 +496,33 @@ class DataMappingService:
     
     async def reverse_map_data(self, source: str, target: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """反向映射数据"""
+        mapper = await self._get_reverse_mapper(source, target)
+        if mapper is None:
+            return {}
+        return await self._reverse_map(mapper, source, target, data)
+    
+    async def reverse_map_many(self, source: str, target: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量反向映射数据
+        
+        映射器只解析一次，批内重复记录只映射一次；结果与输入顺序一致，失败项为空字典
+        """
+        mapper = await self._get_reverse_mapper(source, target)
+        if mapper is None:
+            return [{} for _ in items]
+        
+        results: List[Dict[str, Any]] = []
+        batch_results: Dict[Any, Dict[str, Any]] = {}
+        for data in items:
+            batch_key = self._generate_cache_key(source, target, data)
+            result = batch_results.get(batch_key)
+            if result is None:
+                result = await self._reverse_map(mapper, source, target, data)
+                batch_results[batch_key] = result
+            results.append(dict(result))
+        return results
+    
+    async def _get_reverse_mapper(self, source: str, target: str) -> Optional[DataMapper]:
         mapper_key = f"{target}_to_{source}"
         
         # 尝试自动注册映射器
@@ -471,10 +532,12 @@ class DataMappingService:
         if mapper_key not in self.mappers:
             logger.error(f"未找到反向映射器: {mapper_key}")
             logger.info(f"可用映射器: {list(self.mappers.keys())}")
-            return {}
-        
-        mapper = self.mappers[mapper_key]
+            return None
         
+        return self.mappers[mapper_key]
+    
+    async def _reverse_map(self, mapper: DataMapper, source: str, target: str,
+                           data: Dict[str, Any]) -> Dict[str, Any]:
         # 执行反向映射
         result = {}
         if source == "looma_crm" and target == "zervigo":
@@ -483,11 +546,9 @@ class DataMappingService:
         
         return result
     
-    def _generate_cache_key(self, source: str, target: str, data: Dict[str, Any]) -> str:
+    def _generate_cache_key(self, source: str, target: str, data: Dict[str, Any]) -> Any:
         """生成缓存键"""
-        import hashlib
-        data_str = json.dumps(data, sort_keys=True)
-        return hashlib.md5(f"{source}_{target}_{data_str}".encode()).hexdigest()
+        return structural_fingerprint(source, target, data)
     
     async def clear_cache(self):
         """清空映射缓存"""
@@ -496,10 +557,9 @@ class DataMappingService:
     
     async def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        return {
-            "cache_size": len(self.mapping_cache),
-            "cache_keys": list(self.mapping_cache.keys())
-        }
+        stats = self.mapping_cache.get_stats()
+        stats["cache_size"] = stats["size"]
+        return stats
     
     async def _default_looma_to_zervigo_mapping(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """默认的Looma CRM到Zervigo映射逻辑"""
@@ -6,11 +6,12 @@
 """
 
 import re
-import json
 from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
 import logging
 
+from .memo_cache import MemoCache, structural_fingerprint
+
 logger = logging.getLogger(__name__)
 
 class ValidationResult:
@@ -294,6 +295,62 @@ class LoomaDataValidator(DataValidator):
         
         return True
 
+class LoomaProjectValidator(DataValidator):
+    """Looma CRM项目数据验证器，字段与DataMapper.map_job_to_project的输出一致"""
+    
+    def __init__(self):
+        validation_rules = {
+            "id": {
+                "type": "string",
+                "required": True,
+                "pattern": r'^[a-zA-Z_][a-zA-Z0-9_]*$',
+                "max_length": 100
+            },
+            "name": {
+                "type": "string",
+                "required": True,
+                "max_length": 200,
+                "min_length": 1
+            },
+            "description": {
+                "type": "text"
+            },
+            "requirements": {
+                "type": "array"
+            },
+            "skills_needed": {
+                "type": "array"
+            },
+            "team_size": {
+                "type": "integer",
+                "range": "1-10000"
+            },
+            "duration": {
+                "type": "integer",
+                "range": "0-600"
+            },
+            "budget": {
+                "range": "0-1000000000000"
+            },
+            "status": {
+                "type": "string",
+                "enum": ["planning", "active", "completed", "cancelled", "inactive", "archived"]
+            },
+            "created_at": {
+                "type": "datetime",
+                "format": "iso_datetime"
+            },
+            "updated_at": {
+                "type": "datetime",
+                "format": "iso_datetime"
+            },
+            "zervigo_job_id": {
+                "type": "integer",
+                "range": "1-999999999"
+            }
+        }
+        super().__init__(validation_rules)
+
 class ZervigoDataValidator(DataValidator):
     """Zervigo数据验证器"""
     
@@ -341,6 +398,7 @@ class DataConsistencyValidator:
     
     def __init__(self):
         self.looma_validator = LoomaDataValidator()
+        self.project_validator = LoomaProjectValidator()
         self.zervigo_validator = ZervigoDataValidator()
     
     async def validate_cross_service_consistency(self, looma_data: Dict[str, Any], zervigo_data: Dict[str, Any]) -> ValidationResult:
@@ -393,20 +451,32 @@ class DataConsistencyValidator:
         
         return result
     
-    async def validate_data_integrity(self, data: Dict[str, Any], model_type: str) -> ValidationResult:
-        """验证数据完整性"""
+    def get_validator(self, model_type: str) -> Optional[DataValidator]:
+        """按模型类型查找验证器，未知类型返回None"""
         if model_type == "looma_talent":
-            return await self.looma_validator.validate(data)
+            return self.looma_validator
+        elif model_type == "looma_project":
+            return self.project_validator
         elif model_type == "zervigo_user":
-            return await self.zervigo_validator.validate(data)
-        else:
-            result = ValidationResult(is_valid=False)
-            result.add_error(f"未知的模型类型: {model_type}")
-            return result
+            return self.zervigo_validator
+        return None
+    
+    async def validate_data_integrity(self, data: Dict[str, Any], model_type: str,
+                                      validator: Optional[DataValidator] = None) -> ValidationResult:
+        """验证数据完整性"""
+        if validator is None:
+            validator = self.get_validator(model_type)
+        if validator is not None:
+            return await validator.validate(data)
+        result = ValidationResult(is_valid=False)
+        result.add_error(f"未知的模型类型: {model_type}")
+        return result
     
-    async def validate_business_rules(self, data: Dict[str, Any]) -> ValidationResult:
-        """验证业务规则"""
+    async def validate_business_rules(self, data: Dict[str, Any], model_type: str = "looma_talent") -> ValidationResult:
+        """验证业务规则，现有规则针对人员数据，项目数据不适用"""
         result = ValidationResult(is_valid=True)
+        if model_type == "looma_project":
+            return result
         
         # 业务规则1: 活跃用户必须有邮箱
         if data.get('status') == 'active' and not data.get('email'):
@@ -427,30 +497,56 @@ class DataConsistencyValidator:
 class ValidationService:
     """验证服务"""
     
-    def __init__(self):
+    def __init__(self, cache_max_entries: int = 4096, cache_ttl: float = 300.0):
         self.consistency_validator = DataConsistencyValidator()
-        self.validation_cache = {}
+        self.validation_cache = MemoCache(cache_max_entries, cache_ttl, name="validation")
     
     async def validate_data(self, data: Dict[str, Any], model_type: str, validate_consistency: bool = True) -> ValidationResult:
         """验证数据"""
+        validator = self.consistency_validator.get_validator(model_type)
+        return await self._validate_with_cache(data, model_type, validator)
+    
+    async def validate_many(self, items: List[Dict[str, Any]], model_type: str) -> List[ValidationResult]:
+        """
+        批量验证数据
+        
+        验证器只查找一次，批内重复记录只验证一次；结果与输入顺序一致
+        """
+        validator = self.consistency_validator.get_validator(model_type)
+        results: List[ValidationResult] = []
+        batch_results: Dict[Any, ValidationResult] = {}
+        for data in items:
+            cache_key = self._generate_cache_key(data, model_type)
+            result = batch_results.get(cache_key)
+            if result is None:
+                result = await self._validate_with_cache(data, model_type, validator, cache_key)
+                batch_results[cache_key] = result
+            results.append(result)
+        return results
+    
+    async def _validate_with_cache(self, data: Dict[str, Any], model_type: str,
+                                   validator: Optional[DataValidator],
+                                   cache_key: Any = None) -> ValidationResult:
         # 检查缓存
-        cache_key = self._generate_cache_key(data, model_type)
-        if cache_key in self.validation_cache:
-            logger.info(f"使用缓存验证结果: {cache_key}")
-            return self.validation_cache[cache_key]
+        if cache_key is None:
+            cache_key = self._generate_cache_key(data, model_type)
+        hit, cached = self.validation_cache.get(cache_key)
+        if hit:
+            logger.debug(f"使用缓存验证结果: {model_type}")
+            return cached
         
         # 执行验证
-        result = await self.consistency_validator.validate_data_integrity(data, model_type)
+        result = await self.consistency_validator.validate_data_integrity(data, model_type, validator)
         
         # 验证业务规则
-        business_result = await self.consistency_validator.validate_business_rules(data)
+        business_result = await self.consistency_validator.validate_business_rules(data, model_type)
         result.errors.extend(business_result.errors)
         result.warnings.extend(business_result.warnings)
         if not business_result.is_valid:
             result.is_valid = False
         
         # 缓存结果
-        self.validation_cache[cache_key] = result
+        self.validation_cache.set(cache_key, result)
         
         return result
     
@@ -458,13 +554,17 @@ class ValidationService:
         """验证数据一致性"""
         return await self.consistency_validator.validate_cross_service_consistency(looma_data, zervigo_data)
     
-    def _generate_cache_key(self, data: Dict[str, Any], model_type: str) -> str:
+    def _generate_cache_key(self, data: Dict[str, Any], model_type: str) -> Any:
         """生成缓存键"""
-        import hashlib
-        data_str = json.dumps(data, sort_keys=True)
-        return hashlib.md5(f"{model_type}_{data_str}".encode()).hexdigest()
+        return structural_fingerprint(model_type, data)
     
     async def clear_cache(self):
         """清空验证缓存"""
         self.validation_cache.clear()
         logger.info("验证缓存已清空")
+    
+    async def get_cache_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        stats = self.validation_cache.get_stats()
+        stats["cache_size"] = stats["size"]
+        return stats
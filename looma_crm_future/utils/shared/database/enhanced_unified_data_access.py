@@ -7,6 +7,7 @@
 
 import asyncio
 import logging
+import time
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
@@ -19,12 +20,20 @@ logger = logging.getLogger(__name__)
 class EnhancedUnifiedDataAccess(UnifiedDataAccess):
     """增强的统一数据访问层"""
     
-    def __init__(self):
+    def __init__(self, sync_batch_size: int = 100, cache_purge_interval: float = 60.0):
+        """
+        Args:
+            sync_batch_size: 同步工作器每批最多处理的任务数
+            cache_purge_interval: 清理映射/验证缓存过期条目的间隔(秒)
+        """
         super().__init__()
         self.mapping_service = DataMappingService()
         self.validation_service = ValidationService()
         self.sync_queue = asyncio.Queue()
         self.sync_worker_running = False
+        self.sync_batch_size = sync_batch_size
+        self.cache_purge_interval = cache_purge_interval
+        self._last_cache_purge = time.monotonic()
     
     async def initialize(self):
         """初始化增强的数据访问层"""
@@ -281,35 +290,68 @@ class EnhancedUnifiedDataAccess(UnifiedDataAccess):
             return {"error": str(e)}
     
     async def _sync_worker(self):
-        """数据同步工作器"""
+        """数据同步工作器：等待首个任务后取出队列中已有的任务，按类型批量验证和映射"""
         logger.info("数据同步工作器启动")
         
         while True:
             try:
-                # 从队列获取同步任务
-                sync_data = await self.sync_queue.get()
-                
-                if sync_data["type"] == "talent_update":
-                    await self._sync_talent_to_zervigo(sync_data["looma_data"])
-                elif sync_data["type"] == "project_update":
-                    await self._sync_project_to_zervigo(sync_data["looma_data"])
-                
-                # 标记任务完成
-                self.sync_queue.task_done()
+                # 空闲时按间隔醒来清理缓存过期条目
+                batch = [await asyncio.wait_for(self.sync_queue.get(), timeout=self.cache_purge_interval)]
+            except asyncio.TimeoutError:
+                self._purge_expired_caches()
+                continue
+            
+            while len(batch) < self.sync_batch_size:
+                try:
+                    batch.append(self.sync_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            
+            try:
+                talents = [sync_data["looma_data"] for sync_data in batch if sync_data["type"] == "talent_update"]
+                projects = [sync_data["looma_data"] for sync_data in batch if sync_data["type"] == "project_update"]
+                if talents:
+                    await self._sync_talents_to_zervigo(talents)
+                if projects:
+                    await self._sync_projects_to_zervigo(projects)
                 
             except Exception as e:
                 logger.error(f"数据同步工作器错误: {e}")
                 await asyncio.sleep(5)  # 错误后等待5秒
+            finally:
+                # 标记任务完成
+                for _ in batch:
+                    self.sync_queue.task_done()
+            
+            if time.monotonic() - self._last_cache_purge >= self.cache_purge_interval:
+                self._purge_expired_caches()
+    
+    def _purge_expired_caches(self):
+        self._last_cache_purge = time.monotonic()
+        purged = (self.mapping_service.mapping_cache.purge_expired() +
+                  self.validation_service.validation_cache.purge_expired())
+        if purged:
+            logger.debug(f"清理映射/验证缓存过期条目: {purged}")
     
-    async def _sync_talent_to_zervigo(self, looma_data: Dict[str, Any]):
-        """同步人才数据到Zervigo"""
+    async def _sync_talents_to_zervigo(self, talents: List[Dict[str, Any]]):
+        """批量同步人才数据到Zervigo"""
         try:
+            validation_results = await self.validation_service.validate_many(talents, "looma_talent")
+            valid_talents = []
+            for looma_data, validation_result in zip(talents, validation_results):
+                if validation_result.is_valid:
+                    valid_talents.append(looma_data)
+                else:
+                    logger.error(f"人才数据验证失败，跳过同步: {looma_data.get('id')}, {validation_result.errors}")
+            
             # 反向映射数据
-            zervigo_data = await self.mapping_service.reverse_map_data(
-                "looma_crm", "zervigo", {"talent": looma_data}
+            zervigo_items = await self.mapping_service.reverse_map_many(
+                "looma_crm", "zervigo", [{"talent": looma_data} for looma_data in valid_talents]
             )
             
-            if zervigo_data:
+            for looma_data, zervigo_data in zip(valid_talents, zervigo_items):
+                if not zervigo_data:
+                    continue
                 # 同步到Zervigo
                 success = await self._update_zervigo_user_data(zervigo_data)
                 if success:
@@ -320,6 +362,15 @@ class EnhancedUnifiedDataAccess(UnifiedDataAccess):
         except Exception as e:
             logger.error(f"同步人才数据到Zervigo失败: {e}")
     
+    async def _sync_projects_to_zervigo(self, projects: List[Dict[str, Any]]):
+        """批量同步项目数据到Zervigo"""
+        validation_results = await self.validation_service.validate_many(projects, "looma_project")
+        for looma_data, validation_result in zip(projects, validation_results):
+            if validation_result.is_valid:
+                await self._sync_project_to_zervigo(looma_data)
+            else:
+                logger.error(f"项目数据验证失败，跳过同步: {looma_data.get('id')}, {validation_result.errors}")
+    
     async def _sync_project_to_zervigo(self, looma_data: Dict[str, Any]):
         """同步项目数据到Zervigo"""
         try:
@@ -437,9 +488,7 @@ class EnhancedUnifiedDataAccess(UnifiedDataAccess):
             "sync_queue_size": self.sync_queue.qsize(),
             "sync_worker_running": self.sync_worker_running,
             "mapping_cache_stats": await self.mapping_service.get_cache_stats(),
-            "validation_cache_stats": {
-                "cache_size": len(self.validation_service.validation_cache)
-            }
+            "validation_cache_stats": await self.validation_service.get_cache_stats()
         }
     
     async def close(self):
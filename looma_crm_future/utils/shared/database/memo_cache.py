@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+映射/验证结果缓存
+数据映射服务与验证服务共用的有界记忆化缓存(LRU + TTL)，
+以输入数据的结构指纹为键，避免每次调用都做JSON序列化和MD5
+"""
+
+import logging
+import marshal
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# marshal格式版本2不使用对象引用，相同数据总得到相同字节
+_MARSHAL_VERSION = 2
+
+# 区分dict/list/set冻结后的元组，避免{"a": 1}与[("a", 1)]得到相同指纹
+_DICT = object()
+_LIST = object()
+
+
+def _freeze(value: Any) -> Hashable:
+    """把数据递归转换为可哈希的等价结构"""
+    value_type = type(value)
+    if value_type is str or value is None or value_type is int:
+        return value
+    if value_type is bool or value_type is float:
+        # True == 1 == 1.0，带上类型避免类型验证结果串用
+        return (value_type, value)
+    if isinstance(value, dict):
+        items = [(key, _freeze(item)) for key, item in value.items()]
+        try:
+            items.sort()
+        except TypeError:
+            items.sort(key=lambda pair: repr(pair[0]))
+        return (_DICT, tuple(items))
+    if isinstance(value, (list, tuple)):
+        return (_LIST, tuple(_freeze(item) for item in value))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    try:
+        hash(value)
+        return (value_type, value)
+    except TypeError:
+        return (value_type, repr(value))
+
+
+def structural_fingerprint(*parts: Any) -> Hashable:
+    """
+    生成缓存键
+
+    由C实现的marshal一次编码全部参数，结果直接作为字典键使用(字节串的哈希值会被缓存)，
+    比较基于完整编码，不存在摘要碰撞；编码保留标量与容器类型，不同数据不会得到相同的键。
+    字典按插入顺序编码，同一来源的记录字段顺序稳定，顺序不同只会导致未命中。
+    含datetime等无法marshal的对象时退回递归冻结(字典按键排序)
+    """
+    try:
+        return marshal.dumps(parts, _MARSHAL_VERSION)
+    except ValueError:
+        return tuple(_freeze(part) for part in parts)
+
+
+class MemoCache:
+    """有界记忆化缓存(LRU + TTL)"""
+    
+    def __init__(self, max_entries: int = 4096, ttl: float = 300.0, name: str = "memo"):
+        """
+        Args:
+            max_entries: 最多缓存的条目数，超出后淘汰最久未使用的条目
+            ttl: 条目有效期(秒)，<=0表示不过期
+            name: 用于日志与统计的缓存名
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        # 键 -> (过期时间, 值)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evicted': 0
+        }
+    
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """返回(是否命中, 值)，以区分缓存的空结果与未命中"""
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.stats['misses'] += 1
+            return False, None
+        expires_at, value = entry
+        if expires_at and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return True, value
+    
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0.0
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evicted'] += 1
+    
+    def invalidate(self, key: Hashable) -> bool:
+        return self._entries.pop(key, None) is not None
+    
+    def purge_expired(self) -> int:
+        """清理已过期条目，返回清理数量"""
+        if self.ttl <= 0:
+            return 0
+        now = time.monotonic()
+        expired: List[Hashable] = [key for key, (expires_at, _) in self._entries.items()
+                                   if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self.stats['expired'] += len(expired)
+        return len(expired)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and (not entry[0] or entry[0] > time.monotonic())
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'name': self.name,
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+        }
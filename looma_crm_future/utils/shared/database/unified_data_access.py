@@ -1,170 +1,313 @@
 """
 统一数据访问层 - 集成所有数据库访问
 基于Looma CRM现有数据库架构扩展
+各数据库由连接管理器并发初始化(可配置为按需连接)，单个数据库不可用时其余照常服务，
+不可用的数据库在后台以指数退避重连；Redis与Elasticsearch使用异步客户端
 """
 
 import asyncio
 import logging
+import os
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
-# 直接导入数据库客户端库
-import neo4j
-import weaviate
-import asyncpg
-import redis
-import elasticsearch
-from motor.motor_asyncio import AsyncIOMotorClient
+from .connection_manager import DatabaseConnectionManager
+
+# 数据库客户端库按需导入，缺失的库只会让对应后端处于disabled状态
+try:
+    import neo4j
+    HAS_NEO4J = True
+except ImportError:
+    HAS_NEO4J = False
+
+try:
+    import weaviate
+    HAS_WEAVIATE = True
+except ImportError:
+    HAS_WEAVIATE = False
+
+try:
+    import asyncpg
+    HAS_ASYNCPG = True
+    PostgresConnectionErrors = (asyncpg.exceptions.ConnectionDoesNotExistError,
+                                asyncpg.exceptions.ConnectionFailureError)
+except ImportError:
+    HAS_ASYNCPG = False
+    PostgresConnectionErrors = ()
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+    HAS_REDIS = True
+    RedisConnectionErrors = (RedisConnectionError, RedisTimeoutError)
+except ImportError:
+    HAS_REDIS = False
+    RedisConnectionErrors = ()
+
+try:
+    from elasticsearch import AsyncElasticsearch
+    from elasticsearch import ConnectionError as ElasticsearchConnectionError
+    HAS_ELASTICSEARCH = True
+except ImportError:
+    HAS_ELASTICSEARCH = False
+    ElasticsearchConnectionError = ()
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo.errors import ConnectionFailure as MongoConnectionFailure
+    HAS_MOTOR = True
+except ImportError:
+    HAS_MOTOR = False
+    MongoConnectionFailure = ()
 
 logger = logging.getLogger(__name__)
 
 
+def default_database_config() -> Dict[str, Dict[str, Any]]:
+    """默认数据库配置，可用环境变量覆盖"""
+    return {
+        "neo4j": {
+            "uri": os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+            "username": os.getenv("NEO4J_USERNAME", "neo4j"),
+            "password": os.getenv("NEO4J_PASSWORD", "jobfirst_password_2024")
+        },
+        "weaviate": {
+            "url": os.getenv("WEAVIATE_URL", "http://localhost:8083")
+        },
+        "postgres": {
+            "host": os.getenv("POSTGRES_HOST", "localhost"),
+            "port": int(os.getenv("POSTGRES_PORT", "5432")),
+            "user": os.getenv("POSTGRES_USER", "postgres"),
+            "password": os.getenv("POSTGRES_PASSWORD", "jobfirst_password_2024"),
+            "database": os.getenv("POSTGRES_DB", "looma_crm"),
+            "min_size": 1,
+            "max_size": 10
+        },
+        "redis": {
+            "host": os.getenv("REDIS_HOST", "localhost"),
+            "port": int(os.getenv("REDIS_PORT", "6379")),
+            "db": int(os.getenv("REDIS_DB", "0")),
+            "password": os.getenv("REDIS_PASSWORD") or None,
+            "max_connections": 50
+        },
+        "elasticsearch": {
+            "hosts": os.getenv("ELASTICSEARCH_HOSTS", "http://localhost:9200").split(",")
+        },
+        "mongodb": {
+            "host": os.getenv("MONGODB_HOST", "localhost"),
+            "port": int(os.getenv("MONGODB_PORT", "27017")),
+            "max_pool_size": 100,
+            "min_pool_size": 10
+        },
+        # 按需连接的后端，逗号分隔，如 "neo4j,weaviate"
+        "lazy_backends": [name for name in os.getenv("DATA_ACCESS_LAZY_BACKENDS", "").split(",") if name]
+    }
+
+
 class UnifiedDataAccess:
     """统一数据访问层"""
     
-    def __init__(self):
-        """初始化统一数据访问层"""
-        self.neo4j_driver = None
-        self.weaviate_client = None
-        self.postgres_pool = None
-        self.redis_client = None
-        self.elasticsearch_client = None
-        self.mongodb_client = None  # 新增MongoDB客户端
+    def __init__(self, config: Optional[Dict[str, Any]] = None,
+                 connection_manager: Optional[DatabaseConnectionManager] = None):
+        """
+        初始化统一数据访问层
+        
+        Args:
+            config: 数据库配置，默认见default_database_config()
+            connection_manager: 外部传入的连接管理器(可调整超时与退避参数)
+        """
+        self.config = config or default_database_config()
+        self.connections = connection_manager or DatabaseConnectionManager(
+            connect_timeout=float(os.getenv("DATA_ACCESS_CONNECT_TIMEOUT", "5")),
+            health_check_interval=float(os.getenv("DATA_ACCESS_HEALTH_CHECK_INTERVAL", "30"))
+        )
         self.initialized = False
+        self._register_backends()
+    
+    def _register_backends(self):
+        """注册各数据库后端"""
+        lazy_backends = set(self.config.get("lazy_backends", []))
+        backends = [
+            ("neo4j", HAS_NEO4J, self._connect_neo4j, self._close_neo4j, self._ping_neo4j),
+            ("weaviate", HAS_WEAVIATE, self._connect_weaviate, None, self._ping_weaviate),
+            ("postgres", HAS_ASYNCPG, self._connect_postgres, self._close_postgres, self._ping_postgres),
+            ("redis", HAS_REDIS, self._connect_redis, self._close_redis, self._ping_redis),
+            ("elasticsearch", HAS_ELASTICSEARCH, self._connect_elasticsearch, self._close_elasticsearch,
+             self._ping_elasticsearch),
+            ("mongodb", HAS_MOTOR, self._connect_mongodb, self._close_mongodb, self._ping_mongodb),
+        ]
+        for name, available, connect, close, ping in backends:
+            self.connections.register(
+                name, connect, close=close, ping=ping,
+                lazy=name in lazy_backends,
+                enabled=available,
+                disabled_reason=f"未安装{name}客户端库"
+            )
+    
+    # 兼容原有属性访问：只返回已就绪的客户端，不会触发连接；
+    # 按需连接(lazy_backends)的后端在首次get_client()之前始终为None，新代码应使用get_client()
+    @property
+    def neo4j_driver(self):
+        return self.connections.client("neo4j")
+    
+    @property
+    def weaviate_client(self):
+        return self.connections.client("weaviate")
+    
+    @property
+    def postgres_pool(self):
+        return self.connections.client("postgres")
+    
+    @property
+    def redis_client(self):
+        return self.connections.client("redis")
+    
+    @property
+    def elasticsearch_client(self):
+        return self.connections.client("elasticsearch")
+    
+    @property
+    def mongodb_client(self):
+        return self.connections.client("mongodb")
     
     async def initialize(self):
-        """初始化所有数据库连接"""
-        try:
-            logger.info("正在初始化统一数据访问层...")
-            
-            # 初始化Neo4j连接
-            await self._init_neo4j()
-            
-            # 初始化Weaviate连接
-            await self._init_weaviate()
-            
-            # 初始化PostgreSQL连接
-            await self._init_postgres()
-            
-            # 初始化Redis连接
-            await self._init_redis()
-            
-            # 初始化Elasticsearch连接
-            await self._init_elasticsearch()
-            
-            # 初始化MongoDB连接
-            await self._init_mongodb()
-            
-            self.initialized = True
-            logger.info("统一数据访问层初始化完成")
-            
-        except Exception as e:
-            logger.error(f"统一数据访问层初始化失败: {e}")
-            raise
+        """并发初始化数据库连接；连接失败的数据库在后台重试，不阻塞服务启动"""
+        logger.info("正在初始化统一数据访问层...")
+        await self.connections.start()
+        self.initialized = True
+        logger.info("统一数据访问层初始化完成")
+    
+    async def get_client(self, name: str) -> Any:
+        """获取就绪的客户端，按需连接的后端在首次调用时连接；不可用时返回None"""
+        return await self.connections.get(name)
     
-    async def _init_neo4j(self):
+    def is_ready(self, name: str) -> bool:
+        return self.connections.is_ready(name)
+    
+    def get_readiness(self) -> Dict[str, Dict[str, Any]]:
+        """各数据库的就绪状态"""
+        return self.connections.readiness()
+    
+    # 各后端表示连接断开的异常类型，其余异常(如查询错误)不影响就绪状态
+    _CONNECTION_ERRORS = {
+        "postgres": PostgresConnectionErrors + (OSError,),
+        "redis": RedisConnectionErrors,
+        "elasticsearch": ElasticsearchConnectionError,
+        "mongodb": MongoConnectionFailure,
+    }
+    
+    def report_error(self, name: str, error: Exception) -> bool:
+        """调用方使用客户端出错时上报；连接类异常使后端转为降级并后台重连，返回是否为连接类异常"""
+        if isinstance(error, self._CONNECTION_ERRORS.get(name, ())):
+            self.connections.report_failure(name, error)
+            return True
+        return False
+    
+    # ==================== 各后端的连接、健康检查与关闭 ====================
+    
+    async def _connect_neo4j(self):
         """初始化Neo4j连接"""
-        try:
-            uri = "bolt://localhost:7687"
-            username = "neo4j"
-            password = "jobfirst_password_2024"
-            
-            self.neo4j_driver = neo4j.AsyncGraphDatabase.driver(
-                uri, auth=(username, password)
-            )
-            logger.info("Neo4j连接初始化成功")
-        except Exception as e:
-            logger.warning(f"Neo4j连接初始化失败: {e}")
+        config = self.config["neo4j"]
+        driver = neo4j.AsyncGraphDatabase.driver(
+            config["uri"], auth=(config["username"], config["password"])
+        )
+        return await self._verified(driver, self._ping_neo4j, self._close_neo4j)
     
-    async def _init_weaviate(self):
-        """初始化Weaviate连接"""
-        try:
-            self.weaviate_client = weaviate.Client(
-                url="http://localhost:8083"
-            )
-            logger.info("Weaviate连接初始化成功")
-        except Exception as e:
-            logger.warning(f"Weaviate连接初始化失败: {e}")
+    async def _ping_neo4j(self, driver):
+        await driver.verify_connectivity()
     
-    async def _init_postgres(self):
-        """初始化PostgreSQL连接池"""
-        try:
-            self.postgres_pool = await asyncpg.create_pool(
-                host="localhost",
-                port=5432,
-                user="postgres",
-                password="jobfirst_password_2024",
-                database="looma_crm",
-                min_size=1,
-                max_size=10
-            )
-            logger.info("PostgreSQL连接池初始化成功")
-        except Exception as e:
-            logger.warning(f"PostgreSQL连接池初始化失败: {e}")
+    async def _close_neo4j(self, driver):
+        await driver.close()
     
-    async def _init_redis(self):
-        """初始化Redis连接"""
-        try:
-            self.redis_client = redis.Redis(
-                host="localhost",
-                port=6379,
-                db=0,
-                decode_responses=True
-            )
-            logger.info("Redis连接初始化成功")
-        except Exception as e:
-            logger.warning(f"Redis连接初始化失败: {e}")
+    async def _connect_weaviate(self):
+        """初始化Weaviate连接(同步客户端，构造时会请求服务，放到线程中执行)"""
+        return await asyncio.to_thread(weaviate.Client, url=self.config["weaviate"]["url"])
     
-    async def _init_elasticsearch(self):
-        """初始化Elasticsearch连接"""
-        try:
-            self.elasticsearch_client = elasticsearch.Elasticsearch(
-                hosts=["http://localhost:9200"]
-            )
-            logger.info("Elasticsearch连接初始化成功")
-        except Exception as e:
-            logger.warning(f"Elasticsearch连接初始化失败: {e}")
+    async def _ping_weaviate(self, client):
+        if not await asyncio.to_thread(client.is_ready):
+            raise ConnectionError("Weaviate未就绪")
+    
+    async def _connect_postgres(self):
+        """初始化PostgreSQL连接池(创建时即建立min_size个连接)"""
+        return await asyncpg.create_pool(**self.config["postgres"])
+    
+    async def _ping_postgres(self, pool):
+        async with pool.acquire() as conn:
+            await conn.execute("SELECT 1")
+    
+    async def _close_postgres(self, pool):
+        await pool.close()
+    
+    async def _connect_redis(self):
+        """初始化Redis异步连接池"""
+        client = aioredis.Redis(decode_responses=True, **self.config["redis"])
+        return await self._verified(client, self._ping_redis, self._close_redis)
+    
+    async def _ping_redis(self, client):
+        await client.ping()
     
-    async def _init_mongodb(self):
+    async def _close_redis(self, client):
+        close = getattr(client, "aclose", None) or client.close
+        await close()
+    
+    async def _connect_elasticsearch(self):
+        """初始化Elasticsearch异步客户端"""
+        client = AsyncElasticsearch(hosts=self.config["elasticsearch"]["hosts"])
+        return await self._verified(client, self._ping_elasticsearch, self._close_elasticsearch)
+    
+    async def _ping_elasticsearch(self, client):
+        if not await client.ping():
+            raise ConnectionError("Elasticsearch ping失败")
+    
+    async def _close_elasticsearch(self, client):
+        await client.close()
+    
+    async def _connect_mongodb(self):
         """初始化MongoDB连接"""
+        config = self.config["mongodb"]
+        client = AsyncIOMotorClient(
+            host=config["host"],
+            port=config["port"],
+            maxPoolSize=config["max_pool_size"],
+            minPoolSize=config["min_pool_size"],
+            serverSelectionTimeoutMS=5000,
+            connectTimeoutMS=10000
+        )
+        return await self._verified(client, self._ping_mongodb, self._close_mongodb)
+    
+    async def _ping_mongodb(self, client):
+        await client.admin.command('ping')
+    
+    async def _close_mongodb(self, client):
+        client.close()
+    
+    @staticmethod
+    async def _verified(client, ping, close):
+        """健康检查通过才返回客户端，失败或超时取消时关闭客户端，避免泄漏连接"""
         try:
-            self.mongodb_client = AsyncIOMotorClient(
-                host="localhost",
-                port=27017,
-                maxPoolSize=100,
-                minPoolSize=10,
-                serverSelectionTimeoutMS=5000,
-                connectTimeoutMS=10000
-            )
-            
-            # 测试连接
-            await self.mongodb_client.admin.command('ping')
-            logger.info("MongoDB连接初始化成功")
-        except Exception as e:
-            logger.warning(f"MongoDB连接初始化失败: {e}")
-            # 如果连接失败，尝试无认证连接
+            await ping(client)
+        except BaseException:
             try:
-                self.mongodb_client = AsyncIOMotorClient(
-                    host="localhost",
-                    port=27017,
-                    maxPoolSize=100,
-                    minPoolSize=10,
-                    serverSelectionTimeoutMS=5000,
-                    connectTimeoutMS=10000
-                )
-                await self.mongodb_client.admin.command('ping')
-                logger.info("MongoDB连接初始化成功 (无认证模式)")
-            except Exception as e2:
-                logger.warning(f"MongoDB连接初始化失败 (无认证模式): {e2}")
-                self.mongodb_client = None
+                await close(client)
+            except Exception:
+                pass
+            raise
+        return client
+    
+    async def _mongodb(self):
+        return await self.connections.get("mongodb")
+    
+    def _report_mongodb_error(self, error: Exception):
+        self.report_error("mongodb", error)
     
     async def get_talent_data(self, talent_id: str) -> Dict[str, Any]:
         """获取人才数据"""
         try:
             # 首先尝试从MongoDB获取人才数据
-            if self.mongodb_client:
+            mongodb_client = await self._mongodb()
+            if mongodb_client:
                 try:
-                    db = self.mongodb_client.looma_crm
+                    db = mongodb_client.looma_crm
                     collection = db.talents
                     talent_doc = await collection.find_one({"talent_id": talent_id})
                     if talent_doc:
@@ -174,6 +317,7 @@ class UnifiedDataAccess:
                         logger.info(f"从MongoDB获取人才数据: {talent_id}")
                         return talent_data
                 except Exception as e:
+                    self._report_mongodb_error(e)
                     logger.warning(f"从MongoDB获取人才数据失败: {e}")
             
             # 如果MongoDB中没有数据，返回默认数据
@@ -198,9 +342,10 @@ class UnifiedDataAccess:
         """保存人才数据"""
         try:
             # 保存到MongoDB
-            if self.mongodb_client:
+            mongodb_client = await self._mongodb()
+            if mongodb_client:
                 try:
-                    db = self.mongodb_client.looma_crm
+                    db = mongodb_client.looma_crm
                     collection = db.talents
                     
                     # 添加时间戳
@@ -221,10 +366,11 @@ class UnifiedDataAccess:
                         return True
                         
                 except Exception as e:
+                    self._report_mongodb_error(e)
                     logger.error(f"保存人才数据到MongoDB失败: {e}")
                     return False
             else:
-                logger.warning("MongoDB客户端未初始化，无法保存人才数据")
+                logger.warning("MongoDB不可用，无法保存人才数据")
                 return False
             
         except Exception as e:
@@ -234,18 +380,8 @@ class UnifiedDataAccess:
     async def close(self):
         """关闭所有数据库连接"""
         try:
-            if self.neo4j_driver:
-                await self.neo4j_driver.close()
-            
-            if self.postgres_pool:
-                await self.postgres_pool.close()
-            
-            if self.redis_client:
-                self.redis_client.close()
-            
-            if self.mongodb_client:
-                self.mongodb_client.close()
-            
+            await self.connections.close()
+            self.initialized = False
             logger.info("所有数据库连接已关闭")
             
         except Exception as e:
@@ -255,14 +391,16 @@ class UnifiedDataAccess:
     async def get_mongodb_health(self) -> Dict[str, Any]:
         """获取MongoDB健康状态"""
         try:
-            if not self.mongodb_client:
-                return {"status": "disconnected", "error": "MongoDB客户端未初始化"}
+            mongodb_client = await self._mongodb()
+            if not mongodb_client:
+                state = self.connections.readiness().get("mongodb", {})
+                return {"status": "disconnected", "error": state.get("error") or "MongoDB客户端未初始化"}
             
             # 测试连接
-            await self.mongodb_client.admin.command('ping')
+            await mongodb_client.admin.command('ping')
             
             # 获取服务器信息
-            server_info = await self.mongodb_client.server_info()
+            server_info = await mongodb_client.server_info()
             
             return {
                 "status": "connected",
@@ -273,16 +411,18 @@ class UnifiedDataAccess:
             }
             
         except Exception as e:
+            self._report_mongodb_error(e)
             return {"status": "error", "error": str(e)}
     
     async def create_talent_collection_indexes(self):
         """为人才集合创建索引"""
         try:
-            if not self.mongodb_client:
-                logger.warning("MongoDB客户端未初始化，无法创建索引")
+            mongodb_client = await self._mongodb()
+            if not mongodb_client:
+                logger.warning("MongoDB不可用，无法创建索引")
                 return False
             
-            db = self.mongodb_client.looma_crm
+            db = mongodb_client.looma_crm
             collection = db.talents
             
             # 创建索引
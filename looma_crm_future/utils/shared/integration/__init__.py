@@ -3,5 +3,9 @@ Zervigo子系统集成包
 """
 
 from .zervigo_client import ZervigoClient
+from .token_cache import (
+    TokenVerificationCache, TokenRevocationStore, token_fingerprint, decode_token_expiry
+)
 
-__all__ = ['ZervigoClient']
+__all__ = ['ZervigoClient', 'TokenVerificationCache', 'TokenRevocationStore',
+           'token_fingerprint', 'decode_token_expiry']
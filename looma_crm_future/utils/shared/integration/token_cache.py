@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Token验证结果缓存
+以token的SHA-256摘要为键缓存认证服务返回的用户声明，
+过期时间取token自身的exp与最大TTL中较早者，支持按token撤销(登出)；
+配置Redis时撤销记录在各worker间共享
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def token_fingerprint(token: str) -> str:
+    """token摘要，缓存与并发合并都以摘要为键，内存中不保留原始token"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def decode_token_expiry(token: str) -> Optional[float]:
+    """
+    读取JWT载荷中的exp(秒级时间戳)
+
+    只用于限定缓存时长，签名仍由认证服务校验；非JWT或没有exp时返回None
+    """
+    parts = token.split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + '=' * (-len(parts[1]) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        exp = claims.get('exp') if isinstance(claims, dict) else None
+        return float(exp) if exp is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+def revocation_expiry(token: str, max_ttl: float) -> float:
+    """撤销记录的过期时间：token自身过期后撤销记录不再需要，最长保留max_ttl"""
+    expires_at = time.time() + max_ttl
+    token_exp = decode_token_expiry(token)
+    if token_exp is not None:
+        expires_at = min(expires_at, token_exp)
+    return expires_at
+
+
+class TokenVerificationCache:
+    """已验证token的声明缓存(LRU + 过期时间)"""
+
+    def __init__(self, max_entries: int = 10000, max_ttl: float = 300.0,
+                 default_ttl: float = 60.0):
+        """
+        Args:
+            max_entries: 最多缓存的token数
+            max_ttl: 单个token最长缓存时间(秒)，撤销未通知到时的最大延迟
+            default_ttl: 无法读取exp时的缓存时间(秒)
+        """
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.default_ttl = default_ttl
+        # token摘要 -> (过期时间, 验证结果)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # 已撤销token摘要 -> 撤销记录过期时间，防止撤销前发出的验证把结果写回缓存
+        self._revoked: "OrderedDict[str, float]" = OrderedDict()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evicted': 0,
+            'invalidated': 0
+        }
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """返回未过期的验证结果，未命中返回None"""
+        key = token_fingerprint(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        expires_at, result = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return result
+
+    def set(self, token: str, result: Dict[str, Any]):
+        """缓存验证通过的结果，失败结果不缓存"""
+        if not result.get('valid'):
+            return
+        now = time.time()
+        expires_at = now + self.max_ttl
+        token_exp = decode_token_expiry(token)
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        else:
+            expires_at = min(expires_at, now + self.default_ttl)
+        if expires_at <= now:
+            return
+
+        key = token_fingerprint(token)
+        if self._is_revoked(key, now):
+            return
+        self._remove(key)
+        self._entries[key] = (expires_at, result)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats['evicted'] += 1
+
+    def invalidate_token(self, token: str) -> bool:
+        """撤销单个token(如登出)，撤销记录保留至token过期或max_ttl后，期间不再缓存该token"""
+        key = token_fingerprint(token)
+        self._revoked.pop(key, None)
+        self._revoked[key] = revocation_expiry(token, self.max_ttl)
+        while len(self._revoked) > self.max_entries:
+            self._revoked.popitem(last=False)
+
+        removed = self._remove(key)
+        if removed:
+            self.stats['invalidated'] += 1
+        return removed
+
+    def is_revoked(self, token: str) -> bool:
+        return self._is_revoked(token_fingerprint(token), time.time())
+
+    def _is_revoked(self, key: str, now: float) -> bool:
+        expires_at = self._revoked.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            del self._revoked[key]
+            return False
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self._revoked.clear()
+
+    def _remove(self, key: str) -> bool:
+        return self._entries.pop(key, None) is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+        }
+
+
+class TokenRevocationStore:
+    """
+    跨worker共享的token撤销记录
+
+    每个撤销的token对应一个带过期时间的Redis键，各worker在本地缓存命中时检查；
+    Redis不可用时只记录日志，本地缓存仍最迟在max_ttl后重新验证
+    """
+
+    def __init__(self, redis_client, key_prefix: str = "looma:auth:revoked:", max_ttl: float = 300.0):
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.max_ttl = max_ttl
+        self.stats = {
+            'revoked': 0,
+            'checks': 0,
+            'hits': 0,
+            'errors': 0
+        }
+
+    def _key(self, token: str) -> str:
+        return f"{self.key_prefix}{token_fingerprint(token)}"
+
+    async def revoke(self, token: str) -> bool:
+        """写入撤销记录，token已过期时无需记录"""
+        ttl = math.ceil(revocation_expiry(token, self.max_ttl) - time.time())
+        if ttl <= 0:
+            return False
+        try:
+            await self.redis.set(self._key(token), 1, ex=ttl)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"写入共享token撤销记录失败: {e}")
+            return False
+        self.stats['revoked'] += 1
+        return True
+
+    async def is_revoked(self, token: str) -> bool:
+        self.stats['checks'] += 1
+        try:
+            revoked = bool(await self.redis.exists(self._key(token)))
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"查询共享token撤销记录失败: {e}")
+            return False
+        if revoked:
+            self.stats['hits'] += 1
+        return revoked
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
@@ -11,6 +11,8 @@ from typing import Dict, Any, Optional, List
 import aiohttp
 from datetime import datetime
 
+from .token_cache import token_fingerprint
+
 logger = logging.getLogger(__name__)
 
 class ZervigoClient:
@@ -37,15 +39,54 @@ class ZervigoClient:
         # 超时配置
         self.timeout = aiohttp.ClientTimeout(total=30)
         
+        # 连接池配置：整个客户端共用一个长连接会话
+        self.connection_limit = int(config.get('connection_limit', 100))
+        self.connection_limit_per_host = int(config.get('connection_limit_per_host', 30))
+        self.keepalive_timeout = float(config.get('keepalive_timeout', 60))
+        
+        # 通过start()或在上下文外直接调用时会话常驻，需由持有者调用close()
+        self._persistent = False
+        self._context_depth = 0
+        # token摘要 -> 进行中的验证，同一token的并发验证只发一次请求
+        self._inflight_verifications: Dict[str, asyncio.Future] = {}
+        
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """按需创建共享会话"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=aiohttp.TCPConnector(
+                    limit=self.connection_limit,
+                    limit_per_host=self.connection_limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=300
+                )
+            )
+        return self.session
+    
+    async def start(self):
+        """创建常驻会话，供中间件等长期持有者使用"""
+        self._persistent = True
+        self._ensure_session()
+    
+    async def close(self):
+        """关闭共享会话"""
+        self._persistent = False
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        
     async def __aenter__(self):
         """异步上下文管理器入口"""
-        self.session = aiohttp.ClientSession(timeout=self.timeout)
+        self._context_depth += 1
+        self._ensure_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """异步上下文管理器出口"""
-        if self.session:
-            await self.session.close()
+        """异步上下文管理器出口，最后一个使用者退出且会话非常驻时才关闭"""
+        self._context_depth = max(0, self._context_depth - 1)
+        if self._context_depth == 0 and not self._persistent:
+            await self.close()
     
     async def _make_request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
         """
@@ -59,11 +100,12 @@ class ZervigoClient:
         Returns:
             响应数据字典
         """
-        if not self.session:
-            raise RuntimeError("Client session not initialized. Use async context manager.")
+        if self._context_depth == 0:
+            self._persistent = True
+        session = self._ensure_session()
         
         try:
-            async with self.session.request(method, url, **kwargs) as response:
+            async with session.request(method, url, **kwargs) as response:
                 response_data = await response.json()
                 
                 if response.status >= 400:
@@ -99,7 +141,7 @@ class ZervigoClient:
     
     async def verify_token(self, token: str) -> Dict[str, Any]:
         """
-        验证JWT token
+        验证JWT token，同一token的并发验证合并为一次请求
         
         Args:
             token: JWT token
@@ -107,6 +149,38 @@ class ZervigoClient:
         Returns:
             验证结果
         """
+        key = token_fingerprint(token)
+        while True:
+            inflight = self._inflight_verifications.get(key)
+            if inflight is None:
+                break
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # 发起验证的请求被取消时由当前请求重新发起
+                if not inflight.cancelled():
+                    raise
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_verifications[key] = future
+        try:
+            result = await self._verify_token_remote(token)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 没有其他等待者时避免"exception was never retrieved"警告
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight_verifications.pop(key, None)
+    
+    async def _verify_token_remote(self, token: str) -> Dict[str, Any]:
+        """调用认证服务验证token"""
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
@@ -133,6 +207,32 @@ class ZervigoClient:
                 'error': result['error']
             }
     
+    async def logout(self, token: str) -> Dict[str, Any]:
+        """
+        通知认证服务登出
+        
+        Args:
+            token: JWT token
+            
+        Returns:
+            登出结果
+        """
+        headers = {
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        }
+        url = f"{self.auth_service_url}/api/v1/auth/logout"
+        
+        result = await self._make_request('POST', url, headers=headers)
+        
+        if result['success']:
+            return {'success': True}
+        else:
+            return {
+                'success': False,
+                'error': result['error']
+            }
+    
     async def get_user_permissions(self, user_id: int) -> Dict[str, Any]:
         """
         获取用户权限
@@ -505,10 +605,9 @@ class ZervigoClient:
             所有服务健康状态
         """
         services = ['auth', 'ai', 'resume', 'job', 'company', 'user']
-        health_status = {}
         
-        for service in services:
-            health_status[service] = await self.check_service_health(service)
+        results = await asyncio.gather(*[self.check_service_health(service) for service in services])
+        health_status = dict(zip(services, results))
         
         return {
             'success': True,
@@ -2,6 +2,9 @@
 """
 Zervigo认证中间件
 用于Looma CRM与Zervigo认证服务的集成
+验证通过的token在本地缓存至其过期(或最大TTL)，登出时撤销本地缓存，
+配置共享撤销记录时其他worker在缓存命中时也会发现撤销；
+改密、权限变更等在认证服务侧生效，本地缓存最迟在token_cache_ttl后重新验证
 """
 
 import logging
@@ -9,28 +12,83 @@ from typing import Optional, Dict, Any
 from sanic import Request, HTTPResponse
 from sanic.response import json as sanic_json
 
-from ..integration import ZervigoClient
+from ..integration import ZervigoClient, TokenVerificationCache, TokenRevocationStore
 
 logger = logging.getLogger(__name__)
 
 class ZervigoAuthMiddleware:
     """Zervigo认证中间件"""
     
-    def __init__(self, zervigo_config: Dict[str, str]):
+    def __init__(self, zervigo_config: Dict[str, str],
+                 token_cache: Optional[TokenVerificationCache] = None,
+                 revocation_store: Optional[TokenRevocationStore] = None):
         """
         初始化认证中间件
         
         Args:
-            zervigo_config: Zervigo服务配置
+            zervigo_config: Zervigo服务配置，可含token_cache_size/token_cache_ttl
+            token_cache: 外部传入的token缓存，默认按配置创建
+            revocation_store: 跨worker共享的撤销记录，未配置时撤销只在本worker生效
         """
         self.zervigo_config = zervigo_config
         self.zervigo_client: Optional[ZervigoClient] = None
+        self.token_cache = token_cache or TokenVerificationCache(
+            max_entries=int(zervigo_config.get('token_cache_size', 10000)),
+            max_ttl=float(zervigo_config.get('token_cache_ttl', 300))
+        )
+        self.revocation_store = revocation_store
     
     async def setup(self):
         """设置中间件"""
         self.zervigo_client = ZervigoClient(self.zervigo_config)
+        await self.zervigo_client.start()
         logger.info("Zervigo认证中间件初始化完成")
     
+    async def close(self):
+        """关闭客户端会话并清空缓存"""
+        if self.zervigo_client is not None:
+            await self.zervigo_client.close()
+        self.token_cache.clear()
+    
+    async def verify_token(self, token: str) -> Dict[str, Any]:
+        """先查本地缓存，未命中时调用认证服务并缓存通过的结果"""
+        cached = self.token_cache.get(token)
+        if cached is not None:
+            if not await self._is_revoked_elsewhere(token):
+                return cached
+            # 其他worker已撤销，丢弃本地缓存并重新验证
+            self.token_cache.invalidate_token(token)
+        
+        if not self.zervigo_client:
+            await self.setup()
+        
+        auth_result = await self.zervigo_client.verify_token(token)
+        # 验证期间token被撤销时不写回缓存，本worker的撤销由token_cache.set自行拦截
+        if auth_result.get('valid') and not await self._is_revoked_elsewhere(token):
+            self.token_cache.set(token, auth_result)
+        return auth_result
+    
+    async def _is_revoked_elsewhere(self, token: str) -> bool:
+        if self.revocation_store is None:
+            return False
+        return await self.revocation_store.is_revoked(token)
+    
+    async def revoke_token(self, token: str) -> bool:
+        """撤销单个token的本地缓存，并写入共享撤销记录"""
+        removed = self.token_cache.invalidate_token(token)
+        if self.revocation_store is not None:
+            await self.revocation_store.revoke(token)
+        return removed
+    
+    async def logout(self, token: str) -> Dict[str, Any]:
+        """登出：先撤销缓存，再通知认证服务"""
+        await self.revoke_token(token)
+        
+        if not self.zervigo_client:
+            await self.setup()
+        
+        return await self.zervigo_client.logout(token)
+    
     async def authenticate_request(self, request: Request) -> Optional[HTTPResponse]:
         """
         认证请求
@@ -62,30 +120,26 @@ class ZervigoAuthMiddleware:
             # 提取token
             token = auth_header.replace('Bearer ', '')
             
-            # 使用Zervigo客户端验证token
-            if not self.zervigo_client:
-                await self.setup()
+            # 验证token(本地缓存未命中时调用Zervigo认证服务)
+            auth_result = await self.verify_token(token)
+            
+            if not auth_result['valid']:
+                logger.warning(f"Token验证失败: {auth_result.get('error', 'Unknown error')}")
+                return sanic_json({
+                    "error": "认证失败",
+                    "code": "INVALID_TOKEN",
+                    "message": "认证token无效或已过期"
+                }, status=401)
+            
+            # 将用户信息存储到请求上下文
+            request.ctx.user_id = auth_result['user_id']
+            request.ctx.username = auth_result['username']
+            request.ctx.permissions = auth_result.get('permissions', [])
+            request.ctx.user_info = auth_result.get('user_info', {})
+            
+            logger.debug(f"用户认证成功: {auth_result['username']} (ID: {auth_result['user_id']})")
+            return None  # 认证成功，继续处理
             
-            async with self.zervigo_client as client:
-                auth_result = await client.verify_token(token)
-                
-                if not auth_result['valid']:
-                    logger.warning(f"Token验证失败: {auth_result.get('error', 'Unknown error')}")
-                    return sanic_json({
-                        "error": "认证失败",
-                        "code": "INVALID_TOKEN",
-                        "message": "认证token无效或已过期"
-                    }, status=401)
-                
-                # 将用户信息存储到请求上下文
-                request.ctx.user_id = auth_result['user_id']
-                request.ctx.username = auth_result['username']
-                request.ctx.permissions = auth_result['permissions']
-                request.ctx.user_info = auth_result['user_info']
-                
-                logger.info(f"用户认证成功: {auth_result['username']} (ID: {auth_result['user_id']})")
-                return None  # 认证成功，继续处理
-                
         except Exception as e:
             logger.error(f"认证过程发生异常: {e}")
             return sanic_json({
@@ -113,10 +167,8 @@ class ZervigoAuthMiddleware:
             if not self.zervigo_client:
                 await self.setup()
             
-            async with self.zervigo_client as client:
-                has_permission = await client.check_permission(user_id, required_permission)
-                return has_permission
-                
+            return await self.zervigo_client.check_permission(user_id, required_permission)
+            
         except Exception as e:
             logger.error(f"权限检查异常: {e}")
             return False
@@ -139,15 +191,14 @@ class ZervigoAuthMiddleware:
             if not self.zervigo_client:
                 await self.setup()
             
-            async with self.zervigo_client as client:
-                permissions_result = await client.get_user_permissions(user_id)
-                
-                if permissions_result['success']:
-                    return permissions_result['permissions']
-                else:
-                    logger.warning(f"获取用户权限失败: {permissions_result['error']}")
-                    return []
-                    
+            permissions_result = await self.zervigo_client.get_user_permissions(user_id)
+            
+            if permissions_result['success']:
+                return permissions_result['permissions']
+            else:
+                logger.warning(f"获取用户权限失败: {permissions_result['error']}")
+                return []
+            
         except Exception as e:
             logger.error(f"获取用户权限异常: {e}")
             return []
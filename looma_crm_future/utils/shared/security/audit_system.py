@@ -2,13 +2,20 @@
 """
 数据访问审计系统
 实现完整的数据访问审计、监控和合规性检查
+内存存储为带用户/事件类型索引的环形缓冲区，阈值规则基于滑动窗口计数，
+可选后台批量写入SQLite/PostgreSQL
 """
 
 import asyncio
 import logging
 import json
 import hashlib
-from typing import Dict, Any, List, Optional, Set, Union
+import heapq
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Set, Union, Tuple, Iterable
 from datetime import datetime, timedelta
 from enum import Enum
 from dataclasses import dataclass, field, asdict
@@ -114,42 +121,339 @@ class AuditStorage(ABC):
         """获取用户审计事件"""
         pass
 
+AUDIT_COLUMNS = (
+    "event_id", "event_type", "user_id", "username", "session_id", "ip_address",
+    "user_agent", "resource_type", "resource_id", "action", "status", "level",
+    "details", "timestamp", "duration_ms", "error_message"
+)
+
+def _event_to_row(event: AuditEvent) -> tuple:
+    """审计事件转换为持久化行，列顺序同AUDIT_COLUMNS"""
+    return (
+        event.event_id, event.event_type.value, event.user_id, event.username,
+        event.session_id, event.ip_address, event.user_agent, event.resource_type,
+        event.resource_id, event.action, event.status.value, event.level.value,
+        json.dumps(event.details, ensure_ascii=False, default=str), event.timestamp,
+        event.duration_ms, event.error_message
+    )
+
+class AuditSink(ABC):
+    """审计事件持久化目标"""
+    
+    @abstractmethod
+    async def write_batch(self, events: List[AuditEvent]):
+        """批量写入审计事件"""
+        pass
+    
+    async def close(self):
+        """释放资源"""
+        pass
+
+class SQLiteAuditSink(AuditSink):
+    """SQLite审计持久化，写入在线程中执行，不阻塞事件循环"""
+    
+    def __init__(self, db_path: str = "audit_events.db", table_name: str = "audit_events"):
+        self.db_path = db_path
+        self.table_name = table_name
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table_name} (
+                    event_id TEXT PRIMARY KEY,
+                    event_type TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    username TEXT,
+                    session_id TEXT,
+                    ip_address TEXT,
+                    user_agent TEXT,
+                    resource_type TEXT,
+                    resource_id TEXT,
+                    action TEXT,
+                    status TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    details TEXT,
+                    timestamp TEXT NOT NULL,
+                    duration_ms INTEGER,
+                    error_message TEXT
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_user_time "
+                         f"ON {self.table_name} (user_id, timestamp)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_type_time "
+                         f"ON {self.table_name} (event_type, timestamp)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def _write_rows(self, rows: List[tuple]):
+        conn = self._connect()
+        placeholders = ", ".join("?" for _ in AUDIT_COLUMNS)
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table_name} ({', '.join(AUDIT_COLUMNS)}) VALUES ({placeholders})",
+                rows
+            )
+    
+    async def write_batch(self, events: List[AuditEvent]):
+        rows = []
+        for event in events:
+            row = list(_event_to_row(event))
+            row[13] = event.timestamp.isoformat()
+            rows.append(tuple(row))
+        await asyncio.to_thread(self._write_rows, rows)
+    
+    async def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.to_thread(conn.close)
+
+class PostgresAuditSink(AuditSink):
+    """PostgreSQL审计持久化，使用COPY批量写入"""
+    
+    def __init__(self, config: Dict[str, Any], table_name: str = "audit_events"):
+        self.config = config
+        self.table_name = table_name
+        self.pool = None
+        self._pool_lock = asyncio.Lock()
+        
+        try:
+            import asyncpg
+            self._asyncpg = asyncpg
+        except ImportError:
+            logger.error("asyncpg未安装，无法使用PostgreSQL审计存储")
+            raise
+    
+    async def _get_pool(self):
+        """首次使用时创建连接池并建表"""
+        if self.pool is not None:
+            return self.pool
+        
+        async with self._pool_lock:
+            if self.pool is None:
+                pool = await self._asyncpg.create_pool(
+                    host=self.config.get("host", "localhost"),
+                    port=self.config.get("port", 5432),
+                    user=self.config.get("user", "postgres"),
+                    password=self.config.get("password", ""),
+                    database=self.config.get("database", "looma_crm"),
+                    min_size=self.config.get("min_size", 1),
+                    max_size=self.config.get("max_size", 3)
+                )
+                async with pool.acquire() as conn:
+                    table = self.table_name
+                    await conn.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {table} (
+                            event_id TEXT PRIMARY KEY,
+                            event_type TEXT NOT NULL,
+                            user_id TEXT NOT NULL,
+                            username TEXT,
+                            session_id TEXT,
+                            ip_address TEXT,
+                            user_agent TEXT,
+                            resource_type TEXT,
+                            resource_id TEXT,
+                            action TEXT,
+                            status TEXT NOT NULL,
+                            level TEXT NOT NULL,
+                            details JSONB NOT NULL DEFAULT '{{}}',
+                            timestamp TIMESTAMP NOT NULL,
+                            duration_ms INTEGER,
+                            error_message TEXT
+                        );
+                        CREATE INDEX IF NOT EXISTS idx_{table}_user_time ON {table} (user_id, timestamp DESC);
+                        CREATE INDEX IF NOT EXISTS idx_{table}_type_time ON {table} (event_type, timestamp DESC);
+                    """)
+                self.pool = pool
+                logger.info("PostgreSQL审计存储连接成功")
+        
+        return self.pool
+    
+    async def write_batch(self, events: List[AuditEvent]):
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.copy_records_to_table(
+                self.table_name,
+                records=[_event_to_row(event) for event in events],
+                columns=list(AUDIT_COLUMNS)
+            )
+    
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+class BatchedAuditWriter:
+    """后台批量写入器
+
+    事件进入有界队列，后台任务按batch_size或flush_interval批量写入持久化目标；
+    队列满时丢弃新事件并计数，不阻塞业务请求
+    """
+    
+    def __init__(self, sink: AuditSink, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_queue_size: int = 50000, max_retries: int = 3):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed_batches": 0
+        }
+    
+    def enqueue(self, event: AuditEvent) -> bool:
+        """事件入队，必要时启动后台任务"""
+        if self._closing:
+            return False
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] % 1000 == 1:
+                logger.warning(f"审计持久化队列已满，已丢弃 {self.stats['dropped']} 条事件")
+            return False
+        self.stats["enqueued"] += 1
+        return True
+    
+    async def _next_batch(self) -> List[AuditEvent]:
+        """等待第一条事件，再在flush_interval内凑满一批"""
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0 or self._closing:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _write(self, batch: List[AuditEvent]):
+        for attempt in range(self.max_retries):
+            try:
+                await self.sink.write_batch(batch)
+                self.stats["written"] += len(batch)
+                return
+            except Exception as e:
+                logger.error(f"审计事件批量写入失败(第{attempt + 1}次): {e}")
+                await asyncio.sleep(min(2 ** attempt, 10))
+        self.stats["failed_batches"] += 1
+    
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            await self._write(batch)
+            for _ in batch:
+                self.queue.task_done()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "queue_size": self.queue.qsize()}
+    
+    async def close(self, timeout: float = 10.0):
+        """写完队列中剩余事件后关闭"""
+        self._closing = True
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"审计持久化关闭超时，剩余 {self.queue.qsize()} 条事件未写入")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.sink.close()
+
 class MemoryAuditStorage(AuditStorage):
-    """内存审计存储"""
+    """内存审计存储
+
+    固定大小环形缓冲区，按用户和事件类型维护序号索引；
+    配置writer时事件同时进入后台批量持久化
+    """
+    
+    def __init__(self, max_events: int = 10000, writer: Optional[BatchedAuditWriter] = None):
+        self.max_events = max_events  # 最大存储事件数
+        self.writer = writer
+        self._ring: List[Optional[AuditEvent]] = [None] * max_events
+        self._next_seq = 0
+        # 索引中的序号按写入顺序递增，被覆盖的事件总在队首
+        self._by_user: Dict[str, deque] = {}
+        self._by_type: Dict[AuditEventType, deque] = {}
+    
+    @property
+    def events(self) -> List[AuditEvent]:
+        """按写入顺序排列的当前事件"""
+        return [self._ring[seq % self.max_events] for seq in range(self._oldest_seq(), self._next_seq)]
+    
+    def _oldest_seq(self) -> int:
+        return max(0, self._next_seq - self.max_events)
     
-    def __init__(self):
-        self.events: List[AuditEvent] = []
-        self.max_events = 10000  # 最大存储事件数
+    @staticmethod
+    def _unindex(index: Dict[Any, deque], key: Any, seq: int):
+        seqs = index.get(key)
+        if seqs and seqs[0] == seq:
+            seqs.popleft()
+            if not seqs:
+                del index[key]
     
     async def store_event(self, event: AuditEvent) -> bool:
         """存储审计事件"""
-        self.events.append(event)
+        seq = self._next_seq
+        slot = seq % self.max_events
         
-        # 保持最大事件数限制
-        if len(self.events) > self.max_events:
-            self.events = self.events[-self.max_events:]
+        # 覆盖最旧的事件
+        evicted = self._ring[slot]
+        if evicted is not None:
+            evicted_seq = seq - self.max_events
+            self._unindex(self._by_user, evicted.user_id, evicted_seq)
+            self._unindex(self._by_type, evicted.event_type, evicted_seq)
+        
+        self._ring[slot] = event
+        self._next_seq += 1
+        self._by_user.setdefault(event.user_id, deque()).append(seq)
+        self._by_type.setdefault(event.event_type, deque()).append(seq)
+        
+        if self.writer is not None:
+            self.writer.enqueue(event)
         
         logger.debug(f"审计事件已存储: {event.event_id}")
         return True
     
+    def _candidates(self, filters: Dict[str, Any]) -> Iterable[AuditEvent]:
+        """从最窄的索引取候选事件，按写入顺序返回"""
+        if 'user_id' in filters:
+            seqs = self._by_user.get(filters['user_id'], ())
+        elif 'event_type' in filters:
+            seqs = self._by_type.get(filters['event_type'], ())
+        else:
+            seqs = range(self._oldest_seq(), self._next_seq)
+        return (self._ring[seq % self.max_events] for seq in seqs)
+    
     async def get_events(self, filters: Dict[str, Any], limit: int = 100) -> List[AuditEvent]:
-        """获取审计事件"""
-        filtered_events = []
-        
-        for event in self.events:
-            if self._matches_filters(event, filters):
-                filtered_events.append(event)
-        
-        # 按时间倒序排列
-        filtered_events.sort(key=lambda x: x.timestamp, reverse=True)
-        
-        return filtered_events[:limit]
+        """获取审计事件(按时间倒序)"""
+        matched = (event for event in self._candidates(filters) if self._matches_filters(event, filters))
+        return heapq.nlargest(limit, matched, key=lambda x: x.timestamp)
     
     async def get_events_by_user(self, user_id: str, limit: int = 100) -> List[AuditEvent]:
         """获取用户审计事件"""
-        user_events = [event for event in self.events if event.user_id == user_id]
-        user_events.sort(key=lambda x: x.timestamp, reverse=True)
-        return user_events[:limit]
+        return heapq.nlargest(limit, self._candidates({'user_id': user_id}), key=lambda x: x.timestamp)
     
     def _matches_filters(self, event: AuditEvent, filters: Dict[str, Any]) -> bool:
         """检查事件是否匹配过滤器"""
@@ -169,12 +473,51 @@ class MemoryAuditStorage(AuditStorage):
         
         return True
 
+class SlidingWindowCounter:
+    """滑动窗口计数器
+
+    窗口划分为固定数量的桶，计数与过期均摊O(1)；精度为一个桶的宽度
+    """
+    
+    def __init__(self, window_seconds: float, buckets: int = 60):
+        self.window_seconds = window_seconds
+        self.bucket_width = window_seconds / buckets
+        self._buckets: deque = deque()  # (桶编号, 计数)
+        self.total = 0
+    
+    def _expire(self, now: float):
+        oldest_bucket = int((now - self.window_seconds) // self.bucket_width)
+        while self._buckets and self._buckets[0][0] <= oldest_bucket:
+            self.total -= self._buckets.popleft()[1]
+    
+    def add(self, now: float, amount: int = 1) -> int:
+        """记录事件并返回窗口内计数"""
+        bucket = int(now // self.bucket_width)
+        if self._buckets and self._buckets[-1][0] >= bucket:
+            # 同一桶(或时间回拨)时累加到最新桶
+            last_bucket, count = self._buckets[-1]
+            self._buckets[-1] = (last_bucket, count + amount)
+        else:
+            self._buckets.append((bucket, amount))
+        self.total += amount
+        self._expire(now)
+        return self.total
+    
+    def count(self, now: float) -> int:
+        self._expire(now)
+        return self.total
+
 class AuditRuleEngine:
     """审计规则引擎"""
     
-    def __init__(self):
+    def __init__(self, max_window_keys: int = 100000):
         self.rules: Dict[str, AuditRule] = {}
         self.alerts: List[AuditAlert] = []
+        # (规则ID, 用户ID) -> 滑动窗口计数器 / 最近一次告警时间
+        self.max_window_keys = max_window_keys
+        self._window_counters: Dict[Tuple[str, str], SlidingWindowCounter] = {}
+        self._last_alerted: Dict[Tuple[str, str], float] = {}
+        self._last_prune = time.time()
         self._initialize_default_rules()
     
     def _initialize_default_rules(self):
@@ -279,14 +622,59 @@ class AuditRuleEngine:
             elif event.action != conditions['action']:
                 return False
         
-        # 检查阈值条件（需要历史数据）
+        # 检查阈值条件：按用户统计时间窗口内满足上述条件的事件数
         if 'threshold' in conditions:
-            # 这里需要查询历史事件来计算阈值
-            # 暂时返回False，实际实现需要数据库查询
-            pass
+            return self._check_threshold(event, rule)
+        
+        return True
+    
+    @staticmethod
+    def _window_seconds(conditions: Dict[str, Any]) -> float:
+        if 'time_window_minutes' in conditions:
+            return conditions['time_window_minutes'] * 60
+        if 'time_window_hours' in conditions:
+            return conditions['time_window_hours'] * 3600
+        return conditions.get('time_window_seconds', 60)
+    
+    def _check_threshold(self, event: AuditEvent, rule: AuditRule) -> bool:
+        """窗口内计数达到阈值时触发；同一用户在一个窗口内只告警一次"""
+        window_seconds = self._window_seconds(rule.conditions)
+        key = (rule.rule_id, event.user_id)
+        now = event.timestamp.timestamp()
+        
+        counter = self._window_counters.get(key)
+        if counter is None:
+            counter = SlidingWindowCounter(window_seconds)
+            self._window_counters[key] = counter
+            # 先计数再清理，否则新建的空计数器会被当作已清空的计数器移除
+            total = counter.add(now)
+            self._prune_window_counters(now)
+        else:
+            total = counter.add(now)
+        
+        if total < rule.conditions['threshold']:
+            return False
         
+        last_alerted = self._last_alerted.get(key)
+        if last_alerted is not None and now - last_alerted < window_seconds:
+            return False
+        self._last_alerted[key] = now
         return True
     
+    def _prune_window_counters(self, now: float):
+        """定期移除已清空的计数器，超出上限时淘汰最早创建的计数器"""
+        if len(self._window_counters) <= self.max_window_keys and now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        for key in [key for key, counter in self._window_counters.items() if counter.count(now) == 0]:
+            del self._window_counters[key]
+        for key in list(self._window_counters)[:max(0, len(self._window_counters) - self.max_window_keys)]:
+            del self._window_counters[key]
+        for key, alerted in list(self._last_alerted.items()):
+            rule = self.rules.get(key[0])
+            if rule is None or now - alerted >= self._window_seconds(rule.conditions):
+                del self._last_alerted[key]
+    
     async def _create_alert(self, event: AuditEvent, rule: AuditRule) -> AuditAlert:
         """创建告警"""
         alert = AuditAlert(
@@ -305,14 +693,76 @@ class AuditRuleEngine:
         logger.warning(f"审计告警: {alert.alert_id} - {alert.message}")
         return alert
 
+def default_audit_config() -> Dict[str, Any]:
+    """默认审计配置，可用环境变量覆盖；sink为none时只保留内存环形缓冲区"""
+    return {
+        "sink": os.getenv("AUDIT_SINK", "none"),
+        "max_events": int(os.getenv("AUDIT_MAX_EVENTS", "10000")),
+        "batch_size": int(os.getenv("AUDIT_BATCH_SIZE", "500")),
+        "flush_interval": float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0")),
+        "max_queue_size": int(os.getenv("AUDIT_MAX_QUEUE_SIZE", "50000")),
+        "sqlite_path": os.getenv("AUDIT_SQLITE_PATH", "audit_events.db"),
+        "table_name": os.getenv("AUDIT_TABLE", "audit_events"),
+        "postgres": {
+            "host": os.getenv("POSTGRES_HOST", "localhost"),
+            "port": int(os.getenv("POSTGRES_PORT", "5432")),
+            "user": os.getenv("POSTGRES_USER", "postgres"),
+            "password": os.getenv("POSTGRES_PASSWORD", ""),
+            "database": os.getenv("POSTGRES_DB", "looma_crm")
+        }
+    }
+
+def create_audit_sink(config: Dict[str, Any]) -> Optional[AuditSink]:
+    """按配置创建持久化目标，sink为none或创建失败时返回None"""
+    sink = config.get("sink", "none")
+    table_name = config.get("table_name", "audit_events")
+    if sink == "sqlite":
+        return SQLiteAuditSink(config.get("sqlite_path", "audit_events.db"), table_name)
+    if sink == "postgres":
+        try:
+            return PostgresAuditSink(config.get("postgres", {}), table_name)
+        except ImportError:
+            logger.error("PostgreSQL审计存储不可用，审计事件只保留在内存中")
+            return None
+    if sink not in ("none", "", None):
+        logger.error(f"未知的审计持久化类型: {sink}，审计事件只保留在内存中")
+    return None
+
+def create_audit_storage(config: Optional[Dict[str, Any]] = None) -> MemoryAuditStorage:
+    """按配置创建审计存储：内存环形缓冲区，配置了持久化目标时挂上后台批量写入器"""
+    config = config or default_audit_config()
+    sink = create_audit_sink(config)
+    writer = None
+    if sink is not None:
+        writer = BatchedAuditWriter(
+            sink,
+            batch_size=config.get("batch_size", 500),
+            flush_interval=config.get("flush_interval", 1.0),
+            max_queue_size=config.get("max_queue_size", 50000)
+        )
+    return MemoryAuditStorage(max_events=config.get("max_events", 10000), writer=writer)
+
 class AuditSystem:
     """审计系统"""
     
-    def __init__(self, storage: Optional[AuditStorage] = None):
-        self.storage = storage or MemoryAuditStorage()
+    def __init__(self, storage: Optional[AuditStorage] = None, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化审计系统
+        
+        Args:
+            storage: 外部传入的审计存储，优先于config
+            config: 审计配置，默认见default_audit_config()
+        """
+        self.storage = storage or create_audit_storage(config)
         self.rule_engine = AuditRuleEngine()
         self.is_enabled = True
     
+    async def close(self):
+        """关闭审计系统，写完待持久化的事件"""
+        writer = getattr(self.storage, 'writer', None)
+        if writer is not None:
+            await writer.close()
+    
     async def log_event(self, event_type: AuditEventType, user_id: str, username: str,
                        session_id: Optional[str] = None, ip_address: Optional[str] = None,
                        user_agent: Optional[str] = None, resource_type: Optional[str] = None,
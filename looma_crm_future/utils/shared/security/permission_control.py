@@ -2,12 +2,15 @@
 """
 细粒度权限控制模块
 实现基于角色的访问控制(RBAC)和资源级权限管理
+用户的有效权限预编译为按(资源类型, 操作)索引的查找表，权限决策按(用户, 资源, 操作, 范围归属)缓存，
+角色分配/撤销或角色、权限到期时失效
 """
 
 import asyncio
 import logging
 import json
-from typing import Dict, Any, List, Optional, Set, Union
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Union, Tuple, Callable, Hashable
 from datetime import datetime, timedelta
 from enum import Enum
 from dataclasses import dataclass, field
@@ -118,6 +121,22 @@ class PermissionDecision:
     matched_permissions: List[Permission] = field(default_factory=list)
     timestamp: datetime = field(default_factory=datetime.now)
 
+@dataclass
+class CompiledPermissions:
+    """用户有效权限的编译结果"""
+    user_id: str
+    role_ids: Set[str]
+    role_level: int
+    is_super: bool
+    # (资源类型, 请求操作) -> [(权限, 评估器)]，已展开MANAGE等操作继承
+    table: Dict[Tuple[ResourceType, ActionType], List[Tuple[Permission, "PermissionEvaluator"]]]
+    # 最早到期的角色或权限的到期时间，到期后需要重新编译
+    valid_until: Optional[datetime] = None
+    decisions: "OrderedDict[Hashable, Tuple[bool, str, List[Permission]]]" = field(default_factory=OrderedDict)
+    
+    def is_expired(self, now: datetime) -> bool:
+        return self.valid_until is not None and now >= self.valid_until
+
 class PermissionEvaluator(ABC):
     """权限评估器抽象基类"""
     
@@ -125,6 +144,10 @@ class PermissionEvaluator(ABC):
     async def evaluate(self, request: PermissionRequest, permission: Permission) -> bool:
         """评估权限"""
         pass
+    
+    def cache_key(self, request: PermissionRequest) -> Optional[Hashable]:
+        """评估结果所依赖的请求字段，相同取值的请求评估结果相同；返回None表示结果不可缓存"""
+        return None
 
 class OwnResourceEvaluator(PermissionEvaluator):
     """自有资源权限评估器"""
@@ -148,6 +171,11 @@ class OwnResourceEvaluator(PermissionEvaluator):
             return False
         
         return True
+    
+    def cache_key(self, request: PermissionRequest) -> Optional[Hashable]:
+        if not request.resource_id:
+            return (False,)
+        return (True, request.context.get('resource_owner_id'), request.context.get('user_id'))
 
 class OrganizationResourceEvaluator(PermissionEvaluator):
     """组织资源权限评估器"""
@@ -165,6 +193,9 @@ class OrganizationResourceEvaluator(PermissionEvaluator):
             return user_org == resource_org
         
         return True
+    
+    def cache_key(self, request: PermissionRequest) -> Optional[Hashable]:
+        return (request.context.get('user_organization_id'), request.context.get('resource_organization_id'))
 
 class TenantResourceEvaluator(PermissionEvaluator):
     """租户资源权限评估器"""
@@ -182,6 +213,9 @@ class TenantResourceEvaluator(PermissionEvaluator):
             return user_tenant == resource_tenant
         
         return True
+    
+    def cache_key(self, request: PermissionRequest) -> Optional[Hashable]:
+        return (request.context.get('user_tenant_id'), request.context.get('resource_tenant_id'))
 
 class GlobalResourceEvaluator(PermissionEvaluator):
     """全局资源权限评估器"""
@@ -189,6 +223,9 @@ class GlobalResourceEvaluator(PermissionEvaluator):
     async def evaluate(self, request: PermissionRequest, permission: Permission) -> bool:
         """评估全局资源权限"""
         return permission.scope == PermissionScope.GLOBAL
+    
+    def cache_key(self, request: PermissionRequest) -> Optional[Hashable]:
+        return ()
 
 class RoleManager:
     """角色管理器"""
@@ -196,8 +233,21 @@ class RoleManager:
     def __init__(self):
         self.roles: Dict[str, Role] = {}
         self.user_roles: Dict[str, List[UserRole]] = {}
+        # 用户角色变更回调(参数为user_id)，用于失效权限缓存
+        self._change_listeners: List[Callable[[str], None]] = []
         self._initialize_default_roles()
     
+    def add_change_listener(self, listener: Callable[[str], None]):
+        """注册用户角色变更回调"""
+        self._change_listeners.append(listener)
+    
+    def _notify_change(self, user_id: str):
+        for listener in self._change_listeners:
+            try:
+                listener(user_id)
+            except Exception as e:
+                logger.error(f"角色变更回调失败: {e}")
+    
     def _initialize_default_roles(self):
         """初始化默认角色"""
         # 超级管理员
@@ -461,6 +511,7 @@ class RoleManager:
         )
         
         self.user_roles[user_id].append(user_role)
+        self._notify_change(user_id)
         logger.info(f"角色分配成功: 用户 {user_id} -> 角色 {role_id}")
         return True
     
@@ -473,6 +524,7 @@ class RoleManager:
             ur for ur in self.user_roles[user_id] 
             if not (ur.role_id == role_id and ur.is_active)
         ]
+        self._notify_change(user_id)
         
         logger.info(f"角色撤销成功: 用户 {user_id} -> 角色 {role_id}")
         return True
@@ -512,7 +564,7 @@ class RoleManager:
 class PermissionEngine:
     """权限引擎"""
     
-    def __init__(self):
+    def __init__(self, max_cached_users: int = 10000, max_decisions_per_user: int = 256):
         self.role_manager = RoleManager()
         self.evaluators = {
             PermissionScope.OWN: OwnResourceEvaluator(),
@@ -520,60 +572,183 @@ class PermissionEngine:
             PermissionScope.TENANT: TenantResourceEvaluator(),
             PermissionScope.GLOBAL: GlobalResourceEvaluator()
         }
-    
-    async def check_permission(self, request: PermissionRequest) -> PermissionDecision:
-        """检查权限 - 基于Zervigo设计"""
-        # 1. 超级管理员拥有所有权限
-        user_roles = await self.role_manager.get_user_roles(request.user_id)
-        if any(role.role_id == "super" for role in user_roles):
-            return PermissionDecision(
-                request=request,
-                granted=True,
-                reason="超级管理员拥有所有权限",
-                matched_permissions=[]
-            )
         
-        # 2. 检查角色层次
-        user_role_level = 0
-        for role in user_roles:
-            role_level = ROLE_HIERARCHY.get(role.role_id, 0)
-            user_role_level = max(user_role_level, role_level)
+        # 按用户缓存编译后的权限及其决策，LRU淘汰
+        self.max_cached_users = max_cached_users
+        self.max_decisions_per_user = max_decisions_per_user
+        self._compiled: "OrderedDict[str, CompiledPermissions]" = OrderedDict()
+        self._cache_stats = {
+            'hits': 0,
+            'misses': 0,
+            'compilations': 0,
+            'invalidations': 0
+        }
+        self.role_manager.add_change_listener(self.invalidate_user)
+    
+    def register_evaluator(self, scope: PermissionScope, evaluator: PermissionEvaluator):
+        """注册范围评估器，已编译的权限全部失效"""
+        self.evaluators[scope] = evaluator
+        self.invalidate_all()
+    
+    def invalidate_user(self, user_id: str):
+        """失效用户的编译权限与决策缓存"""
+        if self._compiled.pop(user_id, None) is not None:
+            self._cache_stats['invalidations'] += 1
+    
+    def invalidate_all(self):
+        """失效全部缓存(如修改了角色定义)"""
+        self._cache_stats['invalidations'] += len(self._compiled)
+        self._compiled.clear()
+    
+    async def _compile_user(self, user_id: str, now: datetime) -> CompiledPermissions:
+        """将用户当前有效的角色与权限编译为查找表"""
+        roles = await self.role_manager.get_user_roles(user_id)
+        role_ids = {role.role_id for role in roles}
+        
+        # 最早的角色到期时间
+        expiries = [
+            user_role.expires_at for user_role in self.role_manager.user_roles.get(user_id, [])
+            if user_role.is_active and user_role.expires_at and user_role.expires_at > now
+        ]
         
-        required_level = self._get_required_role_level(request.resource_type, request.action)
-        if user_role_level < required_level:
-            return PermissionDecision(
-                request=request,
-                granted=False,
-                reason=f"角色级别不足: {user_role_level} < {required_level}"
-            )
-        
-        # 3. 获取用户权限
-        user_permissions = await self.role_manager.get_user_permissions(request.user_id)
-        matched_permissions = []
-        
-        # 4. 检查每个权限
-        for permission in user_permissions:
-            if (permission.resource_type == request.resource_type and 
-                self._check_action_permission(permission.action, request.action)):
+        table: Dict[Tuple[ResourceType, ActionType], List[Tuple[Permission, PermissionEvaluator]]] = {}
+        seen = set()
+        for role in roles:
+            for permission in role.permissions:
+                key = (permission.resource_type, permission.action, permission.scope)
+                if key in seen or not permission.is_valid():
+                    continue
+                seen.add(key)
+                if permission.expires_at:
+                    expiries.append(permission.expires_at)
                 
-                # 使用相应的评估器评估权限
                 evaluator = self.evaluators.get(permission.scope)
-                if evaluator and await evaluator.evaluate(request, permission):
-                    matched_permissions.append(permission)
+                if evaluator is None:
+                    continue
+                for action in ActionType:
+                    if self._check_action_permission(permission.action, action):
+                        table.setdefault((permission.resource_type, action), []).append((permission, evaluator))
+        
+        self._cache_stats['compilations'] += 1
+        return CompiledPermissions(
+            user_id=user_id,
+            role_ids=role_ids,
+            role_level=max((ROLE_HIERARCHY.get(role_id, 0) for role_id in role_ids), default=0),
+            is_super="super" in role_ids,
+            table=table,
+            valid_until=min(expiries) if expiries else None
+        )
+    
+    async def _get_compiled(self, user_id: str) -> CompiledPermissions:
+        now = datetime.now()
+        compiled = self._compiled.get(user_id)
+        if compiled is not None and not compiled.is_expired(now):
+            self._compiled.move_to_end(user_id)
+            return compiled
+        
+        compiled = await self._compile_user(user_id, now)
+        self._compiled[user_id] = compiled
+        self._compiled.move_to_end(user_id)
+        while len(self._compiled) > self.max_cached_users:
+            self._compiled.popitem(last=False)
+        return compiled
+    
+    def _decision_key(self, request: PermissionRequest,
+                      candidates: List[Tuple[Permission, PermissionEvaluator]]) -> Optional[Hashable]:
+        """决策缓存键：资源类型、操作及各候选范围评估器依赖的归属字段"""
+        scope_keys = []
+        seen_scopes = set()
+        for permission, evaluator in candidates:
+            if permission.scope in seen_scopes:
+                continue
+            seen_scopes.add(permission.scope)
+            scope_key = evaluator.cache_key(request)
+            if scope_key is None:
+                return None
+            scope_keys.append((permission.scope, scope_key))
+        
+        key = (request.resource_type, request.action, tuple(scope_keys))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+    
+    async def _decide(self, compiled: CompiledPermissions, request: PermissionRequest) -> Tuple[bool, str, List[Permission]]:
+        # 1. 超级管理员拥有所有权限
+        if compiled.is_super:
+            return True, "超级管理员拥有所有权限", []
         
+        # 2. 检查角色层次
+        required_level = self._get_required_role_level(request.resource_type, request.action)
+        if compiled.role_level < required_level:
+            return False, f"角色级别不足: {compiled.role_level} < {required_level}", []
+        
+        # 3. 只评估资源类型与操作匹配的权限
+        candidates = compiled.table.get((request.resource_type, request.action), [])
+        decision_key = self._decision_key(request, candidates)
+        if decision_key is not None:
+            cached = compiled.decisions.get(decision_key)
+            if cached is not None:
+                compiled.decisions.move_to_end(decision_key)
+                self._cache_stats['hits'] += 1
+                return cached
+        self._cache_stats['misses'] += 1
+        
+        # 4. 使用相应的评估器评估权限
+        matched_permissions = [
+            permission for permission, evaluator in candidates
+            if await evaluator.evaluate(request, permission)
+        ]
         if matched_permissions:
-            return PermissionDecision(
-                request=request,
-                granted=True,
-                reason="权限匹配成功",
-                matched_permissions=matched_permissions
-            )
+            decision = (True, "权限匹配成功", matched_permissions)
         else:
-            return PermissionDecision(
+            decision = (False, "没有匹配的权限", [])
+        
+        if decision_key is not None:
+            compiled.decisions[decision_key] = decision
+            if len(compiled.decisions) > self.max_decisions_per_user:
+                compiled.decisions.popitem(last=False)
+        return decision
+    
+    async def check_permission(self, request: PermissionRequest) -> PermissionDecision:
+        """检查权限 - 基于Zervigo设计"""
+        compiled = await self._get_compiled(request.user_id)
+        granted, reason, matched_permissions = await self._decide(compiled, request)
+        return PermissionDecision(
+            request=request,
+            granted=granted,
+            reason=reason,
+            matched_permissions=list(matched_permissions)
+        )
+    
+    async def check_many(self, requests: List[PermissionRequest]) -> List[PermissionDecision]:
+        """批量检查权限，同一用户的权限只编译一次"""
+        compiled_by_user: Dict[str, CompiledPermissions] = {}
+        decisions = []
+        for request in requests:
+            compiled = compiled_by_user.get(request.user_id)
+            if compiled is None:
+                compiled = await self._get_compiled(request.user_id)
+                compiled_by_user[request.user_id] = compiled
+            granted, reason, matched_permissions = await self._decide(compiled, request)
+            decisions.append(PermissionDecision(
                 request=request,
-                granted=False,
-                reason="没有匹配的权限"
-            )
+                granted=granted,
+                reason=reason,
+                matched_permissions=list(matched_permissions)
+            ))
+        return decisions
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """权限决策缓存统计"""
+        lookups = self._cache_stats['hits'] + self._cache_stats['misses']
+        return {
+            **self._cache_stats,
+            'hit_rate': self._cache_stats['hits'] / max(lookups, 1),
+            'cached_users': len(self._compiled),
+            'cached_decisions': sum(len(c.decisions) for c in self._compiled.values())
+        }
     
     async def assign_role(self, user_id: str, role_id: str, assigned_by: str, expires_at: Optional[datetime] = None) -> bool:
         """分配角色"""
@@ -664,6 +839,10 @@ class PermissionControlService:
         
         return await self.permission_engine.check_permission(request)
     
+    async def check_access_many(self, requests: List[PermissionRequest]) -> List[PermissionDecision]:
+        """批量检查访问权限"""
+        return await self.permission_engine.check_many(requests)
+    
     async def assign_user_role(self, user_id: str, role_id: str, assigned_by: str, expires_at: Optional[datetime] = None) -> bool:
         """分配用户角色"""
         return await self.permission_engine.assign_role(user_id, role_id, assigned_by, expires_at)
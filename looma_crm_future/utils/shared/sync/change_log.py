@@ -5,9 +5,10 @@
 """
 
 import asyncio
+import bisect
 import json
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 
@@ -103,6 +104,23 @@ class ChangeLog:
             logger.error(f"获取变更记录失败: {e}")
             return []
     
+    async def iter_changes_since(self, timestamp: datetime,
+                                 page_size: int = 1000) -> AsyncIterator[List[DataChange]]:
+        """按(timestamp, id)游标分页遍历指定时间后的变更，每次产出一页"""
+        after_id = None
+        while True:
+            try:
+                page = await self.storage.get_changes_page(timestamp, after_id, page_size)
+            except Exception as e:
+                logger.error(f"分页获取变更记录失败: {e}")
+                return
+            
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            timestamp, after_id = page[-1].timestamp, page[-1].id
+    
     async def get_changes_by_source(self, source: str, limit: int = 100) -> List[DataChange]:
         """获取指定源的变更记录"""
         try:
@@ -189,33 +207,144 @@ class ChangeLog:
                 "error": str(e)
             }
 
+class _TimeOrderedBuffer:
+    """按(timestamp, id)有序的环形缓冲区
+
+    绝大多数变更按时间顺序追加，追加为O(1)；乱序写入时二分插入。
+    淘汰最旧记录只移动头指针，头部空洞超过一半时再整体压缩
+    """
+    
+    def __init__(self):
+        self._keys: List[Tuple[datetime, str]] = []
+        self._items: List[DataChange] = []
+        self._head = 0
+    
+    def __len__(self) -> int:
+        return len(self._items) - self._head
+    
+    def __iter__(self):
+        return iter(self._items[self._head:])
+    
+    def add(self, change: DataChange):
+        key = (change.timestamp, change.id)
+        if not self._keys or key >= self._keys[-1]:
+            self._keys.append(key)
+            self._items.append(change)
+        else:
+            index = bisect.bisect_right(self._keys, key, lo=self._head)
+            self._keys.insert(index, key)
+            self._items.insert(index, change)
+    
+    def remove(self, change: DataChange) -> bool:
+        key = (change.timestamp, change.id)
+        index = bisect.bisect_left(self._keys, key, lo=self._head)
+        if index < len(self._keys) and self._keys[index] == key:
+            if index == self._head:
+                self._drop_head(1)
+            else:
+                del self._keys[index]
+                del self._items[index]
+            return True
+        return False
+    
+    def oldest(self) -> Optional[DataChange]:
+        return self._items[self._head] if len(self) else None
+    
+    def pop_oldest(self) -> Optional[DataChange]:
+        change = self.oldest()
+        if change is not None:
+            self._drop_head(1)
+        return change
+    
+    def pop_before(self, cutoff_time: datetime) -> List[DataChange]:
+        """弹出时间早于cutoff_time的全部记录"""
+        index = bisect.bisect_left(self._keys, (cutoff_time, ""), lo=self._head)
+        removed = self._items[self._head:index]
+        self._drop_head(index - self._head)
+        return removed
+    
+    def since(self, timestamp: datetime, after_id: Optional[str] = None,
+              limit: Optional[int] = None) -> List[DataChange]:
+        """时间不早于timestamp的记录；指定after_id时为严格大于(timestamp, after_id)的记录"""
+        if after_id is None:
+            index = bisect.bisect_left(self._keys, (timestamp, ""), lo=self._head)
+        else:
+            index = bisect.bisect_right(self._keys, (timestamp, after_id), lo=self._head)
+        stop = len(self._items) if limit is None else min(len(self._items), index + limit)
+        return self._items[index:stop]
+    
+    def latest(self, limit: int) -> List[DataChange]:
+        """最新的limit条记录，时间倒序"""
+        start = max(self._head, len(self._items) - limit)
+        return self._items[start:][::-1]
+    
+    def _drop_head(self, count: int):
+        if count <= 0:
+            return
+        for i in range(self._head, self._head + count):
+            self._items[i] = None
+        self._head += count
+        # 空洞超过一半时压缩，保证均摊O(1)
+        if self._head > len(self._items) // 2:
+            del self._keys[:self._head]
+            del self._items[:self._head]
+            self._head = 0
+
 class MemoryChangeLogStorage:
     """内存变更日志存储"""
     
     def __init__(self, max_entries: int = 100000):
         self.max_entries = max_entries
         self.changes = {}
-        self.changes_by_source = {}
-        self.changes_by_target = {}
-        self.changes_by_time = []
+        self.changes_by_source: Dict[str, _TimeOrderedBuffer] = {}
+        self.changes_by_target: Dict[str, _TimeOrderedBuffer] = {}
+        self.changes_by_time = _TimeOrderedBuffer()
+        
+        # 最近一次成功同步时间(缓存水位)，失效时按需重算
+        self._last_completed: Optional[datetime] = None
+        self._watermark_dirty = False
+    
+    def _index(self, change: DataChange):
+        self.changes_by_time.add(change)
+        self.changes_by_source.setdefault(change.source, _TimeOrderedBuffer()).add(change)
+        self.changes_by_target.setdefault(change.target, _TimeOrderedBuffer()).add(change)
+    
+    def _unindex(self, change: DataChange, from_time_index: bool = True):
+        """从各索引移除；最旧记录位于各缓冲区头部，移除为O(1)"""
+        if from_time_index:
+            self.changes_by_time.remove(change)
+        for index, key in ((self.changes_by_source, change.source), (self.changes_by_target, change.target)):
+            buffer = index.get(key)
+            if buffer is None:
+                continue
+            if buffer.oldest() is change:
+                buffer.pop_oldest()
+            else:
+                buffer.remove(change)
+            if not len(buffer):
+                del index[key]
+        
+        self.changes.pop(change.id, None)
+        if change.sync_status == "completed" and change.timestamp == self._last_completed:
+            self._watermark_dirty = True
+    
+    def _advance_watermark(self, change: DataChange):
+        if change.sync_status == "completed" and (
+                self._last_completed is None or change.timestamp > self._last_completed):
+            self._last_completed = change.timestamp
     
     async def save_change(self, change: DataChange) -> bool:
         """保存变更记录"""
         try:
-            # 保存到主存储
-            self.changes[change.id] = change
-            
-            # 保存到索引
-            if change.source not in self.changes_by_source:
-                self.changes_by_source[change.source] = []
-            self.changes_by_source[change.source].append(change)
-            
-            if change.target not in self.changes_by_target:
-                self.changes_by_target[change.target] = []
-            self.changes_by_target[change.target].append(change)
+            # 同一ID重复写入时替换旧记录
+            existing = self.changes.get(change.id)
+            if existing is not None:
+                self._unindex(existing)
             
-            # 保存到时间索引
-            self.changes_by_time.append(change)
+            # 保存到主存储与索引
+            self.changes[change.id] = change
+            self._index(change)
+            self._advance_watermark(change)
             
             # 限制存储大小
             if len(self.changes) > self.max_entries:
@@ -230,21 +359,27 @@ class MemoryChangeLogStorage:
     async def get_changes_since(self, timestamp: datetime) -> List[DataChange]:
         """获取指定时间后的变更"""
         try:
-            changes = [
-                change for change in self.changes_by_time
-                if change.timestamp >= timestamp
-            ]
-            return sorted(changes, key=lambda x: x.timestamp)
+            return self.changes_by_time.since(timestamp)
             
         except Exception as e:
             logger.error(f"内存存储获取变更失败: {e}")
             return []
     
+    async def get_changes_page(self, timestamp: datetime, after_id: Optional[str] = None,
+                               limit: int = 1000) -> List[DataChange]:
+        """按(timestamp, id)游标分页获取变更"""
+        try:
+            return self.changes_by_time.since(timestamp, after_id, limit)
+            
+        except Exception as e:
+            logger.error(f"内存存储分页获取变更失败: {e}")
+            return []
+    
     async def get_changes_by_source(self, source: str, limit: int = 100) -> List[DataChange]:
         """获取指定源的变更记录"""
         try:
-            changes = self.changes_by_source.get(source, [])
-            return sorted(changes, key=lambda x: x.timestamp, reverse=True)[:limit]
+            buffer = self.changes_by_source.get(source)
+            return buffer.latest(limit) if buffer else []
             
         except Exception as e:
             logger.error(f"内存存储获取源变更失败: {e}")
@@ -253,8 +388,8 @@ class MemoryChangeLogStorage:
     async def get_changes_by_target(self, target: str, limit: int = 100) -> List[DataChange]:
         """获取指定目标的变更记录"""
         try:
-            changes = self.changes_by_target.get(target, [])
-            return sorted(changes, key=lambda x: x.timestamp, reverse=True)[:limit]
+            buffer = self.changes_by_target.get(target)
+            return buffer.latest(limit) if buffer else []
             
         except Exception as e:
             logger.error(f"内存存储获取目标变更失败: {e}")
@@ -263,19 +398,16 @@ class MemoryChangeLogStorage:
     async def get_last_sync_time(self) -> Optional[datetime]:
         """获取上次同步时间"""
         try:
-            if not self.changes_by_time:
-                return None
-            
-            # 找到最近的成功同步
-            successful_changes = [
-                change for change in self.changes_by_time
-                if change.sync_status == "completed"
-            ]
+            if self._watermark_dirty:
+                # 水位对应的记录被删除或状态回退时重算
+                completed = [
+                    change.timestamp for change in self.changes.values()
+                    if change.sync_status == "completed"
+                ]
+                self._last_completed = max(completed) if completed else None
+                self._watermark_dirty = False
             
-            if successful_changes:
-                return max(change.timestamp for change in successful_changes)
-            
-            return None
+            return self._last_completed
             
         except Exception as e:
             logger.error(f"内存存储获取上次同步时间失败: {e}")
@@ -286,8 +418,12 @@ class MemoryChangeLogStorage:
         try:
             if change_id in self.changes:
                 change = self.changes[change_id]
+                if (change.sync_status == "completed" and status != "completed"
+                        and change.timestamp == self._last_completed):
+                    self._watermark_dirty = True
                 change.sync_status = status
                 change.error_message = error_message
+                self._advance_watermark(change)
                 return True
             
             return False
@@ -299,41 +435,11 @@ class MemoryChangeLogStorage:
     async def cleanup_old_changes(self, cutoff_time: datetime) -> int:
         """清理旧的变更记录"""
         try:
-            deleted_count = 0
-            
-            # 清理时间索引
-            old_changes = [
-                change for change in self.changes_by_time
-                if change.timestamp < cutoff_time
-            ]
-            
+            old_changes = self.changes_by_time.pop_before(cutoff_time)
             for change in old_changes:
-                # 从主存储删除
-                if change.id in self.changes:
-                    del self.changes[change.id]
-                    deleted_count += 1
-                
-                # 从源索引删除
-                if change.source in self.changes_by_source:
-                    self.changes_by_source[change.source] = [
-                        c for c in self.changes_by_source[change.source]
-                        if c.id != change.id
-                    ]
-                
-                # 从目标索引删除
-                if change.target in self.changes_by_target:
-                    self.changes_by_target[change.target] = [
-                        c for c in self.changes_by_target[change.target]
-                        if c.id != change.id
-                    ]
-            
-            # 更新时间索引
-            self.changes_by_time = [
-                change for change in self.changes_by_time
-                if change.timestamp >= cutoff_time
-            ]
+                self._unindex(change, from_time_index=False)
             
-            return deleted_count
+            return len(old_changes)
             
         except Exception as e:
             logger.error(f"内存存储清理旧变更失败: {e}")
@@ -351,14 +457,10 @@ class MemoryChangeLogStorage:
                 status_counts[status] = status_counts.get(status, 0) + 1
             
             # 按源统计
-            source_counts = {}
-            for source, changes in self.changes_by_source.items():
-                source_counts[source] = len(changes)
+            source_counts = {source: len(buffer) for source, buffer in self.changes_by_source.items()}
             
             # 按目标统计
-            target_counts = {}
-            for target, changes in self.changes_by_target.items():
-                target_counts[target] = len(changes)
+            target_counts = {target: len(buffer) for target, buffer in self.changes_by_target.items()}
             
             return {
                 "total_changes": total_changes,
@@ -390,35 +492,13 @@ class MemoryChangeLogStorage:
             }
     
     async def _cleanup_oldest(self):
-        """清理最旧的记录"""
+        """淘汰最旧的记录直到不超过容量上限"""
         try:
-            # 按时间排序，删除最旧的记录
-            sorted_changes = sorted(self.changes_by_time, key=lambda x: x.timestamp)
-            
-            # 删除最旧的10%
-            delete_count = max(1, len(sorted_changes) // 10)
-            
-            for change in sorted_changes[:delete_count]:
-                if change.id in self.changes:
-                    del self.changes[change.id]
-                
-                # 从索引中删除
-                if change.source in self.changes_by_source:
-                    self.changes_by_source[change.source] = [
-                        c for c in self.changes_by_source[change.source]
-                        if c.id != change.id
-                    ]
-                
-                if change.target in self.changes_by_target:
-                    self.changes_by_target[change.target] = [
-                        c for c in self.changes_by_target[change.target]
-                        if c.id != change.id
-                    ]
-            
-            # 更新时间索引
-            self.changes_by_time = sorted_changes[delete_count:]
-            
-            logger.info(f"清理了 {delete_count} 个最旧的变更记录")
+            while len(self.changes) > self.max_entries:
+                change = self.changes_by_time.pop_oldest()
+                if change is None:
+                    break
+                self._unindex(change, from_time_index=False)
             
         except Exception as e:
             logger.error(f"清理最旧记录失败: {e}")
@@ -430,6 +510,7 @@ class RedisChangeLogStorage:
         self.config = config
         self.redis_client = None
         self.key_prefix = config.get("key_prefix", "change_log")
+        self.ttl_seconds = config.get("retention_days", 30) * 86400
         self._initialize_redis()
     
     def _initialize_redis(self):
@@ -449,11 +530,14 @@ class RedisChangeLogStorage:
             logger.error(f"Redis变更日志存储连接失败: {e}")
             raise
     
+    def _change_key(self, change_id: str) -> str:
+        return f"{self.key_prefix}:change:{change_id}"
+    
     async def save_change(self, change: DataChange) -> bool:
-        """保存变更记录"""
+        """保存变更记录(单次往返写入记录与全部索引)"""
         try:
             # 使用Hash存储变更记录
-            key = f"{self.key_prefix}:change:{change.id}"
+            key = self._change_key(change.id)
             change_data = {
                 "id": change.id,
                 "source": change.source,
@@ -466,16 +550,19 @@ class RedisChangeLogStorage:
                 "error_message": change.error_message or "",
                 "metadata": json.dumps(change.metadata or {}, ensure_ascii=False)
             }
+            score = change.timestamp.timestamp()
             
-            self.redis_client.hset(key, mapping=change_data)
-            
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hset(key, mapping=change_data)
             # 设置过期时间
-            self.redis_client.expire(key, 86400 * 30)  # 30天
-            
+            pipe.expire(key, self.ttl_seconds)
             # 添加到索引
-            self.redis_client.zadd(f"{self.key_prefix}:by_time", {change.id: change.timestamp.timestamp()})
-            self.redis_client.zadd(f"{self.key_prefix}:by_source:{change.source}", {change.id: change.timestamp.timestamp()})
-            self.redis_client.zadd(f"{self.key_prefix}:by_target:{change.target}", {change.id: change.timestamp.timestamp()})
+            pipe.zadd(f"{self.key_prefix}:by_time", {change.id: score})
+            pipe.zadd(f"{self.key_prefix}:by_source:{change.source}", {change.id: score})
+            pipe.zadd(f"{self.key_prefix}:by_target:{change.target}", {change.id: score})
+            if change.sync_status == "completed":
+                pipe.zadd(f"{self.key_prefix}:completed", {change.id: score})
+            pipe.execute()
             
             return True
             
@@ -486,34 +573,62 @@ class RedisChangeLogStorage:
     async def get_changes_since(self, timestamp: datetime) -> List[DataChange]:
         """获取指定时间后的变更"""
         try:
-            # 从时间索引获取
+            # 从时间索引获取(已按时间排序)
             change_ids = self.redis_client.zrangebyscore(
                 f"{self.key_prefix}:by_time",
                 timestamp.timestamp(),
                 "+inf"
             )
             
-            changes = []
-            for change_id in change_ids:
-                change = await self._get_change_by_id(change_id)
-                if change:
-                    changes.append(change)
-            
-            return sorted(changes, key=lambda x: x.timestamp)
+            return self._get_changes_by_ids(change_ids)
             
         except Exception as e:
             logger.error(f"Redis存储获取变更失败: {e}")
             return []
     
-    async def _get_change_by_id(self, change_id: str) -> Optional[DataChange]:
-        """根据ID获取变更记录"""
+    async def get_changes_page(self, timestamp: datetime, after_id: Optional[str] = None,
+                               limit: int = 1000) -> List[DataChange]:
+        """按(timestamp, id)游标分页获取变更；同分值成员按字典序排列"""
         try:
-            key = f"{self.key_prefix}:change:{change_id}"
-            change_data = self.redis_client.hgetall(key)
+            time_key = f"{self.key_prefix}:by_time"
+            score = timestamp.timestamp()
             
-            if not change_data:
-                return None
+            offset = 0
+            if after_id is not None:
+                ties = self.redis_client.zrangebyscore(time_key, score, score)
+                offset = bisect.bisect_right(ties, after_id)
             
+            change_ids = self.redis_client.zrangebyscore(
+                time_key, score, "+inf", start=offset, num=limit
+            )
+            return self._get_changes_by_ids(change_ids)
+            
+        except Exception as e:
+            logger.error(f"Redis存储分页获取变更失败: {e}")
+            return []
+    
+    def _get_changes_by_ids(self, change_ids: List[str]) -> List[DataChange]:
+        """流水线批量读取变更记录，保持传入顺序"""
+        if not change_ids:
+            return []
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for change_id in change_ids:
+            pipe.hgetall(self._change_key(change_id))
+        
+        changes = []
+        for change_data in pipe.execute():
+            change = self._parse_change(change_data)
+            if change:
+                changes.append(change)
+        return changes
+    
+    def _parse_change(self, change_data: Dict[str, str]) -> Optional[DataChange]:
+        """将Hash字段解析为变更记录"""
+        if not change_data:
+            return None
+        
+        try:
             return DataChange(
                 id=change_data["id"],
                 source=change_data["source"],
@@ -527,6 +642,15 @@ class RedisChangeLogStorage:
                 metadata=json.loads(change_data["metadata"]) if change_data["metadata"] else {}
             )
             
+        except Exception as e:
+            logger.error(f"Redis存储解析变更记录失败: {e}")
+            return None
+    
+    async def _get_change_by_id(self, change_id: str) -> Optional[DataChange]:
+        """根据ID获取变更记录"""
+        try:
+            return self._parse_change(self.redis_client.hgetall(self._change_key(change_id)))
+            
         except Exception as e:
             logger.error(f"Redis存储获取变更记录失败: {e}")
             return None
@@ -539,13 +663,7 @@ class RedisChangeLogStorage:
                 0, limit - 1
             )
             
-            changes = []
-            for change_id in change_ids:
-                change = await self._get_change_by_id(change_id)
-                if change:
-                    changes.append(change)
-            
-            return changes
+            return self._get_changes_by_ids(change_ids)
             
         except Exception as e:
             logger.error(f"Redis存储获取源变更失败: {e}")
@@ -559,30 +677,23 @@ class RedisChangeLogStorage:
                 0, limit - 1
             )
             
-            changes = []
-            for change_id in change_ids:
-                change = await self._get_change_by_id(change_id)
-                if change:
-                    changes.append(change)
-            
-            return changes
+            return self._get_changes_by_ids(change_ids)
             
         except Exception as e:
             logger.error(f"Redis存储获取目标变更失败: {e}")
             return []
     
     async def get_last_sync_time(self) -> Optional[datetime]:
-        """获取上次同步时间"""
+        """获取上次同步时间(completed索引中分值最大的记录)"""
         try:
-            # 获取最近的成功同步记录
-            change_ids = self.redis_client.zrevrange(f"{self.key_prefix}:by_time", 0, 100)
-            
-            for change_id in change_ids:
-                change = await self._get_change_by_id(change_id)
-                if change and change.sync_status == "completed":
-                    return change.timestamp
+            latest = self.redis_client.zrevrange(f"{self.key_prefix}:completed", 0, 0, withscores=True)
+            if not latest:
+                return None
             
-            return None
+            change = await self._get_change_by_id(latest[0][0])
+            if change:
+                return change.timestamp
+            return datetime.fromtimestamp(latest[0][1])
             
         except Exception as e:
             logger.error(f"Redis存储获取上次同步时间失败: {e}")
@@ -591,15 +702,22 @@ class RedisChangeLogStorage:
     async def update_sync_status(self, change_id: str, status: str, error_message: str = None) -> bool:
         """更新同步状态"""
         try:
-            key = f"{self.key_prefix}:change:{change_id}"
-            
-            if self.redis_client.exists(key):
-                self.redis_client.hset(key, "sync_status", status)
-                if error_message:
-                    self.redis_client.hset(key, "error_message", error_message)
-                return True
-            
-            return False
+            key = self._change_key(change_id)
+            score = self.redis_client.zscore(f"{self.key_prefix}:by_time", change_id)
+            
+            if score is None and not self.redis_client.exists(key):
+                return False
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hset(key, "sync_status", status)
+            if error_message:
+                pipe.hset(key, "error_message", error_message)
+            if status == "completed" and score is not None:
+                pipe.zadd(f"{self.key_prefix}:completed", {change_id: score})
+            else:
+                pipe.zrem(f"{self.key_prefix}:completed", change_id)
+            pipe.execute()
+            return True
             
         except Exception as e:
             logger.error(f"Redis存储更新同步状态失败: {e}")
@@ -608,26 +726,35 @@ class RedisChangeLogStorage:
     async def cleanup_old_changes(self, cutoff_time: datetime) -> int:
         """清理旧的变更记录"""
         try:
+            cutoff = cutoff_time.timestamp()
             # 获取需要删除的变更ID
             change_ids = self.redis_client.zrangebyscore(
                 f"{self.key_prefix}:by_time",
                 "-inf",
-                cutoff_time.timestamp()
+                f"({cutoff}"
             )
+            if not change_ids:
+                return 0
             
-            deleted_count = 0
+            # 批量读取source/target以便同时清理对应索引
+            pipe = self.redis_client.pipeline(transaction=False)
             for change_id in change_ids:
+                pipe.hmget(self._change_key(change_id), "source", "target")
+            owners = pipe.execute()
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for change_id, (source, target) in zip(change_ids, owners):
                 # 删除主记录
-                key = f"{self.key_prefix}:change:{change_id}"
-                if self.redis_client.delete(key):
-                    deleted_count += 1
-                
-                # 从索引中删除
-                self.redis_client.zrem(f"{self.key_prefix}:by_time", change_id)
-                # 注意：这里需要知道source和target才能从对应索引中删除
-                # 简化处理，只从时间索引删除
+                pipe.delete(self._change_key(change_id))
+                if source:
+                    pipe.zrem(f"{self.key_prefix}:by_source:{source}", change_id)
+                if target:
+                    pipe.zrem(f"{self.key_prefix}:by_target:{target}", change_id)
+            pipe.zremrangebyscore(f"{self.key_prefix}:by_time", "-inf", f"({cutoff}")
+            pipe.zremrangebyscore(f"{self.key_prefix}:completed", "-inf", f"({cutoff}")
+            pipe.execute()
             
-            return deleted_count
+            return len(change_ids)
             
         except Exception as e:
             logger.error(f"Redis存储清理旧变更失败: {e}")
@@ -664,10 +791,272 @@ class RedisChangeLogStorage:
             }
 
 class PostgresChangeLogStorage:
-    """PostgreSQL变更日志存储"""
+    """PostgreSQL变更日志存储
+
+    以(changed_at, id)复合索引支撑按时间的游标分页，
+    completed状态的部分索引支撑上次同步时间查询
+    """
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        # 这里可以实现PostgreSQL存储
-        # 暂时抛出未实现错误
-        raise NotImplementedError("PostgreSQL存储暂未实现")
+        self.table_name = config.get("change_log_table", "sync_change_log")
+        self.pool = None
+        self._pool_lock = asyncio.Lock()
+        
+        try:
+            import asyncpg
+            self._asyncpg = asyncpg
+        except ImportError:
+            logger.error("asyncpg未安装，无法使用PostgreSQL变更日志存储")
+            raise
+    
+    async def _get_pool(self):
+        """首次使用时创建连接池并建表"""
+        if self.pool is not None:
+            return self.pool
+        
+        async with self._pool_lock:
+            if self.pool is None:
+                postgres_config = self.config.get("postgres", {})
+                pool = await self._asyncpg.create_pool(
+                    host=postgres_config.get("host", "localhost"),
+                    port=postgres_config.get("port", 5432),
+                    user=postgres_config.get("user", "postgres"),
+                    password=postgres_config.get("password", ""),
+                    database=postgres_config.get("database", "looma_crm"),
+                    min_size=postgres_config.get("min_size", 1),
+                    max_size=postgres_config.get("max_size", 5)
+                )
+                async with pool.acquire() as conn:
+                    await self._create_schema(conn)
+                self.pool = pool
+                logger.info("PostgreSQL变更日志存储连接成功")
+        
+        return self.pool
+    
+    async def _create_schema(self, conn):
+        table = self.table_name
+        await conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                data JSONB NOT NULL DEFAULT '{{}}',
+                changed_at TIMESTAMP NOT NULL,
+                sync_status TEXT NOT NULL DEFAULT 'pending',
+                retry_count INTEGER NOT NULL DEFAULT 0,
+                error_message TEXT,
+                metadata JSONB NOT NULL DEFAULT '{{}}'
+            );
+            CREATE INDEX IF NOT EXISTS idx_{table}_time_id ON {table} (changed_at, id);
+            CREATE INDEX IF NOT EXISTS idx_{table}_source_time ON {table} (source, changed_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_{table}_target_time ON {table} (target, changed_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_{table}_completed_time ON {table} (changed_at)
+                WHERE sync_status = 'completed';
+        """)
+    
+    def _row_to_change(self, row) -> DataChange:
+        return DataChange(
+            id=row["id"],
+            source=row["source"],
+            target=row["target"],
+            event_type=SyncEventType(row["event_type"]),
+            data=json.loads(row["data"]) if row["data"] else {},
+            timestamp=row["changed_at"],
+            sync_status=row["sync_status"],
+            retry_count=row["retry_count"],
+            error_message=row["error_message"],
+            metadata=json.loads(row["metadata"]) if row["metadata"] else {}
+        )
+    
+    async def save_change(self, change: DataChange) -> bool:
+        """保存变更记录"""
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                await conn.execute(f"""
+                    INSERT INTO {self.table_name}
+                        (id, source, target, event_type, data, changed_at,
+                         sync_status, retry_count, error_message, metadata)
+                    VALUES ($1, $2, $3, $4, $5::jsonb, $6, $7, $8, $9, $10::jsonb)
+                    ON CONFLICT (id) DO UPDATE SET
+                        source = EXCLUDED.source,
+                        target = EXCLUDED.target,
+                        event_type = EXCLUDED.event_type,
+                        data = EXCLUDED.data,
+                        changed_at = EXCLUDED.changed_at,
+                        sync_status = EXCLUDED.sync_status,
+                        retry_count = EXCLUDED.retry_count,
+                        error_message = EXCLUDED.error_message,
+                        metadata = EXCLUDED.metadata
+                """,
+                    change.id, change.source, change.target, change.event_type.value,
+                    json.dumps(change.data, ensure_ascii=False), change.timestamp,
+                    change.sync_status, change.retry_count, change.error_message,
+                    json.dumps(change.metadata or {}, ensure_ascii=False)
+                )
+            return True
+            
+        except Exception as e:
+            logger.error(f"PostgreSQL存储保存变更失败: {e}")
+            return False
+    
+    async def get_changes_since(self, timestamp: datetime) -> List[DataChange]:
+        """获取指定时间后的变更(内部按游标分页读取)"""
+        changes = []
+        after_id = None
+        page_size = self.config.get("change_log_page_size", 1000)
+        
+        while True:
+            page = await self.get_changes_page(timestamp, after_id, page_size)
+            changes.extend(page)
+            if len(page) < page_size:
+                return changes
+            timestamp, after_id = page[-1].timestamp, page[-1].id
+    
+    async def get_changes_page(self, timestamp: datetime, after_id: Optional[str] = None,
+                               limit: int = 1000) -> List[DataChange]:
+        """按(changed_at, id)游标分页获取变更"""
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                if after_id is None:
+                    rows = await conn.fetch(f"""
+                        SELECT * FROM {self.table_name}
+                        WHERE changed_at >= $1
+                        ORDER BY changed_at, id
+                        LIMIT $2
+                    """, timestamp, limit)
+                else:
+                    rows = await conn.fetch(f"""
+                        SELECT * FROM {self.table_name}
+                        WHERE (changed_at, id) > ($1, $2)
+                        ORDER BY changed_at, id
+                        LIMIT $3
+                    """, timestamp, after_id, limit)
+            
+            return [self._row_to_change(row) for row in rows]
+            
+        except Exception as e:
+            logger.error(f"PostgreSQL存储分页获取变更失败: {e}")
+            return []
+    
+    async def _get_latest_by(self, column: str, value: str, limit: int) -> List[DataChange]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(f"""
+                SELECT * FROM {self.table_name}
+                WHERE {column} = $1
+                ORDER BY changed_at DESC
+                LIMIT $2
+            """, value, limit)
+        return [self._row_to_change(row) for row in rows]
+    
+    async def get_changes_by_source(self, source: str, limit: int = 100) -> List[DataChange]:
+        """获取指定源的变更记录"""
+        try:
+            return await self._get_latest_by("source", source, limit)
+            
+        except Exception as e:
+            logger.error(f"PostgreSQL存储获取源变更失败: {e}")
+            return []
+    
+    async def get_changes_by_target(self, target: str, limit: int = 100) -> List[DataChange]:
+        """获取指定目标的变更记录"""
+        try:
+            return await self._get_latest_by("target", target, limit)
+            
+        except Exception as e:
+            logger.error(f"PostgreSQL存储获取目标变更失败: {e}")
+            return []
+    
+    async def get_last_sync_time(self) -> Optional[datetime]:
+        """获取上次同步时间"""
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                return await conn.fetchval(f"""
+                    SELECT max(changed_at) FROM {self.table_name}
+                    WHERE sync_status = 'completed'
+                """)
+            
+        except Exception as e:
+            logger.error(f"PostgreSQL存储获取上次同步时间失败: {e}")
+            return None
+    
+    async def update_sync_status(self, change_id: str, status: str, error_message: str = None) -> bool:
+        """更新同步状态"""
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                result = await conn.execute(f"""
+                    UPDATE {self.table_name}
+                    SET sync_status = $2, error_message = COALESCE($3, error_message)
+                    WHERE id = $1
+                """, change_id, status, error_message)
+            return result.endswith(" 1")
+            
+        except Exception as e:
+            logger.error(f"PostgreSQL存储更新同步状态失败: {e}")
+            return False
+    
+    async def cleanup_old_changes(self, cutoff_time: datetime) -> int:
+        """清理旧的变更记录"""
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                result = await conn.execute(f"""
+                    DELETE FROM {self.table_name} WHERE changed_at < $1
+                """, cutoff_time)
+            return int(result.split()[-1])
+            
+        except Exception as e:
+            logger.error(f"PostgreSQL存储清理旧变更失败: {e}")
+            return 0
+    
+    async def get_change_stats(self) -> Dict[str, Any]:
+        """获取变更统计信息"""
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT sync_status, count(*) AS total
+                    FROM {self.table_name}
+                    GROUP BY sync_status
+                """)
+            
+            status_counts = {row["sync_status"]: row["total"] for row in rows}
+            return {
+                "total_changes": sum(status_counts.values()),
+                "status_counts": status_counts,
+                "storage_type": "postgres"
+            }
+            
+        except Exception as e:
+            logger.error(f"PostgreSQL存储获取统计失败: {e}")
+            return {}
+    
+    async def health_check(self) -> Dict[str, Any]:
+        """健康检查"""
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                await conn.fetchval("SELECT 1")
+            return {
+                "status": "healthy",
+                "storage_type": "postgres"
+            }
+            
+        except Exception as e:
+            logger.error(f"PostgreSQL存储健康检查失败: {e}")
+            return {
+                "status": "unhealthy",
+                "error": str(e)
+            }
+    
+    async def close(self):
+        """关闭连接池"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
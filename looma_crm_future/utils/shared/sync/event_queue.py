@@ -2,20 +2,29 @@
 """
 事件队列
 实现同步事件的发布和消费
+基于redis.asyncio：批量XREADGROUP读取、有界并发分发、处理成功后批量XACK、
+XAUTOCLAIM回收长时间未确认的消息(超过投递次数上限的转入死信流)，并统计消费延迟与吞吐
 """
 
 import asyncio
 import json
 import logging
-import redis
-from typing import Dict, Any, List, Optional
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
 from datetime import datetime
 from dataclasses import asdict
 
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+
 from .sync_engine import SyncEvent, SyncEventType, SyncStatus
 
 logger = logging.getLogger(__name__)
 
+# 事件处理函数：返回True表示处理完成，可以确认消息
+EventHandler = Callable[[SyncEvent], Awaitable[bool]]
+
 class EventQueue:
     """事件队列"""
     
@@ -28,45 +37,88 @@ class EventQueue:
         self.block_time_ms = self.config.get("block_time_ms", 1000)
         self.is_connected = False
         
-        # 初始化Redis连接
+        # 消费配置
+        self.read_batch_size = self.config.get("read_batch_size", self.config.get("batch_size", 100))
+        self.consumer_concurrency = self.config.get("consumer_concurrency", 16)
+        self.ack_batch_size = self.config.get("ack_batch_size", 100)
+        self.claim_min_idle_ms = self.config.get("claim_min_idle_ms", 60000)
+        self.claim_interval_seconds = self.config.get("claim_interval_seconds", 30)
+        # 投递次数达到上限仍未确认的消息转入死信流并确认，<=0表示不限制
+        self.max_deliveries = self.config.get("max_deliveries", 5)
+        self.dead_letter_stream = self.config.get("dead_letter_stream", f"{self.stream_name}:dlq")
+        # 消费延迟按最早待确认消息计算，XPENDING采样间隔(秒)
+        self.lag_sample_interval_seconds = self.config.get("lag_sample_interval_seconds", 1.0)
+        
+        # 消费指标
+        self.consumer_metrics = {
+            "consumed": 0,
+            "acked": 0,
+            "handler_failures": 0,
+            "parse_failures": 0,
+            "reclaimed": 0,
+            "dead_lettered": 0,
+            "ack_batches": 0,
+            "last_lag_ms": 0,
+            "max_lag_ms": 0
+        }
+        # 按秒分桶的确认计数[(秒, 数量)]，最多保留一小时
+        self._ack_buckets: deque = deque(maxlen=3600)
+        self._last_lag_sample = 0.0
+        self._connect_lock = asyncio.Lock()
+        
+        # 初始化Redis客户端(连接在首次使用时建立)
         self._initialize_redis()
     
     def _initialize_redis(self):
-        """初始化Redis连接"""
-        try:
-            redis_config = self.config.get("redis", {})
-            self.redis_client = redis.Redis(
-                host=redis_config.get("host", "localhost"),
-                port=redis_config.get("port", 6379),
-                db=redis_config.get("db", 0),
-                decode_responses=True
-            )
-            
-            # 测试连接
-            self.redis_client.ping()
-            self.is_connected = True
-            
-            # 创建消费者组
-            self._create_consumer_group()
+        """初始化Redis客户端"""
+        redis_config = self.config.get("redis", {})
+        self.redis_client = aioredis.Redis(
+            host=redis_config.get("host", "localhost"),
+            port=redis_config.get("port", 6379),
+            db=redis_config.get("db", 0),
+            decode_responses=True
+        )
+        self.is_connected = False
+    
+    async def connect(self) -> bool:
+        """建立Redis连接并创建消费者组"""
+        async with self._connect_lock:
+            if self.is_connected:
+                return True
             
-            logger.info("事件队列Redis连接成功")
+            try:
+                # 测试连接
+                await self.redis_client.ping()
+                
+                # 创建消费者组
+                await self._create_consumer_group()
+                
+                self.is_connected = True
+                logger.info("事件队列Redis连接成功")
+                
+            except Exception as e:
+                logger.error(f"事件队列Redis连接失败: {e}")
+                self.is_connected = False
             
-        except Exception as e:
-            logger.error(f"事件队列Redis连接失败: {e}")
-            self.is_connected = False
+            return self.is_connected
+    
+    async def _ensure_connected(self) -> bool:
+        if self.is_connected:
+            return True
+        return await self.connect()
     
-    def _create_consumer_group(self):
+    async def _create_consumer_group(self):
         """创建消费者组"""
         try:
             # 尝试创建消费者组
-            self.redis_client.xgroup_create(
+            await self.redis_client.xgroup_create(
                 self.stream_name,
                 self.consumer_group,
                 id="0",
                 mkstream=True
             )
             logger.info(f"创建消费者组成功: {self.consumer_group}")
-        except redis.exceptions.ResponseError as e:
+        except ResponseError as e:
             if "BUSYGROUP" in str(e):
                 logger.info(f"消费者组已存在: {self.consumer_group}")
             else:
@@ -75,7 +127,7 @@ class EventQueue:
     
     async def publish_event(self, event: SyncEvent) -> bool:
         """发布同步事件"""
-        if not self.is_connected:
+        if not await self._ensure_connected():
             logger.error("Redis连接未建立，无法发布事件")
             return False
         
@@ -96,10 +148,11 @@ class EventQueue:
             }
             
             # 发布到Redis Stream
-            message_id = self.redis_client.xadd(
+            message_id = await self.redis_client.xadd(
                 self.stream_name,
                 event_data,
-                maxlen=self.max_stream_length
+                maxlen=self.max_stream_length,
+                approximate=True
             )
             
             logger.debug(f"事件发布成功: {event.id} -> {message_id}")
@@ -110,56 +163,269 @@ class EventQueue:
             return False
     
     async def consume_event(self, consumer_name: str) -> Optional[SyncEvent]:
-        """消费同步事件"""
-        if not self.is_connected:
+        """消费单个同步事件(读取后立即确认，兼容旧接口；批量消费请使用consume)"""
+        if not await self._ensure_connected():
             logger.error("Redis连接未建立，无法消费事件")
             return None
         
         try:
-            # 从消费者组读取事件
-            messages = self.redis_client.xreadgroup(
-                self.consumer_group,
-                consumer_name,
-                {self.stream_name: ">"},
-                count=1,
-                block=self.block_time_ms
-            )
-            
+            messages = await self.read_batch(consumer_name, count=1)
             if not messages:
                 return None
             
-            # 解析消息
-            for stream, msgs in messages:
-                for message_id, fields in msgs:
-                    try:
-                        # 解析事件数据
-                        event = self._parse_event_from_fields(fields)
-                        if event:
-                            # 确认消息处理
-                            self.redis_client.xack(
-                                self.stream_name,
-                                self.consumer_group,
-                                message_id
-                            )
-                            
-                            logger.debug(f"事件消费成功: {event.id}")
-                            return event
-                            
-                    except Exception as e:
-                        logger.error(f"解析事件失败: {e}")
-                        # 确认消息处理（避免重复处理）
-                        self.redis_client.xack(
-                            self.stream_name,
-                            self.consumer_group,
-                            message_id
-                        )
-            
-            return None
+            message_id, event = messages[0]
+            await self.ack_many([message_id])
+            if event:
+                logger.debug(f"事件消费成功: {event.id}")
+            return event
             
         except Exception as e:
             logger.error(f"消费事件失败: {e}")
             return None
     
+    async def read_batch(self, consumer_name: str, count: Optional[int] = None,
+                         block_ms: Optional[int] = None) -> List[Tuple[str, Optional[SyncEvent]]]:
+        """一次XREADGROUP读取多条新消息，返回[(message_id, event)]，解析失败的event为None"""
+        response = await self.redis_client.xreadgroup(
+            self.consumer_group,
+            consumer_name,
+            {self.stream_name: ">"},
+            count=count or self.read_batch_size,
+            block=self.block_time_ms if block_ms is None else block_ms
+        )
+        
+        messages = []
+        for _, msgs in response or []:
+            for message_id, fields in msgs:
+                messages.append((message_id, self._parse_event_from_fields(fields)))
+        
+        self.consumer_metrics["consumed"] += len(messages)
+        return messages
+    
+    async def reclaim_stale(self, consumer_name: str, count: Optional[int] = None) -> List[Tuple[str, Optional[SyncEvent]]]:
+        """
+        通过XAUTOCLAIM接管空闲超过claim_min_idle_ms的待确认消息
+        
+        投递次数超过max_deliveries的消息不再交给handler，转入死信流后确认
+        """
+        claimed_fields = []
+        start_id = "0-0"
+        limit = count or self.read_batch_size
+        
+        while len(claimed_fields) < limit:
+            response = await self.redis_client.xautoclaim(
+                self.stream_name,
+                self.consumer_group,
+                consumer_name,
+                min_idle_time=self.claim_min_idle_ms,
+                start_id=start_id,
+                count=limit - len(claimed_fields)
+            )
+            start_id, claimed = response[0], response[1]
+            for message_id, fields in claimed:
+                # 已被裁剪出流的消息返回空字段
+                if fields:
+                    claimed_fields.append((message_id, fields))
+                else:
+                    await self.ack_many([message_id])
+            if start_id in ("0-0", b"0-0"):
+                break
+        
+        if self.max_deliveries > 0 and claimed_fields:
+            delivery_counts = await self._delivery_counts([message_id for message_id, _ in claimed_fields])
+            exhausted = [(message_id, fields) for message_id, fields in claimed_fields
+                         if delivery_counts.get(message_id, 0) > self.max_deliveries]
+            if exhausted:
+                await self._dead_letter(exhausted, delivery_counts)
+                exhausted_ids = {message_id for message_id, _ in exhausted}
+                claimed_fields = [item for item in claimed_fields if item[0] not in exhausted_ids]
+        
+        messages = [(message_id, self._parse_event_from_fields(fields)) for message_id, fields in claimed_fields]
+        if messages:
+            self.consumer_metrics["reclaimed"] += len(messages)
+            logger.info(f"回收待确认消息: consumer={consumer_name}, count={len(messages)}")
+        return messages
+    
+    async def _delivery_counts(self, message_ids: List[str]) -> Dict[str, int]:
+        """单次往返通过XPENDING读取各消息的投递次数(XAUTOCLAIM已计入本次投递)"""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for message_id in message_ids:
+                pipe.xpending_range(self.stream_name, self.consumer_group,
+                                    min=message_id, max=message_id, count=1)
+            results = await pipe.execute()
+        
+        counts = {}
+        for entries in results:
+            for entry in entries:
+                counts[entry["message_id"]] = entry["times_delivered"]
+        return counts
+    
+    async def _dead_letter(self, entries: List[Tuple[str, Dict[str, str]]], delivery_counts: Dict[str, int]):
+        """把消息原样写入死信流并在同一事务中确认"""
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            for message_id, fields in entries:
+                pipe.xadd(
+                    self.dead_letter_stream,
+                    {
+                        **fields,
+                        "dlq_original_id": message_id,
+                        "dlq_deliveries": str(delivery_counts.get(message_id, 0)),
+                        "dlq_consumer_group": self.consumer_group
+                    },
+                    maxlen=self.max_stream_length,
+                    approximate=True
+                )
+            pipe.xack(self.stream_name, self.consumer_group, *[message_id for message_id, _ in entries])
+            await pipe.execute()
+        
+        self.consumer_metrics["dead_lettered"] += len(entries)
+        logger.warning(f"消息超过投递次数上限，已转入死信流: stream={self.dead_letter_stream}, "
+                       f"count={len(entries)}, max_deliveries={self.max_deliveries}")
+    
+    async def ack_many(self, message_ids: List[str]) -> int:
+        """按ack_batch_size分批，单次往返流水线确认消息"""
+        if not message_ids:
+            return 0
+        
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for i in range(0, len(message_ids), self.ack_batch_size):
+                pipe.xack(self.stream_name, self.consumer_group, *message_ids[i:i + self.ack_batch_size])
+            results = await pipe.execute()
+        
+        acked = sum(results)
+        self._record_acks(acked)
+        self.consumer_metrics["acked"] += acked
+        self.consumer_metrics["ack_batches"] += 1
+        return acked
+    
+    def _record_acks(self, acked: int):
+        second = int(time.time())
+        if self._ack_buckets and self._ack_buckets[-1][0] == second:
+            self._ack_buckets[-1] = (second, self._ack_buckets[-1][1] + acked)
+        elif acked:
+            self._ack_buckets.append((second, acked))
+    
+    async def sample_lag(self, force: bool = False) -> Optional[int]:
+        """
+        以消费者组中最早的待确认消息估算消费延迟(毫秒)
+        
+        XPENDING摘要中的最小ID即积压中最早的消息，其毫秒时间戳到当前的间隔随积压增长；
+        没有待确认消息时延迟为0。按lag_sample_interval_seconds限频，返回None表示本次未采样
+        """
+        now = time.time()
+        if not force and now - self._last_lag_sample < self.lag_sample_interval_seconds:
+            return None
+        self._last_lag_sample = now
+        
+        summary = await self.redis_client.xpending(self.stream_name, self.consumer_group)
+        oldest = summary.get("min") if summary and summary.get("pending") else None
+        lag_ms = 0
+        if oldest is not None:
+            if isinstance(oldest, bytes):
+                oldest = oldest.decode()
+            try:
+                lag_ms = max(0, int(now * 1000) - int(str(oldest).split("-")[0]))
+            except ValueError:
+                return None
+        
+        self.consumer_metrics["last_lag_ms"] = lag_ms
+        self.consumer_metrics["max_lag_ms"] = max(self.consumer_metrics["max_lag_ms"], lag_ms)
+        return lag_ms
+    
+    async def consume(self, consumer_name: str, handler: EventHandler,
+                      should_continue: Callable[[], bool] = lambda: True):
+        """
+        持续消费事件
+        
+        批量读取后以consumer_concurrency为上限并发调用handler，
+        handler返回True的消息在下一次读取前批量确认；失败的消息保持待确认，
+        空闲超过claim_min_idle_ms后由XAUTOCLAIM重新投递，超过max_deliveries次后转入死信流
+        """
+        in_flight = set()
+        ack_buffer: List[str] = []
+        last_claim = 0.0
+        
+        async def dispatch(message_id: str, event: Optional[SyncEvent]):
+            if event is None:
+                # 无法解析的消息直接确认，避免反复投递
+                self.consumer_metrics["parse_failures"] += 1
+                ack_buffer.append(message_id)
+                return
+            try:
+                if await handler(event):
+                    ack_buffer.append(message_id)
+                else:
+                    self.consumer_metrics["handler_failures"] += 1
+            except Exception as e:
+                self.consumer_metrics["handler_failures"] += 1
+                logger.error(f"处理事件失败: {event.id}, {e}")
+        
+        async def flush_acks():
+            if ack_buffer:
+                message_ids = ack_buffer[:]
+                ack_buffer.clear()
+                await self.ack_many(message_ids)
+        
+        try:
+            while should_continue():
+                if not await self._ensure_connected():
+                    await asyncio.sleep(1)
+                    continue
+                
+                try:
+                    await flush_acks()
+                    
+                    # 并发已满时等待任意任务完成
+                    free_slots = self.consumer_concurrency - len(in_flight)
+                    if free_slots <= 0:
+                        await asyncio.wait(set(in_flight), return_when=asyncio.FIRST_COMPLETED)
+                        continue
+                    
+                    messages = []
+                    if time.time() - last_claim >= self.claim_interval_seconds:
+                        last_claim = time.time()
+                        messages = await self.reclaim_stale(consumer_name, count=free_slots)
+                    if not messages:
+                        # 仍有任务在处理时不长时间阻塞，尽快确认已完成的消息
+                        block_ms = 50 if in_flight else self.block_time_ms
+                        messages = await self.read_batch(consumer_name, count=free_slots, block_ms=block_ms)
+                    
+                    for message_id, event in messages:
+                        task = asyncio.create_task(dispatch(message_id, event))
+                        in_flight.add(task)
+                        task.add_done_callback(in_flight.discard)
+                    
+                    await self.sample_lag()
+                
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"消费事件失败: {e}")
+                    await asyncio.sleep(1)
+        finally:
+            # 停止时等待在途任务完成并确认
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            try:
+                await flush_acks()
+            except Exception as e:
+                logger.error(f"确认消息失败: {e}")
+    
+    def get_consumer_metrics(self, window_seconds: int = 60) -> Dict[str, Any]:
+        """消费指标：累计计数、最近窗口吞吐与延迟"""
+        cutoff = int(time.time()) - window_seconds
+        acked = 0
+        for second, count in reversed(self._ack_buckets):
+            if second <= cutoff:
+                break
+            acked += count
+        
+        return {
+            **self.consumer_metrics,
+            "throughput_per_second": acked / window_seconds,
+            "window_seconds": window_seconds
+        }
+    
     def _parse_event_from_fields(self, fields: Dict[str, str]) -> Optional[SyncEvent]:
         """从字段解析事件"""
         try:
@@ -199,12 +465,12 @@ class EventQueue:
     
     async def get_pending_events(self, consumer_name: str) -> List[SyncEvent]:
         """获取待处理事件"""
-        if not self.is_connected:
+        if not await self._ensure_connected():
             return []
         
         try:
             # 获取待处理事件
-            pending = self.redis_client.xpending_range(
+            pending = await self.redis_client.xpending_range(
                 self.stream_name,
                 self.consumer_group,
                 min="-",
@@ -218,7 +484,7 @@ class EventQueue:
                 message_id = pending_info["message_id"]
                 
                 # 获取事件详情
-                messages = self.redis_client.xrange(
+                messages = await self.redis_client.xrange(
                     self.stream_name,
                     min=message_id,
                     max=message_id
@@ -238,18 +504,19 @@ class EventQueue:
     
     async def get_queue_stats(self) -> Dict[str, Any]:
         """获取队列统计信息"""
-        if not self.is_connected:
+        if not await self._ensure_connected():
             return {"error": "Redis连接未建立"}
         
         try:
             # 获取流信息
-            stream_info = self.redis_client.xinfo_stream(self.stream_name)
+            stream_info = await self.redis_client.xinfo_stream(self.stream_name)
             
             # 获取消费者组信息
-            group_info = self.redis_client.xinfo_groups(self.stream_name)
+            group_info = await self.redis_client.xinfo_groups(self.stream_name)
+            group = next((g for g in group_info if g.get("name") == self.consumer_group), {})
             
             # 获取消费者信息
-            consumers_info = self.redis_client.xinfo_consumers(
+            consumers_info = await self.redis_client.xinfo_consumers(
                 self.stream_name,
                 self.consumer_group
             )
@@ -263,7 +530,9 @@ class EventQueue:
                 "consumer_group": {
                     "name": self.consumer_group,
                     "consumers": len(consumers_info),
-                    "pending": sum(consumer.get("pending", 0) for consumer in consumers_info)
+                    "pending": sum(consumer.get("pending", 0) for consumer in consumers_info),
+                    "lag": group.get("lag"),
+                    "last_delivered_id": group.get("last-delivered-id")
                 },
                 "consumers": [
                     {
@@ -272,7 +541,8 @@ class EventQueue:
                         "idle": consumer.get("idle", 0)
                     }
                     for consumer in consumers_info
-                ]
+                ],
+                "consumer_metrics": self.get_consumer_metrics()
             }
             
         except Exception as e:
@@ -281,15 +551,15 @@ class EventQueue:
     
     async def clear_queue(self) -> bool:
         """清空队列"""
-        if not self.is_connected:
+        if not await self._ensure_connected():
             return False
         
         try:
             # 删除流
-            self.redis_client.delete(self.stream_name)
+            await self.redis_client.delete(self.stream_name)
             
             # 重新创建消费者组
-            self._create_consumer_group()
+            await self._create_consumer_group()
             
             logger.info("队列清空成功")
             return True
@@ -301,14 +571,14 @@ class EventQueue:
     async def health_check(self) -> Dict[str, Any]:
         """健康检查"""
         try:
-            if not self.is_connected:
+            if not await self._ensure_connected():
                 return {
                     "status": "unhealthy",
                     "error": "Redis连接未建立"
                 }
             
             # 测试Redis连接
-            self.redis_client.ping()
+            await self.redis_client.ping()
             
             # 获取队列统计
             stats = await self.get_queue_stats()
@@ -331,8 +601,16 @@ class EventQueue:
     async def reconnect(self) -> bool:
         """重新连接"""
         try:
+            if self.redis_client is not None:
+                await self.redis_client.close()
             self._initialize_redis()
-            return self.is_connected
+            return await self.connect()
         except Exception as e:
             logger.error(f"重新连接失败: {e}")
             return False
+    
+    async def close(self):
+        """关闭Redis连接"""
+        if self.redis_client is not None:
+            await self.redis_client.close()
+        self.is_connected = False
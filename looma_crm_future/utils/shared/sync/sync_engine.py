@@ -54,6 +54,7 @@ class SyncResult:
     error_message: Optional[str] = None
     conflict_resolved: bool = False
     data_changed: bool = False
+    retry_scheduled: bool = False  # 失败后已重新发布重试事件
 
 class SyncEngine:
     """数据同步引擎"""
@@ -241,27 +242,28 @@ class SyncEngine:
     async def incremental_sync(self, last_sync_time: datetime) -> List[SyncResult]:
         """增量同步"""
         try:
-            # 获取变更数据
-            changes = await self.change_log.get_changes_since(last_sync_time)
-            
             results = []
-            for change in changes:
-                # 创建同步事件
-                event = SyncEvent(
-                    id=f"incr_{change.id}",
-                    type=SyncEventType.SYNC,
-                    source=change.source,
-                    target=change.target,
-                    data=change.data,
-                    timestamp=datetime.now(),
-                    priority=0
-                )
-                
-                # 执行同步
-                result = await self._execute_sync(event)
-                results.append(result)
             
-            logger.info(f"增量同步完成，处理了 {len(changes)} 个变更")
+            # 按游标分页获取变更数据，避免一次性加载全部历史
+            async for changes in self.change_log.iter_changes_since(
+                    last_sync_time, page_size=self.config.get("batch_size", 100)):
+                for change in changes:
+                    # 创建同步事件
+                    event = SyncEvent(
+                        id=f"incr_{change.id}",
+                        type=SyncEventType.SYNC,
+                        source=change.source,
+                        target=change.target,
+                        data=change.data,
+                        timestamp=datetime.now(),
+                        priority=0
+                    )
+                    
+                    # 执行同步
+                    result = await self._execute_sync(event)
+                    results.append(result)
+            
+            logger.info(f"增量同步完成，处理了 {len(results)} 个变更")
             return results
             
         except Exception as e:
@@ -299,31 +301,33 @@ class SyncEngine:
             return []
     
     async def _sync_worker(self, worker_name: str):
-        """同步工作器"""
+        """同步工作器：批量消费事件队列，有界并发处理"""
         logger.info(f"同步工作器 {worker_name} 启动")
         
-        while self.is_running:
-            try:
-                # 从事件队列获取事件
-                event = await self.event_queue.consume_event(worker_name)
-                
-                if event:
-                    # 处理同步事件
-                    result = await self._process_sync_event(event)
-                    logger.debug(f"工作器 {worker_name} 处理事件 {event.id}: {result.success}")
-                
-                # 短暂休眠避免CPU占用过高
-                await asyncio.sleep(0.1)
-                
-            except asyncio.CancelledError:
-                logger.info(f"同步工作器 {worker_name} 被取消")
-                break
-            except Exception as e:
-                logger.error(f"同步工作器 {worker_name} 错误: {e}")
-                await asyncio.sleep(1)
+        try:
+            await self.event_queue.consume(
+                worker_name,
+                self._handle_queued_event,
+                should_continue=lambda: self.is_running
+            )
+        except asyncio.CancelledError:
+            logger.info(f"同步工作器 {worker_name} 被取消")
+        except Exception as e:
+            logger.error(f"同步工作器 {worker_name} 错误: {e}")
         
         logger.info(f"同步工作器 {worker_name} 停止")
     
+    async def _handle_queued_event(self, event: SyncEvent) -> bool:
+        """
+        处理队列中的事件，返回是否可以确认消息
+        
+        成功或已重新发布重试事件时确认；否则消息保持待确认，
+        由XAUTOCLAIM重新投递，超过max_deliveries后转入死信流
+        """
+        result = await self._process_sync_event(event)
+        logger.debug(f"处理事件 {event.id}: {result.success}")
+        return result.success or result.retry_scheduled
+    
     async def _process_sync_event(self, event: SyncEvent) -> SyncResult:
         """处理同步事件"""
         start_time = datetime.now()
@@ -350,7 +354,7 @@ class SyncEngine:
                 
                 # 延迟重试
                 await asyncio.sleep(self.config.get("retry_delay_ms", 1000) / 1000)
-                await self.event_queue.publish_event(event)
+                result.retry_scheduled = await self.event_queue.publish_event(event)
             
             return result
             
@@ -463,6 +467,10 @@ class SyncEngine:
         else:
             metrics["conflict_resolution_rate"] = 0
         
+        # 事件队列消费指标
+        if self.event_queue:
+            metrics["event_queue"] = self.event_queue.get_consumer_metrics()
+        
         return metrics
     
     async def health_check(self) -> Dict[str, Any]:
@@ -3,12 +3,15 @@ from .base_service import BaseAIService
 from .service_registry import ServiceRegistry
 from .load_balancer import LoadBalancer
 from .circuit_breaker import CircuitBreaker
-from .rate_limiter import RateLimiter
+from .rate_limiter import RateLimiter, RedisTokenBucketRateLimiter
+from .upstream_pool import UpstreamSessionPool
 
 __all__ = [
     'BaseAIService',
     'ServiceRegistry',
     'LoadBalancer',
     'CircuitBreaker',
-    'RateLimiter'
+    'RateLimiter',
+    'RedisTokenBucketRateLimiter',
+    'UpstreamSessionPool'
 ]
@@ -1,33 +1,134 @@
 """
 负载均衡器 - 用于AI服务的负载均衡
-支持轮询、随机、最少连接等多种策略
+支持轮询、随机、最少连接、Peak-EWMA、二选一(P2C)、一致性哈希等多种策略，
+并根据网关记录的实例响应时间与失败情况进行异常实例摘除
 """
 
 import asyncio
+import bisect
+import hashlib
+import math
 import random
 import logging
-from typing import Dict, Any, List, Optional
+import statistics
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 
+class InstanceStats:
+    """单个实例的实时统计：Peak-EWMA延迟、在途请求与失败情况"""
+    
+    def __init__(self, decay_seconds: float = 10.0):
+        self.decay_seconds = decay_seconds
+        self.ewma_latency = 0.0
+        self.last_update = time.monotonic()
+        self.pending = 0
+        self.samples = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejection_count = 0
+    
+    def observe(self, latency: float, success: bool):
+        """记录一次响应；延迟高于当前值时直接取峰值，否则按时间衰减平滑"""
+        now = time.monotonic()
+        if self.samples == 0 or latency > self.ewma_latency:
+            self.ewma_latency = latency
+        else:
+            weight = math.exp(-(now - self.last_update) / self.decay_seconds)
+            self.ewma_latency = self.ewma_latency * weight + latency * (1 - weight)
+        self.last_update = now
+        self.samples += 1
+        self.total_requests += 1
+        
+        if success:
+            self.consecutive_failures = 0
+        else:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+    
+    def cost(self, default_latency: float) -> float:
+        """负载代价 = 延迟估计 * (在途请求数 + 1)
+
+        长时间无新样本时延迟估计向默认值衰减，使变慢后恢复(如模型预热完成)的实例重新获得试探流量
+        """
+        if not self.samples:
+            latency = default_latency
+        elif self.ewma_latency > default_latency:
+            idle_weight = math.exp(-(time.monotonic() - self.last_update) / self.decay_seconds)
+            latency = default_latency + (self.ewma_latency - default_latency) * idle_weight
+        else:
+            latency = self.ewma_latency
+        return latency * (self.pending + 1)
+    
+    def is_ejected(self, now: float) -> bool:
+        return self.ejected_until > now
+
+
 class LoadBalancer:
     """负载均衡器"""
     
-    def __init__(self, strategy: str = 'round_robin'):
-        """初始化负载均衡器"""
+    def __init__(self, strategy: str = 'round_robin',
+                 strategy_overrides: Optional[Dict[str, str]] = None,
+                 ewma_decay_seconds: float = 10.0,
+                 hash_replicas: int = 100,
+                 ejection_consecutive_failures: int = 5,
+                 ejection_latency_factor: float = 3.0,
+                 ejection_min_samples: int = 20,
+                 ejection_base_seconds: float = 30.0,
+                 max_ejection_percent: float = 0.5):
+        """
+        初始化负载均衡器
+        
+        Args:
+            strategy: 默认策略
+            strategy_overrides: 按服务名覆盖策略，如 {'resume-service': 'consistent_hash'}
+            ewma_decay_seconds: Peak-EWMA衰减时间常数
+            hash_replicas: 一致性哈希环上每个实例的虚拟节点数
+            ejection_consecutive_failures: 连续失败达到该次数时摘除实例
+            ejection_latency_factor: 延迟超过同服务实例中位数该倍数时摘除实例
+            ejection_min_samples: 参与延迟异常判断所需的最少样本数
+            ejection_base_seconds: 基础摘除时长，随摘除次数线性增长
+            max_ejection_percent: 同一服务最多可摘除的实例比例
+        """
         self.strategy = strategy
+        self.strategy_overrides = strategy_overrides or {}
         self.service_instances = {}
         self.instance_counters = {}
         self.instance_connections = {}
         
+        # 实例实时统计 service_name -> instance_id -> InstanceStats
+        self.ewma_decay_seconds = ewma_decay_seconds
+        self.instance_stats: Dict[str, Dict[str, InstanceStats]] = {}
+        
+        # 一致性哈希环 service_name -> (实例ID集合, 哈希点列表, 实例ID列表)
+        self.hash_replicas = hash_replicas
+        self.hash_rings: Dict[str, Tuple[frozenset, List[int], List[str]]] = {}
+        
+        # 异常实例摘除配置
+        self.ejection_consecutive_failures = ejection_consecutive_failures
+        self.ejection_latency_factor = ejection_latency_factor
+        self.ejection_min_samples = ejection_min_samples
+        self.ejection_base_seconds = ejection_base_seconds
+        self.max_ejection_percent = max_ejection_percent
+        
     async def initialize(self):
         """初始化负载均衡器"""
         logger.info(f"负载均衡器初始化成功，策略: {self.strategy}")
     
-    async def select_instance(self, service_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """选择服务实例"""
+    async def select_instance(self, service_info: Dict[str, Any],
+                              hash_key: Optional[Any] = None) -> Optional[Dict[str, Any]]:
+        """
+        选择服务实例
+        
+        Args:
+            service_info: 服务信息(包含instances)
+            hash_key: 一致性哈希键(如user_id)，仅consistent_hash策略使用
+        """
         try:
             service_name = service_info.get('name', 'unknown')
             instances = service_info.get('instances', [])
@@ -43,14 +144,30 @@ class LoadBalancer:
                 return None
             
             # 根据策略选择实例
-            if self.strategy == 'round_robin':
+            strategy = self.strategy_overrides.get(service_name, self.strategy)
+            if strategy == 'consistent_hash':
+                # 哈希环基于全部健康实例构建，摘除实例时其余键的映射保持不变
+                selected_instance = await self._consistent_hash_selection(service_name, healthy_instances, hash_key)
+                if selected_instance is not None:
+                    logger.debug(f"选择服务实例: {service_name} -> {selected_instance.get('id', 'unknown')}")
+                    return selected_instance
+                strategy = 'power_of_two'
+            
+            # 跳过被摘除的异常实例
+            healthy_instances = self._filter_ejected(service_name, healthy_instances)
+            
+            if strategy == 'round_robin':
                 selected_instance = await self._round_robin_selection(service_name, healthy_instances)
-            elif self.strategy == 'random':
+            elif strategy == 'random':
                 selected_instance = await self._random_selection(healthy_instances)
-            elif self.strategy == 'least_connections':
+            elif strategy == 'least_connections':
                 selected_instance = await self._least_connections_selection(service_name, healthy_instances)
-            elif self.strategy == 'weighted_round_robin':
+            elif strategy == 'weighted_round_robin':
                 selected_instance = await self._weighted_round_robin_selection(service_name, healthy_instances)
+            elif strategy == 'peak_ewma':
+                selected_instance = await self._peak_ewma_selection(service_name, healthy_instances)
+            elif strategy == 'power_of_two':
+                selected_instance = await self._power_of_two_selection(service_name, healthy_instances)
             else:
                 # 默认使用轮询
                 selected_instance = await self._round_robin_selection(service_name, healthy_instances)
@@ -118,6 +235,154 @@ class LoadBalancer:
         
         return instances[0]
     
+    def _get_stats(self, service_name: str, instance_id: str) -> InstanceStats:
+        service_stats = self.instance_stats.setdefault(service_name, {})
+        stats = service_stats.get(instance_id)
+        if stats is None:
+            stats = service_stats[instance_id] = InstanceStats(self.ewma_decay_seconds)
+        return stats
+    
+    def _default_latency(self, service_name: str) -> float:
+        """无样本实例的延迟估计：取已有实例的中位数，使新实例能获得试探流量"""
+        latencies = [
+            stats.ewma_latency for stats in self.instance_stats.get(service_name, {}).values()
+            if stats.samples
+        ]
+        return statistics.median(latencies) if latencies else 0.0
+    
+    def _instance_cost(self, service_name: str, instance: Dict[str, Any], default_latency: float) -> float:
+        stats = self.instance_stats.get(service_name, {}).get(instance.get('id', 'unknown'))
+        if stats is None:
+            return default_latency
+        return stats.cost(default_latency)
+    
+    async def _peak_ewma_selection(self, service_name: str, instances: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Peak-EWMA选择：代价最小的实例"""
+        default_latency = self._default_latency(service_name)
+        return min(instances, key=lambda inst: self._instance_cost(service_name, inst, default_latency))
+    
+    async def _power_of_two_selection(self, service_name: str, instances: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """二选一：随机取两个实例，选择Peak-EWMA代价较小者"""
+        if len(instances) == 1:
+            return instances[0]
+        first, second = random.sample(instances, 2)
+        default_latency = self._default_latency(service_name)
+        if self._instance_cost(service_name, second, default_latency) < self._instance_cost(service_name, first, default_latency):
+            return second
+        return first
+    
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+    
+    def _get_hash_ring(self, service_name: str, instances: List[Dict[str, Any]]) -> Tuple[List[int], List[str]]:
+        """获取一致性哈希环，实例集合变化时重建"""
+        instance_ids = frozenset(inst.get('id', 'unknown') for inst in instances)
+        ring = self.hash_rings.get(service_name)
+        if ring is not None and ring[0] == instance_ids:
+            return ring[1], ring[2]
+        
+        points = sorted(
+            (self._hash(f"{instance_id}#{replica}"), instance_id)
+            for instance_id in instance_ids
+            for replica in range(self.hash_replicas)
+        )
+        hashes = [point for point, _ in points]
+        owners = [instance_id for _, instance_id in points]
+        self.hash_rings[service_name] = (instance_ids, hashes, owners)
+        return hashes, owners
+    
+    async def _consistent_hash_selection(self, service_name: str, instances: List[Dict[str, Any]],
+                                         hash_key: Optional[Any]) -> Optional[Dict[str, Any]]:
+        """一致性哈希选择：同一键固定落到同一实例；目标被摘除时顺延到环上下一个可用实例"""
+        if hash_key is None:
+            return None
+        
+        hashes, owners = self._get_hash_ring(service_name, instances)
+        by_id = {inst.get('id', 'unknown'): inst for inst in instances}
+        now = time.monotonic()
+        service_stats = self.instance_stats.get(service_name, {})
+        
+        start = bisect.bisect(hashes, self._hash(str(hash_key))) % len(hashes)
+        tried = set()
+        for offset in range(len(hashes)):
+            instance_id = owners[(start + offset) % len(hashes)]
+            if instance_id in tried:
+                continue
+            tried.add(instance_id)
+            stats = service_stats.get(instance_id)
+            if stats is None or not stats.is_ejected(now):
+                return by_id[instance_id]
+            if len(tried) == len(by_id):
+                break
+        
+        return None
+    
+    def _filter_ejected(self, service_name: str, instances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """过滤被摘除的实例，全部被摘除时退回原列表"""
+        service_stats = self.instance_stats.get(service_name)
+        if not service_stats:
+            return instances
+        now = time.monotonic()
+        available = [
+            inst for inst in instances
+            if not (inst.get('id', 'unknown') in service_stats and service_stats[inst.get('id', 'unknown')].is_ejected(now))
+        ]
+        return available or instances
+    
+    def record_request_start(self, service_name: str, instance_id: str):
+        """请求发往实例前调用，记录在途请求"""
+        self._get_stats(service_name, instance_id).pending += 1
+        connections = self.instance_connections.setdefault(service_name, {})
+        connections[instance_id] = connections.get(instance_id, 0) + 1
+    
+    def record_response(self, service_name: str, instance_id: str, latency: float, success: bool):
+        """实例响应后调用，更新Peak-EWMA延迟并判断是否需要摘除"""
+        stats = self._get_stats(service_name, instance_id)
+        stats.pending = max(stats.pending - 1, 0)
+        stats.observe(latency, success)
+        
+        connections = self.instance_connections.setdefault(service_name, {})
+        connections[instance_id] = max(connections.get(instance_id, 0) - 1, 0)
+        
+        self._check_outlier(service_name, instance_id, stats)
+    
+    def _check_outlier(self, service_name: str, instance_id: str, stats: InstanceStats):
+        """连续失败或延迟显著高于同服务其他实例时摘除实例"""
+        now = time.monotonic()
+        if stats.is_ejected(now):
+            return
+        
+        reason = None
+        if stats.consecutive_failures >= self.ejection_consecutive_failures:
+            reason = f"连续失败{stats.consecutive_failures}次"
+        elif stats.samples >= self.ejection_min_samples:
+            peers = [
+                peer.ewma_latency for peer_id, peer in self.instance_stats[service_name].items()
+                if peer_id != instance_id and peer.samples >= self.ejection_min_samples and not peer.is_ejected(now)
+            ]
+            if peers:
+                baseline = statistics.median(peers)
+                if baseline > 0 and stats.ewma_latency > baseline * self.ejection_latency_factor:
+                    reason = f"延迟{stats.ewma_latency:.3f}s超过中位数{baseline:.3f}s的{self.ejection_latency_factor}倍"
+        
+        if reason is None:
+            return
+        
+        # 限制同一服务被摘除的实例比例
+        service_stats = self.instance_stats[service_name]
+        ejected = sum(1 for peer in service_stats.values() if peer.is_ejected(now))
+        if (ejected + 1) > max(1, int(len(service_stats) * self.max_ejection_percent)):
+            return
+        
+        stats.ejection_count += 1
+        stats.ejected_until = now + self.ejection_base_seconds * stats.ejection_count
+        stats.consecutive_failures = 0
+        # 恢复后以新样本重新评估延迟
+        stats.samples = 0
+        logger.warning(f"摘除异常实例: {service_name}/{instance_id}, 原因: {reason}, "
+                       f"时长: {self.ejection_base_seconds * stats.ejection_count:.0f}秒")
+    
     async def update_instance_connections(self, service_name: str, instance_id: str, delta: int):
         """更新实例连接数"""
         if service_name not in self.instance_connections:
@@ -134,11 +399,23 @@ class LoadBalancer:
     
     async def get_instance_stats(self, service_name: str) -> Dict[str, Any]:
         """获取实例统计信息"""
+        now = time.monotonic()
         stats = {
             'service_name': service_name,
-            'strategy': self.strategy,
+            'strategy': self.strategy_overrides.get(service_name, self.strategy),
             'instance_counters': self.instance_counters.get(service_name, 0),
             'instance_connections': self.instance_connections.get(service_name, {}),
+            'instances': {
+                instance_id: {
+                    'ewma_latency': instance_stats.ewma_latency,
+                    'pending': instance_stats.pending,
+                    'total_requests': instance_stats.total_requests,
+                    'total_failures': instance_stats.total_failures,
+                    'ejected': instance_stats.is_ejected(now),
+                    'ejection_count': instance_stats.ejection_count
+                }
+                for instance_id, instance_stats in self.instance_stats.get(service_name, {}).items()
+            },
             'timestamp': datetime.now().isoformat()
         }
         
@@ -149,6 +426,8 @@ class LoadBalancer:
         self.service_instances.clear()
         self.instance_counters.clear()
         self.instance_connections.clear()
+        self.instance_stats.clear()
+        self.hash_rings.clear()
         logger.info("负载均衡器资源清理完成")
 
 
@@ -223,7 +502,8 @@ class HealthCheckLoadBalancer(LoadBalancer):
                     self.unhealthy_instances.add(instance_id)
                     logger.warning(f"实例不可达: {instance_id}, 错误: {e}")
     
-    async def select_instance(self, service_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def select_instance(self, service_info: Dict[str, Any],
+                              hash_key: Optional[Any] = None) -> Optional[Dict[str, Any]]:
         """选择健康的服务实例"""
         # 过滤不健康的实例
         healthy_instances = []
@@ -240,7 +520,7 @@ class HealthCheckLoadBalancer(LoadBalancer):
         service_info_copy = service_info.copy()
         service_info_copy['instances'] = healthy_instances
         
-        return await super().select_instance(service_info_copy)
+        return await super().select_instance(service_info_copy, hash_key)
     
     async def cleanup(self):
         """清理资源"""
@@ -1,14 +1,27 @@
 """
 限流器 - 用于AI服务的流量控制
 支持令牌桶、滑动窗口等多种限流算法
+内存模式按空闲时间淘汰key；Redis模式每次检查为一次原子Lua调用，多个key可在一次往返内批量检查，
+Redis超时或不可用时退化为按worker数折算的本地近似限流
 """
 
 import asyncio
 import logging
+import math
 import time
+import uuid
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import NoScriptError
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    NoScriptError = None
+    REDIS_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +29,42 @@ logger = logging.getLogger(__name__)
 class RateLimiter:
     """限流器基类"""
     
-    def __init__(self, name: str = "default"):
+    def __init__(self, name: str = "default", max_keys: int = 100000,
+                 idle_ttl: Optional[float] = None):
         self.name = name
         self.total_requests = 0
         self.blocked_requests = 0
+        
+        # 内存模式的key淘汰：按最近访问顺序排列，超出上限或空闲超过idle_ttl的key被移除
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self.evicted_keys = 0
+        self._last_seen: "OrderedDict[str, float]" = OrderedDict()
+        self._last_eviction = 0.0
+    
+    def _touch(self, key: str, now: float):
+        """记录key访问，并按需淘汰空闲key"""
+        self._last_seen[key] = now
+        self._last_seen.move_to_end(key)
+        if len(self._last_seen) > self.max_keys or now - self._last_eviction >= 1.0:
+            self._evict_idle(now)
+    
+    def _evict_idle(self, now: float):
+        """从最久未访问的key开始淘汰，遇到未过期的key即停止"""
+        self._last_eviction = now
+        while self._last_seen:
+            key, last_seen = next(iter(self._last_seen.items()))
+            over_capacity = len(self._last_seen) > self.max_keys
+            idle = self.idle_ttl is not None and now - last_seen > self.idle_ttl
+            if not (over_capacity or idle):
+                break
+            self._last_seen.popitem(last=False)
+            self._drop_key(key)
+            self.evicted_keys += 1
+    
+    def _drop_key(self, key: str):
+        """删除key对应的限流状态 - 子类实现"""
+        pass
     
     async def initialize(self):
         """初始化限流器（兼容性方法）"""
@@ -65,6 +110,8 @@ class RateLimiter:
             'total_requests': self.total_requests,
             'blocked_requests': self.blocked_requests,
             'block_rate': self.blocked_requests / max(self.total_requests, 1),
+            'tracked_keys': len(self._last_seen),
+            'evicted_keys': self.evicted_keys,
             'timestamp': datetime.now().isoformat()
         }
 
@@ -76,9 +123,14 @@ class TokenBucketRateLimiter(RateLimiter):
         self,
         capacity: int = 100,
         refill_rate: float = 10.0,
-        name: str = "token_bucket"
+        name: str = "token_bucket",
+        max_keys: int = 100000,
+        idle_ttl: Optional[float] = None
     ):
-        super().__init__(name)
+        # 空闲超过补满时间的桶与新桶等价，默认按补满时间淘汰，不影响限流结果
+        if idle_ttl is None:
+            idle_ttl = capacity / refill_rate if refill_rate > 0 else None
+        super().__init__(name, max_keys, idle_ttl)
         self.capacity = capacity
         self.refill_rate = refill_rate  # 每秒补充的令牌数
         
@@ -94,6 +146,7 @@ class TokenBucketRateLimiter(RateLimiter):
         
         bucket = self.buckets[key]
         now = time.time()
+        self._touch(key, now)
         
         # 计算需要补充的令牌数
         time_passed = now - bucket['last_refill']
@@ -129,9 +182,13 @@ class TokenBucketRateLimiter(RateLimiter):
             'last_refill': bucket['last_refill']
         }
     
+    def _drop_key(self, key: str):
+        self.buckets.pop(key, None)
+    
     async def cleanup(self):
         """清理资源"""
         self.buckets.clear()
+        self._last_seen.clear()
         logger.info(f"令牌桶限流器 {self.name} 资源清理完成")
 
 
@@ -142,9 +199,12 @@ class SlidingWindowRateLimiter(RateLimiter):
         self,
         window_size: int = 60,
         max_requests: int = 100,
-        name: str = "sliding_window"
+        name: str = "sliding_window",
+        max_keys: int = 100000,
+        idle_ttl: Optional[float] = None
     ):
-        super().__init__(name)
+        # 空闲超过一个窗口的key不再有有效记录，默认按窗口大小淘汰
+        super().__init__(name, max_keys, window_size if idle_ttl is None else idle_ttl)
         self.window_size = window_size  # 窗口大小（秒）
         self.max_requests = max_requests  # 窗口内最大请求数
         
@@ -157,6 +217,7 @@ class SlidingWindowRateLimiter(RateLimiter):
         
         now = time.time()
         window = self.windows[key]
+        self._touch(key, now)
         
         # 清理过期的请求记录
         while window and window[0] <= now - self.window_size:
@@ -188,9 +249,13 @@ class SlidingWindowRateLimiter(RateLimiter):
             'remaining_requests': max(0, self.max_requests - len(window))
         }
     
+    def _drop_key(self, key: str):
+        self.windows.pop(key, None)
+    
     async def cleanup(self):
         """清理资源"""
         self.windows.clear()
+        self._last_seen.clear()
         logger.info(f"滑动窗口限流器 {self.name} 资源清理完成")
 
 
@@ -201,9 +266,11 @@ class FixedWindowRateLimiter(RateLimiter):
         self,
         window_size: int = 60,
         max_requests: int = 100,
-        name: str = "fixed_window"
+        name: str = "fixed_window",
+        max_keys: int = 100000,
+        idle_ttl: Optional[float] = None
     ):
-        super().__init__(name)
+        super().__init__(name, max_keys, window_size if idle_ttl is None else idle_ttl)
         self.window_size = window_size  # 窗口大小（秒）
         self.max_requests = max_requests  # 窗口内最大请求数
         
@@ -221,6 +288,7 @@ class FixedWindowRateLimiter(RateLimiter):
         current_window = int(now // self.window_size) * self.window_size
         
         window = self.windows[key]
+        self._touch(key, now)
         
         # 检查是否需要重置窗口
         if window['window_start'] < current_window:
@@ -258,12 +326,320 @@ class FixedWindowRateLimiter(RateLimiter):
             'window_end': window['window_start'] + self.window_size
         }
     
+    def _drop_key(self, key: str):
+        self.windows.pop(key, None)
+    
     async def cleanup(self):
         """清理资源"""
         self.windows.clear()
+        self._last_seen.clear()
         logger.info(f"固定窗口限流器 {self.name} 资源清理完成")
 
 
+TOKEN_BUCKET_SCRIPT = """
+redis.replicate_commands()
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local last_refill = tonumber(state[2])
+if tokens == nil or last_refill == nil then
+    tokens = capacity
+    last_refill = now
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - last_refill) * refill_rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {allowed, tostring(tokens)}
+"""
+
+SLIDING_WINDOW_SCRIPT = """
+redis.replicate_commands()
+local window_ms = tonumber(ARGV[1])
+local max_requests = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local member = ARGV[4]
+local clock = redis.call('TIME')
+local now_ms = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now_ms - window_ms)
+local count = redis.call('ZCARD', KEYS[1])
+if count + cost > max_requests then
+    return {0, tostring(max_requests - count)}
+end
+
+for i = 1, cost do
+    redis.call('ZADD', KEYS[1], now_ms, member .. ':' .. i)
+end
+redis.call('PEXPIRE', KEYS[1], window_ms)
+return {1, tostring(max_requests - count - cost)}
+"""
+
+FIXED_WINDOW_SCRIPT = """
+redis.replicate_commands()
+local window_size = tonumber(ARGV[1])
+local max_requests = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local window_start = math.floor(tonumber(clock[1]) / window_size) * window_size
+
+local state = redis.call('HMGET', KEYS[1], 'window_start', 'count')
+local count = tonumber(state[2]) or 0
+if tonumber(state[1]) ~= window_start then
+    count = 0
+end
+
+if count + cost > max_requests then
+    return {0, tostring(max_requests - count)}
+end
+
+count = count + cost
+redis.call('HSET', KEYS[1], 'window_start', window_start, 'count', count)
+redis.call('EXPIRE', KEYS[1], window_size + 1)
+return {1, tostring(max_requests - count)}
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """Redis限流器基类 - 多个worker共享同一份限流状态
+
+    每个key的检查是一次原子Lua调用，check_many将多个key放入同一个流水线，一次往返完成；
+    Redis超时或出错时在fallback_cooldown秒内改用本地限流器，本地限额按fallback_workers折算
+    """
+    
+    SCRIPT = ""
+    
+    def __init__(
+        self,
+        redis_client: Optional[Any] = None,
+        redis_url: Optional[str] = None,
+        key_prefix: str = "rate_limit",
+        timeout: float = 0.05,
+        fallback_workers: int = 8,
+        fallback_cooldown: float = 5.0,
+        name: str = "redis"
+    ):
+        super().__init__(name)
+        self.redis_client = redis_client
+        self.redis_url = redis_url
+        self._owns_client = redis_client is None
+        self.key_prefix = f"{key_prefix}:{name}"
+        self.timeout = timeout
+        self.fallback_workers = max(1, fallback_workers)
+        self.fallback_cooldown = fallback_cooldown
+        
+        self._script_sha: Optional[str] = None
+        self._redis_down_until = 0.0
+        self.local_limiter = self._create_local_limiter()
+        
+        self.redis_checks = 0
+        self.fallback_checks = 0
+        self.redis_errors = 0
+    
+    def _create_local_limiter(self) -> RateLimiter:
+        """本地近似限流器 - 子类实现"""
+        raise NotImplementedError
+    
+    def _script_args(self, cost: int, **limits) -> List[Any]:
+        """Lua脚本参数 - 子类实现"""
+        raise NotImplementedError
+    
+    async def initialize(self):
+        """创建Redis客户端并预加载Lua脚本"""
+        if self.redis_client is None:
+            if not REDIS_AVAILABLE:
+                logger.warning(f"redis未安装，限流器 {self.name} 使用本地限流")
+                return True
+            self.redis_client = aioredis.from_url(self.redis_url or "redis://localhost:6379/0")
+        
+        try:
+            self._script_sha = await asyncio.wait_for(
+                self.redis_client.script_load(self.SCRIPT), timeout=max(self.timeout, 1.0)
+            )
+            logger.info(f"Redis限流器 {self.name} 初始化完成")
+        except Exception as e:
+            self._mark_redis_down(e)
+        return True
+    
+    def _mark_redis_down(self, error: Exception):
+        self.redis_errors += 1
+        if time.time() >= self._redis_down_until:
+            logger.warning(f"限流器 {self.name} Redis不可用，{self.fallback_cooldown}秒内使用本地限流: {error}")
+        self._redis_down_until = time.time() + self.fallback_cooldown
+    
+    async def _eval_many(self, keys: List[str], args: List[List[Any]]) -> List[Any]:
+        """流水线批量执行Lua脚本；脚本缓存丢失时重新加载一次"""
+        for attempt in range(2):
+            if self._script_sha is None:
+                self._script_sha = await self.redis_client.script_load(self.SCRIPT)
+            
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, key_args in zip(keys, args):
+                    pipe.evalsha(self._script_sha, 1, f"{self.key_prefix}:{key}", *key_args)
+                results = await pipe.execute(raise_on_error=False)
+            
+            if attempt == 0 and any(isinstance(result, NoScriptError) for result in results):
+                self._script_sha = None
+                continue
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+            return results
+        return results
+    
+    async def is_allowed(self, key: str = "default", cost: int = 1) -> bool:
+        """检查是否允许请求"""
+        return (await self.check_many([key], cost))[0]
+    
+    async def check_many(self, keys: List[str], cost: int = 1,
+                         limits: Optional[Dict[str, Dict[str, Any]]] = None) -> List[bool]:
+        """
+        一次往返批量检查多个key
+        
+        Args:
+            keys: 限流key列表
+            cost: 每个key消耗的配额
+            limits: 按key覆盖限流参数，参数名与构造函数一致
+        """
+        limits = limits or {}
+        self.total_requests += len(keys)
+        
+        if self.redis_client is not None and time.time() >= self._redis_down_until:
+            try:
+                results = await asyncio.wait_for(
+                    self._eval_many(keys, [self._script_args(cost, **limits.get(key, {})) for key in keys]),
+                    timeout=self.timeout
+                )
+                self.redis_checks += len(keys)
+                allowed = [bool(int(result[0])) for result in results]
+                self.blocked_requests += allowed.count(False)
+                return allowed
+            except Exception as e:
+                self._mark_redis_down(e)
+        
+        # 本地近似限流
+        self.fallback_checks += len(keys)
+        allowed = []
+        for key in keys:
+            key_allowed = True
+            for _ in range(cost):
+                key_allowed = await self.local_limiter.is_allowed(key)
+                if not key_allowed:
+                    break
+            allowed.append(key_allowed)
+        self.blocked_requests += allowed.count(False)
+        return allowed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats.update({
+            'backend': 'redis',
+            'redis_checks': self.redis_checks,
+            'fallback_checks': self.fallback_checks,
+            'redis_errors': self.redis_errors,
+            'redis_available': self.redis_client is not None and time.time() >= self._redis_down_until,
+            'local_limiter': self.local_limiter.get_stats()
+        })
+        return stats
+    
+    async def cleanup(self):
+        """清理资源"""
+        await self.local_limiter.cleanup()
+        if self.redis_client is not None and self._owns_client:
+            try:
+                await self.redis_client.close()
+            except Exception as e:
+                logger.warning(f"关闭限流器Redis连接失败: {e}")
+            self.redis_client = None
+        logger.info(f"Redis限流器 {self.name} 资源清理完成")
+
+
+class RedisTokenBucketRateLimiter(RedisRateLimiter):
+    """Redis令牌桶限流器"""
+    
+    SCRIPT = TOKEN_BUCKET_SCRIPT
+    
+    def __init__(self, capacity: int = 100, refill_rate: float = 10.0,
+                 name: str = "token_bucket", **kwargs):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        super().__init__(name=name, **kwargs)
+    
+    def _create_local_limiter(self) -> RateLimiter:
+        return TokenBucketRateLimiter(
+            capacity=max(1, self.capacity // self.fallback_workers),
+            refill_rate=self.refill_rate / self.fallback_workers,
+            name=f"{self.name}_local"
+        )
+    
+    def _script_args(self, cost: int, capacity: Optional[int] = None,
+                     refill_rate: Optional[float] = None) -> List[Any]:
+        capacity = capacity or self.capacity
+        refill_rate = refill_rate or self.refill_rate
+        # 桶补满后key可直接过期，与新桶等价
+        ttl = max(1, math.ceil(capacity / refill_rate)) if refill_rate > 0 else 86400
+        return [capacity, refill_rate, cost, ttl]
+
+
+class RedisSlidingWindowRateLimiter(RedisRateLimiter):
+    """Redis滑动窗口限流器(有序集合记录请求时间)"""
+    
+    SCRIPT = SLIDING_WINDOW_SCRIPT
+    
+    def __init__(self, window_size: int = 60, max_requests: int = 100,
+                 name: str = "sliding_window", **kwargs):
+        self.window_size = window_size
+        self.max_requests = max_requests
+        super().__init__(name=name, **kwargs)
+    
+    def _create_local_limiter(self) -> RateLimiter:
+        return SlidingWindowRateLimiter(
+            window_size=self.window_size,
+            max_requests=max(1, self.max_requests // self.fallback_workers),
+            name=f"{self.name}_local"
+        )
+    
+    def _script_args(self, cost: int, window_size: Optional[int] = None,
+                     max_requests: Optional[int] = None) -> List[Any]:
+        window_size = window_size or self.window_size
+        return [int(window_size * 1000), max_requests or self.max_requests, cost, uuid.uuid4().hex]
+
+
+class RedisFixedWindowRateLimiter(RedisRateLimiter):
+    """Redis固定窗口限流器"""
+    
+    SCRIPT = FIXED_WINDOW_SCRIPT
+    
+    def __init__(self, window_size: int = 60, max_requests: int = 100,
+                 name: str = "fixed_window", **kwargs):
+        self.window_size = window_size
+        self.max_requests = max_requests
+        super().__init__(name=name, **kwargs)
+    
+    def _create_local_limiter(self) -> RateLimiter:
+        return FixedWindowRateLimiter(
+            window_size=self.window_size,
+            max_requests=max(1, self.max_requests // self.fallback_workers),
+            name=f"{self.name}_local"
+        )
+    
+    def _script_args(self, cost: int, window_size: Optional[int] = None,
+                     max_requests: Optional[int] = None) -> List[Any]:
+        return [window_size or self.window_size, max_requests or self.max_requests, cost]
+
+
 class AdaptiveRateLimiter(RateLimiter):
     """自适应限流器 - 根据系统负载动态调整限流参数"""
     
@@ -402,6 +778,12 @@ class RateLimiterManager:
                 self.limiters[name] = FixedWindowRateLimiter(name=name, **kwargs)
             elif limiter_type == "adaptive":
                 self.limiters[name] = AdaptiveRateLimiter(name=name, **kwargs)
+            elif limiter_type == "redis_token_bucket":
+                self.limiters[name] = RedisTokenBucketRateLimiter(name=name, **kwargs)
+            elif limiter_type == "redis_sliding_window":
+                self.limiters[name] = RedisSlidingWindowRateLimiter(name=name, **kwargs)
+            elif limiter_type == "redis_fixed_window":
+                self.limiters[name] = RedisFixedWindowRateLimiter(name=name, **kwargs)
             else:
                 raise ValueError(f"不支持的限流器类型: {limiter_type}")
         
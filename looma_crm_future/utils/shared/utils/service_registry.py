@@ -6,6 +6,8 @@
 import asyncio
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import aiohttp
@@ -22,13 +24,106 @@ logger = logging.getLogger(__name__)
 class ServiceRegistry:
     """服务注册表"""
     
-    def __init__(self, consul_host: str = 'localhost', consul_port: int = 8500):
+    def __init__(self, consul_host: str = 'localhost', consul_port: int = 8500,
+                 watch_wait: str = '55s', call_threads: int = 4):
         """初始化服务注册表"""
         self.consul_host = consul_host
         self.consul_port = consul_port
         self.consul_client = None
         self.registered_services = {}
         
+        # 服务实例缓存，由Consul阻塞查询(index/wait)驱动更新
+        self.watch_wait = watch_wait
+        self.call_threads = call_threads
+        self.instance_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self.watch_indexes: Dict[str, Any] = {}
+        self.watch_tasks: Dict[str, asyncio.Task] = {}
+        self._watch_ready: Dict[str, asyncio.Event] = {}
+        # 注册/注销/健康检查等短调用共用一个线程池；
+        # 每个阻塞查询独占一个线程，避免长时间挂起的监听占满短调用的线程
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._watch_executors: Dict[str, ThreadPoolExecutor] = {}
+        
+    async def _run_blocking(self, func, *args, **kwargs):
+        """在短调用线程池中执行python-consul的同步调用，避免阻塞事件循环"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.call_threads,
+                thread_name_prefix='consul-call'
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+    
+    async def _run_watch_query(self, service_name: str, func, *args, **kwargs):
+        """在该服务专属的监听线程中执行阻塞查询"""
+        executor = self._watch_executors.get(service_name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'consul-watch-{service_name}')
+            self._watch_executors[service_name] = executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+    
+    @staticmethod
+    def _parse_consul_instances(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """转换Consul健康查询结果"""
+        instances = []
+        for service_data in nodes or []:
+            service = service_data['Service']
+            instances.append({
+                'id': service['ID'],
+                'name': service['Service'],
+                'host': service['Address'] or service_data.get('Node', {}).get('Address', 'localhost'),
+                'port': service['Port'],
+                'tags': service.get('Tags', []),
+                'status': 'healthy'
+            })
+        return instances
+    
+    async def _watch_service(self, service_name: str):
+        """阻塞查询循环：Consul在索引变化或wait超时后返回，无变化时不产生额外请求"""
+        backoff = 1.0
+        ready = self._watch_ready[service_name]
+        
+        while True:
+            try:
+                index, nodes = await self._run_watch_query(
+                    service_name,
+                    self.consul_client.health.service,
+                    service_name,
+                    index=self.watch_indexes.get(service_name),
+                    wait=self.watch_wait,
+                    passing=True
+                )
+                
+                previous_index = self.watch_indexes.get(service_name)
+                # 索引回退(如Consul重启)时从头开始
+                if previous_index is not None and index is not None and int(index) < int(previous_index):
+                    index = None
+                self.watch_indexes[service_name] = index
+                
+                if index != previous_index or not ready.is_set():
+                    self.instance_cache[service_name] = self._parse_consul_instances(nodes)
+                    logger.debug(f"服务实例缓存更新: {service_name}, 实例数: {len(self.instance_cache[service_name])}")
+                
+                ready.set()
+                backoff = 1.0
+                
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                # 出错时保留旧缓存，指数退避后重试
+                logger.warning(f"服务监听失败: {service_name}, {backoff:.0f}秒后重试: {e}")
+                ready.set()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+    
+    def _ensure_watch(self, service_name: str) -> asyncio.Event:
+        """首次查询某服务时启动对应的监听任务"""
+        if service_name not in self.watch_tasks:
+            self._watch_ready[service_name] = asyncio.Event()
+            self.watch_tasks[service_name] = asyncio.create_task(self._watch_service(service_name))
+        return self._watch_ready[service_name]
+    
     async def initialize(self):
         """初始化服务注册表"""
         try:
@@ -75,7 +170,8 @@ class ServiceRegistry:
             
             if self.consul_client:
                 # 使用Consul注册
-                self.consul_client.agent.service.register(
+                await self._run_blocking(
+                    self.consul_client.agent.service.register,
                     service_id,
                     service_name,
                     address=service_info.get('host', 'localhost'),
@@ -103,10 +199,10 @@ class ServiceRegistry:
         try:
             if self.consul_client:
                 # 从Consul注销
-                services = self.consul_client.agent.services()
+                services = await self._run_blocking(self.consul_client.agent.services)
                 for service_id, service_data in services.items():
                     if service_data['Service'] == service_name:
-                        self.consul_client.agent.service.deregister(service_id)
+                        await self._run_blocking(self.consul_client.agent.service.deregister, service_id)
                         logger.info(f"服务从Consul注销成功: {service_name}")
                         break
             else:
@@ -131,18 +227,11 @@ class ServiceRegistry:
             instances = []
             
             if self.consul_client:
-                # 从Consul获取服务实例
-                services = self.consul_client.health.service(service_name, passing=True)
-                for service_data in services[1]:
-                    service = service_data['Service']
-                    instances.append({
-                        'id': service['ID'],
-                        'name': service['Service'],
-                        'host': service['Address'],
-                        'port': service['Port'],
-                        'tags': service.get('Tags', []),
-                        'status': 'healthy'
-                    })
+                # 从监听缓存获取服务实例，仅首次查询等待阻塞查询的首个结果
+                ready = self._ensure_watch(service_name)
+                if not ready.is_set():
+                    await ready.wait()
+                instances = list(self.instance_cache.get(service_name, []))
             else:
                 # 从内存注册表获取服务实例
                 for service_id, service_data in self.registered_services.items():
@@ -181,7 +270,7 @@ class ServiceRegistry:
         try:
             if self.consul_client:
                 # 检查Consul连接
-                leader = self.consul_client.status.leader()
+                leader = await self._run_blocking(self.consul_client.status.leader)
                 return leader is not None
             else:
                 # 内存注册表总是健康的
@@ -198,7 +287,7 @@ class ServiceRegistry:
             
             if self.consul_client:
                 # 从Consul获取所有服务
-                services = self.consul_client.catalog.services()
+                services = await self._run_blocking(self.consul_client.catalog.services)
                 for service_name in services[1].keys():
                     instances = await self.get_service_instances(service_name)
                     if instances:
@@ -232,9 +321,23 @@ class ServiceRegistry:
     async def cleanup(self):
         """清理资源"""
         try:
-            if self.consul_client:
-                # 清理Consul连接 (python-consul没有close方法)
-                pass
+            # 停止服务监听
+            for task in self.watch_tasks.values():
+                task.cancel()
+            if self.watch_tasks:
+                await asyncio.gather(*self.watch_tasks.values(), return_exceptions=True)
+            self.watch_tasks.clear()
+            self._watch_ready.clear()
+            self.watch_indexes.clear()
+            self.instance_cache.clear()
+            
+            # 进行中的阻塞查询最多持续watch_wait，不等待其返回
+            for executor in self._watch_executors.values():
+                executor.shutdown(wait=False)
+            self._watch_executors.clear()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
             
             self.registered_services.clear()
             logger.info("服务注册表资源清理完成")
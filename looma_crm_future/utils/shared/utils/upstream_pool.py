@@ -0,0 +1,76 @@
+"""
+上游连接池 - 为每个上游实例维护长连接会话
+复用TCP连接(keep-alive)，按上游限制并发连接数
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamSessionPool:
+    """按上游(host:port)划分的aiohttp会话池"""
+
+    def __init__(self, limit_per_upstream: int = 100, keepalive_timeout: float = 30.0,
+                 connect_timeout: float = 3.0, total_timeout: float = 60.0):
+        """
+        初始化上游连接池
+
+        Args:
+            limit_per_upstream: 每个上游的最大并发连接数
+            keepalive_timeout: 空闲连接保持时间(秒)
+            connect_timeout: 建连超时(秒)
+            total_timeout: 单次请求总超时(秒)
+        """
+        self.limit_per_upstream = limit_per_upstream
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout)
+        self.sessions: Dict[Tuple[str, int], aiohttp.ClientSession] = {}
+
+    def get_session(self, host: str, port: int) -> aiohttp.ClientSession:
+        """获取上游会话，不存在或已关闭时创建"""
+        key = (host, int(port))
+        session = self.sessions.get(key)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit_per_upstream,
+                limit_per_host=self.limit_per_upstream,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self.sessions[key] = session
+            logger.info(f"创建上游连接池: {host}:{port}")
+        return session
+
+    async def discard(self, host: str, port: int):
+        """关闭并移除指定上游的会话(如实例下线)"""
+        session = self.sessions.pop((host, int(port)), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各上游连接池状态"""
+        stats = {}
+        for (host, port), session in self.sessions.items():
+            connector = session.connector
+            stats[f"{host}:{port}"] = {
+                'closed': session.closed,
+                'limit': connector.limit if connector else None,
+                'acquired': len(getattr(connector, '_acquired', ())) if connector else 0
+            }
+        return stats
+
+    async def close(self):
+        """关闭全部会话"""
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        await asyncio.gather(
+            *[session.close() for session in sessions if not session.closed],
+            return_exceptions=True
+        )
+        logger.info("上游连接池已关闭")
@@ -12,14 +12,13 @@ import time
 from datetime import datetime
 from typing import List, Dict, Any
 
-import psycopg2
-import psycopg2.extras
 import requests
 from sanic import Sanic, Request, json as sanic_json
 from sanic.response import json as sanic_response
 
 # 导入职位匹配服务
 from job_matching_service import JobMatchingService
+from resume_vector_store import ResumeVectorStore
 
 # 配置日志
 logging.basicConfig(
@@ -231,9 +230,12 @@ async def job_matching_api(request: Request):
 class Config:
     PORT = int(os.getenv("AI_SERVICE_PORT", 8206))
     POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
+    POSTGRES_PORT = int(os.getenv("POSTGRES_PORT", 5432))
     POSTGRES_USER = os.getenv("POSTGRES_USER", "szjason72")
     POSTGRES_DB = os.getenv("POSTGRES_DB", "jobfirst_vector")
     POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "")
+    POSTGRES_POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", 2))
+    POSTGRES_POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", 10))
     
     # 外部AI服务配置
     EXTERNAL_AI_PROVIDER = os.getenv("EXTERNAL_AI_PROVIDER", "deepseek")
@@ -318,20 +320,16 @@ async def check_user_permission(token: str, required_permission: str) -> bool:
         logger.error(f"权限检查异常: {e}")
         return False
 
-# 数据库连接
-def get_db_connection():
-    """获取PostgreSQL数据库连接"""
-    try:
-        conn = psycopg2.connect(
-            host=Config.POSTGRES_HOST,
-            user=Config.POSTGRES_USER,
-            password=Config.POSTGRES_PASSWORD,
-            database=Config.POSTGRES_DB
-        )
-        return conn
-    except Exception as e:
-        logger.error(f"数据库连接失败: {e}")
-        return None
+# 简历向量存储（共享asyncpg连接池，在initialize_services中创建）
+vector_store = ResumeVectorStore(
+    host=Config.POSTGRES_HOST,
+    port=Config.POSTGRES_PORT,
+    user=Config.POSTGRES_USER,
+    password=Config.POSTGRES_PASSWORD,
+    database=Config.POSTGRES_DB,
+    min_size=Config.POSTGRES_POOL_MIN_SIZE,
+    max_size=Config.POSTGRES_POOL_MAX_SIZE
+)
 
 # 数据模型
 class ResumeAnalysisRequest:
@@ -841,107 +839,46 @@ async def generate_vectors(content: str, analysis: Analysis) -> Vectors:
 # 数据库操作
 async def save_vectors_to_db(resume_id: str, vectors: Vectors):
     """保存向量到数据库"""
-    conn = get_db_connection()
-    if not conn:
-        raise Exception("数据库连接失败")
-    
     try:
-        with conn.cursor() as cursor:
-            # 检查是否已存在
-            cursor.execute(
-                "SELECT id FROM resume_vectors WHERE resume_id = %s",
-                (resume_id,)
-            )
-            
-            if cursor.fetchone():
-                # 更新现有记录
-                cursor.execute("""
-                    UPDATE resume_vectors 
-                    SET content_vector = %s, skills_vector = %s, experience_vector = %s
-                    WHERE resume_id = %s
-                """, (
-                    vectors.content_vector,
-                    vectors.skills_vector,
-                    vectors.experience_vector,
-                    resume_id
-                ))
-            else:
-                # 插入新记录
-                cursor.execute("""
-                    INSERT INTO resume_vectors (resume_id, content_vector, skills_vector, experience_vector)
-                    VALUES (%s, %s, %s, %s)
-                """, (
-                    resume_id,
-                    vectors.content_vector,
-                    vectors.skills_vector,
-                    vectors.experience_vector
-                ))
-            
-            conn.commit()
-            logger.info(f"向量数据已保存到数据库: {resume_id}")
-            
+        await vector_store.save_vectors(
+            int(resume_id),
+            vectors.content_vector,
+            vectors.skills_vector,
+            vectors.experience_vector
+        )
+        logger.info(f"向量数据已保存到数据库: {resume_id}")
     except Exception as e:
-        conn.rollback()
         logger.error(f"保存向量失败: {e}")
         raise
-    finally:
-        conn.close()
+
+async def save_vectors_many(items: List[tuple]) -> int:
+    """批量保存向量，items为(resume_id, Vectors)列表"""
+    try:
+        count = await vector_store.save_vectors_many([
+            (int(resume_id), vectors.content_vector, vectors.skills_vector, vectors.experience_vector)
+            for resume_id, vectors in items
+        ])
+        logger.info(f"批量保存向量完成: {count}条")
+        return count
+    except Exception as e:
+        logger.error(f"批量保存向量失败: {e}")
+        raise
 
 async def get_vectors_from_db(resume_id: int) -> Dict[str, Any]:
     """从数据库获取向量"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-            cursor.execute("""
-                SELECT content_vector, skills_vector, experience_vector
-                FROM resume_vectors 
-                WHERE resume_id = %s
-            """, (resume_id,))
-            
-            result = cursor.fetchone()
-            if result:
-                return dict(result)
-            return None
-            
+        return await vector_store.get_vectors(resume_id)
     except Exception as e:
         logger.error(f"获取向量失败: {e}")
         return None
-    finally:
-        conn.close()
 
 async def search_similar_resumes_db(query_vector: List[float], limit: int) -> List[Dict[str, Any]]:
     """搜索相似简历"""
-    conn = get_db_connection()
-    if not conn:
-        return []
-    
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-            cursor.execute("""
-                SELECT resume_id, 
-                       content_vector <=> %s as distance
-                FROM resume_vectors 
-                ORDER BY content_vector <=> %s 
-                LIMIT %s
-            """, (query_vector, query_vector, limit))
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    "resume_id": row["resume_id"],
-                    "distance": float(row["distance"])
-                })
-            
-            return results
-            
+        return await vector_store.search_similar(query_vector, limit)
     except Exception as e:
         logger.error(f"搜索失败: {e}")
         return []
-    finally:
-        conn.close()
 
 # 职位匹配路由由JobMatchingService自动注册
 
@@ -951,9 +888,19 @@ async def search_similar_resumes_db(query_vector: List[float], limit: int) -> Li
 async def initialize_services(app, loop):
     """在服务器启动前初始化服务"""
     logger.info("开始初始化AI服务...")
+    try:
+        await vector_store.initialize()
+    except Exception as e:
+        # 数据库不可用时降级启动，向量读写在首次使用时重新建立连接池
+        logger.error(f"简历向量存储初始化失败，服务降级启动: {e}")
     await initialize_job_matching()
     logger.info("AI服务初始化完成")
 
+@app.after_server_stop
+async def close_services(app, loop):
+    """服务器停止后释放连接池"""
+    await vector_store.close()
+
 if __name__ == "__main__":
     logger.info(f"启动AI服务，端口: {Config.PORT}")
     
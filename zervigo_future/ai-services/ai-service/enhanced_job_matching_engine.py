@@ -12,6 +12,7 @@
 import asyncio
 import json
 import logging
+import os
 import numpy as np
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
@@ -19,6 +20,9 @@ import asyncpg
 from sentence_transformers import SentenceTransformer
 import structlog
 
+from job_vector_index import JobVectorIndex
+from skill_vocabulary import JobSkillIndex, DEFAULT_SYNONYMS_PATH
+
 logger = structlog.get_logger(__name__)
 
 class EnhancedJobMatchingEngine:
@@ -39,6 +43,12 @@ class EnhancedJobMatchingEngine:
         self.embedding_model = None
         self.model_loaded = False
         
+        # 职位向量内存索引 (两阶段检索)
+        self.job_index = JobVectorIndex(dimension=384)
+        
+        # 职位技能集合索引 (规范化技能词表)
+        self.skill_index = JobSkillIndex()
+        
         # 匹配维度权重配置 (基于Resume-Matcher最佳实践)
         self.matching_dimensions = {
             'semantic_similarity': 0.35,    # 语义相似度 (FastEmbed)
@@ -93,7 +103,14 @@ class EnhancedJobMatchingEngine:
             # 初始化向量数据库索引
             await self._initialize_vector_indexes()
             
-            logger.info("增强版职位匹配引擎初始化成功")
+            # 加载职位向量内存索引
+            await self.job_index.refresh(self.postgres_pool, force=True)
+            
+            # 加载技能同义词(随服务镜像发布的数据文件)，失败时仅按规范化名称匹配
+            self.skill_index.vocabulary.load_from_file(
+                os.getenv("SKILL_SYNONYMS_PATH", DEFAULT_SYNONYMS_PATH))
+            
+            logger.info("增强版职位匹配引擎初始化成功", job_index=self.job_index.get_stats())
             
         except Exception as e:
             logger.error("增强版职位匹配引擎初始化失败", error=str(e))
@@ -372,74 +389,106 @@ class EnhancedJobMatchingEngine:
     
     async def _vector_similarity_search(self, resume_vectors: Dict[str, List[float]], 
                                       candidate_jobs: List[Dict], limit: int) -> List[Dict]:
-        """向量相似度搜索 - 借鉴Resume-Matcher的搜索策略"""
+        """向量相似度搜索 - 内存索引两阶段检索，索引不可用时回退到pgvector查询"""
         try:
             if not candidate_jobs:
                 return []
             
-            job_ids = [job['id'] for job in candidate_jobs]
+            jobs_by_id = {job['id']: job for job in candidate_jobs}
             
-            async with self.postgres_pool.acquire() as conn:
-                # 使用PostgreSQL的向量相似度搜索
-                query = """
-                    SELECT jv.job_id, jv.description_vector, jv.requirements_vector,
-                           (jv.description_vector <=> $1::vector) as content_similarity,
-                           (jv.requirements_vector <=> $2::vector) as skills_similarity
-                    FROM job_vectors jv
-                    WHERE jv.job_id = ANY($3::int[])
-                    ORDER BY (jv.description_vector <=> $1::vector) + (jv.requirements_vector <=> $2::vector)
-                    LIMIT $4
-                """
-                
-                results = await conn.fetch(
-                    query, 
-                    resume_vectors['content_vector'],
-                    resume_vectors['skills_vector'],
-                    job_ids,
-                    limit
-                )
-                
-                # 构建结果
-                vector_matches = []
-                for row in results:
-                    job_info = next((job for job in candidate_jobs if job['id'] == row['job_id']), None)
-                    if job_info:
-                        vector_matches.append({
-                            'job_id': row['job_id'],
-                            'job_info': job_info,
-                            'content_similarity': 1 - row['content_similarity'],  # 转换为相似度
-                            'skills_similarity': 1 - row['skills_similarity'],
-                            'description_vector': row['description_vector'],
-                            'requirements_vector': row['requirements_vector']
-                        })
-                
-                logger.info("向量相似度搜索完成", 
-                           candidates=len(candidate_jobs), 
-                           matches=len(vector_matches))
-                
-                return vector_matches
+            # 增量刷新职位向量索引
+            await self.job_index.refresh(self.postgres_pool)
+            
+            if len(self.job_index) == 0:
+                return await self._vector_similarity_search_db(resume_vectors, jobs_by_id, limit)
+            
+            # 近似召回 + 精确重排
+            results = self.job_index.search(
+                resume_vectors['content_vector'],
+                resume_vectors['skills_vector'],
+                limit,
+                candidate_ids=jobs_by_id.keys()
+            )
+            
+            vector_matches = []
+            for job_id, content_similarity, skills_similarity in results:
+                description_vector, requirements_vector = self.job_index.get_vectors(job_id)
+                vector_matches.append({
+                    'job_id': job_id,
+                    'job_info': jobs_by_id[job_id],
+                    'content_similarity': content_similarity,
+                    'skills_similarity': skills_similarity,
+                    'description_vector': description_vector,
+                    'requirements_vector': requirements_vector
+                })
+            
+            logger.info("向量相似度搜索完成", 
+                       candidates=len(candidate_jobs), 
+                       indexed=len(self.job_index),
+                       matches=len(vector_matches))
+            
+            return vector_matches
                 
         except Exception as e:
             logger.error("向量相似度搜索失败", error=str(e))
             return []
     
+    async def _vector_similarity_search_db(self, resume_vectors: Dict[str, List[float]], 
+                                         jobs_by_id: Dict[int, Dict], limit: int) -> List[Dict]:
+        """基于pgvector的向量相似度搜索"""
+        async with self.postgres_pool.acquire() as conn:
+            query = """
+                SELECT jv.job_id, jv.description_vector, jv.requirements_vector,
+                       (jv.description_vector <=> $1::vector) as content_similarity,
+                       (jv.requirements_vector <=> $2::vector) as skills_similarity
+                FROM job_vectors jv
+                WHERE jv.job_id = ANY($3::int[])
+                ORDER BY (jv.description_vector <=> $1::vector) + (jv.requirements_vector <=> $2::vector)
+                LIMIT $4
+            """
+            
+            results = await conn.fetch(
+                query, 
+                resume_vectors['content_vector'],
+                resume_vectors['skills_vector'],
+                list(jobs_by_id.keys()),
+                limit
+            )
+        
+        vector_matches = []
+        for row in results:
+            job_info = jobs_by_id.get(row['job_id'])
+            if job_info:
+                vector_matches.append({
+                    'job_id': row['job_id'],
+                    'job_info': job_info,
+                    'content_similarity': 1 - row['content_similarity'],  # 转换为相似度
+                    'skills_similarity': 1 - row['skills_similarity'],
+                    'description_vector': row['description_vector'],
+                    'requirements_vector': row['requirements_vector']
+                })
+        
+        return vector_matches
+    
     async def _multi_dimension_scoring(self, resume_data: Dict[str, Any], 
                                      vector_matches: List[Dict]) -> List[Dict]:
         """多维度评分 - 借鉴Resume-Matcher的评分体系"""
         try:
             scored_matches = []
             
-            for match in vector_matches:
+            # 技能与文化匹配对全部候选一次性计算
+            job_infos = [match['job_info'] for match in vector_matches]
+            skills_scores = self.skill_index.skills_match(resume_data.get('skills', []), job_infos)
+            cultural_scores = self.skill_index.cultural_fit(resume_data.get('personality_traits', []), job_infos)
+            
+            for i, match in enumerate(vector_matches):
                 job_info = match['job_info']
                 
                 # 1. 语义相似度评分
                 semantic_score = (match['content_similarity'] + match['skills_similarity']) / 2
                 
                 # 2. 技能匹配评分
-                skills_score = self._calculate_skills_match(
-                    resume_data.get('skills', []), 
-                    job_info.get('required_skills', [])
-                )
+                skills_score = float(skills_scores[i])
                 
                 # 3. 经验匹配评分
                 experience_score = self._calculate_experience_match(
@@ -454,10 +503,7 @@ class EnhancedJobMatchingEngine:
                 )
                 
                 # 5. 文化匹配评分
-                cultural_score = self._calculate_cultural_fit(
-                    resume_data.get('personality_traits', []),
-                    job_info.get('company_culture', {})
-                )
+                cultural_score = float(cultural_scores[i])
                 
                 # 6. 综合评分 (根据行业调整权重)
                 industry = job_info.get('industry', 'general')
@@ -505,24 +551,6 @@ class EnhancedJobMatchingEngine:
             logger.error("多维度评分失败", error=str(e))
             return []
     
-    def _calculate_skills_match(self, resume_skills: List[str], job_skills: List[str]) -> float:
-        """计算技能匹配度"""
-        if not job_skills:
-            return 1.0
-        
-        if not resume_skills:
-            return 0.0
-        
-        # 转换为小写进行比较
-        resume_skills_lower = [skill.lower() for skill in resume_skills]
-        job_skills_lower = [skill.lower() for skill in job_skills]
-        
-        # 计算匹配的技能数量
-        matched_skills = set(resume_skills_lower) & set(job_skills_lower)
-        match_ratio = len(matched_skills) / len(job_skills_lower)
-        
-        return min(match_ratio, 1.0)
-    
     def _calculate_experience_match(self, resume_experience: List[Dict], 
                                   job_requirements: Dict) -> float:
         """计算经验匹配度"""
@@ -582,30 +610,6 @@ class EnhancedJobMatchingEngine:
         
         return max_level / required_level
     
-    def _calculate_cultural_fit(self, personality_traits: List[str], 
-                              company_culture: Dict) -> float:
-        """计算文化匹配度"""
-        if not company_culture:
-            return 0.5  # 默认中等匹配
-        
-        if not personality_traits:
-            return 0.5
-        
-        # 简化的文化匹配计算
-        culture_keywords = company_culture.get('keywords', [])
-        if not culture_keywords:
-            return 0.5
-        
-        # 计算匹配的文化关键词
-        matched_keywords = 0
-        for trait in personality_traits:
-            for keyword in culture_keywords:
-                if keyword.lower() in trait.lower():
-                    matched_keywords += 1
-                    break
-        
-        return min(matched_keywords / len(culture_keywords), 1.0)
-    
     def _calculate_confidence(self, scores: Dict[str, float]) -> float:
         """计算匹配置信度"""
         # 基于各维度评分的方差计算置信度
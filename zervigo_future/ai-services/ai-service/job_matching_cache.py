@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+职位匹配结果缓存
+按(简历向量版本, 筛选条件哈希, 职位向量版本)缓存匹配结果，合并并发的相同请求，
+并通过PostgreSQL LISTEN/NOTIFY(vector_changes)或定期轮询感知向量变更
+
+创建时间: 2026-10-17
+版本: 1.0.0
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable, Set
+
+logger = logging.getLogger(__name__)
+
+VECTOR_CHANGE_CHANNEL = "vector_changes"
+
+
+def filters_hash(filters: Optional[Dict[str, Any]]) -> str:
+    """筛选条件的稳定哈希(键排序后序列化)"""
+    payload = json.dumps(filters or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def cache_resume_id(resume_id: Any) -> int:
+    """缓存键中的简历ID统一为int，请求体中的"42"与变更通知中的42对应同一条目；无法解析时抛出ValueError"""
+    if isinstance(resume_id, bool):
+        raise ValueError(f"无效的简历ID: {resume_id!r}")
+    return int(str(resume_id).strip())
+
+
+class MatchResultCache:
+    """LRU+TTL结果缓存，相同键的并发请求共享同一次计算"""
+
+    def __init__(self, max_entries: int = 2000, ttl: int = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # key -> (value, expires_at)
+        self._entries: "OrderedDict[Tuple, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: Tuple, value: Any):
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.time() + self.ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def get_or_compute(self, key: Tuple,
+                             factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        读取缓存，未命中时计算并写入
+
+        Returns:
+            (结果, 来源)，来源为 hit / coalesced / computed
+        """
+        value = self.get(key)
+        if value is not None:
+            self._stats["hits"] += 1
+            return value, "hit"
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight), "coalesced"
+            except asyncio.CancelledError:
+                # 发起计算的请求被取消(如客户端断开)时由当前请求重新计算
+                if not inflight.cancelled():
+                    raise
+                return await self.get_or_compute(key, factory)
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待者时避免"exception was never retrieved"告警
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if value is not None:
+                self.set(key, value)
+            return value, "computed"
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, predicate: Optional[Callable[[Tuple], bool]] = None) -> int:
+        """按条件失效缓存条目，不传条件时清空"""
+        if predicate is None:
+            removed = len(self._entries)
+            self._entries.clear()
+        else:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            removed = len(keys)
+        self._stats["invalidations"] += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "hit_rate": (self._stats["hits"] + self._stats["coalesced"]) / max(lookups, 1),
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "max_entries": self.max_entries
+        }
+
+
+class VectorVersionTracker:
+    """职位/简历向量版本跟踪
+
+    优先监听vector_changes通道(见迁移005)，收到职位变更即递增职位版本、
+    收到简历变更即回调失效；监听不可用时按poll_interval轮询job_vectors的
+    max(updated_at)与行数作为职位版本
+    """
+
+    def __init__(self, postgres_pool, poll_interval: float = 5.0,
+                 on_resume_change: Optional[Callable[[int], None]] = None,
+                 on_job_change: Optional[Callable[[], None]] = None):
+        self.postgres_pool = postgres_pool
+        self.poll_interval = poll_interval
+        self.on_resume_change = on_resume_change
+        self.on_job_change = on_job_change
+
+        self._listen_conn = None
+        self._job_generation = 0
+        self._polled_signature: Optional[str] = None
+        self._last_poll = 0.0
+        self._poll_lock = asyncio.Lock()
+
+    @property
+    def listening(self) -> bool:
+        return self._listen_conn is not None and not self._listen_conn.is_closed()
+
+    async def start(self):
+        """建立专用监听连接，失败时退化为轮询"""
+        if self.postgres_pool is None:
+            return
+        try:
+            self._listen_conn = await self.postgres_pool.acquire()
+            await self._listen_conn.add_listener(VECTOR_CHANGE_CHANNEL, self._handle_notification)
+            self._listen_conn.add_termination_listener(self._handle_termination)
+            logger.info(f"向量变更监听已启动: channel={VECTOR_CHANGE_CHANNEL}")
+        except Exception as e:
+            logger.warning(f"向量变更监听启动失败，改为轮询job_vectors: {e}")
+            await self._release_listen_conn()
+
+    async def stop(self):
+        if self._listen_conn is not None and not self._listen_conn.is_closed():
+            try:
+                await self._listen_conn.remove_listener(VECTOR_CHANGE_CHANNEL, self._handle_notification)
+            except Exception as e:
+                logger.warning(f"移除向量变更监听失败: {e}")
+        await self._release_listen_conn()
+
+    async def _release_listen_conn(self):
+        conn, self._listen_conn = self._listen_conn, None
+        if conn is not None:
+            try:
+                await self.postgres_pool.release(conn)
+            except Exception as e:
+                logger.warning(f"释放监听连接失败: {e}")
+
+    def _handle_termination(self, conn):
+        logger.warning("向量变更监听连接已断开，改为轮询job_vectors")
+        asyncio.ensure_future(self._release_listen_conn())
+        # 断开期间可能漏掉通知，强制换代
+        self._bump_job_generation()
+
+    def _handle_notification(self, conn, pid, channel, payload: str):
+        table, _, row_id = payload.partition(":")
+        if table == "job_vectors":
+            self._bump_job_generation()
+        elif table == "resume_vectors" and self.on_resume_change is not None:
+            try:
+                self.on_resume_change(cache_resume_id(row_id))
+            except ValueError:
+                logger.warning(f"无法解析向量变更通知: {payload}")
+
+    def _bump_job_generation(self):
+        self._job_generation += 1
+        if self.on_job_change is not None:
+            self.on_job_change()
+
+    async def job_version(self) -> str:
+        """当前职位向量版本"""
+        if self.listening or self.postgres_pool is None:
+            return f"g{self._job_generation}"
+
+        if time.time() - self._last_poll >= self.poll_interval:
+            async with self._poll_lock:
+                if time.time() - self._last_poll >= self.poll_interval:
+                    await self._poll_job_signature()
+        return f"g{self._job_generation}:{self._polled_signature}"
+
+    async def _poll_job_signature(self):
+        try:
+            async with self.postgres_pool.acquire() as conn:
+                row = await conn.fetchrow("SELECT max(updated_at) AS latest, count(*) AS total FROM job_vectors")
+            signature = f"{row['latest'].isoformat() if row['latest'] else '-'}:{row['total']}"
+            if self._polled_signature is not None and signature != self._polled_signature:
+                self._bump_job_generation()
+            self._polled_signature = signature
+        except Exception as e:
+            # 查询失败时不缓存，保证不会返回过期结果
+            logger.error(f"查询职位向量版本失败: {e}")
+            self._polled_signature = f"error-{time.time()}"
+        self._last_poll = time.time()
+
+    @staticmethod
+    def resume_version(resume_data: Dict[str, Any]) -> str:
+        """简历向量版本，取resume_vectors.updated_at"""
+        vectors = resume_data.get("vectors") or {}
+        updated_at = vectors.get("updated_at") or vectors.get("created_at")
+        if updated_at is None:
+            return "-"
+        return updated_at.isoformat() if hasattr(updated_at, "isoformat") else str(updated_at)
+
+
+class BackgroundTasks:
+    """后台任务集合，持有任务引用直到完成，关闭时等待收尾"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self, timeout: float = 5.0):
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
@@ -33,6 +33,9 @@ class JobMatchingEngine:
         self.data_access = data_access
         self.postgres_pool = postgres_pool
         
+        # 后台任务集合(由服务层注入)，未注入时访问日志同步写入
+        self.background_tasks = None
+        
         # 默认匹配权重配置
         self.default_weights = {
             'semantic': 0.35,      # 语义相似度
@@ -116,10 +119,14 @@ class JobMatchingEngine:
             # 5. 排序并返回结果
             scored_matches.sort(key=lambda x: x['match_score'], reverse=True)
             
-            # 6. 记录匹配操作日志
-            await self.data_access.log_job_matching_access(
+            # 6. 记录匹配操作日志(后台写入，不阻塞匹配结果返回)
+            log_access = self.data_access.log_job_matching_access(
                 user_id, resume_data['resume_id'], len(scored_matches)
             )
+            if self.background_tasks is not None:
+                self.background_tasks.spawn(log_access)
+            else:
+                await log_access
             
             logger.info(f"职位匹配完成: user_id={user_id}, resume_id={resume_data['resume_id']}, "
                        f"candidates={len(basic_filtered_jobs)}, matches={len(scored_matches)}")
@@ -22,6 +22,7 @@ from functools import wraps
 
 from job_matching_data_access import JobMatchingDataAccess, SecureSQLiteManager, UserSessionManager
 from job_matching_engine import JobMatchingEngine
+from job_matching_cache import MatchResultCache, VectorVersionTracker, BackgroundTasks, filters_hash, cache_resume_id
 
 logger = logging.getLogger(__name__)
 
@@ -38,8 +39,16 @@ class JobMatchingService:
         self.app = app
         self.data_access = None
         self.matching_engine = None
+        self.version_tracker = None
         self.initialized = False
         
+        # 匹配结果缓存与后台任务(访问日志等)
+        self.result_cache = MatchResultCache(
+            max_entries=int(os.getenv('JOB_MATCHING_CACHE_SIZE', '2000')),
+            ttl=int(os.getenv('JOB_MATCHING_CACHE_TTL', '300'))
+        )
+        self.background_tasks = BackgroundTasks()
+        
         # 配置
         self.mysql_config = {
             'host': os.getenv('MYSQL_HOST', 'localhost'),
@@ -72,6 +81,16 @@ class JobMatchingService:
             
             # 初始化匹配引擎
             self.matching_engine = JobMatchingEngine(self.data_access, self.data_access.postgres_pool)
+            self.matching_engine.background_tasks = self.background_tasks
+            
+            # 向量版本跟踪：职位向量变更使缓存键换代，简历向量变更直接失效对应条目
+            self.version_tracker = VectorVersionTracker(
+                self.data_access.postgres_pool,
+                poll_interval=float(os.getenv('JOB_MATCHING_VERSION_POLL_INTERVAL', '5')),
+                on_resume_change=self._invalidate_resume_cache,
+                on_job_change=self.result_cache.invalidate
+            )
+            await self.version_tracker.start()
             
             self.initialized = True
             logger.info("职位匹配服务初始化成功")
@@ -212,6 +231,10 @@ class JobMatchingService:
             
             if not resume_id:
                 return sanic_json({"error": "简历ID不能为空"}, status=400)
+            try:
+                resume_id = cache_resume_id(resume_id)
+            except (TypeError, ValueError):
+                return sanic_json({"error": "简历ID必须是整数"}, status=400)
             
             user_id = request.ctx.user_id
             
@@ -220,15 +243,23 @@ class JobMatchingService:
             if not resume_data:
                 return sanic_json({"error": "简历数据不存在或无法访问"}, status=404)
             
-            # 执行职位匹配
-            matches = await self.matching_engine.find_matching_jobs(
-                resume_data, user_id, limit, filters
+            # 执行职位匹配(相同简历向量版本、筛选条件和职位向量版本的请求复用结果)
+            cache_key = (
+                resume_id,
+                user_id,
+                VectorVersionTracker.resume_version(resume_data),
+                filters_hash(filters),
+                await self.version_tracker.job_version(),
+                limit
             )
-            
-            # 获取公司信息
-            for match in matches:
-                company_info = await self._get_company_info(match['job_info']['company_id'])
-                match['company_info'] = company_info
+            matches, source = await self.result_cache.get_or_compute(
+                cache_key, lambda: self._compute_matches(resume_data, user_id, limit, filters)
+            )
+            if source != "computed":
+                # 复用结果时仍记录访问日志，且不阻塞响应
+                self.background_tasks.spawn(
+                    self.data_access.log_job_matching_access(user_id, resume_id, len(matches))
+                )
             
             return sanic_json({
                 "status": "success",
@@ -247,6 +278,29 @@ class JobMatchingService:
             logger.error(f"职位匹配API失败: {e}")
             return sanic_json({"error": str(e)}, status=500)
     
+    async def _compute_matches(self, resume_data: Dict[str, Any], user_id: int,
+                               limit: int, filters: Dict) -> List[Dict[str, Any]]:
+        """执行职位匹配并补充公司信息"""
+        matches = await self.matching_engine.find_matching_jobs(
+            resume_data, user_id, limit, filters
+        )
+        
+        # 并发获取公司信息
+        company_infos = await asyncio.gather(*(
+            self._get_company_info(match['job_info']['company_id']) for match in matches
+        ))
+        for match, company_info in zip(matches, company_infos):
+            match['company_info'] = company_info
+        
+        return matches
+    
+    def _invalidate_resume_cache(self, resume_id: int):
+        """简历向量变更时失效该简历的全部缓存结果"""
+        resume_id = cache_resume_id(resume_id)
+        removed = self.result_cache.invalidate(lambda key: key[0] == resume_id)
+        if removed:
+            logger.info(f"简历向量变更，已失效匹配缓存: resume_id={resume_id}, entries={removed}")
+    
     async def _handle_job_matching_details(self, request: Request, job_id: int):
         """处理匹配结果详情请求"""
         try:
@@ -345,6 +399,7 @@ class JobMatchingService:
             
             # 获取统计信息
             stats = await self._get_matching_stats()
+            stats['result_cache'] = self.result_cache.get_stats()
             
             return sanic_json({
                 "status": "success",
@@ -440,6 +495,12 @@ class JobMatchingService:
     async def close(self):
         """关闭服务"""
         try:
+            if self.version_tracker:
+                await self.version_tracker.stop()
+            
+            # 等待未完成的访问日志写入
+            await self.background_tasks.drain()
+            
             if self.data_access:
                 await self.data_access.close()
             
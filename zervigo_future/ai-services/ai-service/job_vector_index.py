@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+职位向量内存索引 - 两阶段检索
+维护 job_id -> 行号映射和描述/要求向量的float32矩阵，从job_vectors按(updated_at, id)水位增量刷新，
+并定期与job_vectors的job_id集合对账以移除已删除的职位；
+检索时先用随机投影草图做廉价近似召回，再对召回的Top-K做精确余弦重排
+
+创建时间: 2026-10-17
+版本: 1.0.0
+"""
+
+import asyncio
+import time
+import numpy as np
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+from datetime import datetime
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# 首次全量加载与增量刷新均按(updated_at, id)键集分页；
+# 只读取updated_at早于当前时间safety_lag秒的行，避免晚提交但updated_at更早的行被水位跳过
+INITIAL_ROWS_SQL = """
+    SELECT id, job_id, description_vector, requirements_vector, updated_at
+    FROM job_vectors
+    WHERE updated_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+    ORDER BY updated_at, id
+    LIMIT $2
+"""
+
+DELTA_ROWS_SQL = """
+    SELECT id, job_id, description_vector, requirements_vector, updated_at
+    FROM job_vectors
+    WHERE (updated_at, id) > ($1, $2)
+      AND updated_at < CURRENT_TIMESTAMP - make_interval(secs => $3)
+    ORDER BY updated_at, id
+    LIMIT $4
+"""
+
+LIVE_JOB_IDS_SQL = "SELECT job_id FROM job_vectors"
+
+
+def to_vector(value: Any) -> Optional[np.ndarray]:
+    """将pgvector返回值(文本或数组)转换为float32向量"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [float(v) for v in value.strip("[]").split(",") if v.strip()]
+    vector = np.asarray(value, dtype=np.float32).ravel()
+    return vector if vector.size else None
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class JobVectorIndex:
+    """职位向量内存索引"""
+
+    def __init__(self, dimension: int = 384, sketch_dimension: int = 64,
+                 oversample: int = 4, refresh_interval: float = 30.0, seed: int = 42,
+                 safety_lag: float = 5.0, reconcile_interval: float = 300.0,
+                 page_size: int = 1000):
+        """
+        Args:
+            dimension: 向量维度
+            sketch_dimension: 近似召回阶段的随机投影维度
+            oversample: 近似召回数量 = 目标数量 * oversample
+            refresh_interval: 两次增量刷新的最小间隔(秒)
+            safety_lag: 只读取updated_at早于当前时间该秒数的行
+            reconcile_interval: 与job_vectors对账、移除已删除职位的间隔(秒)
+            page_size: 每页读取的行数
+        """
+        self.dimension = dimension
+        self.sketch_dimension = sketch_dimension
+        self.oversample = oversample
+        self.refresh_interval = refresh_interval
+        self.safety_lag = safety_lag
+        self.reconcile_interval = reconcile_interval
+        self.page_size = page_size
+
+        rng = np.random.default_rng(seed)
+        self._projection = (rng.standard_normal((dimension, sketch_dimension)) /
+                            np.sqrt(sketch_dimension)).astype(np.float32)
+
+        capacity = 1024
+        self._job_ids = np.zeros(capacity, dtype=np.int64)
+        self._description = np.zeros((capacity, dimension), dtype=np.float32)
+        self._requirements = np.zeros((capacity, dimension), dtype=np.float32)
+        self._sketch = np.zeros((capacity, 2 * sketch_dimension), dtype=np.float32)
+        self._live = np.zeros(capacity, dtype=bool)
+        self._size = 0
+
+        self._positions: Dict[int, int] = {}
+        self._free_rows: List[int] = []
+
+        # (updated_at, id)键集水位
+        self._watermark: Optional[Tuple[datetime, int]] = None
+        self._last_refresh = 0.0
+        self._last_reconcile = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, job_id: int) -> bool:
+        return job_id in self._positions
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def _grow(self):
+        capacity = len(self._job_ids) * 2
+        self._job_ids = np.resize(self._job_ids, capacity)
+        for name in ("_description", "_requirements", "_sketch"):
+            old = getattr(self, name)
+            new = np.zeros((capacity, old.shape[1]), dtype=np.float32)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(self._live)] = self._live
+        self._live = live
+
+    def upsert(self, job_id: int, description_vector: Any, requirements_vector: Any) -> bool:
+        """写入或更新单个职位向量，向量缺失或维度不符时跳过"""
+        description = to_vector(description_vector)
+        requirements = to_vector(requirements_vector)
+        if description is None and requirements is None:
+            return False
+        if description is None:
+            description = requirements
+        if requirements is None:
+            requirements = description
+        if description.size != self.dimension or requirements.size != self.dimension:
+            logger.warning("职位向量维度不匹配，跳过", job_id=job_id, dimension=description.size)
+            return False
+
+        row = self._positions.get(job_id)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                if self._size == len(self._job_ids):
+                    self._grow()
+                row = self._size
+                self._size += 1
+            self._positions[job_id] = row
+
+        description = _normalize(description)
+        requirements = _normalize(requirements)
+        self._job_ids[row] = job_id
+        self._description[row] = description
+        self._requirements[row] = requirements
+        self._sketch[row] = np.concatenate([description @ self._projection,
+                                            requirements @ self._projection])
+        self._live[row] = True
+        return True
+
+    def remove(self, job_id: int) -> bool:
+        row = self._positions.pop(job_id, None)
+        if row is None:
+            return False
+        self._live[row] = False
+        self._free_rows.append(row)
+        self.version += 1
+        return True
+
+    async def refresh(self, postgres_pool, force: bool = False) -> int:
+        """从job_vectors增量刷新，返回本次更新与移除的职位数；到期时顺带对账"""
+        if postgres_pool is None:
+            return 0
+        if not force and time.time() - self._last_refresh < self.refresh_interval:
+            return 0
+
+        async with self._refresh_lock:
+            if not force and time.time() - self._last_refresh < self.refresh_interval:
+                return 0
+
+            try:
+                updated = 0
+                removed = 0
+                async with postgres_pool.acquire() as conn:
+                    while True:
+                        if self._watermark is None:
+                            rows = await conn.fetch(INITIAL_ROWS_SQL, self.safety_lag, self.page_size)
+                        else:
+                            rows = await conn.fetch(DELTA_ROWS_SQL, self._watermark[0], self._watermark[1],
+                                                    self.safety_lag, self.page_size)
+                        updated += self.load_rows(rows)
+                        if len(rows) < self.page_size:
+                            break
+
+                    if force or time.time() - self._last_reconcile >= self.reconcile_interval:
+                        live_rows = await conn.fetch(LIVE_JOB_IDS_SQL)
+                        removed = self.reconcile(row['job_id'] for row in live_rows)
+                        self._last_reconcile = time.time()
+
+                self._last_refresh = time.time()
+
+                if updated or removed:
+                    logger.info("职位向量索引增量刷新完成", updated=updated, removed=removed, size=len(self))
+                return updated + removed
+
+            except Exception as e:
+                logger.error("职位向量索引刷新失败", error=str(e))
+                return 0
+
+    def load_rows(self, rows: Iterable[Any]) -> int:
+        """批量写入job_vectors查询结果(需按updated_at, id升序)，向量已被清空的职位从索引移除"""
+        updated = 0
+        for row in rows:
+            job_id = row['job_id']
+            if self.upsert(job_id, row['description_vector'], row['requirements_vector']):
+                updated += 1
+            elif self.remove(job_id):
+                updated += 1
+            updated_at = row['updated_at']
+            if updated_at is not None:
+                key = (updated_at, row['id'])
+                if self._watermark is None or key > self._watermark:
+                    self._watermark = key
+        if updated:
+            self.version += 1
+        return updated
+
+    def reconcile(self, live_job_ids: Iterable[int]) -> int:
+        """移除job_vectors中已不存在的职位，返回移除数量"""
+        live = set(live_job_ids)
+        stale = [job_id for job_id in self._positions if job_id not in live]
+        for job_id in stale:
+            self.remove(job_id)
+        return len(stale)
+
+    # ------------------------------------------------------------------
+    # 检索
+    # ------------------------------------------------------------------
+
+    def search(self, content_vector: Any, skills_vector: Any, limit: int,
+               candidate_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, float, float]]:
+        """两阶段检索，返回[(job_id, content_similarity, skills_similarity)]，按两者之和降序"""
+        content = to_vector(content_vector)
+        skills = to_vector(skills_vector)
+        if content is None or limit <= 0 or not self._positions:
+            return []
+        if skills is None:
+            skills = content
+        content = _normalize(content)
+        skills = _normalize(skills)
+
+        # 候选行
+        if candidate_ids is None:
+            rows = np.flatnonzero(self._live[:self._size])
+        else:
+            rows = np.fromiter(
+                (self._positions[job_id] for job_id in candidate_ids if job_id in self._positions),
+                dtype=np.int64
+            )
+        if rows.size == 0:
+            return []
+
+        # 第一阶段：随机投影草图上的近似内积召回
+        recall_k = limit * self.oversample
+        if rows.size > recall_k:
+            query_sketch = np.concatenate([content @ self._projection, skills @ self._projection])
+            approx = self._sketch[rows] @ query_sketch
+            rows = rows[np.argpartition(-approx, recall_k - 1)[:recall_k]]
+
+        # 第二阶段：精确余弦重排
+        content_similarity = self._description[rows] @ content
+        skills_similarity = self._requirements[rows] @ skills
+        combined = content_similarity + skills_similarity
+        k = min(limit, rows.size)
+        top = np.argpartition(-combined, k - 1)[:k] if rows.size > k else np.arange(rows.size)
+        top = top[np.argsort(-combined[top], kind="stable")]
+
+        return [
+            (int(self._job_ids[rows[i]]), float(content_similarity[i]), float(skills_similarity[i]))
+            for i in top
+        ]
+
+    def get_vectors(self, job_id: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        row = self._positions.get(job_id)
+        if row is None:
+            return None
+        return self._description[row], self._requirements[row]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self),
+            "capacity": len(self._job_ids),
+            "version": self.version,
+            "watermark": {
+                "updated_at": self._watermark[0].isoformat(),
+                "id": self._watermark[1]
+            } if self._watermark else None
+        }
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+简历向量存储 - asyncpg连接池版本
+为AI服务提供共享连接池、ON CONFLICT upsert、pgvector二进制编解码与批量写入
+
+ON CONFLICT依赖resume_id上的唯一索引(database/migrations/006_resume_vectors_unique_resume_id.sql)，
+启动时检查索引是否存在；缺失时记录错误并改用不依赖约束的UPDATE/INSERT写入。
+启动时数据库不可用不阻止服务启动，连接池在首次读写时重新创建
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import asyncpg
+import numpy as np
+
+try:
+    from pgvector.asyncpg import register_vector
+    HAS_PGVECTOR = True
+except ImportError:
+    HAS_PGVECTOR = False
+
+logger = logging.getLogger(__name__)
+
+UPSERT_VECTORS_SQL = """
+    INSERT INTO resume_vectors (resume_id, content_vector, skills_vector, experience_vector)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (resume_id) DO UPDATE
+    SET content_vector = EXCLUDED.content_vector,
+        skills_vector = EXCLUDED.skills_vector,
+        experience_vector = EXCLUDED.experience_vector,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# 唯一索引缺失时的写入路径：先UPDATE，未命中再INSERT
+UPDATE_VECTORS_SQL = """
+    UPDATE resume_vectors
+    SET content_vector = $2,
+        skills_vector = $3,
+        experience_vector = $4,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE resume_id = $1
+"""
+
+INSERT_VECTORS_SQL = """
+    INSERT INTO resume_vectors (resume_id, content_vector, skills_vector, experience_vector)
+    VALUES ($1, $2, $3, $4)
+"""
+
+# resume_vectors上是否存在仅包含resume_id列的有效唯一索引
+UNIQUE_INDEX_EXISTS_SQL = """
+    SELECT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = 'resume_vectors'::regclass
+          AND i.indisunique
+          AND i.indisvalid
+          AND i.indnatts = 1
+          AND i.indpred IS NULL
+          AND a.attname = 'resume_id'
+    )
+"""
+
+
+class ResumeVectorStore:
+    """简历向量存储"""
+
+    def __init__(self, host: str, user: str, password: str, database: str,
+                 port: int = 5432, min_size: int = 2, max_size: int = 10,
+                 command_timeout: float = 10.0):
+        self.pool_config = {
+            "host": host,
+            "port": port,
+            "user": user,
+            "password": password,
+            "database": database,
+            "min_size": min_size,
+            "max_size": max_size,
+            "command_timeout": command_timeout
+        }
+        self.pool: Optional[asyncpg.Pool] = None
+        self._init_lock = asyncio.Lock()
+        # resume_id唯一索引存在时使用ON CONFLICT upsert
+        self.has_unique_index = False
+
+    async def _init_connection(self, conn: asyncpg.Connection):
+        """为每个连接注册pgvector二进制编解码"""
+        if HAS_PGVECTOR:
+            await register_vector(conn)
+
+    async def initialize(self):
+        """创建连接池并检查upsert所需的唯一索引"""
+        if not HAS_PGVECTOR:
+            logger.warning("pgvector未安装，向量将以文本格式传输，请安装: pip install pgvector")
+
+        self.pool = await asyncpg.create_pool(init=self._init_connection, **self.pool_config)
+
+        try:
+            async with self.pool.acquire() as conn:
+                self.has_unique_index = bool(await conn.fetchval(UNIQUE_INDEX_EXISTS_SQL))
+        except Exception as e:
+            # 表尚未创建等情况下按无唯一索引处理，UPDATE/INSERT写入不依赖约束
+            self.has_unique_index = False
+            logger.error(f"检查resume_vectors唯一索引失败，改用UPDATE/INSERT写入: {e}")
+        else:
+            if not self.has_unique_index:
+                logger.error(
+                    "resume_vectors缺少resume_id唯一索引，已改用UPDATE/INSERT写入；"
+                    "请执行 database/migrations/006_resume_vectors_unique_resume_id.sql"
+                )
+
+        logger.info("简历向量存储连接池初始化成功")
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        """返回连接池；启动时创建失败的在此重新创建"""
+        if self.pool is None:
+            async with self._init_lock:
+                if self.pool is None:
+                    await self.initialize()
+        return self.pool
+
+    async def close(self):
+        """关闭连接池"""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+            logger.info("简历向量存储连接池已关闭")
+
+    def _encode(self, vector: Optional[Sequence[float]]) -> Any:
+        """转换为pgvector参数；未注册二进制编解码时退化为文本字面量"""
+        if vector is None:
+            return None
+        if HAS_PGVECTOR:
+            return np.asarray(vector, dtype=np.float32)
+        return "[" + ",".join(str(float(v)) for v in vector) + "]"
+
+    def _decode(self, value: Any) -> Optional[List[float]]:
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return [float(v) for v in value.strip("[]").split(",") if v]
+        return np.asarray(value, dtype=np.float32).tolist()
+
+    async def save_vectors(self, resume_id: int, content_vector: Sequence[float],
+                           skills_vector: Sequence[float], experience_vector: Sequence[float]):
+        """单条upsert，一次往返"""
+        args = (
+            int(resume_id),
+            self._encode(content_vector),
+            self._encode(skills_vector),
+            self._encode(experience_vector)
+        )
+        async with (await self._get_pool()).acquire() as conn:
+            if self.has_unique_index:
+                await conn.execute(UPSERT_VECTORS_SQL, *args)
+            else:
+                async with conn.transaction():
+                    await self._update_or_insert(conn, args)
+
+    async def save_vectors_many(self, rows: List[Tuple[int, Sequence[float], Sequence[float], Sequence[float]]]) -> int:
+        """批量upsert，rows为(resume_id, content_vector, skills_vector, experience_vector)"""
+        if not rows:
+            return 0
+
+        # 同一批次内重复的resume_id只保留最后一条，避免ON CONFLICT重复更新同一行
+        latest = {int(row[0]): row for row in rows}
+        args = [
+            (resume_id, self._encode(content), self._encode(skills), self._encode(experience))
+            for resume_id, (_, content, skills, experience) in latest.items()
+        ]
+
+        async with (await self._get_pool()).acquire() as conn:
+            async with conn.transaction():
+                if self.has_unique_index:
+                    await conn.executemany(UPSERT_VECTORS_SQL, args)
+                else:
+                    for row_args in args:
+                        await self._update_or_insert(conn, row_args)
+
+        return len(args)
+
+    async def _update_or_insert(self, conn: asyncpg.Connection, args: Tuple[Any, ...]):
+        """不依赖唯一约束的写入：UPDATE命中0行时INSERT"""
+        status = await conn.execute(UPDATE_VECTORS_SQL, *args)
+        if status.endswith(" 0"):
+            await conn.execute(INSERT_VECTORS_SQL, *args)
+
+    async def get_vectors(self, resume_id: int) -> Optional[Dict[str, Any]]:
+        """获取简历向量"""
+        async with (await self._get_pool()).acquire() as conn:
+            row = await conn.fetchrow("""
+                SELECT content_vector, skills_vector, experience_vector
+                FROM resume_vectors
+                WHERE resume_id = $1
+            """, int(resume_id))
+
+        if not row:
+            return None
+
+        return {
+            "content_vector": self._decode(row["content_vector"]),
+            "skills_vector": self._decode(row["skills_vector"]),
+            "experience_vector": self._decode(row["experience_vector"])
+        }
+
+    async def search_similar(self, query_vector: Sequence[float], limit: int = 10) -> List[Dict[str, Any]]:
+        """按余弦距离搜索相似简历"""
+        async with (await self._get_pool()).acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT resume_id, content_vector <=> $1 AS distance
+                FROM resume_vectors
+                ORDER BY content_vector <=> $1
+                LIMIT $2
+            """, self._encode(query_vector), int(limit))
+
+        return [
+            {"resume_id": row["resume_id"], "distance": float(row["distance"])}
+            for row in rows
+        ]
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技能词表与职位技能集合索引
+将技能名称规范化并驻留为整数ID(同义词映射到同一ID)，按职位预编译稀疏技能向量，
+一次向量化运算即可得到简历与全部候选职位的技能重合度
+
+创建时间: 2026-10-17
+版本: 1.0.0
+"""
+
+import json
+import os
+import numpy as np
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# 标准技能及别名数据文件，由generate_skill_synonyms.py从技能标准化引擎的技能库生成，随服务镜像一起发布
+DEFAULT_SYNONYMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "skill_synonyms.json")
+
+
+def normalize_skill(raw_skill: str) -> str:
+    """技能名称规范化：去空白、小写、压缩内部空格"""
+    return " ".join(str(raw_skill).strip().lower().split())
+
+
+class SkillVocabulary:
+    """技能词表 - 规范化名称到整数ID的驻留表"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add_synonyms(self, canonical: str, aliases: Iterable[str]):
+        """登记同义词，所有别名映射到标准名称的ID"""
+        skill_id = self.intern(canonical)
+        for alias in aliases:
+            key = normalize_skill(alias)
+            if key and key not in self._ids:
+                self._ids[key] = skill_id
+
+    def load_from_file(self, path: str = DEFAULT_SYNONYMS_PATH) -> int:
+        """从JSON文件({标准名称: [别名, ...]})加载同义词，返回加载的标准技能数"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                synonyms = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("技能同义词加载失败，仅按规范化名称匹配", path=path, error=str(e))
+            return 0
+
+        for canonical, aliases in synonyms.items():
+            self.add_synonyms(canonical, aliases or [])
+        logger.info("技能同义词加载完成", path=path, skills=len(synonyms), vocabulary_size=len(self._ids))
+        return len(synonyms)
+
+    def intern(self, raw_skill: str) -> int:
+        """获取技能ID，未登记时分配新ID"""
+        key = normalize_skill(raw_skill)
+        skill_id = self._ids.get(key)
+        if skill_id is None:
+            skill_id = len(self._names)
+            self._ids[key] = skill_id
+            self._names.append(key)
+        return skill_id
+
+    def lookup(self, raw_skill: str) -> Optional[int]:
+        return self._ids.get(normalize_skill(raw_skill))
+
+    def encode(self, skills: Iterable[str]) -> np.ndarray:
+        """编码为去重排序的技能ID数组"""
+        return np.unique(np.fromiter((self.intern(s) for s in skills if s), dtype=np.int32))
+
+    def encode_known(self, skills: Iterable[str]) -> np.ndarray:
+        """只编码已登记的技能，不分配新ID；未登记的技能不可能命中任何职位技能"""
+        ids = (self._ids.get(normalize_skill(s)) for s in skills if s)
+        return np.unique(np.fromiter((i for i in ids if i is not None), dtype=np.int32))
+
+    def name(self, skill_id: int) -> str:
+        return self._names[skill_id]
+
+
+class JobSkillIndex:
+    """职位技能集合索引 - 以CSR形式保存各职位的技能ID"""
+
+    def __init__(self, vocabulary: Optional[SkillVocabulary] = None):
+        self.vocabulary = vocabulary or SkillVocabulary()
+        # job_id -> (职位签名, 技能ID数组, 要求技能条数, 文化关键词小写列表)
+        self._jobs: Dict[Any, Tuple[Tuple, np.ndarray, int, List[str]]] = {}
+
+    def _compile_job(self, job_info: Dict[str, Any]):
+        job_id = job_info.get('id', job_info.get('job_id'))
+        required_skills = tuple(job_info.get('required_skills') or [])
+        culture_keywords = tuple((job_info.get('company_culture') or {}).get('keywords', []))
+        signature = (required_skills, culture_keywords)
+        cached = self._jobs.get(job_id)
+        if cached is not None and cached[0] == signature:
+            return cached
+
+        keywords = [keyword.lower() for keyword in culture_keywords]
+        compiled = (signature, self.vocabulary.encode(required_skills), len(required_skills), keywords)
+        if job_id is not None:
+            self._jobs[job_id] = compiled
+        return compiled
+
+    def skills_match(self, resume_skills: List[str], job_infos: List[Dict[str, Any]]) -> np.ndarray:
+        """批量计算技能匹配度：命中的不同职位技能数 / 职位要求技能条数"""
+        compiled = [self._compile_job(job_info) for job_info in job_infos]
+        if not compiled:
+            return np.zeros(0, dtype=np.float32)
+
+        lengths = np.array([len(c[1]) for c in compiled], dtype=np.int64)
+        required_counts = np.array([c[2] for c in compiled], dtype=np.float32)
+
+        # 简历技能只查表不驻留，词表大小只随职位技能与同义词增长
+        resume_ids = self.vocabulary.encode_known(resume_skills or [])
+        scores = np.zeros(len(compiled), dtype=np.float32)
+
+        if resume_ids.size and lengths.sum():
+            flat = np.concatenate([c[1] for c in compiled])
+            hits = np.isin(flat, resume_ids).astype(np.int32)
+            # 按职位分段求和，空段通过前缀和处理
+            cumulative = np.concatenate([[0], np.cumsum(hits)])
+            ends = np.cumsum(lengths)
+            matched = cumulative[ends] - cumulative[ends - lengths]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.where(required_counts > 0, matched / required_counts, 0.0)
+
+        # 职位无技能要求视为完全匹配
+        scores = np.where(required_counts == 0, 1.0, scores)
+        return np.minimum(scores, 1.0).astype(np.float32)
+
+    def cultural_fit(self, personality_traits: List[str], job_infos: List[Dict[str, Any]]) -> np.ndarray:
+        """批量计算文化匹配度，特质只做一次小写化"""
+        traits = [trait.lower() for trait in personality_traits or []]
+        scores = np.full(len(job_infos), 0.5, dtype=np.float32)
+        if not traits:
+            return scores
+
+        for i, job_info in enumerate(job_infos):
+            keywords = self._compile_job(job_info)[3]
+            if not keywords:
+                continue
+            matched = sum(1 for trait in traits if any(keyword in trait for keyword in keywords))
+            scores[i] = min(matched / len(keywords), 1.0)
+        return scores
+
+    def invalidate(self, job_id: Any):
+        self._jobs.pop(job_id, None)
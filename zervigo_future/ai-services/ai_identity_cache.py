@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+AI身份缓存组件
+按条目数与字节数双重限界的LRU+TTL缓存，供向量化与相似度引擎共享
+嵌入向量以连续float32缓冲区存储，可选将淘汰条目溢出到Redis(保留剩余TTL，删除时同步清除)
+"""
+
+import base64
+import json
+import structlog
+import sys
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+logger = structlog.get_logger()
+
+
+def _to_buffer(value: Any) -> Any:
+    """将嵌入向量转换为连续float32缓冲区，非浮点数组保留原dtype"""
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "f":
+            return np.ascontiguousarray(value, dtype=np.float32)
+        return np.ascontiguousarray(value)
+    if isinstance(value, dict):
+        return {k: _to_buffer(v) for k, v in value.items()}
+    return value
+
+
+def _estimate_size(value: Any) -> int:
+    """粗略估算缓存值占用的字节数"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _SpillEncoder(json.JSONEncoder):
+    """Redis溢出序列化，ndarray编码为base64并记录dtype"""
+
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return {
+                "__ndarray__": base64.b64encode(obj.tobytes()).decode("ascii"),
+                "dtype": obj.dtype.str,
+                "shape": list(obj.shape)
+            }
+        if isinstance(obj, (np.floating, np.integer)):
+            return obj.item()
+        return super().default(obj)
+
+
+def _spill_decode(obj: Dict[str, Any]) -> Any:
+    if "__ndarray__" in obj:
+        buffer = base64.b64decode(obj["__ndarray__"])
+        # 早期溢出的条目没有dtype字段，均为float32
+        dtype = np.dtype(obj.get("dtype", "<f4"))
+        return np.frombuffer(buffer, dtype=dtype).reshape(obj["shape"]).copy()
+    return obj
+
+
+class BoundedTTLCache:
+    """LRU+TTL缓存，按条目数与字节数限界"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024,
+                 ttl: int = 3600, namespace: str = "ai_identity:cache",
+                 redis_client: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.namespace = namespace
+        self.redis_client = redis_client
+
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        # 正在溢出到Redis的键；溢出过程中被删除的键在写入后立即清除
+        self._spilling: Dict[str, bool] = {}
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "spills": 0,
+            "spill_hits": 0
+        }
+
+    @classmethod
+    def with_redis_url(cls, redis_url: Optional[str], **kwargs) -> "BoundedTTLCache":
+        """按URL创建带Redis溢出的缓存，未配置或依赖缺失时仅使用内存"""
+        redis_client = None
+        if redis_url:
+            if HAS_REDIS:
+                redis_client = aioredis.from_url(redis_url)
+            else:
+                logger.warning("Redis依赖未安装，缓存溢出已禁用，请安装: pip install redis")
+        return cls(redis_client=redis_client, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.time()
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _remove(self, key: str) -> Optional[Tuple[Any, float, int]]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        return entry
+
+    async def get(self, key: str) -> Optional[Any]:
+        """读取缓存，命中时刷新LRU位置"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+            self._remove(key)
+            self._stats["expirations"] += 1
+
+        if self.redis_client is not None:
+            loaded = await self._load_spilled(key)
+            if loaded is not None:
+                value, remaining_ttl = loaded
+                self._stats["hits"] += 1
+                self._stats["spill_hits"] += 1
+                # 沿用溢出时的剩余TTL，而不是重新计满
+                await self.set(key, value, ttl=remaining_ttl)
+                return value
+
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """写入缓存并按需淘汰"""
+        value = _to_buffer(value)
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            logger.warning("缓存值超过字节上限，跳过缓存", key=key, size=size)
+            return
+
+        self._remove(key)
+        self._entries[key] = (value, time.time() + (ttl or self.ttl), size)
+        self._bytes += size
+        await self._evict()
+
+    async def delete(self, key: str) -> bool:
+        """删除内存条目及其Redis溢出副本"""
+        removed = self._remove(key) is not None
+        if self.redis_client is not None:
+            removed = await self._delete_spilled(key) or removed
+        return removed
+
+    async def pop(self, key: str, default: Any = None) -> Any:
+        entry = self._remove(key)
+        if self.redis_client is not None:
+            await self._delete_spilled(key)
+        return entry[0] if entry is not None else default
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """主动清理过期条目"""
+        now = time.time()
+        expired = [key for key, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self._stats["expirations"] += len(expired)
+        return len(expired)
+
+    async def _evict(self):
+        """超出条目数或字节数上限时按LRU淘汰"""
+        if len(self._entries) <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+
+        # 先清理过期条目，再按LRU顺序淘汰
+        self.purge_expired()
+        now = time.time()
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, (value, expires_at, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._stats["evictions"] += 1
+            if self.redis_client is not None and expires_at > now:
+                await self._spill(key, value, expires_at - now)
+
+    async def _spill(self, key: str, value: Any, remaining_ttl: float):
+        self._spilling[key] = False
+        try:
+            payload = json.dumps(value, cls=_SpillEncoder)
+            await self.redis_client.set(self._redis_key(key), payload, px=max(1, int(remaining_ttl * 1000)))
+            self._stats["spills"] += 1
+            if self._spilling.get(key):
+                # 写入期间该键已被删除
+                await self.redis_client.delete(self._redis_key(key))
+        except Exception as e:
+            logger.warning("缓存溢出到Redis失败", key=key, error=str(e))
+        finally:
+            self._spilling.pop(key, None)
+
+    async def _load_spilled(self, key: str) -> Optional[Tuple[Any, float]]:
+        """读取溢出条目，返回(值, 剩余TTL秒数)"""
+        try:
+            redis_key = self._redis_key(key)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(redis_key)
+                pipe.pttl(redis_key)
+                payload, pttl = await pipe.execute()
+            if payload is None or pttl == -2:
+                return None
+            remaining_ttl = pttl / 1000 if pttl > 0 else self.ttl
+            return json.loads(payload, object_hook=_spill_decode), remaining_ttl
+        except Exception as e:
+            logger.warning("从Redis读取溢出缓存失败", key=key, error=str(e))
+            return None
+
+    async def _delete_spilled(self, key: str) -> bool:
+        if key in self._spilling:
+            self._spilling[key] = True
+        try:
+            return bool(await self.redis_client.delete(self._redis_key(key)))
+        except Exception as e:
+            logger.warning("删除Redis溢出缓存失败", key=key, error=str(e))
+            return False
+
+    async def close(self):
+        if self.redis_client is not None:
+            try:
+                await self.redis_client.close()
+            except Exception as e:
+                logger.warning("关闭缓存Redis连接失败", error=str(e))
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": self._stats["hits"] / max(lookups, 1),
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes
+        }
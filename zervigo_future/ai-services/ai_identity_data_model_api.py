@@ -255,7 +255,8 @@ class AIIdentityDataModelAPI:
                         "vector_type": result.vector_type.value,
                         "vector_dimension": result.vector_dimension,
                         "confidence_score": result.confidence_score,
-                        "embedding_time_ms": result.embedding_time_ms
+                        "embedding_time_ms": result.embedding_time_ms,
+                        "empty_text": result.vector_embedding is None
                     })
                 
                 return sanic_json({
@@ -263,7 +264,7 @@ class AIIdentityDataModelAPI:
                     "message": "批量向量化处理成功",
                     "data": {
                         "total_count": len(profiles_data),
-                        "successful_count": len(results),
+                        "successful_count": sum(1 for result in results if result.vector_embedding is not None),
                         "results": results_dict
                     }
                 })
@@ -30,6 +30,8 @@ except ImportError:
     logger = structlog.get_logger()
     logger.warning("相似度计算依赖包未安装，请安装: pip install scipy scikit-learn")
 
+from ai_identity_cache import BoundedTTLCache
+
 logger = structlog.get_logger()
 
 class SimilarityType(Enum):
@@ -61,7 +63,11 @@ class SimilarityConfig:
     normalize_vectors: bool = True
     cache_results: bool = True
     cache_ttl: int = 3600  # 缓存TTL(秒)
+    cache_max_entries: int = 50000  # 缓存最大条目数
+    cache_max_bytes: int = 128 * 1024 * 1024  # 缓存最大字节数
+    cache_redis_url: Optional[str] = None  # 缓存溢出Redis地址，为空则仅使用内存
     batch_size: int = 100  # 批处理大小
+    matrix_chunk_size: int = 8192  # 矩阵模式下逐块计算曼哈顿距离的行数
     similarity_threshold: float = 0.1  # 相似度阈值
 
 @dataclass
@@ -102,8 +108,19 @@ class AIIdentitySimilarity:
         self.executor = ThreadPoolExecutor(max_workers=4)
         
         # 结果缓存
-        self._similarity_cache = {}
-        self._vector_cache = {}
+        self._similarity_cache = BoundedTTLCache.with_redis_url(
+            self.config.cache_redis_url,
+            max_entries=self.config.cache_max_entries,
+            max_bytes=self.config.cache_max_bytes,
+            ttl=self.config.cache_ttl,
+            namespace="ai_identity:similarity"
+        )
+        self._vector_cache = BoundedTTLCache(
+            max_entries=self.config.cache_max_entries,
+            max_bytes=self.config.cache_max_bytes,
+            ttl=self.config.cache_ttl,
+            namespace="ai_identity:similarity_vectors"
+        )
         
         # 性能统计
         self._performance_stats = {
@@ -112,6 +129,8 @@ class AIIdentitySimilarity:
             "average_time_ms": 0,
             "cache_hits": 0,
             "cache_misses": 0,
+            "matrix_calculations": 0,
+            "matrix_targets_scored": 0,
             "algorithm_usage": {alg.value: 0 for alg in SimilarityAlgorithm}
         }
         
@@ -150,12 +169,12 @@ class AIIdentitySimilarity:
             
             # 检查缓存
             cache_key = f"{source_profile_id}_{target_profile_id}_{similarity_type.value}"
-            if self.config.cache_results and cache_key in self._similarity_cache:
-                cached_result = self._similarity_cache[cache_key]
-                if time.time() - cached_result["timestamp"] < self.config.cache_ttl:
+            if self.config.cache_results:
+                cached_result = await self._similarity_cache.get(cache_key)
+                if cached_result is not None:
                     self._performance_stats["cache_hits"] += 1
                     logger.info("使用缓存的相似度结果", cache_key=cache_key)
-                    return self._deserialize_similarity_result(cached_result["result"])
+                    return self._deserialize_similarity_result(dict(cached_result))
             
             self._performance_stats["cache_misses"] += 1
             
@@ -300,19 +319,7 @@ class AIIdentitySimilarity:
         try:
             components = similarity_metrics["components"]
             
-            # 根据相似度类型设置权重
-            if similarity_type == SimilarityType.SKILL:
-                weights = {"cosine_component": 0.5, "euclidean_component": 0.3, "manhattan_component": 0.2}
-            elif similarity_type == SimilarityType.EXPERIENCE:
-                weights = {"cosine_component": 0.4, "euclidean_component": 0.4, "manhattan_component": 0.2}
-            elif similarity_type == SimilarityType.COMPETENCY:
-                weights = {"cosine_component": 0.6, "euclidean_component": 0.2, "manhattan_component": 0.2}
-            else:  # COMPREHENSIVE
-                weights = {"cosine_component": 0.5, "euclidean_component": 0.3, "manhattan_component": 0.2}
-            
-            # 使用自定义权重
-            if custom_weights:
-                weights.update(custom_weights)
+            weights = self._get_component_weights(similarity_type, custom_weights)
             
             # 计算加权平均
             weighted_sum = 0.0
@@ -338,6 +345,24 @@ class AIIdentitySimilarity:
             logger.error("计算综合相似度评分失败", error=str(e))
             return 0.0
     
+    def _get_component_weights(self, similarity_type: SimilarityType,
+                               custom_weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """根据相似度类型获取组件权重"""
+        if similarity_type == SimilarityType.SKILL:
+            weights = {"cosine_component": 0.5, "euclidean_component": 0.3, "manhattan_component": 0.2}
+        elif similarity_type == SimilarityType.EXPERIENCE:
+            weights = {"cosine_component": 0.4, "euclidean_component": 0.4, "manhattan_component": 0.2}
+        elif similarity_type == SimilarityType.COMPETENCY:
+            weights = {"cosine_component": 0.6, "euclidean_component": 0.2, "manhattan_component": 0.2}
+        else:  # COMPREHENSIVE
+            weights = {"cosine_component": 0.5, "euclidean_component": 0.3, "manhattan_component": 0.2}
+        
+        # 使用自定义权重
+        if custom_weights:
+            weights.update(custom_weights)
+        
+        return weights
+    
     async def _extract_matching_features(self, source_vector: np.ndarray, 
                                        target_vector: np.ndarray,
                                        similarity_metrics: Dict[str, Any]) -> Dict[str, Any]:
@@ -514,12 +539,7 @@ class AIIdentitySimilarity:
         try:
             cache_key = f"{result.source_profile_id}_{result.target_profile_id}_{result.similarity_type.value}"
             
-            cache_data = {
-                "result": self._serialize_similarity_result(result),
-                "timestamp": time.time()
-            }
-            
-            self._similarity_cache[cache_key] = cache_data
+            await self._similarity_cache.set(cache_key, self._serialize_similarity_result(result))
             
         except Exception as e:
             logger.error("缓存相似度结果失败", error=str(e))
@@ -537,6 +557,7 @@ class AIIdentitySimilarity:
                 "manhattan_distance": result.manhattan_distance,
                 "pearson_correlation": result.pearson_correlation,
                 "overall_similarity_score": result.overall_similarity_score,
+                "similarity_rank": result.similarity_rank,
                 "similarity_components": result.similarity_components,
                 "matching_features": result.matching_features,
                 "similarity_explanation": result.similarity_explanation,
@@ -562,6 +583,199 @@ class AIIdentitySimilarity:
             logger.error("反序列化相似度结果失败", error=str(e))
             raise
     
+    def _compute_similarity_matrix(self, source_vector: np.ndarray,
+                                   target_matrix: np.ndarray) -> Dict[str, np.ndarray]:
+        """一对多计算全部相似度指标，返回每个指标长度为N的数组"""
+        source = np.ascontiguousarray(source_vector, dtype=np.float32).ravel()
+        targets = np.ascontiguousarray(target_matrix, dtype=np.float32)
+        dimension = source.shape[0]
+        
+        # 标准化向量
+        if self.config.normalize_vectors:
+            source_norm = np.linalg.norm(source)
+            if source_norm > 0:
+                source = source / source_norm
+            row_norms = np.linalg.norm(targets, axis=1, keepdims=True)
+            targets = targets / np.where(row_norms == 0, 1.0, row_norms)
+        
+        # 一次矩阵向量乘得到全部点积
+        dots = targets @ source
+        source_sq = float(source @ source)
+        target_sq = np.einsum("ij,ij->i", targets, targets)
+        source_len = np.sqrt(source_sq)
+        target_len = np.sqrt(target_sq)
+        
+        # 余弦相似度
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cosine = np.where(target_len * source_len > 0, dots / (target_len * source_len), 0.0)
+        
+        # 欧几里得距离: |t|^2 + |s|^2 - 2 t·s
+        euclidean = np.sqrt(np.maximum(target_sq + source_sq - 2.0 * dots, 0.0))
+        
+        # 曼哈顿距离，分块计算以限制临时内存
+        manhattan = np.empty(len(targets), dtype=np.float32)
+        chunk = max(1, self.config.matrix_chunk_size)
+        for i in range(0, len(targets), chunk):
+            manhattan[i:i + chunk] = np.abs(targets[i:i + chunk] - source).sum(axis=1)
+        
+        # 皮尔逊相关系数: 中心化后的点积，Σ(s_c)=0 故 t_c·s_c = t·s_c
+        source_centered = source - source.mean()
+        source_centered_len = float(np.linalg.norm(source_centered))
+        target_means = targets.mean(axis=1)
+        target_centered_len = np.sqrt(np.maximum(target_sq - dimension * target_means ** 2, 0.0))
+        centered_dots = targets @ source_centered
+        denominator = target_centered_len * source_centered_len
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pearson = np.where(denominator > 0, centered_dots / denominator, np.nan)
+        if dimension <= 1:
+            pearson[:] = np.nan
+        
+        return {
+            "cosine_similarity": cosine.astype(np.float32),
+            "euclidean_distance": euclidean.astype(np.float32),
+            "manhattan_distance": manhattan,
+            "pearson_correlation": pearson.astype(np.float32)
+        }
+    
+    async def calculate_similarity_matrix(self, source_vector: np.ndarray,
+                                          target_vectors: np.ndarray,
+                                          source_profile_id: str,
+                                          target_profile_ids: List[str],
+                                          similarity_type: SimilarityType = SimilarityType.COMPREHENSIVE,
+                                          top_k: Optional[int] = 10,
+                                          custom_weights: Optional[Dict[str, float]] = None) -> List[SimilarityResult]:
+        """一对多相似度计算
+        
+        target_vectors为(N×d)矩阵，全部指标通过少量矩阵运算完成，仅为综合评分前top_k的目标构建完整结果
+        """
+        try:
+            start_time = time.time()
+            
+            target_matrix = np.asarray(target_vectors, dtype=np.float32)
+            if target_matrix.ndim != 2 or target_matrix.shape[0] != len(target_profile_ids):
+                raise ValueError("target_vectors必须是与target_profile_ids等长的(N×d)矩阵")
+            if len(target_profile_ids) == 0:
+                return []
+            
+            logger.info("开始矩阵相似度计算", 
+                       source_profile_id=source_profile_id,
+                       target_count=len(target_profile_ids),
+                       similarity_type=similarity_type.value)
+            
+            # 在线程池中完成矩阵运算
+            loop = asyncio.get_event_loop()
+            metrics = await loop.run_in_executor(
+                self.executor, self._compute_similarity_matrix, source_vector, target_matrix
+            )
+            
+            # 向量化计算综合评分，与_calculate_overall_similarity保持一致
+            pearson = metrics["pearson_correlation"]
+            components = {
+                "cosine_component": metrics["cosine_similarity"],
+                "euclidean_component": 1.0 / (1.0 + metrics["euclidean_distance"]),
+                "manhattan_component": 1.0 / (1.0 + metrics["manhattan_distance"]),
+                "pearson_component": np.nan_to_num(np.abs(pearson), nan=0.0)
+            }
+            weights = self._get_component_weights(similarity_type, custom_weights)
+            weighted_sum = np.zeros(len(target_profile_ids), dtype=np.float32)
+            total_weight = 0.0
+            for component, weight in weights.items():
+                if component in components:
+                    weighted_sum += components[component] * weight
+                    total_weight += weight
+            weighted_sum += components["pearson_component"] * 0.1
+            total_weight += 0.1
+            overall_scores = np.clip(weighted_sum / total_weight, 0.0, 1.0)
+            
+            # 选取top_k
+            count = len(overall_scores)
+            k = count if not top_k else min(top_k, count)
+            if k < count:
+                candidate_indices = np.argpartition(-overall_scores, k - 1)[:k]
+            else:
+                candidate_indices = np.arange(count)
+            top_indices = candidate_indices[np.argsort(-overall_scores[candidate_indices], kind="stable")]
+            
+            matrix_time_ms = int((time.time() - start_time) * 1000)
+            
+            # 仅为top_k构建完整结果
+            source = np.asarray(source_vector, dtype=np.float32).ravel()
+            if self.config.normalize_vectors:
+                source = self._normalize_vector(source)
+            
+            results = []
+            for rank, idx in enumerate(top_indices, start=1):
+                target_vector = target_matrix[idx]
+                if self.config.normalize_vectors:
+                    target_vector = self._normalize_vector(target_vector)
+                
+                pearson_value = float(pearson[idx])
+                similarity_metrics = {
+                    "cosine_similarity": float(metrics["cosine_similarity"][idx]),
+                    "euclidean_distance": float(metrics["euclidean_distance"][idx]),
+                    "manhattan_distance": float(metrics["manhattan_distance"][idx]),
+                    "pearson_correlation": None if np.isnan(pearson_value) else pearson_value,
+                    "components": {name: float(values[idx]) for name, values in components.items()}
+                }
+                overall_score = float(overall_scores[idx])
+                target_profile_id = target_profile_ids[idx]
+                
+                result = SimilarityResult(
+                    similarity_id=f"sim_{source_profile_id}_{target_profile_id}_{similarity_type.value}_{int(datetime.now().timestamp())}",
+                    source_profile_id=source_profile_id,
+                    target_profile_id=target_profile_id,
+                    similarity_type=similarity_type,
+                    cosine_similarity=similarity_metrics["cosine_similarity"],
+                    euclidean_distance=similarity_metrics["euclidean_distance"],
+                    manhattan_distance=similarity_metrics["manhattan_distance"],
+                    pearson_correlation=similarity_metrics["pearson_correlation"],
+                    overall_similarity_score=overall_score,
+                    similarity_rank=rank,
+                    similarity_components=similarity_metrics["components"],
+                    matching_features=await self._extract_matching_features(
+                        source, target_vector, similarity_metrics
+                    ),
+                    similarity_explanation=await self._generate_similarity_explanation(
+                        similarity_metrics, overall_score, similarity_type
+                    ),
+                    calculation_algorithm=self.config.primary_algorithm.value,
+                    calculation_parameters=asdict(self.config),
+                    calculation_time_ms=matrix_time_ms,
+                    confidence_score=await self._calculate_confidence_score(
+                        similarity_metrics, overall_score
+                    ),
+                    metadata={
+                        "vector_dimensions": {
+                            "source": len(source),
+                            "target": len(target_vector)
+                        },
+                        "normalized": self.config.normalize_vectors,
+                        "weights": custom_weights or {},
+                        "matrix_mode": True,
+                        "candidate_count": count
+                    },
+                    created_at=datetime.now()
+                )
+                results.append(result)
+            
+            self._performance_stats["matrix_calculations"] += 1
+            self._performance_stats["matrix_targets_scored"] += count
+            self._update_performance_stats(int((time.time() - start_time) * 1000))
+            
+            logger.info("矩阵相似度计算完成", 
+                       source_profile_id=source_profile_id,
+                       target_count=count,
+                       top_k=len(results),
+                       matrix_time_ms=matrix_time_ms)
+            
+            return results
+            
+        except Exception as e:
+            logger.error("矩阵相似度计算失败", 
+                        source_profile_id=source_profile_id,
+                        error=str(e))
+            raise
+    
     async def batch_calculate_similarity(self, vector_pairs: List[Tuple[np.ndarray, np.ndarray, str, str]], 
                                        similarity_type: SimilarityType = SimilarityType.COMPREHENSIVE) -> List[SimilarityResult]:
         """批量计算相似度"""
@@ -632,7 +846,9 @@ class AIIdentitySimilarity:
                 max(self._performance_stats["cache_hits"] + self._performance_stats["cache_misses"], 1)
             ),
             "cache_size": len(self._similarity_cache),
-            "vector_cache_size": len(self._vector_cache)
+            "vector_cache_size": len(self._vector_cache),
+            "similarity_cache": self._similarity_cache.get_stats(),
+            "vector_cache": self._vector_cache.get_stats()
         }
     
     async def cleanup(self):
@@ -644,6 +860,7 @@ class AIIdentitySimilarity:
             # 清理缓存
             self._similarity_cache.clear()
             self._vector_cache.clear()
+            await self._similarity_cache.close()
             
             logger.info("AI身份相似度计算引擎清理完成")
             
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+AI身份向量索引管理器
+基于FAISS IndexIDMap2实现按档案ID寻址的持久化向量索引
+支持upsert/delete、磁盘快照(可mmap加载)、启动增量恢复，以及按规模自动切换IVF/HNSW索引
+
+写操作只做增量修改；升级、压缩与快照等耗时维护由run_maintenance()在工作线程中执行，
+新索引在锁外构建完成后再替换，期间的写操作记录下来并在替换前重放
+"""
+
+import hashlib
+import json
+import os
+import structlog
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    import faiss
+    HAS_FAISS = True
+except ImportError:
+    HAS_FAISS = False
+
+logger = structlog.get_logger()
+
+# 索引种类
+INDEX_KIND_FLAT = "flat"
+INDEX_KIND_IVF = "ivf"
+INDEX_KIND_HNSW = "hnsw"
+
+
+def text_fingerprint(text: str) -> str:
+    """计算文本指纹，用于判断档案内容是否变化"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class FaissIndexManager:
+    """单个向量集合的FAISS索引管理器
+
+    向量通过IndexIDMap2以int64标签存储，档案ID与标签的映射及内容指纹
+    随索引一起快照到磁盘，重启时直接加载而无需重新向量化全部档案。
+    upsert/delete不会触发重建或写盘，调用方在maintenance_due()为真时
+    于事件循环之外调用run_maintenance()。
+    """
+
+    def __init__(self, name: str, dimension: int,
+                 storage_path: Optional[str] = None,
+                 upgrade_threshold: int = 100000,
+                 upgrade_kind: str = INDEX_KIND_HNSW,
+                 ivf_nlist: int = 1024,
+                 ivf_nprobe: int = 16,
+                 hnsw_m: int = 32,
+                 hnsw_ef_search: int = 64,
+                 snapshot_interval: int = 1000,
+                 mmap_readonly: bool = False):
+        if not HAS_FAISS:
+            raise ImportError("FAISS未安装，请安装: pip install faiss-cpu")
+
+        self.name = name
+        self.dimension = dimension
+        self.storage_path = storage_path
+        self.upgrade_threshold = upgrade_threshold
+        self.upgrade_kind = upgrade_kind
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_search = hnsw_ef_search
+        self.snapshot_interval = snapshot_interval
+        self.mmap_readonly = mmap_readonly
+
+        self._lock = threading.RLock()
+        self._index = None
+        self._kind = INDEX_KIND_FLAT
+        # profile_id -> (label, fingerprint)
+        self._entries: Dict[str, Tuple[int, str]] = {}
+        self._label_to_profile: Dict[int, str] = {}
+        self._next_label = 1
+        # 不支持remove_ids的索引(HNSW)中已失效但仍占位的向量数量
+        self._tombstones = 0
+        self._dirty_ops = 0
+        # 重建期间的写操作日志，替换索引前重放到新索引
+        self._journal: Optional[List[Tuple[str, np.ndarray, Optional[np.ndarray]]]] = None
+        # 同一时间只允许一个维护任务(重建/快照写盘)
+        self._maintenance_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 索引构建
+    # ------------------------------------------------------------------
+
+    def _new_flat_index(self):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+
+    def _new_ann_index(self, vectors: np.ndarray):
+        """根据配置创建IVF或HNSW索引"""
+        if self.upgrade_kind == INDEX_KIND_IVF:
+            nlist = max(1, min(self.ivf_nlist, int(np.sqrt(len(vectors))) * 4))
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            inner = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            inner.train(vectors)
+            inner.nprobe = self.ivf_nprobe
+            # 哈希直接映射，支持按ID删除与重建
+            inner.set_direct_map_type(faiss.DirectMap.Hashtable)
+            return faiss.IndexIDMap2(inner), INDEX_KIND_IVF
+
+        inner = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        inner.hnsw.efSearch = self.hnsw_ef_search
+        return faiss.IndexIDMap2(inner), INDEX_KIND_HNSW
+
+    def _paths(self) -> Tuple[str, str]:
+        base = os.path.join(self.storage_path, self.name)
+        return f"{base}.faiss", f"{base}.meta.json"
+
+    def load_or_create(self) -> bool:
+        """加载磁盘快照，不存在时创建空索引；返回是否从快照恢复"""
+        with self._lock:
+            if self.storage_path:
+                index_path, meta_path = self._paths()
+                if os.path.exists(index_path) and os.path.exists(meta_path):
+                    try:
+                        self._load_snapshot(index_path, meta_path)
+                        logger.info("FAISS索引快照加载完成",
+                                    name=self.name,
+                                    kind=self._kind,
+                                    size=len(self._entries))
+                        return True
+                    except Exception as e:
+                        logger.error("FAISS索引快照加载失败，重建空索引", name=self.name, error=str(e))
+
+            self._index = self._new_flat_index()
+            self._kind = INDEX_KIND_FLAT
+            self._entries.clear()
+            self._label_to_profile.clear()
+            self._next_label = 1
+            self._tombstones = 0
+            return False
+
+    def _load_snapshot(self, index_path: str, meta_path: str):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if meta.get("dimension") != self.dimension:
+            raise ValueError(f"快照维度不匹配: {meta.get('dimension')} != {self.dimension}")
+
+        index = None
+        if self.mmap_readonly:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except Exception as e:
+                logger.warning("FAISS索引mmap加载失败，改为常规加载", name=self.name, error=str(e))
+        if index is None:
+            index = faiss.read_index(index_path)
+
+        self._index = index
+        self._kind = meta.get("kind", INDEX_KIND_FLAT)
+        self._next_label = int(meta.get("next_label", 1))
+        self._tombstones = int(meta.get("tombstones", 0))
+        self._entries = {
+            profile_id: (int(label), fingerprint)
+            for profile_id, (label, fingerprint) in meta.get("entries", {}).items()
+        }
+        self._label_to_profile = {label: profile_id for profile_id, (label, _) in self._entries.items()}
+        self._apply_search_params()
+
+    def _apply_search_params(self):
+        inner = faiss.downcast_index(self._index.index)
+        if self._kind == INDEX_KIND_IVF:
+            inner.nprobe = self.ivf_nprobe
+        elif self._kind == INDEX_KIND_HNSW:
+            inner.hnsw.efSearch = self.hnsw_ef_search
+
+    # ------------------------------------------------------------------
+    # 写操作
+    # ------------------------------------------------------------------
+
+    def _remove_label(self, label: int):
+        if self._journal is not None:
+            self._journal.append(("remove", np.array([label], dtype=np.int64), None))
+        try:
+            self._index.remove_ids(np.array([label], dtype=np.int64))
+        except RuntimeError:
+            # HNSW不支持删除，保留占位并在搜索时过滤
+            self._tombstones += 1
+
+    def upsert(self, profile_id: str, vector: np.ndarray, fingerprint: str = ""):
+        """插入或更新档案向量"""
+        self.upsert_many([profile_id], vector.reshape(1, -1), [fingerprint])
+
+    def upsert_many(self, profile_ids: List[str], vectors: np.ndarray,
+                    fingerprints: Optional[List[str]] = None):
+        """批量插入或更新档案向量"""
+        if self.mmap_readonly:
+            raise RuntimeError(f"索引以只读mmap模式加载: {self.name}")
+        if not profile_ids:
+            return
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(profile_ids), self.dimension)
+        fingerprints = fingerprints or [""] * len(profile_ids)
+
+        # 同一批次内重复的档案ID只保留最后一条，否则先写入的向量会成为无人引用的孤立向量
+        last_row = {profile_id: row for row, profile_id in enumerate(profile_ids)}
+        if len(last_row) < len(profile_ids):
+            rows = sorted(last_row.values())
+            profile_ids = [profile_ids[row] for row in rows]
+            fingerprints = [fingerprints[row] for row in rows]
+            vectors = np.ascontiguousarray(vectors[rows])
+
+        with self._lock:
+            labels = np.empty(len(profile_ids), dtype=np.int64)
+            for i, (profile_id, fingerprint) in enumerate(zip(profile_ids, fingerprints)):
+                existing = self._entries.get(profile_id)
+                if existing is not None:
+                    self._remove_label(existing[0])
+                    self._label_to_profile.pop(existing[0], None)
+
+                label = self._next_label
+                self._next_label += 1
+                labels[i] = label
+                self._entries[profile_id] = (label, fingerprint)
+                self._label_to_profile[label] = profile_id
+
+            self._index.add_with_ids(vectors, labels)
+            if self._journal is not None:
+                self._journal.append(("add", labels, vectors.copy()))
+            self._dirty_ops += len(profile_ids)
+
+    def delete(self, profile_id: str) -> bool:
+        """删除档案向量"""
+        with self._lock:
+            existing = self._entries.pop(profile_id, None)
+            if existing is None:
+                return False
+            self._remove_label(existing[0])
+            self._label_to_profile.pop(existing[0], None)
+            self._dirty_ops += 1
+        return True
+
+    def _extract_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """导出当前有效的(标签, 向量)，需持有锁"""
+        ntotal = self._index.ntotal
+        if ntotal == 0 or not self._label_to_profile:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dimension), dtype=np.float32)
+        try:
+            # Flat/HNSW的底层存储可整体导出，避免逐条reconstruct
+            labels = faiss.vector_to_array(self._index.id_map).astype(np.int64)
+            vectors = faiss.downcast_index(self._index.index).reconstruct_n(0, ntotal)
+            live = np.fromiter((int(label) in self._label_to_profile for label in labels),
+                               dtype=bool, count=len(labels))
+            return labels[live], np.ascontiguousarray(vectors[live], dtype=np.float32)
+        except RuntimeError:
+            labels = np.array(sorted(self._label_to_profile.keys()), dtype=np.int64)
+            vectors = np.vstack([self._index.reconstruct(int(label)) for label in labels]).astype(np.float32)
+            return labels, vectors
+
+    def _rebuild(self, kind: str):
+        """在锁外构建新索引，期间的写操作记入日志，替换前重放"""
+        with self._lock:
+            labels, vectors = self._extract_vectors()
+            self._journal = []
+
+        try:
+            if kind == INDEX_KIND_FLAT or len(labels) == 0:
+                index, kind = self._new_flat_index(), INDEX_KIND_FLAT
+            else:
+                index, kind = self._new_ann_index(vectors)
+            if len(labels):
+                index.add_with_ids(vectors, labels)
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+
+        with self._lock:
+            tombstones = 0
+            for op, op_labels, op_vectors in self._journal:
+                if op == "add":
+                    index.add_with_ids(op_vectors, op_labels)
+                else:
+                    try:
+                        index.remove_ids(op_labels)
+                    except RuntimeError:
+                        tombstones += 1
+            self._journal = None
+            self._index = index
+            self._kind = kind
+            self._tombstones = tombstones
+            self._apply_search_params()
+
+    def _upgrade_due(self) -> bool:
+        return self._kind == INDEX_KIND_FLAT and len(self._entries) >= self.upgrade_threshold
+
+    def _compact_due(self) -> bool:
+        return bool(self._tombstones) and self._tombstones > max(1000, len(self._entries) // 4)
+
+    def _snapshot_due(self) -> bool:
+        return bool(self.storage_path and self.snapshot_interval and not self.mmap_readonly
+                    and self._dirty_ops >= self.snapshot_interval)
+
+    def maintenance_due(self) -> bool:
+        """是否需要升级、压缩或快照"""
+        if self.mmap_readonly:
+            return False
+        return self._upgrade_due() or self._compact_due() or self._snapshot_due()
+
+    def run_maintenance(self) -> bool:
+        """执行到期的升级/压缩与快照；阻塞调用，应在工作线程中运行。已有维护在进行时直接返回False"""
+        if not self._maintenance_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._upgrade_due():
+                start_time = time.time()
+                self._rebuild(self.upgrade_kind)
+                logger.info("FAISS索引已升级",
+                            name=self.name,
+                            kind=self._kind,
+                            size=len(self._entries),
+                            rebuild_time_ms=int((time.time() - start_time) * 1000))
+            elif self._compact_due():
+                self._rebuild(self._kind)
+                logger.info("FAISS索引压缩完成", name=self.name, size=len(self._entries))
+
+            if self._snapshot_due():
+                self._write_snapshot()
+            return True
+        except Exception as e:
+            logger.error("FAISS索引维护失败", name=self.name, error=str(e))
+            return False
+        finally:
+            self._maintenance_lock.release()
+
+    def snapshot(self) -> bool:
+        """将索引与ID映射原子写入磁盘；阻塞调用，应在工作线程中运行"""
+        if not self.storage_path or self.mmap_readonly:
+            return False
+        with self._maintenance_lock:
+            return self._write_snapshot()
+
+    def _write_snapshot(self) -> bool:
+        try:
+            # 锁内只做内存序列化，写盘在锁外进行，不阻塞并发的读写
+            with self._lock:
+                data = faiss.serialize_index(self._index)
+                meta = {
+                    "name": self.name,
+                    "dimension": self.dimension,
+                    "kind": self._kind,
+                    "next_label": self._next_label,
+                    "tombstones": self._tombstones,
+                    "entries": {pid: [label, fp] for pid, (label, fp) in self._entries.items()},
+                    "saved_at": time.time()
+                }
+                dirty_ops = self._dirty_ops
+
+            os.makedirs(self.storage_path, exist_ok=True)
+            index_path, meta_path = self._paths()
+            data.tofile(index_path + ".tmp")
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(index_path + ".tmp", index_path)
+            os.replace(meta_path + ".tmp", meta_path)
+
+            with self._lock:
+                self._dirty_ops = max(0, self._dirty_ops - dirty_ops)
+
+            logger.debug("FAISS索引快照完成", name=self.name, size=len(meta["entries"]))
+            return True
+        except Exception as e:
+            logger.error("FAISS索引快照失败", name=self.name, error=str(e))
+            return False
+
+    # ------------------------------------------------------------------
+    # 读操作
+    # ------------------------------------------------------------------
+
+    def contains(self, profile_id: str, fingerprint: Optional[str] = None) -> bool:
+        """判断档案是否已索引(可选校验内容指纹)"""
+        entry = self._entries.get(profile_id)
+        if entry is None:
+            return False
+        return fingerprint is None or entry[1] == fingerprint
+
+    def get_vector(self, profile_id: str) -> Optional[np.ndarray]:
+        """按档案ID取回已索引的向量"""
+        entry = self._entries.get(profile_id)
+        if entry is None:
+            return None
+        with self._lock:
+            try:
+                return self._index.reconstruct(entry[0]).astype(np.float32)
+            except RuntimeError:
+                return None
+
+    def profile_ids(self) -> List[str]:
+        return list(self._entries.keys())
+
+    def search(self, query_vector: np.ndarray, top_k: int = 10) -> List[Tuple[str, float]]:
+        """检索最相似的档案，返回(profile_id, score)"""
+        with self._lock:
+            if self._index is None or not self._entries:
+                return []
+            query = np.ascontiguousarray(query_vector, dtype=np.float32).reshape(1, -1)
+            # 为失效占位多取一些候选
+            k = min(top_k + self._tombstones, self._index.ntotal)
+            scores, labels = self._index.search(query, k)
+
+        results = []
+        for label, score in zip(labels[0], scores[0]):
+            profile_id = self._label_to_profile.get(int(label))
+            if label < 0 or profile_id is None:
+                continue
+            results.append((profile_id, float(score)))
+            if len(results) >= top_k:
+                break
+        return results
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self._kind,
+            "size": len(self._entries),
+            "ntotal": self._index.ntotal if self._index is not None else 0,
+            "tombstones": self._tombstones,
+            "pending_ops": self._dirty_ops
+        }
@@ -16,6 +16,7 @@ from typing import Dict, List, Any, Optional, Tuple, Union
 from dataclasses import dataclass, asdict
 from enum import Enum
 from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import aiofiles
 
 # 向量化相关依赖
@@ -30,6 +31,9 @@ except ImportError:
     logger = structlog.get_logger()
     logger.warning("向量化依赖包未安装，请安装: pip install sentence-transformers faiss-cpu scikit-learn")
 
+from ai_identity_vector_index import FaissIndexManager, text_fingerprint
+from ai_identity_cache import BoundedTTLCache
+
 logger = structlog.get_logger()
 
 class VectorType(Enum):
@@ -53,11 +57,20 @@ class VectorizationConfig:
     vector_dimension: int = 384  # 向量维度
     max_sequence_length: int = 512  # 最大序列长度
     batch_size: int = 32  # 批处理大小
+    encode_batch_size: int = 64  # 单次model.encode的文本数量
     normalize_vectors: bool = True  # 是否标准化向量
     use_faiss_index: bool = True  # 是否使用FAISS索引
     faiss_index_type: str = "IndexFlatIP"  # FAISS索引类型
+    index_storage_path: Optional[str] = None  # FAISS索引快照目录，为空则仅驻留内存
+    index_upgrade_threshold: int = 100000  # 超过该规模时切换到ANN索引
+    index_upgrade_type: str = "hnsw"  # ANN索引类型: hnsw / ivf
+    index_snapshot_interval: int = 1000  # 每累计多少次写操作自动快照
+    index_mmap_readonly: bool = False  # 以只读mmap方式加载快照(只读副本使用)
     cache_embeddings: bool = True  # 是否缓存嵌入
     cache_ttl: int = 3600  # 缓存TTL(秒)
+    cache_max_entries: int = 20000  # 向量缓存最大条目数
+    cache_max_bytes: int = 256 * 1024 * 1024  # 向量缓存最大字节数
+    cache_redis_url: Optional[str] = None  # 缓存溢出Redis地址，为空则仅使用内存
 
 @dataclass
 class VectorizationResult:
@@ -65,7 +78,7 @@ class VectorizationResult:
     vector_id: str
     profile_id: str
     vector_type: VectorType
-    vector_embedding: np.ndarray
+    vector_embedding: Optional[np.ndarray]  # 档案没有可向量化的文本时为None
     vector_dimension: int
     vector_model: str
     embedding_source: str
@@ -87,8 +100,16 @@ class AIIdentityVectorization:
         
         # 模型缓存
         self._model_cache = {}
-        self._vector_cache = {}
+        self._vector_cache = BoundedTTLCache.with_redis_url(
+            self.config.cache_redis_url,
+            max_entries=self.config.cache_max_entries,
+            max_bytes=self.config.cache_max_bytes,
+            ttl=self.config.cache_ttl,
+            namespace="ai_identity:vectors"
+        )
         self._faiss_indexes = {}
+        # 向量类型 -> 进行中的索引维护任务(升级/压缩/快照在线程池中执行)
+        self._index_maintenance: Dict[str, asyncio.Future] = {}
         
         # 性能统计
         self._performance_stats = {
@@ -99,6 +120,17 @@ class AIIdentityVectorization:
             "cache_misses": 0
         }
         
+        # 批量嵌入统计
+        self._embedding_stats = {
+            "encode_batches": 0,
+            "encoded_texts": 0,
+            "deduplicated_texts": 0,
+            "encode_time_ms": 0,
+            "failed_batches": 0,
+            "failed_texts": 0,
+            "last_batch_throughput": 0.0
+        }
+        
         logger.info("AI身份向量化处理器初始化完成", config=asdict(self.config))
     
     async def initialize(self):
@@ -171,16 +203,27 @@ class AIIdentityVectorization:
             
             logger.info("初始化FAISS索引...")
             
-            # 为每种向量类型创建索引
+            # 为每种向量类型创建索引，存在快照时直接恢复
             for vector_type in VectorType:
                 if vector_type == VectorType.CUSTOM:
                     continue
                 
-                # 创建FAISS索引
-                index = faiss.IndexFlatIP(self.config.vector_dimension)
+                index = FaissIndexManager(
+                    name=f"ai_identity_{vector_type.value}",
+                    dimension=self.config.vector_dimension,
+                    storage_path=self.config.index_storage_path,
+                    upgrade_threshold=self.config.index_upgrade_threshold,
+                    upgrade_kind=self.config.index_upgrade_type,
+                    snapshot_interval=self.config.index_snapshot_interval,
+                    mmap_readonly=self.config.index_mmap_readonly
+                )
+                restored = index.load_or_create()
                 self._faiss_indexes[vector_type.value] = index
                 
-                logger.info("FAISS索引创建完成", vector_type=vector_type.value)
+                logger.info("FAISS索引就绪", 
+                           vector_type=vector_type.value,
+                           restored=restored,
+                           size=index.size)
             
             logger.info("所有FAISS索引初始化完成")
             
@@ -198,51 +241,26 @@ class AIIdentityVectorization:
                        profile_id=profile_data.get("profile_id"),
                        vector_type=vector_type.value)
             
-            # 生成向量ID
-            vector_id = f"vector_{profile_data.get('profile_id', 'unknown')}_{vector_type.value}_{int(datetime.now().timestamp())}"
-            
             # 提取文本数据
             text_data = await self._extract_text_data(profile_data, vector_type)
             
-            # 生成向量嵌入
-            vector_embedding = await self._generate_embedding(text_data, vector_type)
-            
-            # 计算向量属性
-            vector_norm = float(np.linalg.norm(vector_embedding))
-            vector_magnitude = float(np.sqrt(np.sum(vector_embedding ** 2)))
-            
-            # 计算置信度
-            confidence_score = await self._calculate_confidence_score(profile_data, vector_type, vector_embedding)
-            
-            # 标准化向量
-            if self.config.normalize_vectors:
-                vector_embedding = normalize(vector_embedding.reshape(1, -1)).flatten()
-            
-            # 创建向量化结果
-            result = VectorizationResult(
-                vector_id=vector_id,
-                profile_id=profile_data.get("profile_id", ""),
-                vector_type=vector_type,
-                vector_embedding=vector_embedding,
-                vector_dimension=len(vector_embedding),
-                vector_model=self.config.model_name,
-                embedding_source=text_data,
-                embedding_algorithm="sentence-transformers",
-                embedding_parameters={
-                    "model_name": self.config.model_name,
-                    "max_sequence_length": self.config.max_sequence_length,
-                    "normalize": self.config.normalize_vectors
-                },
-                embedding_time_ms=int((time.time() - start_time) * 1000),
-                vector_norm=vector_norm,
-                vector_magnitude=vector_magnitude,
-                confidence_score=confidence_score,
-                metadata={
-                    "text_length": len(text_data),
-                    "vector_type": vector_type.value,
-                    "model_config": asdict(self.config)
-                },
-                created_at=datetime.now()
+            # 空文本不编码：零向量与任何档案的相似度都无意义
+            if not text_data.strip():
+                logger.info("档案没有可向量化的文本，跳过",
+                           profile_id=profile_data.get("profile_id"),
+                           vector_type=vector_type.value)
+                return self._build_empty_result(profile_data, vector_type, text_data)
+            
+            # 内容未变化时直接复用索引中的向量
+            vector_embedding = self._get_indexed_embedding(profile_data.get("profile_id"), text_data, vector_type)
+            reused = vector_embedding is not None
+            if not reused:
+                # 生成向量嵌入
+                vector_embedding = await self._generate_embedding(text_data, vector_type)
+            
+            result = await self._build_vectorization_result(
+                profile_data, vector_type, text_data, vector_embedding, reused,
+                int((time.time() - start_time) * 1000)
             )
             
             # 更新性能统计
@@ -253,13 +271,13 @@ class AIIdentityVectorization:
                 await self._cache_vector_result(result)
             
             # 添加到FAISS索引
-            if self.config.use_faiss_index:
+            if self.config.use_faiss_index and not reused:
                 await self._add_to_faiss_index(result)
             
             logger.info("AI身份档案向量化完成", 
-                       vector_id=vector_id,
+                       vector_id=result.vector_id,
                        embedding_time_ms=result.embedding_time_ms,
-                       confidence_score=confidence_score)
+                       confidence_score=result.confidence_score)
             
             return result
             
@@ -270,6 +288,77 @@ class AIIdentityVectorization:
                         error=str(e))
             raise
     
+    async def _build_vectorization_result(self, profile_data: Dict[str, Any], vector_type: VectorType,
+                                          text_data: str, vector_embedding: np.ndarray,
+                                          reused: bool, embedding_time_ms: int) -> VectorizationResult:
+        """根据已生成的嵌入构建向量化结果"""
+        # 生成向量ID
+        vector_id = f"vector_{profile_data.get('profile_id', 'unknown')}_{vector_type.value}_{int(datetime.now().timestamp())}"
+        
+        # 计算向量属性
+        vector_norm = float(np.linalg.norm(vector_embedding))
+        vector_magnitude = float(np.sqrt(np.sum(vector_embedding ** 2)))
+        
+        # 计算置信度
+        confidence_score = await self._calculate_confidence_score(profile_data, vector_type, vector_embedding)
+        
+        # 标准化向量
+        if self.config.normalize_vectors:
+            vector_embedding = normalize(vector_embedding.reshape(1, -1)).flatten()
+        
+        # 创建向量化结果
+        return VectorizationResult(
+            vector_id=vector_id,
+            profile_id=profile_data.get("profile_id", ""),
+            vector_type=vector_type,
+            vector_embedding=vector_embedding,
+            vector_dimension=len(vector_embedding),
+            vector_model=self.config.model_name,
+            embedding_source=text_data,
+            embedding_algorithm="sentence-transformers",
+            embedding_parameters={
+                "model_name": self.config.model_name,
+                "max_sequence_length": self.config.max_sequence_length,
+                "normalize": self.config.normalize_vectors
+            },
+            embedding_time_ms=embedding_time_ms,
+            vector_norm=vector_norm,
+            vector_magnitude=vector_magnitude,
+            confidence_score=confidence_score,
+            metadata={
+                "text_length": len(text_data),
+                "vector_type": vector_type.value,
+                "model_config": asdict(self.config),
+                "reused_from_index": reused
+            },
+            created_at=datetime.now()
+        )
+    
+    def _build_empty_result(self, profile_data: Dict[str, Any], vector_type: VectorType,
+                            text_data: str) -> VectorizationResult:
+        """档案没有可向量化文本时的结果：不含向量，metadata.empty_text标记为True，不缓存也不写入索引"""
+        return VectorizationResult(
+            vector_id="",
+            profile_id=profile_data.get("profile_id", ""),
+            vector_type=vector_type,
+            vector_embedding=None,
+            vector_dimension=0,
+            vector_model=self.config.model_name,
+            embedding_source=text_data,
+            embedding_algorithm="sentence-transformers",
+            embedding_parameters={},
+            embedding_time_ms=0,
+            vector_norm=0.0,
+            vector_magnitude=0.0,
+            confidence_score=0.0,
+            metadata={
+                "text_length": len(text_data),
+                "vector_type": vector_type.value,
+                "empty_text": True
+            },
+            created_at=datetime.now()
+        )
+    
     async def _extract_text_data(self, profile_data: Dict[str, Any], vector_type: VectorType) -> str:
         """提取文本数据"""
         try:
@@ -409,13 +498,13 @@ class AIIdentityVectorization:
             loop = asyncio.get_event_loop()
             embedding = await loop.run_in_executor(
                 self.executor,
-                model.encode,
-                text_data,
-                {
-                    "batch_size": self.config.batch_size,
-                    "show_progress_bar": False,
-                    "convert_to_numpy": True
-                }
+                partial(
+                    model.encode,
+                    text_data,
+                    batch_size=self.config.batch_size,
+                    show_progress_bar=False,
+                    convert_to_numpy=True
+                )
             )
             
             # 确保是numpy数组
@@ -433,6 +522,82 @@ class AIIdentityVectorization:
             # 返回随机向量作为fallback
             return np.random.randn(self.config.vector_dimension).astype(np.float32)
     
+    async def _encode_texts(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """微批量生成嵌入：去重后按encode_batch_size分块调用model.encode，返回文本到嵌入的映射，编码失败的文本映射为None"""
+        embeddings: Dict[str, np.ndarray] = {}
+        
+        # 去重并保持顺序，空文本不编码(调用方应事先过滤)
+        unique_texts = []
+        for text in texts:
+            if text in embeddings or not text.strip():
+                continue
+            embeddings[text] = None
+            unique_texts.append(text)
+        
+        self._embedding_stats["deduplicated_texts"] += len(texts) - len(unique_texts)
+        
+        if not unique_texts:
+            return embeddings
+        
+        model = self._model_cache.get(self.config.model_name)
+        if not model:
+            raise ValueError(f"模型未加载: {self.config.model_name}")
+        
+        chunk_size = max(1, self.config.encode_batch_size)
+        
+        for i in range(0, len(unique_texts), chunk_size):
+            chunk = unique_texts[i:i + chunk_size]
+            batch_start = time.time()
+            
+            try:
+                chunk_embeddings = await self._encode_chunk(model, chunk)
+            except Exception as e:
+                # 整批失败时逐条重试，单条异常文本只影响自身所属的档案
+                logger.warning("嵌入批次失败，逐条重试", batch_size=len(chunk), error=str(e))
+                self._embedding_stats["failed_batches"] += 1
+                chunk_embeddings = []
+                for text in chunk:
+                    try:
+                        chunk_embeddings.append((await self._encode_chunk(model, [text]))[0])
+                    except Exception as text_error:
+                        self._embedding_stats["failed_texts"] += 1
+                        logger.error("生成向量嵌入失败", error=str(text_error))
+                        chunk_embeddings.append(None)
+            
+            for text, embedding in zip(chunk, chunk_embeddings):
+                embeddings[text] = embedding
+            
+            # 记录批次吞吐
+            elapsed = max(time.time() - batch_start, 1e-6)
+            throughput = len(chunk) / elapsed
+            self._embedding_stats["encode_batches"] += 1
+            self._embedding_stats["encoded_texts"] += len(chunk)
+            self._embedding_stats["encode_time_ms"] += int(elapsed * 1000)
+            self._embedding_stats["last_batch_throughput"] = throughput
+            
+            logger.debug("嵌入批次完成", 
+                        batch_index=i // chunk_size + 1,
+                        batch_size=len(chunk),
+                        elapsed_ms=int(elapsed * 1000),
+                        texts_per_second=round(throughput, 2))
+        
+        return embeddings
+    
+    async def _encode_chunk(self, model, chunk: List[str]) -> np.ndarray:
+        """在线程池中编码一批文本"""
+        loop = asyncio.get_event_loop()
+        chunk_embeddings = await loop.run_in_executor(
+            self.executor,
+            partial(
+                model.encode,
+                chunk,
+                batch_size=len(chunk),
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+        )
+        return np.asarray(chunk_embeddings, dtype=np.float32).reshape(len(chunk), -1)
+    
     async def _calculate_confidence_score(self, profile_data: Dict[str, Any], 
                                         vector_type: VectorType, 
                                         vector_embedding: np.ndarray) -> float:
@@ -476,24 +641,34 @@ class AIIdentityVectorization:
         try:
             cache_key = f"{result.profile_id}_{result.vector_type.value}"
             
-            # 转换为可序列化格式
+            # 向量以连续float32缓冲区缓存，过期与淘汰由缓存组件负责
             cache_data = {
                 "vector_id": result.vector_id,
                 "profile_id": result.profile_id,
                 "vector_type": result.vector_type.value,
-                "vector_embedding": result.vector_embedding.tolist(),
+                "vector_embedding": result.vector_embedding,
                 "vector_dimension": result.vector_dimension,
                 "vector_model": result.vector_model,
                 "confidence_score": result.confidence_score,
-                "created_at": result.created_at.isoformat(),
-                "ttl": int(time.time()) + self.config.cache_ttl
+                "created_at": result.created_at.isoformat()
             }
             
-            self._vector_cache[cache_key] = cache_data
+            await self._vector_cache.set(cache_key, cache_data)
             
         except Exception as e:
             logger.error("缓存向量化结果失败", error=str(e))
     
+    async def get_cached_vector(self, profile_id: str,
+                                vector_type: VectorType = VectorType.COMPREHENSIVE) -> Optional[np.ndarray]:
+        """读取缓存的档案向量"""
+        cached = await self._vector_cache.get(f"{profile_id}_{vector_type.value}")
+        if cached is None:
+            self._performance_stats["cache_misses"] += 1
+            return None
+        
+        self._performance_stats["cache_hits"] += 1
+        return cached["vector_embedding"]
+    
     async def _add_to_faiss_index(self, result: VectorizationResult):
         """添加到FAISS索引"""
         try:
@@ -505,56 +680,223 @@ class AIIdentityVectorization:
                 logger.warning("FAISS索引不存在", vector_type=result.vector_type.value)
                 return
             
-            # 准备向量数据
-            vector = result.vector_embedding.reshape(1, -1).astype(np.float32)
+            # 按档案ID写入索引(已存在则覆盖)
+            index.upsert(
+                result.profile_id,
+                result.vector_embedding,
+                text_fingerprint(result.embedding_source)
+            )
             
-            # 添加到索引
-            index.add(vector)
+            self._schedule_index_maintenance(result.vector_type.value, index)
             
-            logger.debug("向量添加到FAISS索引", 
+            logger.debug("向量写入FAISS索引", 
                         vector_type=result.vector_type.value,
-                        index_size=index.ntotal)
+                        index_size=index.size)
             
         except Exception as e:
             logger.error("添加向量到FAISS索引失败", error=str(e))
     
+    def _get_indexed_embedding(self, profile_id: Optional[str], text_data: str,
+                               vector_type: VectorType) -> Optional[np.ndarray]:
+        """档案内容指纹未变化时从索引取回已有向量"""
+        if not self.config.use_faiss_index or not profile_id:
+            return None
+        
+        index = self._faiss_indexes.get(vector_type.value)
+        if not index or not index.contains(profile_id, text_fingerprint(text_data)):
+            return None
+        
+        return index.get_vector(profile_id)
+    
+    async def delete_from_faiss_index(self, profile_id: str, vector_type: Optional[VectorType] = None) -> bool:
+        """从FAISS索引删除档案向量，未指定类型时删除全部类型"""
+        try:
+            vector_types = [vector_type] if vector_type else list(VectorType)
+            deleted = False
+            for vt in vector_types:
+                index = self._faiss_indexes.get(vt.value)
+                if index and index.delete(profile_id):
+                    deleted = True
+                    self._schedule_index_maintenance(vt.value, index)
+                await self._vector_cache.delete(f"{profile_id}_{vt.value}")
+            
+            return deleted
+            
+        except Exception as e:
+            logger.error("从FAISS索引删除向量失败", profile_id=profile_id, error=str(e))
+            return False
+    
+    async def rebuild_faiss_indexes(self, profiles_data: List[Dict[str, Any]],
+                                    vector_type: VectorType = VectorType.COMPREHENSIVE) -> Dict[str, int]:
+        """启动后增量重建索引：仅向量化内容有变化的档案，并清理已不存在的档案"""
+        stats = {"unchanged": 0, "vectorized": 0, "deleted": 0}
+        try:
+            index = self._faiss_indexes.get(vector_type.value)
+            if not index:
+                logger.warning("FAISS索引不存在", vector_type=vector_type.value)
+                return stats
+            
+            pending = []
+            for profile_data in profiles_data:
+                profile_id = profile_data.get("profile_id")
+                text_data = await self._extract_text_data(profile_data, vector_type)
+                if not text_data.strip():
+                    # 档案已没有可向量化的文本，移除旧向量
+                    if profile_id and index.delete(profile_id):
+                        stats["deleted"] += 1
+                    continue
+                if profile_id and index.contains(profile_id, text_fingerprint(text_data)):
+                    stats["unchanged"] += 1
+                else:
+                    pending.append(profile_data)
+            
+            if pending:
+                results = await self.batch_vectorize(pending, vector_type)
+                stats["vectorized"] = sum(1 for r in results if r.vector_embedding is not None)
+            
+            live_ids = {p.get("profile_id") for p in profiles_data}
+            for profile_id in index.profile_ids():
+                if profile_id not in live_ids and index.delete(profile_id):
+                    stats["deleted"] += 1
+            
+            await self.save_faiss_indexes()
+            
+            logger.info("FAISS索引增量重建完成", vector_type=vector_type.value, **stats)
+            return stats
+            
+        except Exception as e:
+            logger.error("FAISS索引增量重建失败", vector_type=vector_type.value, error=str(e))
+            return stats
+    
+    def _schedule_index_maintenance(self, vector_type: str, index: FaissIndexManager):
+        """索引需要升级/压缩/快照时在线程池中执行，不阻塞事件循环；同一索引同时只有一个维护任务"""
+        if not index.maintenance_due():
+            return
+        running = self._index_maintenance.get(vector_type)
+        if running is not None and not running.done():
+            return
+        
+        loop = asyncio.get_event_loop()
+        task = loop.run_in_executor(self.executor, index.run_maintenance)
+        self._index_maintenance[vector_type] = task
+        
+        def _on_done(future: asyncio.Future, vector_type=vector_type, index=index):
+            if future.cancelled() or future.exception() is not None or not future.result():
+                return
+            # 维护期间的写入可能再次触发阈值
+            if self._faiss_indexes.get(vector_type) is index:
+                self._schedule_index_maintenance(vector_type, index)
+        
+        task.add_done_callback(_on_done)
+    
+    async def wait_index_maintenance(self):
+        """等待进行中的索引维护任务完成"""
+        pending = [task for task in self._index_maintenance.values() if not task.done()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def save_faiss_indexes(self) -> bool:
+        """将全部FAISS索引快照到磁盘"""
+        try:
+            if not self.config.index_storage_path:
+                return False
+            
+            loop = asyncio.get_event_loop()
+            results = await asyncio.gather(*[
+                loop.run_in_executor(self.executor, index.snapshot)
+                for index in self._faiss_indexes.values()
+            ])
+            return all(results)
+            
+        except Exception as e:
+            logger.error("保存FAISS索引快照失败", error=str(e))
+            return False
+    
     async def batch_vectorize(self, profiles_data: List[Dict[str, Any]], 
                             vector_type: VectorType = VectorType.COMPREHENSIVE) -> List[VectorizationResult]:
         """批量向量化"""
+        return await self.batch_vectorize_multi(profiles_data, [vector_type])
+    
+    async def batch_vectorize_multi(self, profiles_data: List[Dict[str, Any]], 
+                                  vector_types: List[VectorType]) -> List[VectorizationResult]:
+        """跨档案、跨向量类型批量向量化
+        
+        先收集全部(档案, 向量类型)的文本，去重后按块一次性送入模型编码，再将嵌入分发回各档案
+        """
         try:
+            start_time = time.time()
             logger.info("开始批量向量化", 
                        profile_count=len(profiles_data),
-                       vector_type=vector_type.value)
-            
+                       vector_types=[vt.value for vt in vector_types])
+            
+            # 收集文本，能从索引复用的向量不再编码，空文本不编码
+            items = []
+            pending_texts = []
+            empty_count = 0
+            for profile_data in profiles_data:
+                for vector_type in vector_types:
+                    text_data = await self._extract_text_data(profile_data, vector_type)
+                    if not text_data.strip():
+                        items.append((profile_data, vector_type, text_data, None, True))
+                        empty_count += 1
+                        continue
+                    indexed = self._get_indexed_embedding(profile_data.get("profile_id"), text_data, vector_type)
+                    items.append((profile_data, vector_type, text_data, indexed, False))
+                    if indexed is None:
+                        pending_texts.append(text_data)
+            
+            embeddings = await self._encode_texts(pending_texts)
+            
+            # 批次耗时按条目均摊，而不是记录每条距批次开始的累计时间
+            vectorized_count = len(items) - empty_count
+            batch_time_ms = int((time.time() - start_time) * 1000)
+            per_item_ms = batch_time_ms // vectorized_count if vectorized_count else 0
+            
+            # 分发嵌入并构建结果
             results = []
-            
-            # 分批处理
-            for i in range(0, len(profiles_data), self.config.batch_size):
-                batch = profiles_data[i:i + self.config.batch_size]
-                
-                # 并行处理批次
-                tasks = [
-                    self.vectorize_ai_identity_profile(profile, vector_type)
-                    for profile in batch
-                ]
-                
-                batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # 处理结果
-                for result in batch_results:
-                    if isinstance(result, Exception):
-                        logger.error("批量向量化失败", error=str(result))
-                    else:
-                        results.append(result)
-                
-                logger.info("批次向量化完成", 
-                           batch_index=i // self.config.batch_size + 1,
-                           batch_size=len(batch),
-                           total_results=len(results))
-            
+            new_results = []
+            for profile_data, vector_type, text_data, indexed, empty in items:
+                try:
+                    if empty:
+                        results.append(self._build_empty_result(profile_data, vector_type, text_data))
+                        continue
+                    
+                    reused = indexed is not None
+                    vector_embedding = indexed if reused else embeddings.get(text_data)
+                    if vector_embedding is None:
+                        raise ValueError("文本嵌入生成失败")
+                    result = await self._build_vectorization_result(
+                        profile_data, vector_type, text_data, vector_embedding, reused, per_item_ms
+                    )
+                    results.append(result)
+                    if not reused:
+                        new_results.append(result)
+                    
+                    if self.config.cache_embeddings:
+                        await self._cache_vector_result(result)
+                        
+                except Exception as e:
+                    logger.error("批量向量化失败", 
+                                profile_id=profile_data.get("profile_id"),
+                                vector_type=vector_type.value,
+                                error=str(e))
+            
+            # 按向量类型批量写入索引
+            if self.config.use_faiss_index and new_results:
+                await self._add_many_to_faiss_index(new_results)
+            
+            # 整个批次只计一次耗时
+            if vectorized_count:
+                self._update_performance_stats(batch_time_ms, vectorized_count)
+            
+            elapsed = max(time.time() - start_time, 1e-6)
             logger.info("批量向量化完成", 
                        total_profiles=len(profiles_data),
-                       successful_results=len(results))
+                       successful_results=len(results) - empty_count,
+                       empty_texts=empty_count,
+                       encoded_texts=len(pending_texts),
+                       elapsed_ms=int(elapsed * 1000),
+                       profiles_per_second=round(len(results) / elapsed, 2))
             
             return results
             
@@ -562,28 +904,45 @@ class AIIdentityVectorization:
             logger.error("批量向量化失败", error=str(e))
             return []
     
+    async def _add_many_to_faiss_index(self, results: List[VectorizationResult]):
+        """按向量类型分组批量写入FAISS索引"""
+        try:
+            grouped: Dict[str, List[VectorizationResult]] = {}
+            for result in results:
+                grouped.setdefault(result.vector_type.value, []).append(result)
+            
+            for vector_type, group in grouped.items():
+                index = self._faiss_indexes.get(vector_type)
+                if not index:
+                    logger.warning("FAISS索引不存在", vector_type=vector_type)
+                    continue
+                
+                index.upsert_many(
+                    [r.profile_id for r in group],
+                    np.vstack([r.vector_embedding for r in group]),
+                    [text_fingerprint(r.embedding_source) for r in group]
+                )
+                self._schedule_index_maintenance(vector_type, index)
+                
+        except Exception as e:
+            logger.error("批量添加向量到FAISS索引失败", error=str(e))
+    
     async def search_similar_vectors(self, query_vector: np.ndarray, 
                                    vector_type: VectorType = VectorType.COMPREHENSIVE,
-                                   top_k: int = 10) -> List[Tuple[int, float]]:
-        """搜索相似向量"""
+                                   top_k: int = 10) -> List[Tuple[str, float]]:
+        """搜索相似向量，返回(profile_id, score)列表"""
         try:
             if not self.config.use_faiss_index:
                 logger.warning("FAISS索引未启用，无法进行向量搜索")
                 return []
             
             index = self._faiss_indexes.get(vector_type.value)
-            if not index or index.ntotal == 0:
+            if not index or index.size == 0:
                 logger.warning("FAISS索引为空或不存在", vector_type=vector_type.value)
                 return []
             
-            # 准备查询向量
-            query_vector = query_vector.reshape(1, -1).astype(np.float32)
-            
             # 搜索相似向量
-            scores, indices = index.search(query_vector, min(top_k, index.ntotal))
-            
-            # 返回结果
-            results = [(int(idx), float(score)) for idx, score in zip(indices[0], scores[0]) if idx >= 0]
+            results = index.search(query_vector, top_k)
             
             logger.info("向量搜索完成", 
                        vector_type=vector_type.value,
@@ -596,9 +955,9 @@ class AIIdentityVectorization:
             logger.error("搜索相似向量失败", error=str(e))
             return []
     
-    def _update_performance_stats(self, execution_time_ms: int):
-        """更新性能统计"""
-        self._performance_stats["total_vectorizations"] += 1
+    def _update_performance_stats(self, execution_time_ms: int, count: int = 1):
+        """更新性能统计；批量处理时传入整个批次的耗时与条目数"""
+        self._performance_stats["total_vectorizations"] += count
         self._performance_stats["total_time_ms"] += execution_time_ms
         self._performance_stats["average_time_ms"] = (
             self._performance_stats["total_time_ms"] / 
@@ -614,22 +973,36 @@ class AIIdentityVectorization:
                 max(self._performance_stats["cache_hits"] + self._performance_stats["cache_misses"], 1)
             ),
             "faiss_indexes": {
-                vector_type: index.ntotal 
+                vector_type: index.get_stats() 
                 for vector_type, index in self._faiss_indexes.items()
             },
+            "embedding": {
+                **self._embedding_stats,
+                "average_throughput": (
+                    self._embedding_stats["encoded_texts"] /
+                    max(self._embedding_stats["encode_time_ms"] / 1000, 1e-6)
+                    if self._embedding_stats["encoded_texts"] else 0.0
+                )
+            },
             "model_cache_size": len(self._model_cache),
-            "vector_cache_size": len(self._vector_cache)
+            "vector_cache_size": len(self._vector_cache),
+            "vector_cache": self._vector_cache.get_stats()
         }
     
     async def cleanup(self):
         """清理资源"""
         try:
+            # 退出前等待后台维护结束并保存索引快照
+            await self.wait_index_maintenance()
+            await self.save_faiss_indexes()
+            
             # 关闭线程池
             self.executor.shutdown(wait=True)
             
             # 清理缓存
             self._model_cache.clear()
             self._vector_cache.clear()
+            await self._vector_cache.close()
             self._faiss_indexes.clear()
             
             logger.info("AI身份向量化处理器清理完成")
@@ -30,6 +30,11 @@ async def setup_db(app, loop):
     # 这里可以添加数据库连接初始化
     logger.info("能力评估框架API服务初始化完成")
 
+@app.after_server_stop
+async def cleanup(app, loop):
+    """服务停止时关闭批量分析进程池"""
+    competency_engine.close()
+
 @app.route("/health", methods=["GET"])
 async def health_check(request: Request):
     """健康检查"""
@@ -206,9 +211,13 @@ async def batch_competency_assessment(request: Request):
         total_business_score = 0.0
         total_overall_score = 0.0
         
-        for i, text in enumerate(texts):
+        # 整批在进程池中评估，单条失败时对应位置为异常对象
+        assessments = await competency_engine.assess_many(texts)
+        
+        for i, (text, assessment) in enumerate(zip(texts, assessments)):
             try:
-                assessment = await competency_engine.assess_competency(text)
+                if isinstance(assessment, Exception):
+                    raise assessment
                 
                 results.append({
                     "index": i,
@@ -14,6 +14,8 @@ from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+from keyword_scorer import KeywordScorer, KeywordHits, ProcessBatchRunner
+
 logger = structlog.get_logger()
 
 class CompetencyLevel(Enum):
@@ -223,17 +225,28 @@ class CompetencyAssessmentEngine:
                 BusinessCompetencyType.BUSINESS_ACUMEN: 0.05
             }
         }
+        
+        # 全部能力关键词编译进同一个自动机，一次扫描得到所有命中次数
+        self.keyword_scorer = KeywordScorer()
+        for keywords_by_type in (self.technical_keywords, self.business_keywords):
+            for competency_type, keywords_by_level in keywords_by_type.items():
+                for level, keywords in keywords_by_level.items():
+                    self.keyword_scorer.add_dictionary((competency_type, level), keywords)
+        
+        self.batch_runner = ProcessBatchRunner()
     
-    async def assess_technical_competency(self, text: str) -> List[TechnicalCompetency]:
-        """评估技术能力"""
+    async def assess_technical_competency(self, text: str,
+                                          hits: Optional[KeywordHits] = None) -> List[TechnicalCompetency]:
+        """评估技术能力，hits为已有的关键词扫描结果时不再重复扫描"""
         logger.info("开始技术能力评估", text_length=len(text))
         
         competencies = []
-        text_lower = text.lower()
+        if hits is None:
+            hits = self.keyword_scorer.scan(text)
         
         for competency_type, keywords_by_level in self.technical_keywords.items():
             competency = await self._assess_single_technical_competency(
-                competency_type, text_lower, keywords_by_level
+                competency_type, hits, keywords_by_level
             )
             if competency:
                 competencies.append(competency)
@@ -245,7 +258,7 @@ class CompetencyAssessmentEngine:
         return competencies
     
     async def _assess_single_technical_competency(self, competency_type: TechnicalCompetencyType, 
-                                                text_lower: str, keywords_by_level: Dict[str, List[str]]) -> Optional[TechnicalCompetency]:
+                                                hits: KeywordHits, keywords_by_level: Dict[str, List[str]]) -> Optional[TechnicalCompetency]:
         """评估单个技术能力"""
         total_score = 0.0
         total_matches = 0
@@ -262,7 +275,7 @@ class CompetencyAssessmentEngine:
             }.get(level, 1.0)
             
             for keyword in keywords:
-                matches = text_lower.count(keyword.lower())
+                matches = hits.count(keyword)
                 if matches > 0:
                     score = level_weight * matches
                     total_score += score
@@ -295,16 +308,18 @@ class CompetencyAssessmentEngine:
             assessment_details=assessment_details
         )
     
-    async def assess_business_competency(self, text: str) -> List[BusinessCompetency]:
-        """评估业务能力"""
+    async def assess_business_competency(self, text: str,
+                                         hits: Optional[KeywordHits] = None) -> List[BusinessCompetency]:
+        """评估业务能力，hits为已有的关键词扫描结果时不再重复扫描"""
         logger.info("开始业务能力评估", text_length=len(text))
         
         competencies = []
-        text_lower = text.lower()
+        if hits is None:
+            hits = self.keyword_scorer.scan(text)
         
         for competency_type, keywords_by_level in self.business_keywords.items():
             competency = await self._assess_single_business_competency(
-                competency_type, text_lower, keywords_by_level
+                competency_type, hits, keywords_by_level
             )
             if competency:
                 competencies.append(competency)
@@ -316,7 +331,7 @@ class CompetencyAssessmentEngine:
         return competencies
     
     async def _assess_single_business_competency(self, competency_type: BusinessCompetencyType, 
-                                               text_lower: str, keywords_by_level: Dict[str, List[str]]) -> Optional[BusinessCompetency]:
+                                               hits: KeywordHits, keywords_by_level: Dict[str, List[str]]) -> Optional[BusinessCompetency]:
         """评估单个业务能力"""
         total_score = 0.0
         total_matches = 0
@@ -333,7 +348,7 @@ class CompetencyAssessmentEngine:
             }.get(level, 1.0)
             
             for keyword in keywords:
-                matches = text_lower.count(keyword.lower())
+                matches = hits.count(keyword)
                 if matches > 0:
                     score = level_weight * matches
                     total_score += score
@@ -559,11 +574,14 @@ class CompetencyAssessmentEngine:
         """综合能力评估"""
         logger.info("开始综合能力评估", text_length=len(text))
         
+        # 一次扫描，技术与业务能力共用命中结果
+        hits = self.keyword_scorer.scan(text)
+        
         # 评估技术能力
-        technical_competencies = await self.assess_technical_competency(text)
+        technical_competencies = await self.assess_technical_competency(text, hits)
         
         # 评估业务能力
-        business_competencies = await self.assess_business_competency(text)
+        business_competencies = await self.assess_business_competency(text, hits)
         
         # 计算综合评分
         technical_score, business_score, overall_score = await self.calculate_overall_scores(
@@ -596,10 +614,33 @@ class CompetencyAssessmentEngine:
                    overall_score=overall_score)
         
         return result
+    
+    async def assess_many(self, texts: List[str]) -> List[Any]:
+        """
+        批量综合能力评估，在进程池中分块执行
+        
+        Returns:
+            与输入顺序一致的CompetencyAssessment列表，单条失败时对应位置为异常对象
+        """
+        return await self.batch_runner.run(_assess_chunk, list(texts))
+    
+    def close(self):
+        """关闭批量评估进程池"""
+        self.batch_runner.shutdown()
 
 # 创建全局实例
 competency_engine = CompetencyAssessmentEngine()
 
+def _assess_chunk(texts: List[str]) -> List[Any]:
+    """进程池任务：用本进程的全局引擎评估一块文本"""
+    results = []
+    for text in texts:
+        try:
+            results.append(asyncio.run(competency_engine.assess_competency(text)))
+        except Exception as e:
+            results.append(e)
+    return results
+
 async def main():
     """测试函数"""
     engine = CompetencyAssessmentEngine()
@@ -29,6 +29,11 @@ async def setup_db(app, loop):
     # 这里可以添加数据库连接初始化
     logger.info("经验量化分析API服务初始化完成")
 
+@app.after_server_stop
+async def cleanup(app, loop):
+    """服务停止时关闭批量分析进程池"""
+    experience_engine.close()
+
 @app.route("/health", methods=["GET"])
 async def health_check(request: Request):
     """健康检查"""
@@ -253,9 +258,13 @@ async def batch_experience_analysis(request: Request):
         results = []
         total_score = 0.0
         
-        for i, experience_text in enumerate(experiences):
+        # 整批在进程池中分析，单条失败时对应位置为异常对象
+        analyses = await experience_engine.analyze_many(experiences)
+        
+        for i, (experience_text, analysis) in enumerate(zip(experiences, analyses)):
             try:
-                analysis = await experience_engine.analyze_experience(experience_text)
+                if isinstance(analysis, Exception):
+                    raise analysis
                 
                 formatted_achievements = []
                 for achievement in analysis.achievements:
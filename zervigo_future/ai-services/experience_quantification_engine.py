@@ -14,6 +14,8 @@ from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+from keyword_scorer import KeywordScorer, KeywordHits, FusedPatternSet, ProcessBatchRunner
+
 logger = structlog.get_logger()
 
 class ComplexityLevel(Enum):
@@ -152,19 +154,71 @@ class ExperienceQuantificationEngine:
             "strategic_thinking": ["strategy", "strategic", "planning", "vision", "战略", "策略", "规划", "愿景"],
             "innovation": ["innovated", "created", "designed", "developed", "创新", "创造", "设计", "开发"]
         }
+        
+        # 复杂度加分关键词(按出现与否计分)
+        self.tech_keywords = [
+            "algorithm", "architecture", "scalability", "performance", "optimization",
+            "distributed", "microservices", "machine learning", "ai", "blockchain",
+            "algorithm", "架构", "可扩展性", "性能", "优化", "分布式", "微服务", "机器学习", "人工智能", "区块链"
+        ]
+        
+        self.advanced_tech_keywords = [
+            "kubernetes", "docker", "aws", "azure", "gcp", "spark", "kafka",
+            "elasticsearch", "redis", "mongodb", "postgresql", "mysql",
+            "kubernetes", "docker", "云服务", "大数据", "消息队列", "搜索引擎", "缓存", "数据库"
+        ]
+        
+        self.business_keywords = [
+            "stakeholder", "requirements", "compliance", "regulation", "governance",
+            "integration", "migration", "transformation", "digitalization",
+            "利益相关者", "需求", "合规", "监管", "治理", "集成", "迁移", "转型", "数字化"
+        ]
+        
+        self.team_keywords = [
+            "collaboration", "coordination", "communication", "cross-functional",
+            "multi-disciplinary", "distributed", "remote", "agile", "scrum",
+            "协作", "协调", "沟通", "跨职能", "多学科", "分布式", "远程", "敏捷", "scrum"
+        ]
+        
+        # 全部关键词词典编译进同一个自动机，一次扫描供复杂度与领导力分析共用
+        self.keyword_scorer = KeywordScorer()
+        for dimension, keywords_by_level in self.complexity_keywords.items():
+            for level, keywords in keywords_by_level.items():
+                self.keyword_scorer.add_dictionary(("complexity", dimension, level), keywords)
+        for name in ("tech_keywords", "advanced_tech_keywords", "business_keywords", "team_keywords"):
+            self.keyword_scorer.add_dictionary(name, getattr(self, name))
+        for indicator_type, keywords in self.leadership_indicators.items():
+            self.keyword_scorer.add_dictionary(("leadership", indicator_type), keywords)
+        
+        # 全部成果正则融合为一条，一次扫描；保留每条正则所属的成果类型
+        self._achievement_pattern_types = [
+            achievement_type
+            for achievement_type, patterns in self.achievement_patterns.items()
+            for _ in patterns
+        ]
+        self.achievement_matcher = FusedPatternSet(
+            [pattern for patterns in self.achievement_patterns.values() for pattern in patterns],
+            re.IGNORECASE
+        )
+        
+        self.batch_runner = ProcessBatchRunner()
     
-    async def analyze_project_complexity(self, project_description: str) -> ProjectComplexity:
-        """分析项目复杂度"""
+    async def analyze_project_complexity(self, project_description: str,
+                                         hits: Optional[KeywordHits] = None) -> ProjectComplexity:
+        """分析项目复杂度，hits为已有的关键词扫描结果时不再重复扫描"""
         logger.info("开始分析项目复杂度", project_length=len(project_description))
         
+        if hits is None:
+            hits = self.keyword_scorer.scan(project_description)
+        
         # 技术复杂度评估
-        technical_complexity = await self._assess_technical_complexity(project_description)
+        technical_complexity = await self._assess_technical_complexity(project_description, hits)
         
         # 业务复杂度评估
-        business_complexity = await self._assess_business_complexity(project_description)
+        business_complexity = await self._assess_business_complexity(project_description, hits)
         
         # 团队复杂度评估
-        team_complexity = await self._assess_team_complexity(project_description)
+        team_complexity = await self._assess_team_complexity(project_description, hits)
         
         # 综合复杂度计算
         overall_complexity = (technical_complexity * 0.4 + 
@@ -197,9 +251,11 @@ class ExperienceQuantificationEngine:
         
         return result
     
-    async def _assess_technical_complexity(self, description: str) -> float:
+    async def _assess_technical_complexity(self, description: str,
+                                           hits: Optional[KeywordHits] = None) -> float:
         """评估技术复杂度"""
-        description_lower = description.lower()
+        if hits is None:
+            hits = self.keyword_scorer.scan(description)
         complexity_score = 0.0
         total_matches = 0
         
@@ -213,31 +269,19 @@ class ExperienceQuantificationEngine:
             }[level]
             
             for keyword in keywords:
-                matches = description_lower.count(keyword.lower())
+                matches = hits.count(keyword)
                 if matches > 0:
                     complexity_score += level_weight * matches
                     total_matches += matches
         
         # 技术关键词权重调整
-        tech_keywords = [
-            "algorithm", "architecture", "scalability", "performance", "optimization",
-            "distributed", "microservices", "machine learning", "ai", "blockchain",
-            "algorithm", "架构", "可扩展性", "性能", "优化", "分布式", "微服务", "机器学习", "人工智能", "区块链"
-        ]
-        
-        tech_keyword_matches = sum(1 for keyword in tech_keywords 
-                                 if keyword.lower() in description_lower)
+        tech_keyword_matches = sum(1 for keyword in self.tech_keywords 
+                                 if hits.contains(keyword))
         complexity_score += tech_keyword_matches * 0.5
         
         # 技术栈复杂度评估
-        advanced_tech = [
-            "kubernetes", "docker", "aws", "azure", "gcp", "spark", "kafka",
-            "elasticsearch", "redis", "mongodb", "postgresql", "mysql",
-            "kubernetes", "docker", "云服务", "大数据", "消息队列", "搜索引擎", "缓存", "数据库"
-        ]
-        
-        advanced_tech_matches = sum(1 for tech in advanced_tech 
-                                  if tech.lower() in description_lower)
+        advanced_tech_matches = sum(1 for tech in self.advanced_tech_keywords 
+                                  if hits.contains(tech))
         complexity_score += advanced_tech_matches * 0.3
         
         # 归一化到0-5范围
@@ -246,9 +290,11 @@ class ExperienceQuantificationEngine:
         
         return round(complexity_score, 2)
     
-    async def _assess_business_complexity(self, description: str) -> float:
+    async def _assess_business_complexity(self, description: str,
+                                          hits: Optional[KeywordHits] = None) -> float:
         """评估业务复杂度"""
-        description_lower = description.lower()
+        if hits is None:
+            hits = self.keyword_scorer.scan(description)
         complexity_score = 0.0
         total_matches = 0
         
@@ -262,20 +308,14 @@ class ExperienceQuantificationEngine:
             }[level]
             
             for keyword in keywords:
-                matches = description_lower.count(keyword.lower())
+                matches = hits.count(keyword)
                 if matches > 0:
                     complexity_score += level_weight * matches
                     total_matches += matches
         
         # 业务关键词权重调整
-        business_keywords = [
-            "stakeholder", "requirements", "compliance", "regulation", "governance",
-            "integration", "migration", "transformation", "digitalization",
-            "利益相关者", "需求", "合规", "监管", "治理", "集成", "迁移", "转型", "数字化"
-        ]
-        
-        business_keyword_matches = sum(1 for keyword in business_keywords 
-                                     if keyword.lower() in description_lower)
+        business_keyword_matches = sum(1 for keyword in self.business_keywords 
+                                     if hits.contains(keyword))
         complexity_score += business_keyword_matches * 0.4
         
         # 归一化到0-5范围
@@ -284,9 +324,11 @@ class ExperienceQuantificationEngine:
         
         return round(complexity_score, 2)
     
-    async def _assess_team_complexity(self, description: str) -> float:
+    async def _assess_team_complexity(self, description: str,
+                                      hits: Optional[KeywordHits] = None) -> float:
         """评估团队复杂度"""
-        description_lower = description.lower()
+        if hits is None:
+            hits = self.keyword_scorer.scan(description)
         complexity_score = 0.0
         total_matches = 0
         
@@ -300,20 +342,14 @@ class ExperienceQuantificationEngine:
             }[level]
             
             for keyword in keywords:
-                matches = description_lower.count(keyword.lower())
+                matches = hits.count(keyword)
                 if matches > 0:
                     complexity_score += level_weight * matches
                     total_matches += matches
         
         # 团队关键词权重调整
-        team_keywords = [
-            "collaboration", "coordination", "communication", "cross-functional",
-            "multi-disciplinary", "distributed", "remote", "agile", "scrum",
-            "协作", "协调", "沟通", "跨职能", "多学科", "分布式", "远程", "敏捷", "scrum"
-        ]
-        
-        team_keyword_matches = sum(1 for keyword in team_keywords 
-                                 if keyword.lower() in description_lower)
+        team_keyword_matches = sum(1 for keyword in self.team_keywords 
+                                 if hits.contains(keyword))
         complexity_score += team_keyword_matches * 0.3
         
         # 归一化到0-5范围
@@ -341,19 +377,18 @@ class ExperienceQuantificationEngine:
         
         achievements = []
         
-        for achievement_type, patterns in self.achievement_patterns.items():
-            for pattern in patterns:
-                matches = re.finditer(pattern, experience_text, re.IGNORECASE)
-                for match in matches:
-                    try:
-                        value = float(match.group(1))
-                        achievement = await self._create_achievement(
-                            achievement_type, experience_text, match, value
-                        )
-                        if achievement:
-                            achievements.append(achievement)
-                    except (ValueError, IndexError):
-                        continue
+        pattern_matches = self.achievement_matcher.finditer_all(experience_text)
+        for achievement_type, matches in zip(self._achievement_pattern_types, pattern_matches):
+            for match in matches:
+                try:
+                    value = float(match.group(1))
+                    achievement = await self._create_achievement(
+                        achievement_type, experience_text, match, value
+                    )
+                    if achievement:
+                        achievements.append(achievement)
+                except (ValueError, IndexError):
+                    continue
         
         # 去重和排序
         achievements = self._deduplicate_achievements(achievements)
@@ -559,17 +594,19 @@ class ExperienceQuantificationEngine:
         
         return unique_achievements
     
-    async def analyze_leadership_indicators(self, experience_text: str) -> Dict[str, float]:
+    async def analyze_leadership_indicators(self, experience_text: str,
+                                            hits: Optional[KeywordHits] = None) -> Dict[str, float]:
         """分析领导力指标"""
         logger.info("开始分析领导力指标")
         
         indicators = {}
-        text_lower = experience_text.lower()
+        if hits is None:
+            hits = self.keyword_scorer.scan(experience_text)
         
         for indicator_type, keywords in self.leadership_indicators.items():
             score = 0.0
             for keyword in keywords:
-                score += text_lower.count(keyword.lower())
+                score += hits.count(keyword)
             
             # 归一化到0-1范围
             indicators[indicator_type] = min(1.0, score / 10.0)
@@ -613,9 +650,10 @@ class ExperienceQuantificationEngine:
         
         scores = []
         for experience in experiences:
-            complexity = await self.analyze_project_complexity(experience)
+            hits = self.keyword_scorer.scan(experience)
+            complexity = await self.analyze_project_complexity(experience, hits)
             achievements = await self.extract_quantified_achievements(experience)
-            leadership = await self.analyze_leadership_indicators(experience)
+            leadership = await self.analyze_leadership_indicators(experience, hits)
             score = await self.calculate_experience_score(complexity, achievements, leadership)
             scores.append(score)
         
@@ -630,14 +668,17 @@ class ExperienceQuantificationEngine:
         """综合分析经验"""
         logger.info("开始综合分析经验", text_length=len(experience_text))
         
+        # 一次关键词扫描，复杂度与领导力分析共用
+        hits = self.keyword_scorer.scan(experience_text)
+        
         # 项目复杂度分析
-        complexity = await self.analyze_project_complexity(experience_text)
+        complexity = await self.analyze_project_complexity(experience_text, hits)
         
         # 量化成果提取
         achievements = await self.extract_quantified_achievements(experience_text)
         
         # 领导力指标分析
-        leadership = await self.analyze_leadership_indicators(experience_text)
+        leadership = await self.analyze_leadership_indicators(experience_text, hits)
         
         # 经验评分计算
         experience_score = await self.calculate_experience_score(complexity, achievements, leadership)
@@ -659,10 +700,33 @@ class ExperienceQuantificationEngine:
                    complexity_level=complexity.complexity_level.value)
         
         return result
+    
+    async def analyze_many(self, experience_texts: List[str]) -> List[Any]:
+        """
+        批量经验分析，在进程池中分块执行
+        
+        Returns:
+            与输入顺序一致的ExperienceAnalysis列表，单条失败时对应位置为异常对象
+        """
+        return await self.batch_runner.run(_analyze_chunk, list(experience_texts))
+    
+    def close(self):
+        """关闭批量分析进程池"""
+        self.batch_runner.shutdown()
 
 # 创建全局实例
 experience_engine = ExperienceQuantificationEngine()
 
+def _analyze_chunk(experience_texts: List[str]) -> List[Any]:
+    """进程池任务：用本进程的全局引擎分析一块经验文本"""
+    results = []
+    for experience_text in experience_texts:
+        try:
+            results.append(asyncio.run(experience_engine.analyze_experience(experience_text)))
+        except Exception as e:
+            results.append(e)
+    return results
+
 async def main():
     """测试函数"""
     engine = ExperienceQuantificationEngine()
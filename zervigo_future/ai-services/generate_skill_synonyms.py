@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+由技能标准化引擎生成ai-service/skill_synonyms.json
+ai-service容器只包含ai-service目录，职位匹配引擎从该文件加载同义词；
+修改skill_standardization_engine.py中的技能数据后重新运行本脚本
+"""
+
+import asyncio
+import json
+import os
+
+from skill_standardization_engine import SkillStandardizationEngine
+
+SYNONYMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai-service", "skill_synonyms.json")
+
+
+async def generate_skill_synonyms(path: str = SYNONYMS_PATH) -> int:
+    """写入同义词文件，返回技能数"""
+    synonyms = await SkillStandardizationEngine().export_synonyms()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(synonyms, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    return len(synonyms)
+
+
+if __name__ == "__main__":
+    count = asyncio.run(generate_skill_synonyms())
+    print(f"已生成 {SYNONYMS_PATH}，共{count}个技能")
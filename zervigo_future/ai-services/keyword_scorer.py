@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+关键词评分器
+能力评估引擎与经验量化引擎共用：
+- KeywordScorer: 把全部关键词词典编译进一个Aho-Corasick自动机，一次扫描得到所有关键词的命中次数
+- FusedPatternSet: 把多条共享数字前缀的正则融合为一条，每个数字只尝试一次全部后缀
+- ProcessBatchRunner: 在进程池中分块执行批量分析，绕开GIL
+"""
+
+import asyncio
+import os
+import re
+import structlog
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Iterable, Callable, Hashable, Tuple
+
+from skill_lookup_index import AliasAutomaton
+
+logger = structlog.get_logger()
+
+
+class KeywordHits:
+    """一次扫描的关键词命中结果，按登记时的原始写法索引"""
+
+    __slots__ = ("counts",)
+
+    def __init__(self, counts: Dict[str, int]):
+        self.counts = counts
+
+    def count(self, keyword: str) -> int:
+        """与text.lower().count(keyword.lower())等价的不重叠命中次数(仅限已登记的关键词)"""
+        return self.counts.get(keyword, 0)
+
+    def contains(self, keyword: str) -> bool:
+        return keyword in self.counts
+
+
+class KeywordScorer:
+    """多词典关键词评分器"""
+
+    def __init__(self, dictionaries: Optional[Dict[Hashable, Iterable[str]]] = None):
+        self._automaton = AliasAutomaton()
+        self._keywords: List[str] = []
+        self._keyword_ids: Dict[str, int] = {}
+        # 小写关键词ID -> 登记过的全部原始写法
+        self._spellings: List[List[str]] = []
+        self._dictionaries: Dict[Hashable, List[str]] = {}
+        for name, keywords in (dictionaries or {}).items():
+            self.add_dictionary(name, keywords)
+
+    def add_dictionary(self, name: Hashable, keywords: Iterable[str]):
+        """登记一个关键词词典，保留原顺序与重复项"""
+        keywords = list(keywords)
+        self._dictionaries[name] = keywords
+        for keyword in keywords:
+            key = keyword.lower()
+            if not key:
+                continue
+            keyword_id = self._keyword_ids.get(key)
+            if keyword_id is None:
+                keyword_id = self._keyword_ids[key] = len(self._keywords)
+                self._keywords.append(key)
+                self._spellings.append([])
+                self._automaton.add(key, keyword_id)
+            if keyword not in self._spellings[keyword_id]:
+                self._spellings[keyword_id].append(keyword)
+
+    def scan(self, text: str) -> KeywordHits:
+        """扫描一次文本，统计全部关键词的不重叠命中次数"""
+        counts_by_id: Dict[int, int] = {}
+        # str.count从左到右统计不重叠出现，同一关键词上一次命中结束前的重叠命中不计
+        next_allowed: Dict[int, int] = {}
+        keywords = self._keywords
+        for end, keyword_id in self._automaton.iter_matches(text.lower()):
+            if end - len(keywords[keyword_id]) < next_allowed.get(keyword_id, 0):
+                continue
+            next_allowed[keyword_id] = end
+            counts_by_id[keyword_id] = counts_by_id.get(keyword_id, 0) + 1
+
+        counts: Dict[str, int] = {}
+        for keyword_id, count in counts_by_id.items():
+            for spelling in self._spellings[keyword_id]:
+                counts[spelling] = count
+        return KeywordHits(counts)
+
+    def dictionary_counts(self, hits: KeywordHits, name: Hashable) -> List[Tuple[str, int]]:
+        """按词典原顺序返回(关键词, 命中次数)"""
+        return [(keyword, hits.count(keyword)) for keyword in self._dictionaries[name]]
+
+
+class FusedMatch:
+    """融合正则中单条子模式的匹配，接口与re.Match的常用部分一致"""
+
+    __slots__ = ("_groups", "_start", "_end")
+
+    def __init__(self, groups: Tuple[Optional[str], ...], start: int, end: int):
+        self._groups = groups
+        self._start = start
+        self._end = end
+
+    def group(self, index: int = 0) -> Optional[str]:
+        return self._groups[index]
+
+    def start(self) -> int:
+        return self._start
+
+    def end(self) -> int:
+        return self._end
+
+
+class FusedPatternSet:
+    """
+    共享数字前缀的多条正则融合匹配
+
+    要求每条子模式形如"前缀 + 后缀"，前缀贪婪匹配一个数字(默认整数或小数)，
+    且后缀不能以数字或小数点开头。此时子模式只可能从一段连续数字的起点开始匹配，
+    并且前缀不会回溯：先用一条正则找出所有数字起点及其数字，再用一条融合了
+    全部后缀(各自位于可选先行断言中)的正则在数字之后一次匹配，
+    按子模式过滤与其上一次匹配重叠的结果，得到与逐条re.finditer相同的匹配序列
+    """
+
+    NUMBER_PREFIX = r"(\d+(?:\.\d+)?)"
+
+    def __init__(self, patterns: Iterable[str], flags: int = 0, prefix: str = NUMBER_PREFIX):
+        self.patterns = list(patterns)
+        suffixes = []
+        for pattern in self.patterns:
+            if not pattern.startswith(prefix):
+                raise ValueError(f"子模式必须以{prefix}开头: {pattern}")
+            suffixes.append(pattern[len(prefix):])
+
+        # 前缀本身带一个捕获分组(即数字)，放在先行断言中以找出相互重叠的数字起点
+        self._prefix_regex = re.compile(rf"(?<!\d)(?={prefix})", flags)
+        # 每条后缀在融合正则中的(整体分组号, 自身分组数)
+        self._slots: List[Tuple[int, int]] = []
+        parts = []
+        group_index = 1
+        for suffix in suffixes:
+            own_groups = re.compile(suffix, flags).groups
+            self._slots.append((group_index, own_groups))
+            parts.append(f"(?:(?=({suffix})))?")
+            group_index += own_groups + 1
+        self._suffix_regex = re.compile("".join(parts), flags)
+
+    def finditer_all(self, text: str) -> List[List[FusedMatch]]:
+        """返回每条子模式各自的匹配列表(与输入顺序一致)，分组0为整体、分组1为数字"""
+        results: List[List[FusedMatch]] = [[] for _ in self.patterns]
+        next_allowed = [0] * len(self.patterns)
+        slots = self._slots
+        for number_match in self._prefix_regex.finditer(text):
+            start = number_match.start()
+            number = number_match.group(1)
+            number_end = number_match.end(1)
+            suffix_groups = self._suffix_regex.match(text, number_end).groups()
+            for index, (group_index, own_groups) in enumerate(slots):
+                suffix = suffix_groups[group_index - 1]
+                if suffix is None or start < next_allowed[index]:
+                    continue
+                end = number_end + len(suffix)
+                groups = (text[start:end], number) + suffix_groups[group_index:group_index + own_groups]
+                results[index].append(FusedMatch(groups, start, end))
+                next_allowed[index] = end
+        return results
+
+
+class ProcessBatchRunner:
+    """进程池批量执行器，按块提交以摊薄进程间通信开销"""
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = 8,
+                 min_batch_size: int = 4):
+        """
+        Args:
+            max_workers: 进程数，默认CPU核数
+            chunk_size: 每个任务处理的条目数
+            min_batch_size: 少于该数量时在当前进程内执行
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.min_batch_size = min_batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, chunk_func: Callable[[List[Any]], List[Any]], items: List[Any]) -> List[Any]:
+        """
+        执行批量任务
+
+        Args:
+            chunk_func: 模块级函数，处理一块条目并返回等长结果(单条失败时返回异常对象)
+            items: 全部条目
+        """
+        # 进程内执行时放到线程中，避免阻塞事件循环(chunk_func内部可自行asyncio.run)
+        if len(items) < self.min_batch_size or self.max_workers <= 1:
+            return await asyncio.to_thread(chunk_func, items)
+
+        loop = asyncio.get_running_loop()
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        try:
+            executor = self._get_executor()
+            chunk_results = await asyncio.gather(*[
+                loop.run_in_executor(executor, chunk_func, chunk) for chunk in chunks
+            ])
+        except Exception as e:
+            # 进程池不可用(如进程崩溃)时退回当前进程执行
+            logger.warning("进程池执行失败，改为进程内执行", error=str(e))
+            self.shutdown()
+            return await asyncio.to_thread(chunk_func, items)
+        return [result for chunk_result in chunk_results for result in chunk_result]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+文档解析流水线
+在有界进程池中提取PDF/DOCX的文本与版面，CPU计算不占用事件循环；
+PDF按页分批提交，每批完成即可读取部分结果；
+提取结果按文件内容哈希缓存(内存LRU + 磁盘JSON)，并发提交的同一文档只提取一次；
+提取期间流水线持有文件的硬链接(跨设备时为副本)，提交者提前删除原文件不影响合并到同一任务的其他请求
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Any, Tuple
+import structlog
+
+try:
+    from PyPDF2 import PdfReader
+    HAS_PYPDF2 = True
+except ImportError:
+    HAS_PYPDF2 = False
+
+try:
+    import docx
+    HAS_DOCX = True
+except ImportError:
+    HAS_DOCX = False
+
+logger = structlog.get_logger()
+
+PDF_EXTENSIONS = {".pdf"}
+DOCX_EXTENSIONS = {".docx", ".doc"}
+
+# 常见的章节标题，版面信息不足时用于识别章节
+SECTION_KEYWORDS = [
+    "基本信息", "个人信息", "求职意向", "教育经历", "教育背景", "工作经历", "工作经验",
+    "项目经验", "项目经历", "技能专长", "专业技能", "自我评价", "获奖情况", "证书",
+    "公司简介", "企业简介", "基本情况", "经营状况", "财务状况", "风险分析", "发展历程", "组织架构"
+]
+
+
+class PipelineBusy(Exception):
+    """进行中的提取任务已达上限"""
+
+
+# 与文档内容无关的失败(文件被删除、工作进程崩溃)，不计入失败缓存，下次提交重新提取
+TRANSIENT_ERRORS = (FileNotFoundError, BrokenProcessPool)
+
+
+# ==================== 进程池中执行的提取函数 ====================
+
+def _metadata_value(info, key: str) -> Optional[str]:
+    value = info.get(key) if info else None
+    if value is not None and hasattr(value, "get_object"):
+        value = value.get_object()
+    return str(value) if value else None
+
+
+def _open_pdf(file_path: str):
+    if not HAS_PYPDF2:
+        raise RuntimeError("未安装PyPDF2，无法解析PDF")
+    reader = PdfReader(file_path)
+    if reader.is_encrypted:
+        # 只有打开密码为空的加密文档可以解析
+        reader.decrypt("")
+    return reader
+
+
+def inspect_pdf(file_path: str) -> Dict[str, Any]:
+    """读取PDF页数与文档信息"""
+    reader = _open_pdf(file_path)
+    info = reader.metadata
+    return {
+        "page_count": len(reader.pages),
+        "metadata": {
+            "title": _metadata_value(info, "/Title"),
+            "author": _metadata_value(info, "/Author"),
+            "created": _metadata_value(info, "/CreationDate"),
+            "modified": _metadata_value(info, "/ModDate"),
+            "producer": _metadata_value(info, "/Producer")
+        }
+    }
+
+
+def _group_lines(fragments: List[Tuple[str, float, float, float]]) -> List[Dict[str, Any]]:
+    """把文本片段按基线纵坐标合并成行，行从上到下、片段从左到右排列"""
+    rows: Dict[int, List[Tuple[str, float, float, float]]] = {}
+    for fragment in fragments:
+        rows.setdefault(round(fragment[2] / 2), []).append(fragment)
+    lines = []
+    for key in sorted(rows, reverse=True):
+        row = sorted(rows[key], key=lambda fragment: fragment[1])
+        text = "".join(fragment[0] for fragment in row).strip()
+        if text:
+            lines.append({
+                "text": text,
+                "x": round(row[0][1], 1),
+                "y": round(row[0][2], 1),
+                "font_size": round(max(fragment[3] for fragment in row), 1)
+            })
+    return lines
+
+
+def extract_pdf_pages(file_path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """提取[start, end)页的文本与行级版面(页码从1开始编号)"""
+    reader = _open_pdf(file_path)
+    pages = []
+    for index in range(start, end):
+        page = reader.pages[index]
+        fragments: List[Tuple[str, float, float, float]] = []
+
+        def visitor(text, cm, tm, font_dict, font_size):
+            if not text or not text.strip():
+                return
+            # 文本矩阵叠加当前变换矩阵得到页面坐标
+            x = cm[0] * tm[4] + cm[2] * tm[5] + cm[4]
+            y = cm[1] * tm[4] + cm[3] * tm[5] + cm[5]
+            size = (font_size or 0) * (abs(tm[3]) or 1) * (abs(cm[3]) or 1)
+            fragments.append((text.replace("\n", " "), x, y, size))
+
+        text = page.extract_text(visitor_text=visitor) or ""
+        box = page.mediabox
+        pages.append({
+            "page": index + 1,
+            "text": text,
+            "width": float(box.width),
+            "height": float(box.height),
+            "rotation": int(page.get("/Rotate", 0) or 0),
+            "lines": _group_lines(fragments)
+        })
+    return pages
+
+
+def _is_heading_style(style_name: str) -> bool:
+    return style_name.startswith("Heading") or style_name.startswith("标题") or style_name == "Title"
+
+
+def extract_docx(file_path: str) -> Dict[str, Any]:
+    """提取DOCX段落、表格与文档属性，按手动分页符切分页"""
+    if not HAS_DOCX:
+        raise RuntimeError("未安装python-docx，无法解析DOCX")
+    try:
+        document = docx.Document(file_path)
+    except Exception as e:
+        raise ValueError(f"无法读取文档(旧版.doc需先转换为.docx): {e}")
+
+    props = document.core_properties
+    page_lines: List[List[Dict[str, Any]]] = [[]]
+    for paragraph in document.paragraphs:
+        text = paragraph.text
+        if text.strip():
+            style_name = paragraph.style.name if paragraph.style is not None else ""
+            page_lines[-1].append({
+                "text": text,
+                "style": style_name,
+                "heading": _is_heading_style(style_name)
+            })
+        if paragraph._p.xpath('.//w:br[@w:type="page"]'):
+            page_lines.append([])
+    if len(page_lines) > 1 and not page_lines[-1]:
+        page_lines.pop()
+
+    return {
+        "page_count": len(page_lines),
+        "metadata": {
+            "title": props.title or None,
+            "author": props.author or None,
+            "created": props.created.isoformat() if props.created else None,
+            "modified": props.modified.isoformat() if props.modified else None
+        },
+        "pages": [
+            {"page": number, "text": "\n".join(line["text"] for line in lines), "lines": lines}
+            for number, lines in enumerate(page_lines, 1)
+        ],
+        "tables": [
+            [[cell.text for cell in row.cells] for row in table.rows]
+            for table in document.tables
+        ]
+    }
+
+
+def detect_structure(extraction: Dict[str, Any]) -> Dict[str, Any]:
+    """根据版面推断标题与章节：DOCX用标题样式，PDF用明显大于正文的字号，另按常见章节名补充"""
+    lines = [line for page in extraction.get("pages", []) for line in page.get("lines", [])]
+    sizes = sorted(line["font_size"] for line in lines if line.get("font_size"))
+    body_size = sizes[len(sizes) // 2] if sizes else 0
+
+    sections: List[str] = []
+    for line in lines:
+        text = line["text"].strip()
+        if not text or len(text) > 30:
+            continue
+        is_heading = line.get("heading") or (body_size and line.get("font_size", 0) >= body_size * 1.15)
+        if not is_heading:
+            is_heading = any(text.strip("：:【】[] ") == keyword for keyword in SECTION_KEYWORDS)
+        if is_heading and text not in sections:
+            sections.append(text)
+
+    title = (extraction.get("metadata") or {}).get("title")
+    if not title:
+        if sections:
+            title = sections[0]
+        elif lines:
+            title = lines[0]["text"].strip()
+    return {"title": title, "sections": sections}
+
+
+# ==================== 异步调度 ====================
+
+class ExtractionTask:
+    """一个文档(按内容哈希)的提取任务，页面随批次完成陆续可读"""
+
+    def __init__(self, content_hash: str, file_type: str):
+        self.content_hash = content_hash
+        self.file_type = file_type
+        self.status = "queued"
+        self.cached = False
+        self.page_count: Optional[int] = None
+        self.metadata: Dict[str, Any] = {}
+        self.tables: List[Any] = []
+        self.pages: Dict[int, Dict[str, Any]] = {}
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._updated = asyncio.Event()
+
+    @classmethod
+    def from_cache(cls, content_hash: str, extraction: Dict[str, Any]) -> "ExtractionTask":
+        task = cls(content_hash, extraction["type"])
+        task.cached = True
+        task.set_info(extraction)
+        task.tables = extraction.get("tables", [])
+        task.add_pages(extraction["pages"])
+        task.complete(extraction)
+        return task
+
+    @property
+    def finished(self) -> bool:
+        return self.done.done()
+
+    def update_event(self) -> asyncio.Event:
+        """返回下一次更新时触发的事件(先取事件再读状态，避免错过更新)"""
+        return self._updated
+
+    def notify(self):
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    def set_info(self, info: Dict[str, Any]):
+        self.page_count = info["page_count"]
+        self.metadata = info.get("metadata") or {}
+
+    def add_pages(self, pages: List[Dict[str, Any]]):
+        for page in pages:
+            self.pages[page["page"]] = page
+        self.notify()
+
+    def pages_from(self, start_page: int = 1) -> List[Dict[str, Any]]:
+        return [self.pages[number] for number in sorted(self.pages) if number >= start_page]
+
+    def complete(self, extraction: Dict[str, Any]):
+        self.status = "completed"
+        self.finished_at = time.time()
+        self.done.set_result(extraction)
+        self.notify()
+
+    def fail(self, error: Exception):
+        self.status = "failed"
+        self.error = str(error)
+        self.finished_at = time.time()
+        self.done.set_exception(error)
+        # 没有等待者时避免"exception was never retrieved"警告
+        self.done.exception()
+        self.notify()
+
+    def to_extraction(self) -> Dict[str, Any]:
+        pages = self.pages_from(1)
+        return {
+            "type": self.file_type,
+            "content_hash": self.content_hash,
+            "page_count": self.page_count if self.page_count is not None else len(pages),
+            "metadata": self.metadata,
+            "pages": pages,
+            "tables": self.tables,
+            "text": "\n".join(page["text"] for page in pages)
+        }
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "cached": self.cached,
+            "content_hash": self.content_hash,
+            "page_count": self.page_count,
+            "pages_done": len(self.pages),
+            "error": self.error
+        }
+
+
+class DocumentParsingPipeline:
+    """文档解析流水线"""
+
+    def __init__(self, max_workers: int = 2, page_batch_size: int = 8, cache_dir: Optional[str] = None,
+                 memory_cache_size: int = 128, max_inflight: int = 8, failure_ttl: float = 30.0):
+        """
+        Args:
+            max_workers: 进程池大小
+            page_batch_size: PDF每批提取的页数，也是部分结果的粒度
+            cache_dir: 磁盘缓存目录，为None时只用内存缓存
+            memory_cache_size: 内存中保留的提取结果数
+            max_inflight: 同时进行的提取任务上限，超出时拒绝新文档
+            failure_ttl: 提取失败的文档在该时间(秒)内直接返回失败，不重复解析
+        """
+        self.max_workers = max_workers
+        self.page_batch_size = page_batch_size
+        self.cache_dir = cache_dir
+        self.memory_cache_size = memory_cache_size
+        self.max_inflight = max_inflight
+        self.failure_ttl = failure_ttl
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, ExtractionTask] = {}
+        self._runners = set()
+        self._memory_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._recent_failures: "OrderedDict[str, Tuple[float, str, Exception]]" = OrderedDict()
+        # (路径, 大小, 修改时间) -> 内容哈希，同一请求中多次提交同一文件时不重复读盘
+        self._hash_memo: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self.stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "coalesced": 0,
+            "documents_parsed": 0,
+            "pages_parsed": 0,
+            "failures": 0
+        }
+
+        # 进行中任务的文件硬链接目录，任务结束即删除
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.work_dir = os.path.join(cache_dir, "work")
+            os.makedirs(self.work_dir, exist_ok=True)
+            # 清理上次异常退出残留的链接
+            for leftover in os.listdir(self.work_dir):
+                os.remove(os.path.join(self.work_dir, leftover))
+        else:
+            self.work_dir = tempfile.mkdtemp(prefix="document-parsing-")
+
+    @staticmethod
+    def file_type_of(file_path: str) -> str:
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension in PDF_EXTENSIONS:
+            return "pdf"
+        if extension in DOCX_EXTENSIONS:
+            return "docx"
+        raise ValueError(f"不支持的文件类型: {extension or '未知'}")
+
+    # ---------- 提交 ----------
+
+    async def extract(self, file_path: str) -> ExtractionTask:
+        """提交文档并立即返回提取任务；已缓存或正在提取的同一内容直接复用"""
+        file_type = self.file_type_of(file_path)
+        content_hash = await self.hash_file(file_path)
+
+        task = self._inflight.get(content_hash)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return task
+
+        failure = self._recent_failures.get(content_hash)
+        if failure is not None and time.time() - failure[0] < self.failure_ttl:
+            task = ExtractionTask(content_hash, failure[1])
+            task.fail(failure[2])
+            return task
+
+        cached = await self._cache_get(content_hash)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return ExtractionTask.from_cache(content_hash, cached)
+        self.stats["cache_misses"] += 1
+
+        # 读缓存期间可能已有相同内容的任务被提交
+        task = self._inflight.get(content_hash)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return task
+        if len(self._inflight) >= self.max_inflight:
+            raise PipelineBusy(f"进行中的解析任务已达上限({self.max_inflight})")
+
+        task = ExtractionTask(content_hash, file_type)
+        self._inflight[content_hash] = task
+        try:
+            work_path = await asyncio.to_thread(self._link_sync, file_path, self._work_path(file_path, content_hash))
+        except BaseException:
+            self._inflight.pop(content_hash, None)
+            raise
+        runner = asyncio.create_task(self._run(task, work_path))
+        self._runners.add(runner)
+        runner.add_done_callback(self._runners.discard)
+        return task
+
+    async def extract_result(self, file_path: str) -> Dict[str, Any]:
+        """提交并等待完整提取结果"""
+        task = await self.extract(file_path)
+        return await asyncio.shield(task.done)
+
+    async def hash_file(self, file_path: str) -> str:
+        stat = await asyncio.to_thread(os.stat, file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._hash_memo.get(key)
+        if content_hash is None:
+            content_hash = await asyncio.to_thread(self._hash_file_sync, file_path)
+            self._hash_memo[key] = content_hash
+            while len(self._hash_memo) > 256:
+                self._hash_memo.popitem(last=False)
+        return content_hash
+
+    @staticmethod
+    def _hash_file_sync(file_path: str) -> str:
+        hasher = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def _work_path(self, file_path: str, content_hash: str) -> str:
+        return os.path.join(self.work_dir, content_hash + os.path.splitext(file_path)[1].lower())
+
+    @staticmethod
+    def _link_sync(file_path: str, work_path: str) -> str:
+        """为提取任务建立文件的硬链接，不支持硬链接时复制"""
+        try:
+            os.remove(work_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(file_path, work_path)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(file_path, work_path)
+        return work_path
+
+    @staticmethod
+    def _unlink_sync(work_path: str):
+        try:
+            os.remove(work_path)
+        except FileNotFoundError:
+            pass
+
+    # ---------- 执行 ----------
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def _in_pool(self, func, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool:
+            # 工作进程崩溃(如内存不足被杀)后重建进程池，当前任务按失败处理
+            logger.warning("解析进程池已损坏，重新创建")
+            self._shutdown_executor()
+            raise
+
+    async def _run(self, task: ExtractionTask, file_path: str):
+        task.status = "running"
+        try:
+            if task.file_type == "pdf":
+                task.set_info(await self._in_pool(inspect_pdf, file_path))
+                batches = [
+                    self._in_pool(extract_pdf_pages, file_path, start, min(start + self.page_batch_size, task.page_count))
+                    for start in range(0, task.page_count, self.page_batch_size)
+                ]
+                futures = [asyncio.ensure_future(batch) for batch in batches]
+                try:
+                    for future in asyncio.as_completed(futures):
+                        task.add_pages(await future)
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+            else:
+                result = await self._in_pool(extract_docx, file_path)
+                task.set_info(result)
+                task.tables = result["tables"]
+                task.add_pages(result["pages"])
+
+            extraction = task.to_extraction()
+            self.stats["documents_parsed"] += 1
+            self.stats["pages_parsed"] += len(extraction["pages"])
+            await self._cache_set(task.content_hash, extraction)
+            task.complete(extraction)
+            logger.info("文档提取完成", content_hash=task.content_hash, file_type=task.file_type,
+                        pages=extraction["page_count"], elapsed=round(task.finished_at - task.started_at, 3))
+
+        except Exception as e:
+            self.stats["failures"] += 1
+            logger.error("文档提取失败", content_hash=task.content_hash, file_path=file_path, error=str(e))
+            task.fail(e)
+            if not isinstance(e, TRANSIENT_ERRORS):
+                self._recent_failures[task.content_hash] = (time.time(), task.file_type, e)
+                while len(self._recent_failures) > self.memory_cache_size:
+                    self._recent_failures.popitem(last=False)
+        except asyncio.CancelledError:
+            task.fail(RuntimeError("解析任务已取消"))
+            raise
+        finally:
+            self._inflight.pop(task.content_hash, None)
+            self._unlink_sync(file_path)
+
+    # ---------- 缓存 ----------
+
+    def _cache_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    def _remember(self, content_hash: str, extraction: Dict[str, Any]):
+        self._memory_cache[content_hash] = extraction
+        self._memory_cache.move_to_end(content_hash)
+        while len(self._memory_cache) > self.memory_cache_size:
+            self._memory_cache.popitem(last=False)
+
+    async def _cache_get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        extraction = self._memory_cache.get(content_hash)
+        if extraction is not None:
+            self._memory_cache.move_to_end(content_hash)
+            return extraction
+        if not self.cache_dir:
+            return None
+        extraction = await asyncio.to_thread(self._read_cache_file, self._cache_path(content_hash))
+        if extraction is not None:
+            self._remember(content_hash, extraction)
+        return extraction
+
+    @staticmethod
+    def _read_cache_file(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("解析缓存文件损坏，忽略", path=path, error=str(e))
+            return None
+
+    async def _cache_set(self, content_hash: str, extraction: Dict[str, Any]):
+        self._remember(content_hash, extraction)
+        if self.cache_dir:
+            try:
+                await asyncio.to_thread(self._write_cache_file, self._cache_path(content_hash), extraction)
+            except OSError as e:
+                logger.warning("写入解析缓存失败", content_hash=content_hash, error=str(e))
+
+    @staticmethod
+    def _write_cache_file(path: str, extraction: Dict[str, Any]):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(extraction, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    # ---------- 状态 ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "inflight": len(self._inflight),
+            "max_inflight": self.max_inflight,
+            "max_workers": self.max_workers,
+            "memory_cache_size": len(self._memory_cache),
+            "pdf_supported": HAS_PYPDF2,
+            "docx_supported": HAS_DOCX
+        }
+
+    def _shutdown_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def close(self):
+        for runner in list(self._runners):
+            runner.cancel()
+        self._shutdown_executor()
+        if not self.cache_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
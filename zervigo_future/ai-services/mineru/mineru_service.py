@@ -5,9 +5,14 @@ MinerU文档解析服务 - 容器化版本
 """
 
 import asyncio
+import json as jsonlib
 import logging
 import os
+import re
 import shutil
+import time
+import uuid
+from collections import OrderedDict
 from typing import Dict, List, Optional
 from sanic import Sanic, Request, response
 from sanic.response import json
@@ -15,6 +20,7 @@ import structlog
 import aiofiles
 from pathlib import Path
 from document_classifier import document_classifier
+from document_parsing_pipeline import DocumentParsingPipeline, PipelineBusy, detect_structure
 
 # 配置日志
 structlog.configure(
@@ -40,20 +46,82 @@ logger = structlog.get_logger()
 # 创建Sanic应用
 app = Sanic("mineru-service")
 
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_PATTERN = re.compile(r"(?<!\d)1[3-9]\d{9}(?!\d)")
+COMPANY_NAME_PATTERN = re.compile(r"[\u4e00-\u9fa5A-Za-z0-9（）()]{2,40}?(?:股份有限公司|有限责任公司|有限公司|集团)")
+
+class JobStoreFull(Exception):
+    """作业数已达上限且没有可淘汰的已结束作业"""
+
+def flag_enabled(value) -> bool:
+    """解析请求中的布尔参数(JSON布尔值或表单字符串)"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+class ParseJob:
+    """异步解析作业"""
+    
+    def __init__(self, file_path: str, user_id: int, business_type: str, cleanup: bool = False):
+        self.job_id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.user_id = user_id
+        self.business_type = business_type
+        self.cleanup = cleanup
+        self.status = "queued"
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.extraction = None
+        self.runner: Optional[asyncio.Task] = None
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+    
+    def to_dict(self, from_page: Optional[int] = None) -> Dict:
+        """作业状态；指定from_page时附带已提取完成的页面(部分结果)"""
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "user_id": self.user_id,
+            "business_type": self.business_type,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "progress": self.extraction.progress() if self.extraction else None,
+            "error": self.error
+        }
+        if from_page is not None and self.extraction is not None:
+            data["pages"] = self.extraction.pages_from(from_page)
+        if self.status == "completed":
+            data["result"] = self.result
+        return data
+
 class MinerUService:
     """MinerU文档解析服务类"""
     
     def __init__(self):
-        self.upload_dir = "/app/uploads"
-        self.output_dir = "/app/output"
+        self.upload_dir = os.getenv("UPLOAD_DIR", "/app/uploads")
+        self.output_dir = os.getenv("OUTPUT_DIR", "/app/output")
         self.max_memory = os.getenv("MAX_MEMORY", "2GB")
         self.max_concurrent = int(os.getenv("MAX_CONCURRENT", "2"))
         self.current_tasks = 0
+        self.max_jobs = int(os.getenv("MAX_JOBS", "1000"))
+        self.jobs: "OrderedDict[str, ParseJob]" = OrderedDict()
         
         # 创建必要的目录
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.output_dir, exist_ok=True)
         
+        # 进程池大小与并发上限一致，提取结果按内容哈希缓存到输出目录
+        self.pipeline = DocumentParsingPipeline(
+            max_workers=self.max_concurrent,
+            page_batch_size=int(os.getenv("PAGE_BATCH_SIZE", "8")),
+            cache_dir=os.path.join(self.output_dir, "cache"),
+            max_inflight=int(os.getenv("MAX_INFLIGHT_DOCUMENTS", str(self.max_concurrent * 4)))
+        )
+        
         logger.info("MinerU服务初始化", 
                    upload_dir=self.upload_dir, 
                    output_dir=self.output_dir,
@@ -136,77 +204,10 @@ class MinerUService:
     async def parse_pdf(self, file_path: str, business_type: str = "resume") -> Dict:
         """解析PDF文件 - 支持业务类型"""
         try:
-            # 根据业务类型返回不同的模拟结果
-            if business_type == "resume":
-                result = {
-                    "type": "pdf",
-                    "business_type": "resume",
-                    "pages": 1,
-                    "content": "简历PDF解析内容（模拟）",
-                    "structure": {
-                        "title": "个人简历",
-                        "sections": ["基本信息", "教育经历", "工作经历", "技能专长", "项目经验"]
-                    },
-                    "metadata": {
-                        "author": "求职者",
-                        "created": "2025-09-14",
-                        "modified": "2025-09-14"
-                    },
-                    # 简历特有字段
-                    "name": "张三",
-                    "phone": "13800138000",
-                    "email": "zhangsan@example.com",
-                    "location": "北京市朝阳区",
-                    "degree": "本科",
-                    "school": "北京大学",
-                    "major": "计算机科学与技术",
-                    "technical_skills": ["Go", "Python", "MySQL", "Redis"],
-                    "work_experience": ["软件工程师", "高级开发工程师"],
-                    "confidence": 0.92
-                }
-            elif business_type == "company":
-                result = {
-                    "type": "pdf",
-                    "business_type": "company",
-                    "pages": 1,
-                    "content": "企业画像PDF解析内容（模拟）",
-                    "structure": {
-                        "title": "企业画像报告",
-                        "sections": ["基本信息", "经营状况", "财务状况", "风险分析"]
-                    },
-                    "metadata": {
-                        "author": "企业",
-                        "created": "2025-09-14",
-                        "modified": "2025-09-14"
-                    },
-                    # 企业特有字段
-                    "company_name": "某某科技有限公司",
-                    "industry": "信息技术",
-                    "location": "上海市浦东新区",
-                    "employee_count": 500,
-                    "founded_year": 2010,
-                    "revenue": "5000万元",
-                    "confidence": 0.88
-                }
-            else:
-                result = {
-                    "type": "pdf",
-                    "business_type": business_type,
-                    "pages": 1,
-                    "content": "通用PDF解析内容（模拟）",
-                    "structure": {
-                        "title": "文档标题",
-                        "sections": ["章节1", "章节2"]
-                    },
-                    "metadata": {
-                        "author": "作者",
-                        "created": "2025-09-14",
-                        "modified": "2025-09-14"
-                    },
-                    "confidence": 0.85
-                }
+            extraction = await self.pipeline.extract_result(file_path)
+            result = self.build_parse_result(extraction, business_type)
             
-            logger.info("PDF解析完成", file_path=file_path, business_type=business_type)
+            logger.info("PDF解析完成", file_path=file_path, business_type=business_type, pages=result["pages"])
             return result
             
         except Exception as e:
@@ -216,80 +217,57 @@ class MinerUService:
     async def parse_docx(self, file_path: str, business_type: str = "resume") -> Dict:
         """解析DOCX文件 - 支持业务类型"""
         try:
-            # 根据业务类型返回不同的模拟结果
-            if business_type == "resume":
-                result = {
-                    "type": "docx",
-                    "business_type": "resume",
-                    "content": "简历DOCX解析内容（模拟）",
-                    "structure": {
-                        "title": "个人简历",
-                        "sections": ["基本信息", "教育经历", "工作经历", "技能专长", "项目经验"]
-                    },
-                    "metadata": {
-                        "author": "求职者",
-                        "created": "2025-09-14",
-                        "modified": "2025-09-14"
-                    },
-                    # 简历特有字段
-                    "name": "李四",
-                    "phone": "13900139000",
-                    "email": "lisi@example.com",
-                    "location": "上海市浦东新区",
-                    "degree": "硕士",
-                    "school": "清华大学",
-                    "major": "软件工程",
-                    "technical_skills": ["Java", "Spring", "MySQL", "Redis"],
-                    "work_experience": ["Java开发工程师", "技术主管"],
-                    "confidence": 0.90
-                }
-            elif business_type == "company":
-                result = {
-                    "type": "docx",
-                    "business_type": "company",
-                    "content": "企业画像DOCX解析内容（模拟）",
-                    "structure": {
-                        "title": "企业画像报告",
-                        "sections": ["基本信息", "经营状况", "财务状况", "风险分析"]
-                    },
-                    "metadata": {
-                        "author": "企业",
-                        "created": "2025-09-14",
-                        "modified": "2025-09-14"
-                    },
-                    # 企业特有字段
-                    "company_name": "某某互联网科技有限公司",
-                    "industry": "互联网",
-                    "location": "深圳市南山区",
-                    "employee_count": 1000,
-                    "founded_year": 2015,
-                    "revenue": "1亿元",
-                    "confidence": 0.87
-                }
-            else:
-                result = {
-                    "type": "docx",
-                    "business_type": business_type,
-                    "content": "通用DOCX解析内容（模拟）",
-                    "structure": {
-                        "title": "文档标题",
-                        "sections": ["章节1", "章节2"]
-                    },
-                    "metadata": {
-                        "author": "作者",
-                        "created": "2025-09-14",
-                        "modified": "2025-09-14"
-                    },
-                    "confidence": 0.85
-                }
+            extraction = await self.pipeline.extract_result(file_path)
+            result = self.build_parse_result(extraction, business_type)
             
-            logger.info("DOCX解析完成", file_path=file_path, business_type=business_type)
+            logger.info("DOCX解析完成", file_path=file_path, business_type=business_type, pages=result["pages"])
             return result
             
         except Exception as e:
             logger.error("DOCX解析失败", file_path=file_path, business_type=business_type, error=str(e))
             raise
     
+    def build_parse_result(self, extraction: Dict, business_type: str) -> Dict:
+        """由文本与版面提取结果组装解析结果"""
+        metadata = extraction.get("metadata") or {}
+        result = {
+            "type": extraction["type"],
+            "business_type": business_type,
+            "pages": extraction["page_count"],
+            "content": extraction["text"],
+            "content_hash": extraction["content_hash"],
+            "structure": detect_structure(extraction),
+            "metadata": {
+                "author": metadata.get("author"),
+                "created": metadata.get("created"),
+                "modified": metadata.get("modified")
+            },
+            "page_contents": extraction["pages"]
+        }
+        if extraction.get("tables"):
+            result["tables"] = extraction["tables"]
+        result.update(self.extract_business_fields(extraction["text"], business_type))
+        return result
+    
+    def extract_business_fields(self, text: str, business_type: str) -> Dict:
+        """从正文中抽取可直接识别的业务字段"""
+        fields = {}
+        if business_type == "resume":
+            email = EMAIL_PATTERN.search(text)
+            if email:
+                fields["email"] = email.group(0)
+            phone = PHONE_PATTERN.search(text)
+            if phone:
+                fields["phone"] = phone.group(0)
+        elif business_type == "company":
+            company_name = COMPANY_NAME_PATTERN.search(text)
+            if company_name:
+                fields["company_name"] = company_name.group(0)
+            email = EMAIL_PATTERN.search(text)
+            if email:
+                fields["email"] = email.group(0)
+        return fields
+    
     async def enhance_parsing_result(self, result: Dict, file_info: Dict, business_type: str = "resume") -> Dict:
         """增强解析结果 - 支持业务类型"""
         try:
@@ -351,13 +329,24 @@ class MinerUService:
             }
     
     async def extract_document_content(self, file_path: str) -> str:
-        """提取文档内容（简化版本）"""
+        """提取文档内容，提取结果与解析共用缓存，同一文档只解析一次"""
+        try:
+            extraction = await self.pipeline.extract_result(file_path)
+            if extraction["text"].strip():
+                return extraction["text"]
+        except PipelineBusy:
+            raise
+        except Exception as e:
+            logger.warning("文档文本提取失败，改用文件名推断", file_path=file_path, error=str(e))
+        
+        # 扫描件等无文本层的文档，或不支持的文件类型
+        return self.content_from_filename(file_path)
+    
+    def content_from_filename(self, file_path: str) -> str:
+        """根据文件名推断文档内容"""
         try:
-            # 这里应该实现真正的文档内容提取
-            # 目前返回文件名作为内容，实际应该使用OCR或文档解析库
             filename = os.path.basename(file_path)
             
-            # 模拟内容提取
             if "简历" in filename or "resume" in filename.lower():
                 return "个人简历 姓名 性别 年龄 教育背景 工作经历 技能专长"
             elif "企业" in filename or "公司" in filename or "company" in filename.lower():
@@ -369,9 +358,75 @@ class MinerUService:
             logger.error("文档内容提取失败", file_path=file_path, error=str(e))
             return ""
 
+    async def submit_job(self, file_path: str, user_id: int, business_type: str, cleanup: bool = False) -> ParseJob:
+        """提交异步解析作业，文本提取立即在进程池中开始"""
+        # 先腾出位置并占位再开始提取，作业已满时不占用进程池，并发提交也不会超出上限
+        if not self._evict_jobs():
+            raise JobStoreFull(f"未结束的作业已达上限({self.max_jobs})，请稍后重试")
+        job = ParseJob(file_path, user_id, business_type, cleanup)
+        self.jobs[job.job_id] = job
+        try:
+            job.extraction = await self.pipeline.extract(file_path)
+        except BaseException:
+            self.jobs.pop(job.job_id, None)
+            raise
+        
+        job.runner = asyncio.create_task(self._run_job(job))
+        logger.info("解析作业已提交", job_id=job.job_id, file_path=file_path, business_type=business_type)
+        return job
+    
+    async def _run_job(self, job: ParseJob):
+        job.status = "running"
+        try:
+            job.result = await self.parse_document(job.file_path, job.user_id, job.business_type)
+            # 逐页内容由from_page查询与流式接口从提取结果读取，结果中不再重复保存
+            job.result.pop("page_contents", None)
+            job.status = "completed"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            if job.cleanup:
+                await remove_file(job.file_path)
+            # 唤醒等待该作业的流式响应
+            job.extraction.notify()
+    
+    def get_job(self, job_id: str) -> Optional[ParseJob]:
+        job = self.jobs.get(job_id)
+        # 占位中(提取尚未开始)的作业还未返回给调用方
+        return job if job is not None and job.extraction is not None else None
+    
+    def _evict_jobs(self) -> bool:
+        """为新作业腾出一个位置，只淘汰最早结束的作业；返回是否有空位"""
+        overflow = len(self.jobs) - self.max_jobs + 1
+        if overflow <= 0:
+            return True
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished][:overflow]:
+            del self.jobs[job_id]
+        return len(self.jobs) < self.max_jobs
+    
+    async def save_upload(self, file) -> str:
+        """保存上传文件，文件名加随机前缀以免并发上传互相覆盖"""
+        file_path = os.path.join(self.upload_dir, f"{uuid.uuid4().hex}_{os.path.basename(file.name)}")
+        async with aiofiles.open(file_path, "wb") as f:
+            await f.write(file.body)
+        return file_path
+
+async def remove_file(file_path: str):
+    try:
+        await asyncio.to_thread(os.remove, file_path)
+    except FileNotFoundError:
+        pass
+
 # 创建服务实例
 mineru_service = MinerUService()
 
+@app.after_server_stop
+async def shutdown_pipeline(app, loop):
+    """关闭解析进程池"""
+    await mineru_service.pipeline.close()
+
 @app.route("/health", methods=["GET"])
 async def health_check(request: Request):
     """健康检查"""
@@ -379,17 +434,19 @@ async def health_check(request: Request):
         "status": "healthy",
         "service": "mineru-service",
         "current_tasks": mineru_service.current_tasks,
-        "max_concurrent": mineru_service.max_concurrent
+        "max_concurrent": mineru_service.max_concurrent,
+        "pipeline": mineru_service.pipeline.get_stats()
     })
 
 @app.route("/api/v1/parse/document", methods=["POST"])
 async def parse_document(request: Request):
-    """解析文档 - 支持业务类型参数"""
+    """解析文档 - 支持业务类型参数，include_pages为真时附带逐页内容"""
     try:
         data = request.json
         file_path = data.get("file_path")
         user_id = data.get("user_id")
         business_type = data.get("business_type", "resume")  # 默认简历类型
+        include_pages = flag_enabled(data.get("include_pages", False))
         
         if not file_path:
             return json({"error": "文件路径不能为空"}, status=400)
@@ -409,6 +466,8 @@ async def parse_document(request: Request):
         
         try:
             result = await mineru_service.parse_document(file_path, user_id, business_type)
+            if not include_pages:
+                result.pop("page_contents", None)
             
             return json({
                 "status": "success",
@@ -416,6 +475,8 @@ async def parse_document(request: Request):
                 "result": result
             })
             
+        except PipelineBusy:
+            return json({"error": "服务繁忙，请稍后重试"}, status=503)
         except Exception as e:
             logger.error("文档解析API失败", error=str(e))
             return json({"error": str(e)}, status=500)
@@ -481,12 +542,13 @@ async def classify_document(request: Request):
 
 @app.route("/api/v1/parse/upload", methods=["POST"])
 async def upload_and_parse(request: Request):
-    """上传并解析文档"""
+    """上传并解析文档，include_pages为真时附带逐页内容"""
     try:
         # 获取上传的文件
         file = request.files.get("file")
         user_id = request.form.get("user_id")
         business_type = request.form.get("business_type", "resume")  # 支持业务类型参数
+        include_pages = flag_enabled(request.form.get("include_pages", False))
         
         if not file:
             return json({"error": "没有上传文件"}, status=400)
@@ -499,15 +561,16 @@ async def upload_and_parse(request: Request):
             return json({"error": "不支持的业务类型，仅支持resume或company"}, status=400)
         
         # 保存上传的文件
-        file_path = os.path.join(mineru_service.upload_dir, file.name)
-        async with aiofiles.open(file_path, "wb") as f:
-            await f.write(file.body)
+        file_path = await mineru_service.save_upload(file)
         
-        # 解析文档 - 传递业务类型参数
-        result = await mineru_service.parse_document(file_path, int(user_id), business_type)
-        
-        # 清理临时文件
-        os.remove(file_path)
+        try:
+            # 解析文档 - 传递业务类型参数
+            result = await mineru_service.parse_document(file_path, int(user_id), business_type)
+        finally:
+            # 清理临时文件
+            await remove_file(file_path)
+        if not include_pages:
+            result.pop("page_contents", None)
         
         return json({
             "status": "success",
@@ -515,6 +578,8 @@ async def upload_and_parse(request: Request):
             "result": result
         })
         
+    except PipelineBusy:
+        return json({"error": "服务繁忙，请稍后重试"}, status=503)
     except Exception as e:
         logger.error("上传解析API失败", error=str(e))
         return json({"error": str(e)}, status=500)
@@ -526,9 +591,108 @@ async def get_parse_status(request: Request):
         "status": "success",
         "current_tasks": mineru_service.current_tasks,
         "max_concurrent": mineru_service.max_concurrent,
-        "available": mineru_service.current_tasks < mineru_service.max_concurrent
+        "available": mineru_service.current_tasks < mineru_service.max_concurrent,
+        "pipeline": mineru_service.pipeline.get_stats()
+    })
+
+@app.route("/api/v1/parse/jobs", methods=["POST"])
+async def submit_parse_job(request: Request):
+    """提交异步解析作业 - 支持multipart上传(file)或JSON中的file_path"""
+    file_path = None
+    cleanup = False
+    try:
+        if request.files.get("file"):
+            params = request.form
+        else:
+            params = request.json or {}
+        user_id = params.get("user_id")
+        business_type = params.get("business_type", "resume")
+        
+        if not user_id:
+            return json({"error": "用户ID不能为空"}, status=400)
+        
+        if business_type not in ["resume", "company"]:
+            return json({"error": "不支持的业务类型，仅支持resume或company"}, status=400)
+        
+        file = request.files.get("file")
+        if file:
+            file_path = await mineru_service.save_upload(file)
+            cleanup = True
+        else:
+            file_path = params.get("file_path")
+            if not file_path:
+                return json({"error": "没有上传文件或文件路径为空"}, status=400)
+            if not os.path.exists(file_path):
+                return json({"error": f"文件不存在: {file_path}"}, status=404)
+        
+        job = await mineru_service.submit_job(file_path, int(user_id), business_type, cleanup=cleanup)
+        cleanup = False
+        
+        return json({
+            "status": "accepted",
+            "job_id": job.job_id,
+            "job": job.to_dict()
+        }, status=202)
+        
+    except PipelineBusy:
+        return json({"error": "服务繁忙，请稍后重试"}, status=503)
+    except JobStoreFull as e:
+        return json({"error": str(e)}, status=503)
+    except ValueError as e:
+        return json({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.error("提交解析作业失败", error=str(e))
+        return json({"error": str(e)}, status=500)
+    finally:
+        # 作业未能提交时清理已保存的上传文件
+        if cleanup and file_path:
+            await remove_file(file_path)
+
+@app.route("/api/v1/parse/jobs/<job_id>", methods=["GET"])
+async def get_parse_job(request: Request, job_id: str):
+    """查询解析作业状态，from_page参数返回从该页起已完成的页面"""
+    job = mineru_service.get_job(job_id)
+    if job is None:
+        return json({"error": "作业不存在"}, status=404)
+    
+    from_page = request.args.get("from_page")
+    try:
+        from_page = int(from_page) if from_page is not None else None
+    except ValueError:
+        return json({"error": "from_page必须是整数"}, status=400)
+    
+    return json({
+        "status": "success",
+        "job": job.to_dict(from_page)
     })
 
+@app.route("/api/v1/parse/jobs/<job_id>/stream", methods=["GET"])
+async def stream_parse_job(request: Request, job_id: str):
+    """以NDJSON逐页推送解析结果，每页提取完成即发送，最后一行为作业最终状态"""
+    job = mineru_service.get_job(job_id)
+    if job is None:
+        return json({"error": "作业不存在"}, status=404)
+    
+    stream = await request.respond(content_type="application/x-ndjson")
+    sent_pages = set()
+    while True:
+        # 先取事件再读状态，避免漏掉两者之间发生的更新
+        updated = job.extraction.update_event()
+        for page in job.extraction.pages_from(1):
+            if page["page"] not in sent_pages:
+                sent_pages.add(page["page"])
+                await stream.send(jsonlib.dumps({"event": "page", "page": page}, ensure_ascii=False) + "\n")
+        if job.finished:
+            break
+        try:
+            await asyncio.wait_for(updated.wait(), timeout=15)
+        except asyncio.TimeoutError:
+            # 心跳，防止长文档解析期间连接被中间代理断开
+            await stream.send(jsonlib.dumps({"event": "progress", "progress": job.extraction.progress()}) + "\n")
+    
+    await stream.send(jsonlib.dumps({"event": job.status, "job": job.to_dict()}, ensure_ascii=False, default=str) + "\n")
+    await stream.eof()
+
 if __name__ == "__main__":
     # 启动服务
     logger.info("启动MinerU服务", port=8000)
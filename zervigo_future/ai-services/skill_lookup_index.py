@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+技能查找索引
+供技能标准化引擎使用的预编译结构：
+- AliasAutomaton: 别名Aho-Corasick自动机，一次扫描找出文本中出现的全部别名(关键词评分器也复用)
+- NGramIndex: 字符n-gram倒排索引，按"查询串是某文本的子串"召回并校验
+- CharJaccardIndex: 字符倒排索引，只对有公共字符的条目计算字符集合Jaccard相似度
+"""
+
+from collections import deque, OrderedDict
+from typing import Dict, List, Set, Tuple, Any, Iterator
+
+_MISSING = object()
+
+
+class AliasAutomaton:
+    """别名Aho-Corasick自动机"""
+
+    def __init__(self):
+        # 节点以数组存储：goto转移、失败指针、该节点(含后缀链)命中的载荷
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[int]] = [set()]
+        self._compiled = False
+
+    def add(self, pattern: str, payload: int):
+        """登记模式串及其载荷(如技能序号)"""
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node].add(payload)
+        self._compiled = False
+
+    def compile(self):
+        """广度优先构建失败指针，并把后缀链上的输出合并到节点"""
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            queue.append(node)
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] |= self._output[self._fail[child]]
+        self._compiled = True
+
+    def find_all(self, text: str) -> Set[int]:
+        """返回文本中出现的全部模式串的载荷"""
+        found: Set[int] = set()
+        for _, output in self._scan(text):
+            found |= output
+        return found
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """按结束位置顺序产出(结束位置(不含), 载荷)，包括重叠的命中"""
+        for end, output in self._scan(text):
+            for payload in output:
+                yield end, payload
+
+    def _scan(self, text: str) -> Iterator[Tuple[int, Set[int]]]:
+        if not self._compiled:
+            self.compile()
+        goto = self._goto
+        fail = self._fail
+        outputs = self._output
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if outputs[node]:
+                yield index + 1, outputs[node]
+
+
+class NGramIndex:
+    """字符n-gram倒排索引，召回包含查询串的文本"""
+
+    def __init__(self, n: int = 3):
+        self.n = n
+        self._entries: List[Tuple[int, str]] = []
+        # gram -> 条目序号集合；为短查询同时索引1..n长度的gram
+        self._postings: Dict[str, Set[int]] = {}
+
+    def add(self, doc_id: int, text: str):
+        entry = len(self._entries)
+        self._entries.append((doc_id, text))
+        for size in range(1, self.n + 1):
+            for start in range(len(text) - size + 1):
+                self._postings.setdefault(text[start:start + size], set()).add(entry)
+
+    def containing(self, query: str) -> Set[int]:
+        """返回至少有一条文本包含query的doc_id集合"""
+        if not query:
+            return {doc_id for doc_id, _ in self._entries}
+        size = min(self.n, len(query))
+        grams = {query[start:start + size] for start in range(len(query) - size + 1)}
+        postings = sorted((self._postings.get(gram, ()) for gram in grams), key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return set()
+        return {self._entries[entry][0] for entry in candidates if query in self._entries[entry][1]}
+
+
+class CharJaccardIndex:
+    """字符集合Jaccard相似度索引"""
+
+    def __init__(self):
+        self._sizes: Dict[int, int] = {}
+        self._postings: Dict[str, Set[int]] = {}
+
+    def add(self, doc_id: int, text: str):
+        chars = set(text)
+        self._sizes[doc_id] = len(chars)
+        for char in chars:
+            self._postings.setdefault(char, set()).add(doc_id)
+
+    def above(self, text: str, threshold: float) -> Set[int]:
+        """返回与text字符集合Jaccard相似度大于threshold的doc_id"""
+        chars = set(text)
+        overlap: Dict[int, int] = {}
+        for char in chars:
+            for doc_id in self._postings.get(char, ()):
+                overlap[doc_id] = overlap.get(doc_id, 0) + 1
+        return {
+            doc_id for doc_id, common in overlap.items()
+            if common / (len(chars) + self._sizes[doc_id] - common) > threshold
+        }
+
+
+class LRUCache:
+    """简单LRU缓存，可缓存None结果"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Tuple[bool, Any]:
+        """返回(是否命中, 值)，以区分缓存的None与未命中"""
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Any, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
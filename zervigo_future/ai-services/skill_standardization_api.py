@@ -93,9 +93,8 @@ async def batch_standardize_skills(request: Request):
             }, status=400)
         
         results = []
-        for raw_skill in raw_skills:
-            standardized_skill = await skill_engine.standardize_skill(raw_skill)
-            
+        standardized_skills = await skill_engine.standardize_many(raw_skills)
+        for raw_skill, standardized_skill in zip(raw_skills, standardized_skills):
             if standardized_skill:
                 results.append({
                     "original_skill": raw_skill,
@@ -366,11 +365,10 @@ async def recommend_skills(request: Request):
             }, status=400)
         
         # 获取用户技能的标准化版本
-        standardized_user_skills = []
-        for skill in user_skills:
-            standardized = await skill_engine.standardize_skill(skill)
-            if standardized:
-                standardized_user_skills.append(standardized)
+        standardized_user_skills = [
+            standardized for standardized in await skill_engine.standardize_many(user_skills)
+            if standardized
+        ]
         
         # 基于相关技能推荐
         recommendations = []
@@ -13,6 +13,8 @@ from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+from skill_lookup_index import AliasAutomaton, NGramIndex, CharJaccardIndex, LRUCache
+
 logger = structlog.get_logger()
 
 class SkillCategory(Enum):
@@ -56,12 +58,22 @@ class SkillMatch:
 class SkillStandardizationEngine:
     """技能标准化引擎"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 4096):
         self.skills_database: Dict[str, StandardizedSkill] = {}
         self.skill_index: Dict[str, List[str]] = {}  # 技能名称索引
         self.category_index: Dict[SkillCategory, List[str]] = {}  # 分类索引
         self.initialized = False
         
+        # 模糊查找用的预编译索引，以技能在数据库中的顺序号为ID，
+        # 多个候选时取顺序号最小者，与逐个扫描数据库的结果一致
+        self._skill_order: List[StandardizedSkill] = []
+        self._alias_automaton = AliasAutomaton()
+        self._alias_ngrams = NGramIndex()
+        self._name_ngrams = NGramIndex()
+        self._description_ngrams = NGramIndex()
+        self._name_chars = CharJaccardIndex()
+        self._standardize_cache = LRUCache(cache_size)
+        
     async def initialize(self):
         """初始化技能数据库"""
         if self.initialized:
@@ -462,6 +474,43 @@ class SkillStandardizationEngine:
             if skill.category not in self.category_index:
                 self.category_index[skill.category] = []
             self.category_index[skill.category].append(skill_name)
+        
+        self._build_lookup_indexes()
+    
+    def _build_lookup_indexes(self):
+        """编译别名自动机、n-gram索引与字符索引，并清空标准化缓存"""
+        self._skill_order = list(self.skills_database.values())
+        self._alias_automaton = AliasAutomaton()
+        self._alias_ngrams = NGramIndex()
+        self._name_ngrams = NGramIndex()
+        self._description_ngrams = NGramIndex()
+        self._name_chars = CharJaccardIndex()
+        
+        for position, (skill_name, skill) in enumerate(self.skills_database.items()):
+            for alias in skill.aliases:
+                self._alias_automaton.add(alias, position)
+                self._alias_ngrams.add(position, alias)
+            self._name_ngrams.add(position, skill_name)
+            self._description_ngrams.add(position, skill.description.lower())
+            self._name_chars.add(position, skill_name)
+        
+        self._alias_automaton.compile()
+        self._standardize_cache.clear()
+    
+    def _lookup_skill(self, raw_skill: str) -> Optional[StandardizedSkill]:
+        """查找已规范化(去空白、小写)的技能名称"""
+        # 精确匹配
+        skill_names = self.skill_index.get(raw_skill)
+        if skill_names:
+            return self.skills_database[skill_names[0]]
+        
+        # 模糊匹配：别名出现在输入中、输入是别名的子串、名称字符集合相似度>0.8
+        candidates = self._alias_automaton.find_all(raw_skill)
+        candidates |= self._alias_ngrams.containing(raw_skill)
+        candidates |= self._name_chars.above(raw_skill, 0.8)
+        if candidates:
+            return self._skill_order[min(candidates)]
+        return None
     
     async def standardize_skill(self, raw_skill: str) -> Optional[StandardizedSkill]:
         """技能标准化"""
@@ -470,25 +519,37 @@ class SkillStandardizationEngine:
         
         raw_skill = raw_skill.strip().lower()
         
-        # 精确匹配
-        if raw_skill in self.skill_index:
-            skill_names = self.skill_index[raw_skill]
-            if skill_names:
-                return self.skills_database[skill_names[0]]
+        found, skill = self._standardize_cache.get(raw_skill)
+        if found:
+            return skill
         
-        # 模糊匹配
-        for skill_name, skill in self.skills_database.items():
-            # 检查别名匹配
-            for alias in skill.aliases:
-                if raw_skill in alias or alias in raw_skill:
-                    return skill
-            
-            # 检查名称相似度
-            if self._calculate_similarity(raw_skill, skill_name) > 0.8:
-                return skill
+        skill = self._lookup_skill(raw_skill)
+        self._standardize_cache.set(raw_skill, skill)
+        if skill is None:
+            logger.warning("未找到匹配的技能", raw_skill=raw_skill)
+        return skill
+    
+    async def standardize_many(self, raw_skills: List[str]) -> List[Optional[StandardizedSkill]]:
+        """批量技能标准化，结果与输入顺序一致，重复技能只查找一次"""
+        if not self.initialized:
+            await self.initialize()
         
-        logger.warning("未找到匹配的技能", raw_skill=raw_skill)
-        return None
+        resolved: Dict[str, Optional[StandardizedSkill]] = {}
+        for raw_skill in raw_skills:
+            if raw_skill not in resolved:
+                resolved[raw_skill] = await self.standardize_skill(raw_skill)
+        return [resolved[raw_skill] for raw_skill in raw_skills]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """标准化结果缓存统计"""
+        return self._standardize_cache.get_stats()
+    
+    async def export_synonyms(self) -> Dict[str, List[str]]:
+        """导出同义词表({标准名称: [别名, ...]})，供ai-service的skill_synonyms.json使用"""
+        if not self.initialized:
+            await self.initialize()
+        
+        return {skill.name: list(skill.aliases) for skill in self._skill_order}
     
     async def calculate_skill_level(self, skill_name: str, experience: str) -> SkillLevel:
         """基于经验描述计算技能等级"""
@@ -530,47 +591,64 @@ class SkillStandardizationEngine:
     async def match_skill_requirements(self, user_skills: Dict[str, str], 
                                      job_requirements: Dict[str, str]) -> Dict[str, Any]:
         """技能匹配度计算"""
+        results = await self.match_many(user_skills, [job_requirements])
+        return results[0]
+    
+    async def match_many(self, user_skills: Dict[str, str],
+                         job_requirements_list: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        批量技能匹配：同一份用户技能对多组职位要求计算匹配度
+        
+        用户技能与职位要求技能各自只标准化一次，逐对比较只做标准技能之间的判断
+        """
         if not self.initialized:
             await self.initialize()
         
-        matches = []
-        total_score = 0.0
-        max_possible_score = 0.0
+        user_names = list(user_skills.keys())
+        user_standards = await self.standardize_many(user_names)
         
-        for req_skill, req_description in job_requirements.items():
-            max_possible_score += 1.0
+        req_names = list({req_skill: None for job_requirements in job_requirements_list
+                          for req_skill in job_requirements})
+        req_standards = dict(zip(req_names, await self.standardize_many(req_names)))
+        
+        results = []
+        for job_requirements in job_requirements_list:
+            matches = []
+            total_score = 0.0
+            max_possible_score = 0.0
             
-            best_match = None
-            best_score = 0.0
+            for req_skill in job_requirements:
+                max_possible_score += 1.0
+                req_standard = req_standards[req_skill]
+                
+                best_match = None
+                best_score = 0.0
+                
+                for user_skill, user_standard in zip(user_names, user_standards):
+                    match = self._match_standardized(req_standard, user_standard, user_skill)
+                    if match.match_score > best_score:
+                        best_score = match.match_score
+                        best_match = match
+                
+                if best_match:
+                    matches.append(best_match)
+                    total_score += best_match.match_score
             
-            for user_skill, user_experience in user_skills.items():
-                match = await self._calculate_skill_match(req_skill, user_skill, 
-                                                        req_description, user_experience)
-                if match.match_score > best_score:
-                    best_score = match.match_score
-                    best_match = match
+            overall_match_score = total_score / max_possible_score if max_possible_score > 0 else 0.0
             
-            if best_match:
-                matches.append(best_match)
-                total_score += best_match.match_score
-        
-        overall_match_score = total_score / max_possible_score if max_possible_score > 0 else 0.0
-        
-        return {
-            "overall_score": overall_match_score,
-            "matches": matches,
-            "total_requirements": len(job_requirements),
-            "matched_requirements": len(matches),
-            "match_percentage": len(matches) / len(job_requirements) * 100 if job_requirements else 0
-        }
+            results.append({
+                "overall_score": overall_match_score,
+                "matches": matches,
+                "total_requirements": len(job_requirements),
+                "matched_requirements": len(matches),
+                "match_percentage": len(matches) / len(job_requirements) * 100 if job_requirements else 0
+            })
+        
+        return results
     
-    async def _calculate_skill_match(self, req_skill: str, user_skill: str, 
-                                   req_description: str, user_experience: str) -> SkillMatch:
-        """计算技能匹配度"""
-        # 标准化技能名称
-        req_standard = await self.standardize_skill(req_skill)
-        user_standard = await self.standardize_skill(user_skill)
-        
+    def _match_standardized(self, req_standard: Optional[StandardizedSkill],
+                            user_standard: Optional[StandardizedSkill], user_skill: str) -> SkillMatch:
+        """比较已标准化的职位要求技能与用户技能"""
         if not req_standard or not user_standard:
             return SkillMatch(
                 user_skill=user_skill,
@@ -623,15 +701,6 @@ class SkillStandardizationEngine:
             match_type="no_match"
         )
     
-    def _calculate_similarity(self, str1: str, str2: str) -> float:
-        """计算字符串相似度"""
-        # 简单的Jaccard相似度
-        set1 = set(str1)
-        set2 = set(str2)
-        intersection = len(set1.intersection(set2))
-        union = len(set1.union(set2))
-        return intersection / union if union > 0 else 0.0
-    
     async def get_skills_by_category(self, category: SkillCategory) -> List[StandardizedSkill]:
         """根据分类获取技能"""
         if not self.initialized:
@@ -648,20 +717,23 @@ class SkillStandardizationEngine:
         query = query.lower()
         results = []
         
-        for skill_name, skill in self.skills_database.items():
+        name_hits = self._name_ngrams.containing(query)
+        alias_hits = self._alias_ngrams.containing(query)
+        description_hits = self._description_ngrams.containing(query)
+        
+        for position in sorted(name_hits | alias_hits | description_hits):
+            skill = self._skill_order[position]
             # 名称匹配
-            if query in skill_name:
+            if position in name_hits:
                 results.append((skill, 1.0))
                 continue
             
             # 别名匹配
-            for alias in skill.aliases:
-                if query in alias:
-                    results.append((skill, 0.8))
-                    break
+            if position in alias_hits:
+                results.append((skill, 0.8))
             
             # 描述匹配
-            if query in skill.description.lower():
+            if position in description_hits:
                 results.append((skill, 0.6))
         
         # 按匹配度排序并返回前limit个结果
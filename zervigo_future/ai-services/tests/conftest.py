@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+AI服务单元测试配置
+服务模块以脚本目录形式平铺存放，测试时把所在目录加入Python路径
+"""
+
+import os
+import sys
+
+AI_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (AI_SERVICES_DIR, os.path.join(AI_SERVICES_DIR, "ai-service"), os.path.join(AI_SERVICES_DIR, "mineru")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
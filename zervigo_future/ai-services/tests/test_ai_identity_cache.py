@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+AI身份缓存测试
+使用内存版Redis替身验证溢出、删除与TTL行为
+"""
+
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("structlog")
+
+from ai_identity_cache import BoundedTTLCache
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get(self, key):
+        self.commands.append(("get", key))
+
+    def pttl(self, key):
+        self.commands.append(("pttl", key))
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(key) for name, key in self.commands]
+
+
+class FakeRedis:
+    """支持get/set(px)/delete/pttl/pipeline的内存Redis替身"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, px=None, ex=None):
+        ttl_ms = px if px is not None else (ex * 1000 if ex is not None else None)
+        self.data[key] = (value, time.time() + ttl_ms / 1000 if ttl_ms else None)
+
+    async def get(self, key):
+        entry = self.data.get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            return None
+        return entry[0]
+
+    async def pttl(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return -2
+        if entry[1] is None:
+            return -1
+        return max(0, int((entry[1] - time.time()) * 1000))
+
+    async def delete(self, key):
+        return 1 if self.data.pop(key, None) is not None else 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+class TestBoundedTTLCache:
+    """测试有界TTL缓存"""
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_spills_to_redis(self, redis):
+        cache = BoundedTTLCache(max_entries=1, ttl=60, namespace="t", redis_client=redis)
+        await cache.set("a", {"v": 1})
+        await cache.set("b", {"v": 2})
+
+        assert "a" not in cache
+        assert "t:a" in redis.data
+        assert await cache.get("a") == {"v": 1}
+        assert cache.get_stats()["spill_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_delete_removes_spilled_copy(self, redis):
+        """删除后不能再从Redis溢出副本中读回旧值"""
+        cache = BoundedTTLCache(max_entries=1, ttl=60, namespace="t", redis_client=redis)
+        await cache.set("profile_1", {"vector_embedding": np.ones(4, dtype=np.float32)})
+        await cache.set("profile_2", {"vector_embedding": np.zeros(4, dtype=np.float32)})
+        assert "t:profile_1" in redis.data
+
+        assert await cache.delete("profile_1")
+        assert "t:profile_1" not in redis.data
+        assert await cache.get("profile_1") is None
+
+        assert await cache.pop("profile_2") is not None
+        assert await cache.get("profile_2") is None
+
+    @pytest.mark.asyncio
+    async def test_reload_keeps_remaining_ttl(self, redis):
+        cache = BoundedTTLCache(max_entries=1, ttl=60, namespace="t", redis_client=redis)
+        await cache.set("a", {"v": 1})
+        await cache.set("b", {"v": 2})
+        # 模拟溢出后已过去50秒
+        value, _ = redis.data["t:a"]
+        redis.data["t:a"] = (value, time.time() + 10)
+
+        assert await cache.get("a") == {"v": 1}
+        _, expires_at, _ = cache._entries["a"]
+        assert expires_at - time.time() <= 10
+
+    @pytest.mark.asyncio
+    async def test_spill_keeps_dtype(self, redis):
+        cache = BoundedTTLCache(max_entries=1, ttl=60, namespace="t", redis_client=redis)
+        labels = np.array([1, 2, 3], dtype=np.int64)
+        await cache.set("a", {"labels": labels, "vector": np.arange(3, dtype=np.float64)})
+        await cache.set("b", {"v": 2})
+
+        loaded = await cache.get("a")
+        assert loaded["labels"].dtype == np.int64
+        assert np.array_equal(loaded["labels"], labels)
+        # 浮点嵌入统一以float32存储
+        assert loaded["vector"].dtype == np.float32
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+FAISS索引管理器测试
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("structlog")
+
+from ai_identity_vector_index import FaissIndexManager, INDEX_KIND_FLAT, INDEX_KIND_HNSW
+
+DIMENSION = 8
+
+
+def _unit_vectors(count: int, seed: int = 0) -> "np.ndarray":
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _manager(**kwargs) -> FaissIndexManager:
+    manager = FaissIndexManager(name="test", dimension=DIMENSION, **kwargs)
+    manager.load_or_create()
+    return manager
+
+
+class TestFaissIndexManager:
+    """测试FAISS索引管理器"""
+
+    def test_upsert_replaces_existing_vector(self):
+        manager = _manager()
+        vectors = _unit_vectors(2)
+        manager.upsert("p1", vectors[0], "v1")
+        manager.upsert("p1", vectors[1], "v2")
+
+        assert manager.size == 1
+        assert manager.get_stats()["ntotal"] == 1
+        assert manager.contains("p1", "v2")
+        assert np.allclose(manager.get_vector("p1"), vectors[1])
+
+    def test_duplicate_ids_in_batch_leave_no_orphan(self):
+        """同一批次内重复的档案ID只保留最后一条向量"""
+        manager = _manager()
+        vectors = _unit_vectors(3)
+        manager.upsert_many(["p1", "p2", "p1"], vectors, ["a", "b", "c"])
+
+        assert manager.size == 2
+        assert manager.get_stats()["ntotal"] == 2
+        assert manager.contains("p1", "c")
+        assert np.allclose(manager.get_vector("p1"), vectors[2])
+        assert {profile_id for profile_id, _ in manager.search(vectors[0], top_k=5)} == {"p1", "p2"}
+
+    def test_writes_do_not_rebuild_inline(self):
+        """写操作只标记维护，升级由run_maintenance执行"""
+        manager = _manager(upgrade_threshold=10, upgrade_kind=INDEX_KIND_HNSW)
+        vectors = _unit_vectors(12)
+        manager.upsert_many([f"p{i}" for i in range(12)], vectors)
+
+        assert manager.get_stats()["kind"] == INDEX_KIND_FLAT
+        assert manager.maintenance_due()
+
+        assert manager.run_maintenance()
+        assert manager.get_stats()["kind"] == INDEX_KIND_HNSW
+        assert manager.size == 12
+        assert manager.search(vectors[3], top_k=1)[0][0] == "p3"
+        assert not manager.maintenance_due()
+
+    def test_snapshot_round_trip(self, tmp_path):
+        manager = _manager(storage_path=str(tmp_path), snapshot_interval=2)
+        vectors = _unit_vectors(3)
+        manager.upsert_many(["p1", "p2", "p3"], vectors, ["a", "b", "c"])
+        manager.delete("p2")
+
+        assert manager.maintenance_due()
+        assert manager.run_maintenance()
+        assert manager.get_stats()["pending_ops"] == 0
+
+        restored = FaissIndexManager(name="test", dimension=DIMENSION, storage_path=str(tmp_path))
+        assert restored.load_or_create()
+        assert sorted(restored.profile_ids()) == ["p1", "p3"]
+        assert restored.contains("p3", "c")
+        assert restored.search(vectors[0], top_k=1)[0][0] == "p1"
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+AI身份批量向量化测试
+使用假模型验证批次耗时统计与空文本处理，不加载真实的sentence-transformers模型
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("structlog")
+pytest.importorskip("aiofiles")
+
+from ai_identity_vectorization import AIIdentityVectorization, VectorizationConfig, VectorType
+
+DIMENSION = 8
+
+
+class FakeModel:
+    """按文本长度生成确定性向量的假模型"""
+
+    def __init__(self, bad_texts=()):
+        self.encoded = []
+        self.bad_texts = set(bad_texts)
+
+    def encode(self, texts, **kwargs):
+        if self.bad_texts.intersection(texts):
+            raise RuntimeError("encode failed")
+        self.encoded.extend(texts)
+        return np.array([[len(text) + i for i in range(DIMENSION)] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def vectorizer():
+    config = VectorizationConfig(
+        vector_dimension=DIMENSION,
+        normalize_vectors=False,
+        use_faiss_index=False,
+        cache_embeddings=False
+    )
+    vectorizer = AIIdentityVectorization(config)
+    vectorizer._model_cache[config.model_name] = FakeModel()
+    yield vectorizer
+    vectorizer.executor.shutdown(wait=False)
+
+
+def _profile(profile_id: str, skill: str = None):
+    skills = [{"skill_name": skill, "level": "senior", "category": "tech"}] if skill else []
+    return {"profile_id": profile_id, "skills": skills}
+
+
+class TestBatchVectorize:
+    """测试批量向量化"""
+
+    @pytest.mark.asyncio
+    async def test_empty_text_is_flagged_and_not_encoded(self, vectorizer):
+        results = await vectorizer.batch_vectorize(
+            [_profile("p1", "python"), _profile("p2")], VectorType.SKILL
+        )
+
+        assert [r.profile_id for r in results] == ["p1", "p2"]
+        assert results[0].vector_embedding is not None
+        assert results[1].vector_embedding is None
+        assert results[1].metadata["empty_text"] is True
+        assert all(text.strip() for text in vectorizer._model_cache[vectorizer.config.model_name].encoded)
+
+    @pytest.mark.asyncio
+    async def test_batch_time_is_recorded_once(self, vectorizer):
+        profiles = [_profile(f"p{i}", f"skill{i}") for i in range(10)]
+        results = await vectorizer.batch_vectorize(profiles, VectorType.SKILL)
+        stats = await vectorizer.get_performance_stats()
+
+        assert stats["total_vectorizations"] == 10
+        # 每条结果记录均摊后的耗时，合计不超过批次耗时
+        assert len({r.embedding_time_ms for r in results}) == 1
+        assert sum(r.embedding_time_ms for r in results) <= stats["total_time_ms"]
+        assert stats["average_time_ms"] == stats["total_time_ms"] / 10
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_only_fails_bad_text(self, vectorizer):
+        profiles = [_profile("p1", "python"), _profile("p2", "broken"), _profile("p3", "go")]
+        bad_text = await vectorizer._extract_text_data(profiles[1], VectorType.SKILL)
+        vectorizer._model_cache[vectorizer.config.model_name] = FakeModel(bad_texts=[bad_text])
+
+        results = await vectorizer.batch_vectorize(profiles, VectorType.SKILL)
+        stats = await vectorizer.get_performance_stats()
+
+        assert [r.profile_id for r in results] == ["p1", "p3"]
+        assert all(r.vector_embedding is not None for r in results)
+        assert stats["embedding"]["failed_batches"] == 1
+        assert stats["embedding"]["failed_texts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_single_profile_without_text(self, vectorizer):
+        result = await vectorizer.vectorize_ai_identity_profile(_profile("p1"), VectorType.SKILL)
+
+        assert result.vector_embedding is None
+        assert result.metadata["empty_text"] is True
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+文档解析流水线测试
+用替身进程池验证同一内容的并发合并、提交者删除原文件后合并任务仍能完成、
+缓存命中、临时性失败不进入失败缓存，以及作业数上限
+"""
+
+import asyncio
+import os
+import tempfile
+from typing import Tuple
+
+import pytest
+
+pytest.importorskip("structlog")
+
+from document_parsing_pipeline import DocumentParsingPipeline, PipelineBusy, extract_docx
+
+DOCX_RESULT = {
+    "page_count": 1,
+    "metadata": {"title": "简历"},
+    "pages": [{"page": 1, "text": "张三 Python", "lines": []}],
+    "tables": []
+}
+
+
+class FakePool:
+    """替代进程池：等待放行后读取任务文件，可按次数注入异常"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.calls = []
+        self.errors = []
+
+    async def __call__(self, func, *args):
+        assert func is extract_docx
+        self.calls.append(args[0])
+        await self.release.wait()
+        if self.errors:
+            raise self.errors.pop(0)
+        with open(args[0], "rb") as f:
+            f.read()
+        return DOCX_RESULT
+
+
+def _pipeline(tmp_path, **kwargs) -> Tuple[DocumentParsingPipeline, FakePool]:
+    pipeline = DocumentParsingPipeline(cache_dir=str(tmp_path / "cache"), **kwargs)
+    pool = FakePool()
+    pipeline._in_pool = pool
+    return pipeline, pool
+
+
+def _write(tmp_path, name: str, content: bytes = b"resume content") -> str:
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_same_content_is_extracted_once(tmp_path):
+    pipeline, pool = _pipeline(tmp_path)
+    first = await pipeline.extract(_write(tmp_path, "a.docx"))
+    second = await pipeline.extract(_write(tmp_path, "b.docx"))
+
+    assert second is first
+    assert pipeline.stats["coalesced"] == 1
+    pool.release.set()
+    assert (await first.done)["text"] == "张三 Python"
+    assert len(pool.calls) == 1
+    await pipeline.close()
+
+
+@pytest.mark.asyncio
+async def test_coalesced_job_survives_submitter_deleting_file(tmp_path):
+    pipeline, pool = _pipeline(tmp_path)
+    file_path = _write(tmp_path, "upload.docx")
+    task = await pipeline.extract(file_path)
+    assert await pipeline.extract(file_path) is task
+
+    # 第一个提交者的请求结束后删除了上传文件
+    os.remove(file_path)
+    pool.release.set()
+    extraction = await task.done
+
+    assert extraction["page_count"] == 1
+    assert pool.calls[0] != file_path
+    assert os.listdir(pipeline.work_dir) == []
+    await pipeline.close()
+
+
+@pytest.mark.asyncio
+async def test_completed_extraction_hits_cache(tmp_path):
+    pipeline, pool = _pipeline(tmp_path)
+    pool.release.set()
+    await pipeline.extract_result(_write(tmp_path, "a.docx"))
+
+    task = await pipeline.extract(_write(tmp_path, "b.docx"))
+    assert task.cached and task.finished
+    assert pipeline.stats["cache_hits"] == 1
+
+    # 新实例从磁盘缓存读取
+    restarted, restarted_pool = _pipeline(tmp_path)
+    task = await restarted.extract(_write(tmp_path, "c.docx"))
+    assert task.cached
+    assert len(pool.calls) == 1 and restarted_pool.calls == []
+    await pipeline.close()
+    await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_transient_failure_is_not_remembered(tmp_path):
+    pipeline, pool = _pipeline(tmp_path)
+    pool.release.set()
+    file_path = _write(tmp_path, "a.docx")
+
+    pool.errors.append(FileNotFoundError("gone"))
+    with pytest.raises(FileNotFoundError):
+        await pipeline.extract_result(file_path)
+    assert (await pipeline.extract_result(file_path))["page_count"] == 1
+    assert len(pool.calls) == 2
+    await pipeline.close()
+
+
+@pytest.mark.asyncio
+async def test_content_failure_is_remembered(tmp_path):
+    pipeline, pool = _pipeline(tmp_path)
+    pool.release.set()
+    file_path = _write(tmp_path, "a.docx")
+
+    pool.errors.append(ValueError("无法读取文档"))
+    with pytest.raises(ValueError):
+        await pipeline.extract_result(file_path)
+    task = await pipeline.extract(file_path)
+    assert task.status == "failed"
+    assert len(pool.calls) == 1
+    await pipeline.close()
+
+
+@pytest.mark.asyncio
+async def test_inflight_limit_raises_busy(tmp_path):
+    pipeline, pool = _pipeline(tmp_path, max_inflight=1)
+    await pipeline.extract(_write(tmp_path, "a.docx", b"first"))
+
+    with pytest.raises(PipelineBusy):
+        await pipeline.extract(_write(tmp_path, "b.docx", b"second"))
+    assert os.listdir(pipeline.work_dir) != []
+    pool.release.set()
+    await pipeline.close()
+
+
+class TestJobStore:
+    """作业数上限：只淘汰已结束的作业，全部未结束时拒绝(接口返回503)"""
+
+    @pytest.fixture
+    def service(self, monkeypatch):
+        pytest.importorskip("sanic")
+        pytest.importorskip("aiofiles")
+        os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="mineru-uploads-"))
+        os.environ.setdefault("OUTPUT_DIR", tempfile.mkdtemp(prefix="mineru-output-"))
+        import mineru_service
+        service = mineru_service.mineru_service
+        monkeypatch.setattr(service, "max_jobs", 2)
+        monkeypatch.setattr(service, "jobs", type(service.jobs)())
+        return mineru_service, service
+
+    def test_finished_jobs_are_evicted_first(self, service):
+        module, service = service
+        finished = module.ParseJob("a.docx", 1, "resume")
+        finished.status = "completed"
+        running = module.ParseJob("b.docx", 1, "resume")
+        service.jobs[finished.job_id] = finished
+        service.jobs[running.job_id] = running
+
+        assert service._evict_jobs() is True
+        assert list(service.jobs) == [running.job_id]
+
+    @pytest.mark.asyncio
+    async def test_full_store_rejects_new_job(self, service, tmp_path):
+        module, service = service
+        for name in ("a.docx", "b.docx"):
+            job = module.ParseJob(name, 1, "resume")
+            service.jobs[job.job_id] = job
+
+        with pytest.raises(module.JobStoreFull):
+            await service.submit_job(_write(tmp_path, "c.docx"), 1, "resume")
+        assert len(service.jobs) == 2
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+职位匹配结果缓存测试
+验证请求中的简历ID与向量变更通知中的简历ID在缓存键中统一为int，失效不会因类型不同而遗漏
+"""
+
+import pytest
+
+from job_matching_cache import MatchResultCache, VectorVersionTracker, cache_resume_id
+
+
+def test_cache_resume_id_normalizes_to_int():
+    assert cache_resume_id("42") == 42
+    assert cache_resume_id(" 42 ") == 42
+    assert cache_resume_id(42) == 42
+    with pytest.raises(ValueError):
+        cache_resume_id("abc")
+    with pytest.raises(ValueError):
+        cache_resume_id(True)
+
+
+def test_notification_invalidates_entries_from_string_request_ids():
+    cache = MatchResultCache()
+    # 请求体中的"42"在进入缓存键前已规范化
+    cache.set((cache_resume_id("42"), 1, "v1", "f", "g0", 10), ["match"])
+    cache.set((cache_resume_id(7), 1, "v1", "f", "g0", 10), ["other"])
+
+    invalidated = []
+
+    def on_resume_change(resume_id):
+        invalidated.append(resume_id)
+        cache.invalidate(lambda key: key[0] == cache_resume_id(resume_id))
+
+    tracker = VectorVersionTracker(None, on_resume_change=on_resume_change)
+    tracker._handle_notification(None, 0, "vector_changes", "resume_vectors:42")
+
+    assert invalidated == [42]
+    assert len(cache) == 1
+    assert cache.get((7, 1, "v1", "f", "g0", 10)) == ["other"]
+
+
+def test_unparseable_notification_is_ignored():
+    calls = []
+    tracker = VectorVersionTracker(None, on_resume_change=calls.append)
+    tracker._handle_notification(None, 0, "vector_changes", "resume_vectors:not-a-number")
+    assert calls == []
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+职位向量内存索引测试
+使用按SQL语义过滤的假连接池验证(updated_at, id)水位与删除对账
+"""
+
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("structlog")
+
+from job_vector_index import JobVectorIndex, INITIAL_ROWS_SQL, DELTA_ROWS_SQL, LIVE_JOB_IDS_SQL
+
+DIMENSION = 4
+T0 = datetime(2025, 10, 17, 12, 0, 0)
+
+
+def _row(row_id: int, job_id: int, updated_at: datetime, value: float = 1.0):
+    vector = [value, 0.0, 0.0, 0.0]
+    return {"id": row_id, "job_id": job_id, "description_vector": vector,
+            "requirements_vector": vector, "updated_at": updated_at}
+
+
+class FakeConnection:
+    """job_vectors表替身，按键集水位过滤并排序(不模拟安全延迟)"""
+
+    def __init__(self):
+        self.rows = {}
+
+    async def fetch(self, sql, *args):
+        rows = sorted(self.rows.values(), key=lambda r: (r["updated_at"], r["id"]))
+        if sql == LIVE_JOB_IDS_SQL:
+            return [{"job_id": r["job_id"]} for r in rows]
+        if sql == INITIAL_ROWS_SQL:
+            _, limit = args
+            return rows[:limit]
+        if sql == DELTA_ROWS_SQL:
+            watermark_ts, watermark_id, _, limit = args
+            return [r for r in rows if (r["updated_at"], r["id"]) > (watermark_ts, watermark_id)][:limit]
+        raise AssertionError(f"unexpected sql: {sql}")
+
+
+class FakeAcquire:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def acquire(self):
+        return FakeAcquire(self.conn)
+
+
+class TestJobVectorIndex:
+    """测试职位向量内存索引"""
+
+    @pytest.mark.asyncio
+    async def test_rows_sharing_watermark_timestamp_are_not_skipped(self):
+        """晚提交但updated_at与水位相同的行仍会被读到"""
+        pool = FakePool()
+        index = JobVectorIndex(dimension=DIMENSION, page_size=10)
+        pool.conn.rows[1] = _row(1, 101, T0)
+        await index.refresh(pool, force=True)
+        assert 101 in index
+
+        pool.conn.rows[2] = _row(2, 102, T0)
+        await index.refresh(pool, force=True)
+        assert 102 in index
+        assert index.get_stats()["watermark"]["id"] == 2
+
+    @pytest.mark.asyncio
+    async def test_refresh_pages_through_all_rows(self):
+        pool = FakePool()
+        index = JobVectorIndex(dimension=DIMENSION, page_size=2)
+        for i in range(5):
+            pool.conn.rows[i] = _row(i, 200 + i, T0)
+
+        assert await index.refresh(pool, force=True) == 5
+        assert len(index) == 5
+
+    @pytest.mark.asyncio
+    async def test_deleted_jobs_are_reconciled(self):
+        pool = FakePool()
+        index = JobVectorIndex(dimension=DIMENSION, page_size=10)
+        pool.conn.rows[1] = _row(1, 101, T0)
+        pool.conn.rows[2] = _row(2, 102, T0)
+        await index.refresh(pool, force=True)
+
+        del pool.conn.rows[1]
+        await index.refresh(pool, force=True)
+
+        assert 101 not in index
+        assert 102 in index
+        assert [job_id for job_id, _, _ in index.search([1, 0, 0, 0], None, 10)] == [102]
+
+    def test_cleared_vectors_remove_job(self):
+        index = JobVectorIndex(dimension=DIMENSION)
+        index.load_rows([_row(1, 101, T0)])
+        cleared = {"id": 1, "job_id": 101, "description_vector": None,
+                   "requirements_vector": None, "updated_at": T0.replace(minute=1)}
+        index.load_rows([cleared])
+
+        assert 101 not in index
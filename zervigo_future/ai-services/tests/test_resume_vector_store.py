@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+简历向量存储测试
+使用假连接池验证唯一索引检查与两种写入路径
+"""
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("asyncpg")
+
+import resume_vector_store
+from resume_vector_store import ResumeVectorStore, UPSERT_VECTORS_SQL, UPDATE_VECTORS_SQL, INSERT_VECTORS_SQL
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    """记录执行的SQL，UPDATE按已存在的resume_id返回影响行数"""
+
+    def __init__(self, has_unique_index: bool):
+        self.has_unique_index = has_unique_index
+        self.rows = {}
+        self.statements = []
+
+    async def fetchval(self, sql, *args):
+        if self.has_unique_index is None:
+            raise RuntimeError('relation "resume_vectors" does not exist')
+        return self.has_unique_index
+
+    async def execute(self, sql, *args):
+        self.statements.append(sql)
+        if sql == UPDATE_VECTORS_SQL:
+            return f"UPDATE {1 if args[0] in self.rows else 0}"
+        self.rows[args[0]] = args[1:]
+        return "INSERT 0 1"
+
+    async def executemany(self, sql, args):
+        for row_args in args:
+            await self.execute(sql, *row_args)
+
+    def transaction(self):
+        return FakeTransaction()
+
+
+class FakeAcquire:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return FakeAcquire(self.conn)
+
+    async def close(self):
+        pass
+
+
+async def _store(monkeypatch, has_unique_index: bool):
+    conn = FakeConnection(has_unique_index)
+
+    async def create_pool(**kwargs):
+        return FakePool(conn)
+
+    monkeypatch.setattr(resume_vector_store.asyncpg, "create_pool", create_pool)
+    store = ResumeVectorStore(host="localhost", user="u", password="p", database="d")
+    await store.initialize()
+    return store, conn
+
+
+class TestResumeVectorStore:
+    """测试简历向量存储"""
+
+    @pytest.mark.asyncio
+    async def test_uses_on_conflict_when_index_exists(self, monkeypatch):
+        store, conn = await _store(monkeypatch, has_unique_index=True)
+        await store.save_vectors(1, [0.1], [0.2], [0.3])
+
+        assert store.has_unique_index
+        assert conn.statements == [UPSERT_VECTORS_SQL]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_without_unique_index(self, monkeypatch):
+        """缺少唯一索引时不能使用ON CONFLICT"""
+        store, conn = await _store(monkeypatch, has_unique_index=False)
+        await store.save_vectors(1, [0.1], [0.2], [0.3])
+        await store.save_vectors_many([(1, [0.4], [0.5], [0.6]), (2, [0.7], [0.8], [0.9])])
+
+        assert not store.has_unique_index
+        assert UPSERT_VECTORS_SQL not in conn.statements
+        assert conn.statements.count(INSERT_VECTORS_SQL) == 2
+        assert sorted(conn.rows) == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_index_check_failure_does_not_fail_initialize(self, monkeypatch):
+        store, conn = await _store(monkeypatch, has_unique_index=None)
+        await store.save_vectors(1, [0.1], [0.2], [0.3])
+
+        assert not store.has_unique_index
+        assert conn.statements == [UPDATE_VECTORS_SQL, INSERT_VECTORS_SQL]
+
+    @pytest.mark.asyncio
+    async def test_pool_is_created_on_first_use_after_failed_startup(self, monkeypatch):
+        conn = FakeConnection(has_unique_index=True)
+        attempts = []
+
+        async def create_pool(**kwargs):
+            attempts.append(kwargs)
+            if len(attempts) == 1:
+                raise OSError("connection refused")
+            return FakePool(conn)
+
+        monkeypatch.setattr(resume_vector_store.asyncpg, "create_pool", create_pool)
+        store = ResumeVectorStore(host="localhost", user="u", password="p", database="d")
+        with pytest.raises(OSError):
+            await store.initialize()
+
+        await store.save_vectors(1, [0.1], [0.2], [0.3])
+        assert len(attempts) == 2
+        assert conn.statements == [UPSERT_VECTORS_SQL]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+技能词表与职位技能索引测试
+验证随服务发布的同义词数据文件可加载且与技能标准化引擎一致，以及简历技能不会撑大词表
+"""
+
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("structlog")
+
+from skill_vocabulary import SkillVocabulary, JobSkillIndex, DEFAULT_SYNONYMS_PATH
+
+
+def test_shipped_synonyms_file_loads():
+    vocabulary = SkillVocabulary()
+    assert vocabulary.load_from_file(DEFAULT_SYNONYMS_PATH) > 0
+    assert vocabulary.lookup("golang") == vocabulary.lookup("Go")
+    assert vocabulary.lookup("py") == vocabulary.lookup("Python")
+
+
+@pytest.mark.asyncio
+async def test_shipped_synonyms_match_standardization_engine():
+    """skill_synonyms.json由generate_skill_synonyms.py生成，与引擎技能数据保持一致"""
+    from skill_standardization_engine import SkillStandardizationEngine
+
+    with open(DEFAULT_SYNONYMS_PATH, "r", encoding="utf-8") as f:
+        shipped = json.load(f)
+    assert shipped == await SkillStandardizationEngine().export_synonyms()
+
+
+def test_missing_synonyms_file_is_reported_not_raised(tmp_path):
+    vocabulary = SkillVocabulary()
+    assert vocabulary.load_from_file(str(tmp_path / "missing.json")) == 0
+    assert len(vocabulary) == 0
+
+
+def test_synonyms_match_job_skills():
+    index = JobSkillIndex()
+    index.vocabulary.add_synonyms("Go", ["golang"])
+    jobs = [{"id": 1, "required_skills": ["Go", "Docker"]}]
+    scores = index.skills_match(["golang"], jobs)
+    assert scores[0] == pytest.approx(0.5)
+
+
+def test_resume_skills_do_not_grow_vocabulary():
+    index = JobSkillIndex()
+    jobs = [{"id": 1, "required_skills": ["Python"]}]
+    index.skills_match(["python"], jobs)
+    size = len(index.vocabulary)
+
+    for i in range(100):
+        index.skills_match([f"unknown-skill-{i}", "Python"], jobs)
+
+    assert len(index.vocabulary) == size
@@ -0,0 +1,38 @@
+-- 向量变更通知触发器 (PostgreSQL)
+-- 创建时间: 2026年10月17日
+-- 用途: job_vectors / resume_vectors 行变化时通过 NOTIFY vector_changes 通知AI服务，
+--       使职位匹配结果缓存即时失效
+
+CREATE OR REPLACE FUNCTION notify_vector_change() RETURNS TRIGGER AS $$
+DECLARE
+    changed RECORD;
+    row_id BIGINT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+
+    IF TG_TABLE_NAME = 'job_vectors' THEN
+        row_id := changed.job_id;
+    ELSE
+        row_id := changed.resume_id;
+    END IF;
+
+    PERFORM pg_notify('vector_changes', TG_TABLE_NAME || ':' || row_id::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 职位向量变更通知
+DROP TRIGGER IF EXISTS trg_job_vectors_notify ON job_vectors;
+CREATE TRIGGER trg_job_vectors_notify
+AFTER INSERT OR UPDATE OR DELETE ON job_vectors
+FOR EACH ROW EXECUTE FUNCTION notify_vector_change();
+
+-- 简历向量变更通知
+DROP TRIGGER IF EXISTS trg_resume_vectors_notify ON resume_vectors;
+CREATE TRIGGER trg_resume_vectors_notify
+AFTER INSERT OR UPDATE OR DELETE ON resume_vectors
+FOR EACH ROW EXECUTE FUNCTION notify_vector_change();
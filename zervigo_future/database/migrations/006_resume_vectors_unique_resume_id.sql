@@ -0,0 +1,20 @@
+-- resume_vectors.resume_id 唯一约束 (PostgreSQL)
+-- 创建时间: 2026年10月17日
+-- 用途: AI服务以 INSERT ... ON CONFLICT (resume_id) 写入简历向量，需要resume_id上的唯一索引。
+--       历史数据中同一resume_id可能有多行，先保留每个resume_id最近更新的一行再建索引。
+
+BEGIN;
+
+-- 去重期间阻止并发写入产生新的重复行
+LOCK TABLE resume_vectors IN SHARE ROW EXCLUSIVE MODE;
+
+DELETE FROM resume_vectors older
+USING resume_vectors newer
+WHERE older.resume_id = newer.resume_id
+  AND (COALESCE(older.updated_at, '-infinity'::timestamp), older.ctid)
+    < (COALESCE(newer.updated_at, '-infinity'::timestamp), newer.ctid);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uk_resume_vectors_resume_id
+ON resume_vectors (resume_id);
+
+COMMIT;